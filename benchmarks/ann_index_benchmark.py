@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Recall@k vs latency benchmark for the FAISS index types in rag/index_factory.py.
+
+Builds every index type over the same vectors, then measures recall@k against
+exact search, single-query latency (the production access pattern), build time
+and serialized size. Results are written as JSON and a Markdown report.
+
+    python benchmarks/ann_index_benchmark.py --num-vectors 100000 --dimension 768
+    python benchmarks/ann_index_benchmark.py --vectors embeddings.npy   # real embeddings
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+
+from rag.index_factory import select_index_params, create_index, train_index, apply_search_params
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Query-time settings to sweep per index type
+SWEEPS = {
+    'flat': [{}],
+    'ivf_flat': [{'nprobe': n} for n in (4, 8, 16, 32, 64)],
+    'hnsw': [{'ef_search': ef} for ef in (16, 32, 64, 128, 256)],
+    'ivf_pq': [{'nprobe': n} for n in (8, 16, 32, 64)],
+    'opq_ivf_pq': [{'nprobe': n} for n in (8, 16, 32, 64)],
+}
+
+
+def synthetic_vectors(num_vectors: int, dimension: int, num_queries: int, seed: int = 0):
+    """Clustered unit vectors, a rough stand-in for topic-heavy newsletter embeddings."""
+    rng = np.random.default_rng(seed)
+    num_topics = max(16, num_vectors // 500)
+    topics = rng.standard_normal((num_topics, dimension)).astype(np.float32)
+    assignment = rng.integers(0, num_topics, num_vectors + num_queries)
+    vectors = topics[assignment] + 0.9 * rng.standard_normal((len(assignment), dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors[:num_vectors], vectors[num_vectors:]
+
+
+def load_vectors(path: Path, num_queries: int, seed: int = 0):
+    vectors = np.load(path).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[order[num_queries:]], vectors[order[:num_queries]]
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row[row >= 0]) & set(expected)) for row, expected in zip(found, truth))
+    return hits / truth.size
+
+
+def benchmark_index(index_type: str, vectors: np.ndarray, queries: np.ndarray,
+                    truth: np.ndarray, k: int, memory_budget_mb: float):
+    params = select_index_params(len(vectors), vectors.shape[1], index_type=index_type,
+                                 memory_budget_mb=memory_budget_mb)
+    start = time.perf_counter()
+    index = create_index(params)
+    train_index(index, vectors, params)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+    build_seconds = time.perf_counter() - start
+    size_mb = len(faiss.serialize_index(index)) / (1024 * 1024)
+    print(f"🔨 {index_type}: built in {build_seconds:.1f}s, {size_mb:.1f} MB")
+
+    rows = []
+    for overrides in SWEEPS[index_type]:
+        search_params = {**params, **overrides}
+        apply_search_params(index, search_params)
+        latencies = []
+        found = np.empty((len(queries), k), dtype=np.int64)
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, ids = index.search(query.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[i] = ids[0]
+        row = {
+            'index_type': index_type,
+            'setting': ', '.join(f"{key}={value}" for key, value in overrides.items()) or 'exact',
+            'recall_at_k': round(recall_at_k(found, truth), 4),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+            'build_seconds': round(build_seconds, 1),
+            'size_mb': round(size_mb, 1),
+            'params': {key: search_params[key] for key in ('nlist', 'nprobe', 'hnsw_m', 'ef_search', 'pq_m', 'pq_nbits')},
+        }
+        print(f"   {row['setting']:>14}: recall@{k}={row['recall_at_k']:.3f} "
+              f"p50={row['p50_ms']:.2f}ms p95={row['p95_ms']:.2f}ms")
+        rows.append(row)
+    return rows
+
+
+def write_report(results, meta, output_prefix: Path):
+    output_prefix.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_prefix.with_suffix('.json'), 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+
+    auto = select_index_params(meta['num_vectors'], meta['dimension'], index_type='auto',
+                               memory_budget_mb=meta['memory_budget_mb'])
+    lines = [
+        "# ANN index benchmark",
+        "",
+        f"- Vectors: {meta['num_vectors']} x {meta['dimension']} ({meta['source']})",
+        f"- Queries: {meta['num_queries']}, k = {meta['k']}, single-query latency, {meta['threads']} thread(s)",
+        f"- Memory budget: {meta['memory_budget_mb']} MB; `INDEX_TYPE=auto` picks **{auto['index_type']}** "
+        f"(nlist={auto['nlist']}, nprobe={auto['nprobe']}, pq_m={auto['pq_m']})",
+        "",
+        f"| Index | Setting | Recall@{meta['k']} | p50 ms | p95 ms | Build s | Size MB |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for row in results:
+        lines.append(f"| {row['index_type']} | {row['setting']} | {row['recall_at_k']:.3f} | {row['p50_ms']:.2f} "
+                     f"| {row['p95_ms']:.2f} | {row['build_seconds']} | {row['size_mb']} |")
+    with open(output_prefix.with_suffix('.md'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    print(f"📊 Report written to {output_prefix.with_suffix('.md')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-vectors', type=int, default=100000)
+    parser.add_argument('--dimension', type=int, default=768)
+    parser.add_argument('--vectors', type=Path, help="Optional .npy of real embeddings instead of synthetic ones")
+    parser.add_argument('--num-queries', type=int, default=500)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--memory-budget-mb', type=float, default=1024)
+    parser.add_argument('--index-types', default=','.join(SWEEPS))
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--output', type=Path, default=RESULTS_DIR / "ann_index_benchmark")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    if args.vectors:
+        vectors, queries = load_vectors(args.vectors, args.num_queries)
+        source = str(args.vectors)
+    else:
+        vectors, queries = synthetic_vectors(args.num_vectors, args.dimension, args.num_queries)
+        source = 'synthetic clustered'
+    print(f"📐 {len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries")
+
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    results = []
+    for index_type in args.index_types.split(','):
+        results.extend(benchmark_index(index_type, vectors, queries, truth, args.k, args.memory_budget_mb))
+
+    write_report(results, {
+        'num_vectors': len(vectors),
+        'dimension': int(vectors.shape[1]),
+        'num_queries': len(queries),
+        'k': args.k,
+        'threads': args.threads,
+        'memory_budget_mb': args.memory_budget_mb,
+        'source': source,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
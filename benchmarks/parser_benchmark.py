@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the ingestion path: parse, save, insert.
+
+Generates a synthetic corpus of newsletter-shaped MIME emails (large HTML with
+many images and iframes, multipart/alternative, PDF and image attachments),
+then times EmailParser.parse_email, EmailParser.save_parsed_email and
+EmailDatabase.insert_email over it. Reports throughput, p50/p99 latency and
+peak RSS per stage as JSON (for regression tracking) and a Markdown report.
+
+Runs offline: persona topics use the keyword fallback instead of the LLM, and
+personas, parsed files, the database and the attachment cache go to a
+temporary directory.
+
+    python benchmarks/parser_benchmark.py --num-emails 500
+    python benchmarks/parser_benchmark.py --baseline benchmarks/results/parser_benchmark.json
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import zlib
+import struct
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import importlib
+from email.message import EmailMessage
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from ingestion_api.config import config
+from ingestion_api.database import EmailDatabase
+from ingestion_api.models import EmailMetadata
+from ingestion_api.attachments import AttachmentExtractor, PYMUPDF_AVAILABLE, TESSERACT_AVAILABLE
+from ingestion_api import persona_extractor as persona_module
+
+# The package exports the parser instance under the module's name
+parser_module = importlib.import_module('ingestion_api.parser')
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+STAGES = ('parse', 'save', 'insert')
+
+# Share of each email shape in the corpus
+EMAIL_KINDS = {
+    'html_newsletter': 0.45,
+    'multipart_alternative': 0.35,
+    'with_pdf': 0.1,
+    'with_image': 0.1,
+}
+
+WORDS = ("agents model retention pricing launch growth founders inference latency churn cohort "
+         "revenue roadmap benchmark enterprise onboarding funnel distribution open source gpu").split()
+
+
+def sentence(rng: random.Random, words: int = 18) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def newsletter_html(rng: random.Random, sections: int, images_per_section: int) -> str:
+    """A Substack-style newsletter: nested tables, inline styles, tracking pixels, embeds."""
+    parts = ["<!DOCTYPE html><html><head><meta charset='utf-8'><style>",
+             "td{font-family:Georgia,serif} .btn{padding:8px} " * 20,
+             "</style></head><body><table width='100%'><tr><td>"]
+    for i in range(sections):
+        parts.append(f"<table class='section'><tr><td><h2 style='margin:0'>{sentence(rng, 6)}</h2>")
+        for _ in range(3):
+            parts.append(f"<p style='line-height:1.5'>{sentence(rng)} <a href='https://example.substack.com/p/"
+                         f"{rng.randint(0, 10 ** 6)}'>{rng.choice(WORDS)}</a> {sentence(rng)}&nbsp;&amp; more</p>")
+        for _ in range(images_per_section):
+            parts.append(f"<img src='https://substackcdn.com/image/fetch/w_1456/{rng.getrandbits(64):x}.png' "
+                         f"width='600' alt='{rng.choice(WORDS)}'>")
+        if i % 4 == 0:
+            parts.append(f"<iframe src='https://www.youtube.com/embed/{rng.getrandbits(40):x}'></iframe>")
+            parts.append(f"<video controls><source src='https://cdn.example.com/clips/{i}.mp4'></video>")
+        parts.append("<!-- section end --></td></tr></table>\n")
+    parts.append("<img src='https://email.example.com/open?id=1' width='1' height='1'>"
+                 "<p>Unsubscribe | Manage preferences</p></td></tr></table></body></html>")
+    return ''.join(parts)
+
+
+def make_pdf(pages: list) -> bytes:
+    """A minimal, valid multi-page PDF with one line of text per page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_png(rng: random.Random, width: int = 320, height: int = 200) -> bytes:
+    """A grayscale PNG of noise (a screenshot-sized attachment)."""
+    raw = b''.join(b'\x00' + bytes(rng.getrandbits(8) for _ in range(width)) for _ in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def synthetic_corpus(num_emails: int, sections: int, images_per_section: int, pdf_pages: int, seed: int = 0):
+    """Raw emails and their kinds; attachments differ per email so the attachment cache never hits."""
+    rng = random.Random(seed)
+    kinds = rng.choices(list(EMAIL_KINDS), weights=list(EMAIL_KINDS.values()), k=num_emails)
+    emails = []
+    for i, kind in enumerate(kinds):
+        msg = EmailMessage()
+        msg['From'] = f"{rng.choice(['Lenny', 'Casey', 'Ben', 'Ava'])} from Newsletter <writer{i % 40}@substack.com>"
+        msg['To'] = 'inbox@example.com'
+        msg['Subject'] = f"Issue #{i}: {sentence(rng, 6)}"
+        msg['Date'] = f"Mon, {1 + i % 28:02d} Sep 2025 {i % 24:02d}:00:00 +0000"
+        msg['Message-ID'] = f"<bench-{seed}-{i}@substack.com>"
+        html = newsletter_html(rng, sections, images_per_section)
+        if kind == 'html_newsletter':
+            msg.set_content(html, subtype='html')
+        else:
+            msg.set_content('\n\n'.join(sentence(rng, 40) for _ in range(sections)))
+            msg.add_alternative(html, subtype='html')
+        if kind == 'with_pdf':
+            msg.add_attachment(make_pdf([f"Deck {i} page {page}: {sentence(rng)}" for page in range(pdf_pages)]),
+                               maintype='application', subtype='pdf', filename=f"deck-{i}.pdf")
+        elif kind == 'with_image':
+            msg.add_attachment(make_png(rng), maintype='image', subtype='png', filename=f"chart-{i}.png")
+        emails.append((kind, msg.as_bytes()))
+    return emails
+
+
+def peak_rss_mb() -> float:
+    # KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def summarize(latencies_ms: list) -> dict:
+    total_seconds = sum(latencies_ms) / 1000
+    return {
+        'count': len(latencies_ms),
+        'throughput_per_s': round(len(latencies_ms) / total_seconds, 1) if total_seconds else None,
+        'mean_ms': round(float(np.mean(latencies_ms)), 3),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+        'max_ms': round(float(np.max(latencies_ms)), 3),
+    }
+
+
+def run_benchmark(emails, work_dir: Path, attachment_workers: int, warmup: int):
+    """Time every stage over the corpus, stage by stage, so peak RSS can be read after each."""
+    parsed_dir = work_dir / 'parsed_emails'
+    parsed_dir.mkdir()
+    extractor = AttachmentExtractor(workers=attachment_workers, cache_path=work_dir / 'attachment_cache.db')
+    persona_extractor = persona_module.persona_extractor
+    database = EmailDatabase(db_path=str(work_dir / 'email_index.db'))
+    email_parser = parser_module.EmailParser()
+
+    with patch.object(persona_module, 'PROMPT_SYSTEM_AVAILABLE', False), \
+            patch.object(persona_extractor, 'personas_file', work_dir / 'personas.json'), \
+            patch.object(persona_extractor, 'personas', {}), \
+            patch.object(parser_module, 'attachment_extractor', extractor), \
+            patch.object(config, 'PARSED_EMAILS_DIR', parsed_dir):
+        try:
+            # Warm up imports, lxml and the extractor's process pool
+            for _, raw in emails[:warmup]:
+                email_parser.parse_email(raw)
+
+            stages = {stage: [] for stage in STAGES}
+            by_kind = {}
+            rss = {'start': round(peak_rss_mb(), 1)}
+
+            parsed = []
+            for kind, raw in emails:
+                start = time.perf_counter()
+                email_data = email_parser.parse_email(raw)
+                elapsed = (time.perf_counter() - start) * 1000
+                stages['parse'].append(elapsed)
+                by_kind.setdefault(kind, []).append(elapsed)
+                parsed.append(email_data)
+            rss['parse'] = round(peak_rss_mb(), 1)
+
+            paths = []
+            for i, email_data in enumerate(parsed):
+                start = time.perf_counter()
+                paths.append(email_parser.save_parsed_email(email_data, f"bench-{i}"))
+                stages['save'].append((time.perf_counter() - start) * 1000)
+            rss['save'] = round(peak_rss_mb(), 1)
+
+            for i, (email_data, path) in enumerate(zip(parsed, paths)):
+                metadata = EmailMetadata(id=f"bench-{i}", subject=email_data['subject'], sender=email_data['sender'],
+                                         date=email_data['date'], label=email_data['label'], parsed_path=path,
+                                         has_attachments=bool(email_data['attachments']),
+                                         attachment_count=len(email_data['attachments']))
+                start = time.perf_counter()
+                if not database.insert_email(metadata):
+                    raise RuntimeError(f"insert_email failed for bench-{i}")
+                stages['insert'].append((time.perf_counter() - start) * 1000)
+            rss['insert'] = round(peak_rss_mb(), 1)
+        finally:
+            extractor.shutdown()
+
+    results = {stage: {**summarize(latencies), 'peak_rss_mb': rss[stage]} for stage, latencies in stages.items()}
+    results['end_to_end'] = summarize([sum(values) for values in zip(*stages.values())])
+    results['end_to_end']['peak_rss_mb'] = rss['insert']
+    parse_by_kind = {kind: summarize(latencies) for kind, latencies in sorted(by_kind.items())}
+    return results, parse_by_kind, rss['start'], extractor.get_stats()
+
+
+def compare(results: dict, baseline_path: Path, tolerance: float) -> list:
+    """Stages whose p50 got slower than the baseline by more than ``tolerance`` (a fraction)."""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)['results']
+    regressions = []
+    print(f"📏 Against {baseline_path}:")
+    for stage, row in results.items():
+        if stage not in baseline:
+            continue
+        before, after = baseline[stage]['p50_ms'], row['p50_ms']
+        change = (after - before) / before if before else 0.0
+        flag = '  ⚠️ regression' if change > tolerance else ''
+        print(f"   {stage:>10}: p50 {before:.2f}ms -> {after:.2f}ms ({change:+.0%}){flag}")
+        if change > tolerance:
+            regressions.append(stage)
+    return regressions
+
+
+def write_report(results, parse_by_kind, meta, output_prefix: Path):
+    output_prefix.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_prefix.with_suffix('.json'), 'w') as f:
+        json.dump({'meta': meta, 'results': results, 'parse_by_kind': parse_by_kind}, f, indent=2)
+
+    lines = [
+        "# Parser benchmark",
+        "",
+        f"- Emails: {meta['num_emails']} synthetic newsletters, {meta['avg_email_kb']} KB on average "
+        f"({', '.join(f'{kind} {share:.0%}' for kind, share in EMAIL_KINDS.items())})",
+        f"- HTML: {meta['sections']} sections x {meta['images_per_section']} images each, an iframe and a video "
+        f"every 4 sections; PDFs have {meta['pdf_pages']} pages",
+        f"- HTML backend: {meta['html_backend']}; PyMuPDF: {meta['pymupdf']}; tesseract: {meta['tesseract']}; "
+        f"attachment workers: {meta['attachment_workers']}",
+        f"- Peak RSS before the first stage: {meta['start_rss_mb']} MB",
+        "",
+        "| Stage | Emails/s | p50 ms | p99 ms | Max ms | Peak RSS MB |",
+        "|---|---|---|---|---|---|",
+    ]
+    for stage, row in results.items():
+        lines.append(f"| {stage} | {row['throughput_per_s']} | {row['p50_ms']:.2f} | {row['p99_ms']:.2f} "
+                     f"| {row['max_ms']:.2f} | {row['peak_rss_mb']} |")
+    lines += ["", "Parse latency by email shape:", "",
+              "| Shape | Emails | p50 ms | p99 ms |", "|---|---|---|---|"]
+    for kind, row in parse_by_kind.items():
+        lines.append(f"| {kind} | {row['count']} | {row['p50_ms']:.2f} | {row['p99_ms']:.2f} |")
+    with open(output_prefix.with_suffix('.md'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    print(f"📊 Report written to {output_prefix.with_suffix('.md')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-emails', type=int, default=500)
+    parser.add_argument('--sections', type=int, default=30, help="Sections per newsletter")
+    parser.add_argument('--images-per-section', type=int, default=3)
+    parser.add_argument('--pdf-pages', type=int, default=8)
+    parser.add_argument('--attachment-workers', type=int, default=0,
+                        help="Attachment extraction processes (0 = inline, as in the tests)")
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', type=Path, help="Earlier JSON results to compare p50 latencies against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed p50 slowdown against the baseline before exiting non-zero")
+    parser.add_argument('--output', type=Path, default=RESULTS_DIR / "parser_benchmark")
+    args = parser.parse_args()
+
+    emails = synthetic_corpus(args.num_emails, args.sections, args.images_per_section, args.pdf_pages, args.seed)
+    avg_kb = sum(len(raw) for _, raw in emails) / len(emails) / 1024
+    print(f"📨 {len(emails)} emails, {avg_kb:.0f} KB on average")
+
+    work_dir = Path(tempfile.mkdtemp(prefix='parser_benchmark_'))
+    try:
+        results, parse_by_kind, start_rss, extractor_stats = run_benchmark(emails, work_dir, args.attachment_workers,
+                                                                           args.warmup)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for stage, row in results.items():
+        print(f"   {stage:>10}: {row['throughput_per_s']}/s p50={row['p50_ms']:.2f}ms "
+              f"p99={row['p99_ms']:.2f}ms peak RSS {row['peak_rss_mb']} MB")
+
+    regressions = compare(results, args.baseline, args.tolerance) if args.baseline else []
+
+    write_report(results, parse_by_kind, {
+        'num_emails': len(emails),
+        'avg_email_kb': round(avg_kb, 1),
+        'sections': args.sections,
+        'images_per_section': args.images_per_section,
+        'pdf_pages': args.pdf_pages,
+        'attachment_workers': args.attachment_workers,
+        'html_backend': 'lxml' if parser_module.LXML_AVAILABLE else 'BeautifulSoup',
+        'pymupdf': PYMUPDF_AVAILABLE,
+        'tesseract': TESSERACT_AVAILABLE,
+        'start_rss_mb': start_rss,
+        'attachments': extractor_stats,
+        'seed': args.seed,
+    }, args.output)
+
+    if regressions:
+        print(f"❌ p50 regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency benchmark for EmailRAGPipeline.query and the /query endpoint.
+
+Builds an index over a synthetic corpus at each size, embedded by a
+deterministic local embedder, and answers through the real generator and
+provider router against a stub LLM server. The stub speaks the Groq
+(OpenAI-compatible) and Gemini REST APIs and simulates their latency and
+failure profiles. Reports per-stage timings (embed query, filter, FAISS search,
+BM25, document fetch, prompt build, generate) and QPS under concurrency, as
+JSON and a Markdown report.
+
+Runs offline; nothing under data/ is read or written.
+
+    python benchmarks/rag_latency_benchmark.py --corpus-sizes 100,1000,10000,100000
+    python benchmarks/rag_latency_benchmark.py --llm-profile groq_degraded --concurrency 1,8,32
+    python benchmarks/rag_latency_benchmark.py --corpus-sizes 1000 --llm-latency-scale 0.1   # quick run
+"""
+
+import sys
+import os
+import json
+import math
+import time
+import random
+import socket
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from rag.config import config
+from rag.document_source import Document
+from rag.email_pipeline import EmailRAGPipeline
+from rag import generator as generator_module
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+STAGES = ('embed_query', 'filter', 'faiss_search', 'bm25', 'fetch_docs', 'prompt_build', 'generate')
+
+LABELS = ('substack.com', 'beehiiv.com', 'news.example.com', 'ghost.io')
+
+WORDS = ("agents model retention pricing launch growth founders inference latency churn cohort revenue "
+         "roadmap benchmark enterprise onboarding funnel distribution open source gpu vector search "
+         "embedding newsletter creator subscription seed series valuation hiring remote culture "
+         "product market fit marketplace network effects moat compute training data evaluation").split()
+
+
+# Deterministic embedder
+
+class HashingEmbedder:
+    """Bag-of-words feature hashing: deterministic, no model or API key.
+
+    ``latency_ms`` adds a sleep to query embeddings, standing in for the
+    round trip to a hosted embedding API.
+    """
+
+    def __init__(self, dimension: int = 384, latency_ms: float = 0.0):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+        self._buckets = {}
+
+    def _bucket(self, word: str):
+        bucket = self._buckets.get(word)
+        if bucket is None:
+            digest = hashlib.md5(word.encode()).digest()
+            bucket = self._buckets[word] = (int.from_bytes(digest[:4], 'little') % self.dimension,
+                                            1.0 if digest[4] & 1 else -1.0)
+        return bucket
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in text.lower().split():
+            index, sign = self._bucket(word)
+            vector[index] += sign
+        return vector
+
+    def embed_texts(self, texts):
+        return np.array([self._embed(text) for text in texts], dtype=np.float32).reshape(-1, self.dimension)
+
+    def embed_single_text(self, text, use_cache: bool = True):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self._embed(text)
+
+
+# Stub LLM server
+
+@dataclass
+class ProviderProfile:
+    """Latency (log-normal around ``median_seconds``) and failure mix of one provider."""
+    median_seconds: float
+    sigma: float = 0.4
+    error_rate: float = 0.0  # 5xx
+    rate_limit_rate: float = 0.0  # 429
+    stall_rate: float = 0.0  # Requests that hang for ``stall_seconds``
+    stall_seconds: float = 30.0
+
+
+LLM_PROFILES = {
+    'healthy': {
+        'groq': ProviderProfile(median_seconds=0.35, sigma=0.45, error_rate=0.005, rate_limit_rate=0.01),
+        'gemini': ProviderProfile(median_seconds=0.9, sigma=0.35, error_rate=0.005),
+    },
+    'groq_degraded': {
+        'groq': ProviderProfile(median_seconds=1.5, sigma=0.8, error_rate=0.05, rate_limit_rate=0.25,
+                                stall_rate=0.05),
+        'gemini': ProviderProfile(median_seconds=0.9, sigma=0.35, error_rate=0.005),
+    },
+    'groq_down': {
+        'groq': ProviderProfile(median_seconds=0.05, sigma=0.2, error_rate=1.0),
+        'gemini': ProviderProfile(median_seconds=0.9, sigma=0.35, error_rate=0.01),
+    },
+}
+
+
+class StubLLMServer:
+    """Local HTTP server answering Groq chat completions and Gemini generateContent calls.
+
+    The real SDK clients are pointed at it, so request building, HTTP and
+    response parsing are part of the measured path. Each request sleeps for a
+    latency drawn from its provider's profile (scaled by ``latency_scale``)
+    or fails the way that provider does.
+    """
+
+    def __init__(self, profiles, latency_scale: float = 1.0, seed: int = 0):
+        self.profiles = profiles
+        self.latency_scale = latency_scale
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.requests = Counter()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _draw(self, provider: str):
+        """``(seconds to wait, outcome)`` with outcome ``ok``, ``error`` or ``rate_limited``."""
+        profile = self.profiles[provider]
+        with self._rng_lock:
+            roll = self._rng.random()
+            latency = profile.median_seconds * math.exp(profile.sigma * self._rng.gauss(0, 1))
+        if roll < profile.error_rate:
+            return latency * 0.2, 'error'
+        roll -= profile.error_rate
+        if roll < profile.rate_limit_rate:
+            return 0.02, 'rate_limited'
+        roll -= profile.rate_limit_rate
+        if roll < profile.stall_rate:
+            return profile.stall_seconds, 'ok'
+        return latency, 'ok'
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out as separate writes; don't let Nagle delay the body
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                provider = 'gemini' if ':generateContent' in self.path else 'groq'
+                delay, outcome = stub._draw(provider)
+                stub.requests[(provider, outcome)] += 1
+                time.sleep(delay * stub.latency_scale)
+                if outcome == 'rate_limited':
+                    return self._reply(429, {'error': {'message': 'Rate limit reached', 'type': 'tokens',
+                                                       'code': 'rate_limit_exceeded'}}, {'Retry-After': '1'})
+                if outcome == 'error':
+                    return self._reply(503, {'error': {'code': 503, 'message': 'The model is overloaded.',
+                                                       'status': 'UNAVAILABLE'}})
+                answer = "Based on your newsletters: " + ' '.join(WORDS[:40])
+                if provider == 'gemini':
+                    return self._reply(200, {
+                        'candidates': [{'content': {'parts': [{'text': answer}], 'role': 'model'},
+                                        'finishReason': 'STOP', 'index': 0}],
+                        'usageMetadata': {'promptTokenCount': 1, 'candidatesTokenCount': 1, 'totalTokenCount': 2}
+                    })
+                return self._reply(200, {
+                    'id': 'chatcmpl-bench', 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': body.get('model', 'unknown'),
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer},
+                                 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}
+                })
+
+            def _reply(self, status: int, payload, headers=None):
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    for name, value in (headers or {}).items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up (timeout or a hedged call that lost)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def make_generator(stub_url: str):
+    """The production generator and router, with SDK clients pointed at the stub."""
+    import groq
+    import google.generativeai as genai
+    with patch.object(config, 'GROQ_API_KEY', 'bench'), patch.object(config, 'GEMINI_API_KEY', 'bench'):
+        generator = generator_module.MultiProviderGenerator()
+    generator.groq_client = groq.Groq(api_key='bench', base_url=stub_url, max_retries=0)
+    genai.configure(api_key='bench', transport='rest', client_options={'api_endpoint': stub_url})
+    generator.gemini_client = genai.GenerativeModel(generator_module.GEMINI_MODEL)
+    return generator
+
+
+# Corpus and queries
+
+def synthetic_corpus(num_chunks: int, chunks_per_email: int = 5, words_per_chunk: int = 120, seed: int = 0):
+    """Newsletter-like chunks spread over labels and the last 90 days."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    documents = []
+    for i in range(num_chunks):
+        email_index = i // chunks_per_email
+        email_rng = random.Random(seed * 1_000_003 + email_index)
+        topic = email_rng.sample(WORDS, 6)
+        content = ' '.join(rng.choice(topic) if rng.random() < 0.3 else rng.choice(WORDS)
+                           for _ in range(words_per_chunk))
+        documents.append(Document(content, {
+            'email_id': f"email-{email_index}",
+            'subject': f"Issue {email_index}: {' '.join(topic[:3])}",
+            'sender': f"writer{email_index % 50}@{LABELS[email_index % len(LABELS)]}",
+            'date': (now - timedelta(days=email_rng.uniform(0, 90))).isoformat(),
+            'label': LABELS[email_index % len(LABELS)],
+            'chunk_index': i % chunks_per_email,
+            'source_file': f"email-{email_index}.txt",
+        }))
+    return documents
+
+
+def synthetic_queries(count: int, seed: int = 1):
+    """Distinct questions (so no cache answers them), a third with a label and a third with an age filter."""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        question = f"What did they say about {' and '.join(rng.sample(WORDS, 3))} (q{seed}-{i})?"
+        label = LABELS[i % len(LABELS)] if i % 3 == 1 else None
+        max_age_days = 30 if i % 3 == 2 else None
+        queries.append((question, label, max_age_days))
+    return queries
+
+
+# Stage timing
+
+class StageTimer:
+    """Accumulates time spent in wrapped functions, per stage, for one query at a time."""
+
+    def __init__(self):
+        self.current = Counter()
+
+    def wrap(self, stage: str, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.current[stage] += time.perf_counter() - start
+        return timed
+
+    def take(self) -> Counter:
+        current, self.current = self.current, Counter()
+        return current
+
+
+def instrument(stack: ExitStack, pipeline: EmailRAGPipeline, timer: StageTimer):
+    retriever, generator = pipeline.retriever, pipeline.generator
+    targets = [
+        (retriever, 'embed_query', 'embed_query'),
+        (retriever.doc_store, 'filter_mask', 'filter'),
+        (retriever, '_index_search', 'faiss_search'),
+        (retriever, '_lexical_search', 'bm25'),
+        (retriever.doc_store, 'get_many', 'fetch_docs'),
+        (generator.packer, 'pack', 'prompt_build'),
+        (generator, '_generate', 'generate'),
+    ]
+    for obj, name, stage in targets:
+        stack.enter_context(patch.object(obj, name, timer.wrap(stage, getattr(obj, name))))
+
+
+def percentiles(values_ms):
+    if not values_ms:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'mean_ms': None}
+    return {
+        'p50_ms': round(float(np.percentile(values_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(values_ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(values_ms, 99)), 3),
+        'mean_ms': round(float(np.mean(values_ms)), 3),
+    }
+
+
+def measure_stages(pipeline: EmailRAGPipeline, queries):
+    """Run queries one at a time, breaking each down by stage."""
+    timer = StageTimer()
+    per_stage = {stage: [] for stage in STAGES + ('other', 'total')}
+    providers = Counter()
+    with ExitStack() as stack:
+        instrument(stack, pipeline, timer)
+        for question, label, max_age_days in queries:
+            start = time.perf_counter()
+            result = pipeline.query(question, label=label, max_age_days=max_age_days, use_cache=False)
+            total = time.perf_counter() - start
+            spent = timer.take()
+            # Prompts are packed lazily inside the router call
+            spent['generate'] -= spent['prompt_build'] if spent['generate'] else 0
+            for stage in STAGES:
+                per_stage[stage].append(spent[stage] * 1000)
+            per_stage['other'].append(max(0.0, total - sum(spent[stage] for stage in STAGES)) * 1000)
+            per_stage['total'].append(total * 1000)
+            providers[result.get('provider', 'error')] += 1
+    return {stage: percentiles(values) for stage, values in per_stage.items()}, dict(providers)
+
+
+def measure_concurrency(call, queries, concurrency: int):
+    """Run ``call(query)`` for every query on ``concurrency`` threads; QPS and latency."""
+    latencies, outcomes = [], Counter()
+    lock = threading.Lock()
+
+    def run(query):
+        start = time.perf_counter()
+        try:
+            outcome = call(query)
+        except Exception as e:
+            outcome = f"exception:{type(e).__name__}"
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            outcomes[outcome] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run, queries))
+    wall = time.perf_counter() - start
+    return {'concurrency': concurrency, 'queries': len(queries), 'qps': round(len(queries) / wall, 2),
+            **percentiles(latencies), 'outcomes': dict(outcomes)}
+
+
+# /query endpoint
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class QueryEndpoint:
+    """The ingestion API app served by uvicorn in this process, answering with the benchmark pipeline.
+
+    Startup hooks are skipped (lifespan off), so the app doesn't load data/
+    or start the ingest queue.
+    """
+
+    def __init__(self, pipeline: EmailRAGPipeline):
+        import httpx
+        import uvicorn
+        from ingestion_api import main
+        self._main = main
+        self._patch = patch.object(main, '_rag_pipeline', pipeline)
+        self.port = free_port()
+        self._server = uvicorn.Server(uvicorn.Config(main.app, host='127.0.0.1', port=self.port,
+                                                     lifespan='off', log_level='warning', access_log=False))
+        self._thread = None
+        self.client = httpx.Client(base_url=f"http://127.0.0.1:{self.port}", timeout=120,
+                                   limits=httpx.Limits(max_connections=256, max_keepalive_connections=256))
+
+    def __enter__(self):
+        self._patch.start()
+        self._thread = threading.Thread(target=self._server.run, name="bench-api", daemon=True)
+        self._thread.start()
+        deadline = time.time() + 30
+        while not self._server.started:
+            if time.time() > deadline:
+                raise RuntimeError("API server did not start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.client.close()
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+        self._patch.stop()
+
+    def query(self, query) -> str:
+        question, label, _ = query
+        payload = {'question': question, **({'label': label} if label else {})}
+        response = self.client.post('/query', json=payload)
+        return f"http_{response.status_code}" if response.status_code != 200 else response.json()['provider']
+
+
+# Benchmark
+
+def run_corpus_size(num_chunks: int, args, stub: StubLLMServer):
+    work_dir = Path(tempfile.mkdtemp(prefix='rag_latency_benchmark_'))
+    try:
+        pipeline = EmailRAGPipeline(data_dir=str(work_dir))
+        pipeline._embedder = HashingEmbedder(args.dimension, args.embed_latency_ms)
+        pipeline._generator = make_generator(stub.url)
+
+        documents = synthetic_corpus(num_chunks, seed=args.seed)
+        start = time.perf_counter()
+        pipeline.retriever.build_index(documents, force_rebuild=True, show_progress=False)
+        build_seconds = time.perf_counter() - start
+        del documents
+        index_type = pipeline.retriever.index_params.get('index_type')
+        print(f"🔨 {num_chunks} chunks: {index_type} index built in {build_seconds:.1f}s")
+
+        for question, label, max_age_days in synthetic_queries(args.warmup, seed=0):
+            pipeline.query(question, label=label, max_age_days=max_age_days, use_cache=False)
+
+        stages, providers = measure_stages(pipeline, synthetic_queries(args.num_queries, seed=1))
+        print(f"   stages: " + ', '.join(f"{stage}={stages[stage]['p50_ms']:.2f}ms"
+                                         for stage in STAGES + ('total',)))
+
+        concurrency = {'pipeline': [], 'endpoint': []}
+        seed = 2
+        for level in args.concurrency:
+            queries = synthetic_queries(max(args.qps_queries, level * 4), seed=seed)
+            seed += 1
+            row = measure_concurrency(
+                lambda q: pipeline.query(q[0], label=q[1], max_age_days=q[2], use_cache=False).get('provider'),
+                queries, level)
+            concurrency['pipeline'].append(row)
+            print(f"   pipeline x{level}: {row['qps']} QPS, p50={row['p50_ms']:.0f}ms p99={row['p99_ms']:.0f}ms")
+
+        if not args.skip_endpoint:
+            # Each distinct question is answered once; the answer cache would serve repeats
+            with QueryEndpoint(pipeline) as endpoint:
+                for level in args.concurrency:
+                    queries = synthetic_queries(max(args.qps_queries, level * 4), seed=seed)
+                    seed += 1
+                    row = measure_concurrency(endpoint.query, queries, level)
+                    concurrency['endpoint'].append(row)
+                    print(f"   /query x{level}: {row['qps']} QPS, p50={row['p50_ms']:.0f}ms p99={row['p99_ms']:.0f}ms")
+
+        router = pipeline.generator.get_stats()
+        pipeline.shutdown()
+        return {
+            'num_chunks': num_chunks,
+            'index_type': index_type,
+            'build_seconds': round(build_seconds, 1),
+            'stages': stages,
+            'providers': providers,
+            'concurrency': concurrency,
+            'router': router,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def write_report(results, meta, output_prefix: Path):
+    output_prefix.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_prefix.with_suffix('.json'), 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2, default=str)
+
+    lines = [
+        "# RAG latency benchmark",
+        "",
+        f"- LLM profile: **{meta['llm_profile']}** (latency scale {meta['llm_latency_scale']}), "
+        f"served by the stub over HTTP to the Groq and Gemini SDKs",
+        f"- Embedder: feature hashing, {meta['dimension']} dims, {meta['embed_latency_ms']} ms simulated "
+        f"query embedding latency",
+        f"- {meta['num_queries']} sequential queries per corpus size (a third label-filtered, a third "
+        f"age-filtered); caches bypassed",
+        f"- Hybrid search: {meta['hybrid_search']}; reranking: off; `/query` thread pool: "
+        f"{meta['max_concurrent_requests']} workers",
+        "",
+        "Per-stage p50 (ms):",
+        "",
+        "| Chunks | Index | " + " | ".join(STAGES) + " | other | total | total p95 |",
+        "|---" * (len(STAGES) + 5) + "|",
+    ]
+    for row in results:
+        stages = row['stages']
+        lines.append(f"| {row['num_chunks']} | {row['index_type']} | "
+                     + " | ".join(f"{stages[stage]['p50_ms']:.2f}" for stage in STAGES + ('other', 'total'))
+                     + f" | {stages['total']['p95_ms']:.2f} |")
+    lines += ["", "Throughput under concurrency:", "",
+              "| Chunks | Path | Concurrency | QPS | p50 ms | p99 ms | Outcomes |", "|---|---|---|---|---|---|---|"]
+    for row in results:
+        for path, levels in row['concurrency'].items():
+            for level in levels:
+                outcomes = ', '.join(f"{name} {count}" for name, count in sorted(level['outcomes'].items()))
+                lines.append(f"| {row['num_chunks']} | {path} | {level['concurrency']} | {level['qps']} "
+                             f"| {level['p50_ms']:.0f} | {level['p99_ms']:.0f} | {outcomes} |")
+    with open(output_prefix.with_suffix('.md'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    print(f"📊 Report written to {output_prefix.with_suffix('.md')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus-sizes', default='100,1000,10000,100000', help="Chunks per corpus")
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--embed-latency-ms', type=float, default=0.0,
+                        help="Simulated query embedding latency (a hosted embedding API)")
+    parser.add_argument('--llm-profile', choices=list(LLM_PROFILES), default='healthy')
+    parser.add_argument('--llm-latency-scale', type=float, default=1.0,
+                        help="Multiply simulated LLM latencies (e.g. 0.1 for a quick run)")
+    parser.add_argument('--num-queries', type=int, default=50, help="Sequential queries for stage timings")
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--qps-queries', type=int, default=64, help="Queries per concurrency level (at least 4x it)")
+    parser.add_argument('--skip-endpoint', action='store_true', help="Only benchmark EmailRAGPipeline.query")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, default=RESULTS_DIR / "rag_latency_benchmark")
+    args = parser.parse_args()
+    args.concurrency = [int(level) for level in args.concurrency.split(',')]
+
+    stub = StubLLMServer(LLM_PROFILES[args.llm_profile], args.llm_latency_scale, args.seed)
+    stub.start()
+    results = []
+    try:
+        # Single process, and no cross-encoder model to download
+        with patch.object(config, 'INDEX_MODE', 'single'), patch.object(config, 'RERANK_ENABLED', False):
+            for num_chunks in (int(size) for size in args.corpus_sizes.split(',')):
+                results.append(run_corpus_size(num_chunks, args, stub))
+    finally:
+        stub.stop()
+
+    from ingestion_api.config import config as api_config
+    write_report(results, {
+        'llm_profile': args.llm_profile,
+        'llm_profiles': {provider: vars(profile) for provider, profile in LLM_PROFILES[args.llm_profile].items()},
+        'llm_latency_scale': args.llm_latency_scale,
+        'llm_requests': {f"{provider}:{outcome}": count for (provider, outcome), count in sorted(stub.requests.items())},
+        'dimension': args.dimension,
+        'embed_latency_ms': args.embed_latency_ms,
+        'num_queries': args.num_queries,
+        'hybrid_search': config.HYBRID_SEARCH_ENABLED,
+        'index_type_setting': config.INDEX_TYPE,
+        'max_concurrent_requests': api_config.MAX_CONCURRENT_REQUESTS,
+        'seed': args.seed,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
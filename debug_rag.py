@@ -22,13 +22,13 @@ def test_rag_system():
     print("\n1. Testing Embedder...")
     embedder = HybridEmbedder()
     test_embedding = embedder.embed_single_text("test query")
-    print(f"   Embedding generated: {len(test_embedding) if test_embedding else 0} dimensions")
+    print(f"   Embedding generated: {len(test_embedding) if test_embedding is not None else 0} dimensions")
     
     # Test 2: Check retriever
     print("\n2. Testing Retriever...")
     retriever = FAISSRetriever(config.VECTOR_STORE_DIR, embedder)
     print(f"   FAISS index loaded: {retriever.index is not None}")
-    print(f"   Documents loaded: {len(retriever.documents)}")
+    print(f"   Documents loaded: {retriever.document_count()}")
     
     # Test 3: Test search
     print("\n3. Testing Search...")
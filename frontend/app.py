@@ -195,6 +195,48 @@ def query_rag(question: str, label: str = None, days_back: int = 30, sender_filt
         st.error(f"Error querying RAG: {e}")
         return None
 
+def query_rag_stream(question: str, label: str = None, sender_filter: str = None, on_token=None):
+    """Query the RAG system via the streaming backend API.
+    
+    Calls ``on_token(answer_so_far)`` as tokens arrive and returns the same
+    shape as ``query_rag``. Falls back to ``query_rag`` if streaming fails
+    before anything was received.
+    """
+    api_url = "http://localhost:8002/query/stream"
+    payload = {
+        "question": question,
+        "label": label if label and label != "All" else "substack.com",
+        "sender": sender_filter
+    }
+    result = {"answer": "", "context": [], "metadata": []}
+    try:
+        # Only the connection has a timeout; the answer can take as long as it streams
+        with requests.post(api_url, json=payload, stream=True, timeout=(5, None)) as response:
+            if response.status_code != 200:
+                return query_rag(question, label, sender_filter=sender_filter)
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "sources":
+                        result.update(data)
+                    elif event == "token":
+                        result["answer"] += data["text"]
+                        if on_token:
+                            on_token(result["answer"])
+                    elif event == "done":
+                        result.update(data)
+                    elif event == "error":
+                        st.error(f"Error querying RAG: {data.get('error')}")
+                        return result if result["answer"] else None
+        return result
+    except requests.exceptions.RequestException as e:
+        if result["answer"]:
+            return result
+        return query_rag(question, label, sender_filter=sender_filter)
+
 def display_document_card(doc: Dict[str, Any]):
     """Display a document card with metadata"""
     with st.container():
@@ -418,14 +460,15 @@ def main():
                         # Add user message to chat
                         st.session_state.messages.append({"role": "user", "content": question})
                         
-                        # Query RAG system
-                        with st.spinner("Searching emails..."):
-                            result = query_rag(
-                                question, 
-                                st.session_state.selected_label if st.session_state.selected_label != 'All' else None,
-                                days_back,
-                                st.session_state.selected_sender
-                            )
+                        # Query RAG system, showing the answer as it is generated
+                        answer_placeholder = st.empty()
+                        answer_placeholder.info("Searching emails...")
+                        result = query_rag_stream(
+                            question, 
+                            st.session_state.selected_label if st.session_state.selected_label != 'All' else None,
+                            st.session_state.selected_sender,
+                            on_token=lambda answer: answer_placeholder.markdown(f"**Assistant:** {answer}")
+                        )
                         
                         if result:
                             # Add assistant response to chat
@@ -91,7 +91,7 @@ class GmailForwarder:
                 timeout=10
             )
             
-            if response.status_code == 200:
+            if response.status_code in (200, 202):
                 print(f"✅ Email '{subject}' forwarded successfully")
                 self.processed_ids.add(email_id)
                 return True
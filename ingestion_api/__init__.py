@@ -4,10 +4,17 @@ Email Processing & RAG API - Ingestion Module
 This module provides FastAPI-based email ingestion and processing capabilities.
 """
 
-from .main import app
-from .parser import parser
-from .database import db
-from .config import config
+import importlib
 
 __version__ = "1.0.0"
-__all__ = ["app", "parser", "db", "config"] 
\ No newline at end of file
+__all__ = ["app", "parser", "db", "config"]
+
+# Loaded on first use, so importing one submodule (e.g. in the attachment
+# worker processes) doesn't start the whole API
+_EXPORTS = {"app": ".main", "parser": ".parser", "db": ".database", "config": ".config"}
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,299 @@
+import io
+import time
+import sqlite3
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+# Document processing imports
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+try:
+    # Try to import pytesseract without pandas dependency
+    import pytesseract
+    from PIL import Image
+    TESSERACT_AVAILABLE = True
+except (ImportError, ValueError) as e:
+    TESSERACT_AVAILABLE = False
+    print(f"Warning: pytesseract not available. OCR will be skipped. Error: {e}")
+
+from .config import config
+
+
+# Run in the worker processes
+
+def _extract_pdf_pages(pdf_data: bytes, start: int, end: int) -> List[str]:
+    """Text of pages ``start``..``end - 1`` of a PDF."""
+    doc = fitz.open(stream=pdf_data, filetype="pdf")
+    try:
+        return [doc.load_page(page_num).get_text() for page_num in range(start, end)]
+    finally:
+        doc.close()
+
+
+def _ocr_image(image_data: bytes, timeout: float) -> str:
+    image = Image.open(io.BytesIO(image_data))
+    # pytesseract kills tesseract when the timeout expires
+    return pytesseract.image_to_string(image, timeout=max(1, int(timeout))).strip()
+
+
+class AttachmentExtractor:
+    """Text extraction for PDF and image attachments, off the API process.
+
+    PDFs are split into page ranges and images OCR'd as separate tasks on a
+    process pool, so the attachments of an email (and the pages of a long
+    deck) are worked on in parallel without pinning a core of the API
+    process. Budgets per attachment:
+
+    - pages: only the first ``max_pages`` pages of a PDF are read
+    - time: whatever isn't done after ``timeout`` seconds is left out (the
+      result is marked truncated), and tesseract is killed at the deadline.
+      Cancelling doesn't stop a task that already runs, so after a timeout
+      the pool is replaced and its workers are killed
+
+    Complete results are cached by the SHA-256 of the attachment, so the same
+    attachment forwarded again isn't extracted twice. With ``workers=0``
+    extraction runs in the calling thread.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: Optional[float] = None,
+                 max_pages: Optional[int] = None, pages_per_task: Optional[int] = None,
+                 cache_path: Optional[Path] = None, cache_max_entries: Optional[int] = None):
+        self.workers = config.ATTACHMENT_WORKERS if workers is None else workers
+        self.timeout = timeout or config.ATTACHMENT_TIMEOUT_SECONDS
+        self.max_pages = max_pages or config.ATTACHMENT_MAX_PAGES
+        self.pages_per_task = max(1, pages_per_task or config.ATTACHMENT_PAGES_PER_TASK)
+        self.cache_path = Path(cache_path or config.ATTACHMENT_CACHE_PATH)
+        self.cache_max_entries = cache_max_entries or config.ATTACHMENT_CACHE_MAX_ENTRIES
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_futures: Set[Future] = set()
+        self._pool_lock = threading.Lock()
+        self._cache_ready = False
+        self.stats = {'extracted': 0, 'cache_hits': 0, 'truncated': 0, 'timeouts': 0, 'errors': 0}
+
+    # Process pool
+
+    def _submit_to_pool(self, fn, *args) -> Future:
+        with self._pool_lock:
+            if self._pool is None:
+                # Not forked: the API process runs threads, whose locks a fork would copy
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+                self._pool_futures = set()
+            future = self._pool.submit(fn, *args)
+            self._pool_futures.add(future)
+            future.add_done_callback(self._pool_futures.discard)
+        return future
+
+    def _submit(self, fn, *args) -> Future:
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        try:
+            return self._submit_to_pool(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. a crash in a native library); start a fresh pool
+            with self._pool_lock:
+                self._pool = None
+            return self._submit_to_pool(fn, *args)
+
+    def _recycle_pool(self, overdue: Sequence[Future]):
+        """Replace the pool whose workers are stuck on ``overdue`` tasks, and kill them.
+
+        New tasks go to a fresh pool right away. The old workers are killed
+        once the pool's other tasks are done or past their own budgets, which
+        end within ``timeout`` seconds.
+        """
+        with self._pool_lock:
+            if self._pool is None or not self._pool_futures.intersection(overdue):
+                return  # Already replaced (by another caller that timed out)
+            pool, others = self._pool, self._pool_futures - set(overdue)
+            self._pool = None
+        threading.Thread(target=self._terminate_pool, args=(pool, others), name="attachment-pool-reaper",
+                         daemon=True).start()
+
+    def _terminate_pool(self, pool: ProcessPoolExecutor, others: Set[Future]):
+        wait(others, timeout=self.timeout)
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        print(f"🔪 Stopped {len(processes)} attachment workers after a timeout")
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    # Cache
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._cache_ready:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.cache_path), timeout=30)
+        if not self._cache_ready:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS attachment_text (
+                        sha256 TEXT PRIMARY KEY,
+                        content_type TEXT NOT NULL,
+                        text TEXT NOT NULL,
+                        pages INTEGER,
+                        pages_total INTEGER,
+                        created_at REAL NOT NULL
+                    )
+                """)
+            self._cache_ready = True
+        return conn
+
+    def _cache_get(self, digest: str) -> Optional[Dict[str, Any]]:
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT text, pages, pages_total FROM attachment_text WHERE sha256 = ?",
+                                   (digest,)).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️  Attachment cache unavailable: {e}")
+            return None
+        if row is None:
+            return None
+        return {'text': row[0], 'pages': row[1], 'pages_total': row[2]}
+
+    def _cache_set(self, digest: str, content_type: str, result: Dict[str, Any]):
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO attachment_text VALUES (?, ?, ?, ?, ?, ?)",
+                                 (digest, content_type, result['text'], result.get('pages'),
+                                  result.get('pages_total'), time.time()))
+                    conn.execute("""
+                        DELETE FROM attachment_text WHERE sha256 NOT IN (
+                            SELECT sha256 FROM attachment_text ORDER BY created_at DESC LIMIT ?)
+                    """, (self.cache_max_entries,))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not cache attachment text: {e}")
+
+    # Extraction
+
+    def extract(self, content_type: str, data: bytes) -> Dict[str, Any]:
+        """Extract one attachment; see ``extract_many``."""
+        return self.extract_many([(content_type, data)])[0]
+
+    def extract_many(self, attachments: Sequence[Tuple[str, bytes]]) -> List[Dict[str, Any]]:
+        """Extract text from ``(content_type, data)`` attachments, all at once.
+
+        Each result has ``text``, ``sha256``, ``pages`` / ``pages_total``
+        (PDFs), ``truncated`` (a budget cut the text short), ``cached`` and
+        ``error`` (None on success).
+        """
+        results: List[Dict[str, Any]] = []
+        pending: List[Tuple[int, List[Future], float]] = []
+        for content_type, data in attachments:
+            digest = hashlib.sha256(data).hexdigest()
+            result = {'text': '', 'sha256': digest, 'pages': None, 'pages_total': None,
+                      'truncated': False, 'cached': False, 'error': None}
+            results.append(result)
+            if not data:
+                continue
+            cached = self._cache_get(digest)
+            if cached is not None:
+                result.update(cached, cached=True)
+                result['truncated'] = bool(cached['pages_total'] and cached['pages'] < cached['pages_total'])
+                self.stats['cache_hits'] += 1
+                continue
+            try:
+                futures = self._start(content_type, data, result)
+            except Exception as e:
+                self._fail(result, content_type, e)
+                continue
+            if futures:
+                pending.append((len(results) - 1, futures, time.monotonic() + self.timeout))
+
+        # Collect, giving every attachment its own time budget
+        for index, futures, deadline in pending:
+            result = results[index]
+            content_type = attachments[index][0]
+            done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+            parts = []
+            for future in futures:
+                if future not in done:
+                    break
+                try:
+                    value = future.result()
+                except Exception as e:
+                    self._fail(result, content_type, e)
+                    break
+                parts.extend(value if isinstance(value, list) else [value])
+            if result['error'] is not None:
+                continue
+            if not_done:
+                if not all([future.cancel() for future in not_done]) and self.workers > 0:
+                    self._recycle_pool(list(not_done))
+                self.stats['timeouts'] += 1
+                result['truncated'] = True
+                print(f"⏱️ Attachment extraction over its {self.timeout:.0f}s budget, keeping what finished")
+            if result['pages_total'] is not None:
+                result['pages'] = len(parts)
+            result['text'] = '\n\n'.join(part for part in parts if part.strip()) \
+                if content_type == 'application/pdf' else ''.join(parts)
+            self.stats['extracted'] += 1
+            if result['truncated']:
+                self.stats['truncated'] += 1
+            if not not_done:
+                # Only complete results: a timeout might not happen next time
+                self._cache_set(result['sha256'], content_type, result)
+        return results
+
+    def _start(self, content_type: str, data: bytes, result: Dict[str, Any]) -> List[Future]:
+        """Submit the tasks for one attachment (or fill in why it can't be extracted)."""
+        if content_type == 'application/pdf':
+            if not PYMUPDF_AVAILABLE:
+                result['text'] = "PDF text extraction not available (PyMuPDF not installed)"
+                return []
+            # Counting pages is cheap; reading them is what's farmed out
+            doc = fitz.open(stream=data, filetype="pdf")
+            page_count = len(doc)
+            doc.close()
+            pages = min(page_count, self.max_pages)
+            result['pages_total'] = page_count
+            result['truncated'] = pages < page_count
+            return [self._submit(_extract_pdf_pages, data, start, min(start + self.pages_per_task, pages))
+                    for start in range(0, pages, self.pages_per_task)]
+        if content_type.startswith('image/'):
+            if not TESSERACT_AVAILABLE:
+                result['text'] = "OCR not available (pytesseract not installed)"
+                return []
+            return [self._submit(_ocr_image, data, self.timeout)]
+        return []
+
+    def _fail(self, result: Dict[str, Any], content_type: str, error: Exception):
+        self.stats['errors'] += 1
+        kind = 'PDF text' if content_type == 'application/pdf' else 'image text'
+        print(f"Error extracting {kind}: {error}")
+        result['error'] = str(error)
+        result['text'] = f"Error extracting {kind}: {str(error)}"
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'workers': self.workers, 'timeout_seconds': self.timeout, 'max_pages': self.max_pages}
+
+
+# Global extractor instance (the process pool starts on first use)
+attachment_extractor = AttachmentExtractor()
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional
+
+
+class PoolSaturatedError(Exception):
+    """No worker became free within the pool's queue timeout."""
+
+
+class BlockingPool:
+    """Bounded thread pool for blocking work (embeddings, FAISS, LLM calls) from async endpoints.
+
+    At most ``max_workers`` calls run at once; further callers wait up to
+    ``queue_timeout`` seconds for a slot and then get ``PoolSaturatedError``.
+    A slot is only released when the call has actually finished, so requests
+    abandoned by their client can't push the pool past its limit.
+    """
+
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, name: str, max_workers: int, queue_timeout: Optional[float] = None):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._lock = threading.Lock()
+        self.stats = {'active': 0, 'waiting': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``func(*args, **kwargs)`` on the pool without blocking the event loop."""
+        return await asyncio.wrap_future(await self._submit(func, *args, **kwargs))
+
+    async def iterate(self, func: Callable[..., Iterable], *args, **kwargs) -> AsyncIterator:
+        """Consume the blocking iterator ``func(*args, **kwargs)`` on the pool, yielding its items.
+
+        Items are handed over as they are produced. If the consumer stops early
+        (e.g. the client disconnected) the iterator is closed on the worker.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        end = object()
+
+        def put(item, error=None):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+            except RuntimeError:  # Event loop already closed
+                stop.set()
+
+        def produce():
+            items = None
+            try:
+                items = func(*args, **kwargs)
+                for item in items:
+                    if stop.is_set():
+                        break
+                    put(item)
+            except BaseException as e:
+                put(end, e)
+                return
+            finally:
+                if hasattr(items, 'close'):
+                    items.close()
+            put(end)
+
+        await self._submit(produce)
+        try:
+            while True:
+                item, error = await queue.get()
+                if error is not None:
+                    raise error
+                if item is end:
+                    return
+                yield item
+        finally:
+            stop.set()
+
+    async def _submit(self, func: Callable[..., Any], *args, **kwargs):
+        if not await self._acquire():
+            self._count('rejected')
+            raise PoolSaturatedError(f"{self.name}: all {self.max_workers} workers busy")
+        self._count('active')
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def _acquire(self) -> bool:
+        if self._slots.acquire(blocking=False):
+            return True
+        # Poll rather than block, so the event loop keeps serving other requests
+        # and a cancelled request never ends up holding a slot
+        self._count('waiting')
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = None if self.queue_timeout is None else loop.time() + self.queue_timeout
+            while not self._slots.acquire(blocking=False):
+                if deadline is not None and loop.time() >= deadline:
+                    return False
+                await asyncio.sleep(self.POLL_INTERVAL)
+            return True
+        finally:
+            self._count('waiting', -1)
+
+    def _release(self, future):
+        self._count('active', -1)
+        if future is not None:
+            self._count('failed' if future.exception() is not None else 'completed')
+        self._slots.release()
+
+    def _count(self, key: str, delta: int = 1):
+        with self._lock:
+            self.stats[key] += delta
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'max_workers': self.max_workers, **self.stats}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -48,6 +48,22 @@ class Config:
     # Performance settings
     CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # 1 hour
     MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "10"))
+    QUERY_QUEUE_TIMEOUT = float(os.getenv("QUERY_QUEUE_TIMEOUT", "30"))  # Seconds a query waits for a worker before 503
+    
+    # Ingest queue: /inbound-email stores the raw email and workers process it
+    INGEST_QUEUE_PATH = DATA_DIR / "ingest_queue.db"
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+    INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "500"))  # Beyond this, /inbound-email answers 429
+    INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+    INGEST_RETRY_BASE_SECONDS = float(os.getenv("INGEST_RETRY_BASE_SECONDS", "5"))  # Doubles on every retry
+    
+    # Attachment extraction (PDF text, OCR) on a process pool, see attachments.py
+    ATTACHMENT_WORKERS = int(os.getenv("ATTACHMENT_WORKERS", "2"))  # 0 = extract in the calling thread
+    ATTACHMENT_TIMEOUT_SECONDS = float(os.getenv("ATTACHMENT_TIMEOUT_SECONDS", "30"))  # Per attachment
+    ATTACHMENT_MAX_PAGES = int(os.getenv("ATTACHMENT_MAX_PAGES", "50"))  # PDF pages read per attachment
+    ATTACHMENT_PAGES_PER_TASK = int(os.getenv("ATTACHMENT_PAGES_PER_TASK", "8"))
+    ATTACHMENT_CACHE_PATH = DATA_DIR / "attachment_cache.db"  # Extracted text by attachment SHA-256
+    ATTACHMENT_CACHE_MAX_ENTRIES = int(os.getenv("ATTACHMENT_CACHE_MAX_ENTRIES", "5000"))
     
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -23,8 +23,33 @@ class EmailDatabase:
             self.db_path = str(current_dir.parent / "data" / "email_index.db")
         else:
             self.db_path = db_path
+        self._delete_listeners = []
         self._init_database()
     
+    def add_delete_listener(self, callback):
+        """Register a callback invoked with the IDs of emails removed from the database."""
+        if callback not in self._delete_listeners:
+            self._delete_listeners.append(callback)
+    
+    def _notify_deleted(self, email_ids: List[str]):
+        """Tell listeners (e.g. the vector index) which emails were removed."""
+        if not email_ids:
+            return
+        for callback in self._delete_listeners:
+            try:
+                callback(email_ids)
+            except Exception as e:
+                print(f"Error notifying delete listener: {e}")
+    
+    @staticmethod
+    def _remove_parsed_files(parsed_paths: List[str]):
+        """Delete the parsed files of removed emails, so an index rebuild doesn't bring them back."""
+        for parsed_path in parsed_paths:
+            try:
+                Path(parsed_path).unlink(missing_ok=True)
+            except OSError as e:
+                print(f"Error removing parsed email file {parsed_path}: {e}")
+    
     def _init_database(self):
         """Initialize database with required tables."""
         with sqlite3.connect(self.db_path) as conn:
@@ -48,10 +73,41 @@ class EmailDatabase:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_label ON emails(label)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_date ON emails(date)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_sender ON emails(sender)")
+            
+            # Bumped in the same transaction as every write to emails
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS email_generation (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    generation INTEGER NOT NULL
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO email_generation (id, generation) VALUES (0, 0)")
             conn.commit()
     
+    @staticmethod
+    def _bump_generation(conn: sqlite3.Connection):
+        conn.execute("UPDATE email_generation SET generation = generation + 1 WHERE id = 0")
+    
+    def get_generation(self) -> Optional[int]:
+        """Counter that changes whenever emails are inserted or deleted, by any process.
+        
+        A single-row read, cheap enough to check before every use of a cached
+        view of the emails; None if it can't be read.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                row = conn.execute("SELECT generation FROM email_generation WHERE id = 0").fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            print(f"Error reading email generation: {e}")
+            return None
+    
     def insert_email(self, email: EmailMetadata) -> bool:
-        """Insert email metadata into database, keeping only the most recent 100 emails."""
+        """Insert email metadata into database, keeping only the most recent 100 emails.
+        
+        Evicted emails lose their parsed file too. That can be the email just
+        inserted, if it's older than the 100 most recent ones.
+        """
         try:
             with sqlite3.connect(self.db_path) as conn:
                 conn.execute("""
@@ -64,15 +120,20 @@ class EmailDatabase:
                     email.date.isoformat(), email.label, email.timestamp.isoformat(),
                     email.parsed_path, email.has_attachments, email.attachment_count
                 ))
+                self._bump_generation(conn)
                 conn.commit()
                 # Enforce max 100 emails
-                cursor = conn.execute("SELECT id FROM emails ORDER BY date DESC")
-                ids = [row[0] for row in cursor.fetchall()]
-                if len(ids) > 100:
-                    for old_id in ids[100:]:
+                cursor = conn.execute("SELECT id, parsed_path FROM emails ORDER BY date DESC")
+                evicted = cursor.fetchall()[100:]
+                evicted_ids = [row[0] for row in evicted]
+                if evicted_ids:
+                    for old_id in evicted_ids:
                         conn.execute("DELETE FROM emails WHERE id = ?", (old_id,))
+                    self._bump_generation(conn)
                     conn.commit()
-                return True
+            self._remove_parsed_files([row[1] for row in evicted])
+            self._notify_deleted(evicted_ids)
+            return True
         except Exception as e:
             print(f"Error inserting email: {e}")
             return False
@@ -186,12 +247,17 @@ class EmailDatabase:
             return []
     
     def delete_email(self, email_id: str) -> bool:
-        """Delete email from database."""
+        """Delete email from database, along with its parsed file."""
         try:
             with sqlite3.connect(self.db_path) as conn:
+                row = conn.execute("SELECT parsed_path FROM emails WHERE id = ?", (email_id,)).fetchone()
                 conn.execute("DELETE FROM emails WHERE id = ?", (email_id,))
+                self._bump_generation(conn)
                 conn.commit()
-                return True
+            if row is not None:
+                self._remove_parsed_files([row[0]])
+            self._notify_deleted([email_id])
+            return True
         except Exception as e:
             print(f"Error deleting email: {e}")
             return False
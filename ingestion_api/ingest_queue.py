@@ -0,0 +1,293 @@
+import os
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+from email import policy
+from email.parser import BytesHeaderParser
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class QueueFullError(Exception):
+    """Too many emails are waiting to be processed; the sender should retry later."""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def idempotency_key(raw_email: bytes) -> str:
+    """Message-ID of the email (headers only are parsed), or a hash of the bytes if it has none."""
+    try:
+        headers = BytesHeaderParser(policy=policy.default).parsebytes(raw_email)
+        message_id = str(headers.get('message-id') or '').strip()
+    except Exception:
+        message_id = ''
+    if message_id:
+        return f"message-id:{message_id}"
+    return f"sha256:{hashlib.sha256(raw_email).hexdigest()}"
+
+
+class IngestQueue:
+    """Durable queue between ``/inbound-email`` and the email processing workers.
+
+    The endpoint only stores the raw bytes (``enqueue``) and answers; a pool
+    of worker threads then runs ``handler(item_id, raw_email)`` for each item,
+    which parses, extracts, embeds and indexes the email. Items live in a
+    SQLite table, so queued emails survive a restart.
+
+    - Idempotency: an email whose Message-ID (or, without one, content hash)
+      was already queued is not queued again; the existing item is returned.
+      An email that failed for good is queued again when it's re-sent.
+    - Backpressure: with ``max_pending`` items waiting, ``enqueue`` raises
+      ``QueueFullError``.
+    - Retries: a failing item is retried with exponential backoff, up to
+      ``max_attempts`` attempts, then marked failed.
+
+    Several processes can consume one queue: items are claimed atomically, and
+    items claimed by a process that died are picked up again.
+    """
+
+    POLL_INTERVAL = 1.0
+    RECOVER_INTERVAL = 60.0
+
+    def __init__(self, db_path: Path, handler: Callable[[str, bytes], Optional[Dict[str, Any]]],
+                 workers: int = 2, max_pending: int = 500, max_attempts: int = 5,
+                 retry_base_seconds: float = 5.0):
+        self.db_path = Path(db_path)
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._last_recover = 0.0
+        self.stats = {'enqueued': 0, 'duplicates': 0, 'rejected': 0, 'processed': 0, 'retried': 0, 'failed': 0}
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_queue (
+                    id TEXT PRIMARY KEY,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    status TEXT NOT NULL,
+                    raw_email BLOB,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    worker_pid INTEGER,
+                    message TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_status ON ingest_queue (status, next_attempt_at)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit; multi-statement updates take the write lock with BEGIN IMMEDIATE
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, raw_email: bytes) -> Tuple[Dict[str, Any], bool]:
+        """Store an email for processing.
+
+        Returns the queue item and whether it was newly queued (False: the
+        same email was queued before and hasn't failed). Raises
+        ``QueueFullError`` when the queue is at capacity.
+        """
+        key = idempotency_key(raw_email)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = conn.execute("SELECT * FROM ingest_queue WHERE idempotency_key = ?", (key,)).fetchone()
+                if existing is not None and existing['status'] != 'failed':
+                    conn.execute("COMMIT")
+                    self.stats['duplicates'] += 1
+                    return self._to_item(existing), False
+                pending = conn.execute("SELECT COUNT(*) FROM ingest_queue WHERE status IN ('pending', 'processing')").fetchone()[0]
+                if pending >= self.max_pending:
+                    conn.execute("COMMIT")
+                    self.stats['rejected'] += 1
+                    raise QueueFullError(f"{pending} emails waiting to be processed")
+                now = time.time()
+                if existing is not None:
+                    # Gave up on it before: start over with a fresh set of attempts
+                    item_id = existing['id']
+                    conn.execute("""
+                        UPDATE ingest_queue SET status = 'pending', raw_email = ?, attempts = 0, next_attempt_at = ?,
+                            worker_pid = NULL, message = NULL, error = NULL, updated_at = ? WHERE id = ?
+                    """, (sqlite3.Binary(raw_email), now, now, item_id))
+                else:
+                    item_id = str(uuid.uuid4())
+                    conn.execute("""
+                        INSERT INTO ingest_queue (id, idempotency_key, status, raw_email, next_attempt_at, created_at, updated_at)
+                        VALUES (?, ?, 'pending', ?, ?, ?, ?)
+                    """, (item_id, key, sqlite3.Binary(raw_email), now, now, now))
+                item = conn.execute("SELECT * FROM ingest_queue WHERE id = ?", (item_id,)).fetchone()
+                conn.execute("COMMIT")
+            except QueueFullError:
+                raise
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        self.stats['enqueued'] += 1
+        with self._wakeup:
+            self._wakeup.notify()
+        return self._to_item(item), True
+
+    def get(self, item_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM ingest_queue WHERE id = ?", (item_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_item(row) if row is not None else None
+
+    def claim(self) -> Optional[Tuple[str, bytes]]:
+        """Take the oldest item that is due, marking it as processing in this process."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute("""
+                SELECT id, raw_email FROM ingest_queue WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at LIMIT 1
+            """, (now,)).fetchone()
+            if row is not None:
+                conn.execute("""
+                    UPDATE ingest_queue SET status = 'processing', attempts = attempts + 1,
+                        worker_pid = ?, updated_at = ? WHERE id = ?
+                """, (os.getpid(), now, row['id']))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return (row['id'], bytes(row['raw_email'])) if row is not None else None
+
+    def complete(self, item_id: str, status: str = 'done', message: Optional[str] = None):
+        """Record the outcome of an item; its raw bytes are no longer needed."""
+        self._execute("UPDATE ingest_queue SET status = ?, message = ?, error = NULL, raw_email = NULL, "
+                      "updated_at = ? WHERE id = ?", (status, message, time.time(), item_id))
+
+    def retry_or_fail(self, item_id: str, error: str) -> str:
+        """After a failed attempt: schedule a retry with backoff, or give up. Returns the new status."""
+        item = self.get(item_id)
+        attempts = item['attempts'] if item else self.max_attempts
+        now = time.time()
+        if attempts >= self.max_attempts:
+            self._execute("UPDATE ingest_queue SET status = 'failed', error = ?, raw_email = NULL, updated_at = ? "
+                          "WHERE id = ?", (error, now, item_id))
+            self.stats['failed'] += 1
+            return 'failed'
+        delay = self.retry_base_seconds * 2 ** (attempts - 1)
+        self._execute("UPDATE ingest_queue SET status = 'pending', error = ?, next_attempt_at = ?, updated_at = ? "
+                      "WHERE id = ?", (error, now + delay, now, item_id))
+        self.stats['retried'] += 1
+        return 'pending'
+
+    def recover(self) -> int:
+        """Put items claimed by processes that no longer exist back in the queue."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT id, worker_pid FROM ingest_queue WHERE status = 'processing'").fetchall()
+            # Our own items are only abandoned if our workers aren't running
+            # (e.g. a restarted container process that got the same pid)
+            abandoned = [row['id'] for row in rows
+                         if not (self._threads if row['worker_pid'] == os.getpid() else
+                                 row['worker_pid'] is not None and _pid_alive(row['worker_pid']))]
+            for item_id in abandoned:
+                conn.execute("UPDATE ingest_queue SET status = 'pending', next_attempt_at = ? "
+                             "WHERE id = ? AND status = 'processing'", (time.time(), item_id))
+        finally:
+            conn.close()
+        self._last_recover = time.time()
+        return len(abandoned)
+
+    def _execute(self, query: str, params: tuple):
+        conn = self._connect()
+        try:
+            conn.execute(query, params)
+        finally:
+            conn.close()
+
+    def process_next(self) -> bool:
+        """Process one due item in this thread. Returns False if there was none."""
+        claimed = self.claim()
+        if claimed is None:
+            return False
+        item_id, raw_email = claimed
+        try:
+            result = self.handler(item_id, raw_email) or {}
+        except Exception as e:
+            status = self.retry_or_fail(item_id, str(e))
+            print(f"⚠️  Processing queued email {item_id} failed ({status}): {e}")
+            return True
+        self.complete(item_id, result.get('status', 'done'), result.get('message'))
+        self.stats['processed'] += 1
+        return True
+
+    def _run_worker(self):
+        while not self._stop.is_set():
+            try:
+                if self.process_next():
+                    continue
+                if time.time() - self._last_recover > self.RECOVER_INTERVAL:
+                    self.recover()
+            except Exception as e:
+                print(f"❌ Ingest worker error: {e}")
+            with self._wakeup:
+                self._wakeup.wait(self.POLL_INTERVAL)
+
+    def start(self):
+        recovered = self.recover()
+        if recovered:
+            print(f"🔄 Re-queued {recovered} emails left unfinished by a stopped worker")
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run_worker, name=f"ingest-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self, timeout: float = 10):
+        """Stop the workers; an item being processed is finished first (or re-queued on the next start)."""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM ingest_queue GROUP BY status").fetchall())
+        finally:
+            conn.close()
+        return {**self.stats, 'workers': self.workers, 'max_pending': self.max_pending, 'by_status': counts}
+
+    @staticmethod
+    def _to_item(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'idempotency_key': row['idempotency_key'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'message': row['message'],
+            'error': row['error']
+        }
@@ -4,7 +4,8 @@ from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from fastapi import FastAPI, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 import pytz
 import os
@@ -15,11 +16,15 @@ import psutil
 
 from .models import (
     EmailProcessingResponse, EmailStatusResponse, EmailContent,
-    QueryRequest, QueryResponse, RefreshResponse, EmailMetadata, PersonaInfo
+    QueryRequest, QueryResponse, RefreshResponse, JobResponse, EmailMetadata, PersonaInfo,
+    IngestStatusResponse
 )
 from .parser import parser
 from .database import db
 from .config import config
+from .concurrency import BlockingPool, PoolSaturatedError
+from .attachments import attachment_extractor
+from .ingest_queue import IngestQueue, QueueFullError
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -39,6 +44,12 @@ app.add_middleware(
 
 # Global RAG pipeline instance (initialized lazily)
 _rag_pipeline = None
+# Durable queue between /inbound-email and the ingest workers (created lazily, started on startup)
+_ingest_queue = None
+
+# Embedding, FAISS search and LLM calls block, so they run on bounded thread
+# pools instead of the event loop (which keeps serving /inbound-email and /health)
+query_pool = BlockingPool("rag-query", config.MAX_CONCURRENT_REQUESTS, config.QUERY_QUEUE_TIMEOUT)
 
 def get_rag_pipeline():
     """Get or create RAG pipeline instance."""
@@ -47,8 +58,24 @@ def get_rag_pipeline():
         sys.path.append(str(Path(__file__).parent.parent))
         from rag.email_pipeline import pipeline
         _rag_pipeline = pipeline
+        # Keep the vector index in sync with deletions (including the 100-email cap)
+        db.add_delete_listener(pipeline.remove_emails)
     return _rag_pipeline
 
+def get_ingest_queue() -> IngestQueue:
+    """Get or create the ingest queue."""
+    global _ingest_queue
+    if _ingest_queue is None:
+        _ingest_queue = IngestQueue(
+            config.INGEST_QUEUE_PATH,
+            process_queued_email,
+            workers=config.INGEST_WORKERS,
+            max_pending=config.INGEST_MAX_PENDING,
+            max_attempts=config.INGEST_MAX_ATTEMPTS,
+            retry_base_seconds=config.INGEST_RETRY_BASE_SECONDS
+        )
+    return _ingest_queue
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup."""
@@ -62,11 +89,26 @@ async def startup_event():
     try:
         pipeline = get_rag_pipeline()
         pipeline.initialize()
-        print("✅ RAG pipeline initialized successfully")
+        print(f"✅ RAG pipeline initialized successfully (pid {os.getpid()}, index role: {pipeline.role})")
     except Exception as e:
         print(f"⚠️  Warning: RAG pipeline initialization failed: {e}")
         print("🔄 Continuing without RAG pipeline - will initialize on first use")
         # Don't fail startup - the pipeline can be initialized later
+    
+    # Process queued emails, including any left over from the last run
+    get_ingest_queue().start()
+    print(f"📥 Ingest queue started with {config.INGEST_WORKERS} workers")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the worker pools."""
+    query_pool.shutdown()
+    attachment_extractor.shutdown()
+    if _ingest_queue is not None:
+        _ingest_queue.shutdown()
+    # Lets another worker take over as index writer right away
+    if _rag_pipeline is not None:
+        _rag_pipeline.shutdown()
 
 @app.get("/")
 async def root():
@@ -75,81 +117,110 @@ async def root():
         "message": "Email Processing & RAG API",
         "version": "1.0.0",
         "endpoints": {
-            "POST /inbound-email": "Process incoming MIME email",
+            "POST /inbound-email": "Queue incoming MIME email for processing (returns 202)",
+            "GET /inbound-email/{id}": "Get the processing status of a queued email",
             "GET /status": "Get email status and metadata",
             "GET /email/{id}/content": "Get parsed email content",
-            "POST /refresh": "Reprocess emails from maildir",
+            "POST /refresh": "Rebuild the RAG index in the background (returns a job ID)",
+            "GET /jobs/{id}": "Get the status and progress of a background job",
             "POST /query": "Query emails using RAG",
+            "POST /query/stream": "Query emails using RAG, streaming the answer as server-sent events",
             "GET /rag/stats": "Get RAG pipeline statistics"
         }
     }
 
-@app.post("/inbound-email", response_model=EmailProcessingResponse)
+def process_queued_email(email_id: str, raw_email: bytes) -> Dict[str, Any]:
+    """Ingest worker: parse, extract, save, embed and index one queued email.
+    
+    Safe to retry: every step is skipped or overwritten if an earlier
+    attempt already got that far.
+    """
+    # Parse email
+    email_data = parser.parse_email(raw_email)
+    # Check if email is within age limit
+    email_date = email_data['date']
+    # Ensure both datetimes are timezone-aware (UTC)
+    if email_date.tzinfo is None:
+        email_date = email_date.replace(tzinfo=pytz.UTC)
+    now_utc = datetime.utcnow().replace(tzinfo=email_date.tzinfo)
+    if email_date < now_utc - timedelta(days=config.MAX_AGE_DAYS):
+        return {'status': 'skipped',
+                'message': f"Email too old (received {email_date.date()}, max age: {config.MAX_AGE_DAYS} days)"}
+    # Save parsed email to file
+    parsed_path = parser.save_parsed_email(email_data, email_id)
+    if not parsed_path:
+        raise RuntimeError("Failed to save parsed email")
+    # Create email metadata
+    email_metadata = EmailMetadata(
+        id=email_id,
+        subject=email_data['subject'],
+        sender=email_data['sender'],
+        date=email_data['date'],
+        label=email_data['label'],
+        parsed_path=parsed_path,
+        has_attachments=email_data['has_attachments'],
+        attachment_count=email_data['attachment_count'],
+        has_media=email_data.get('has_media', False),
+        media_urls=email_data.get('media_urls', {'images': [], 'videos': [], 'iframes': []}),
+        persona=PersonaInfo(**email_data['persona']) if email_data.get('persona') else None
+    )
+    # Save to database
+    if db.get_email_by_id(email_id) is None and not db.insert_email(email_metadata):
+        raise RuntimeError("Failed to save email metadata")
+    if db.get_email_by_id(email_id) is None:
+        # Older than the 100 most recent emails: evicted as soon as it was inserted
+        return {'status': 'skipped', 'message': "Email is older than the most recent emails kept"}
+    # Make the new email searchable without a full index rebuild (raises if it couldn't be
+    # embedded, so the queue retries it)
+    pipeline = get_rag_pipeline()
+    if pipeline is not None:
+        pipeline.index_email(email_id, parsed_path, email_metadata)
+    print(f"📨 Processed email {email_id}: {email_data['subject']}")
+    return {'status': 'done', 'message': f"Email processed successfully. Subject: {email_data['subject']}"}
+
+@app.post("/inbound-email", response_model=EmailProcessingResponse, status_code=202)
 async def process_inbound_email(request: Request):
-    """Process incoming MIME email from smtp2http or direct forward."""
+    """Queue incoming MIME email from smtp2http or direct forward for processing.
+    
+    The raw email is stored and the request answered right away; parsing,
+    attachment extraction, persona extraction and indexing run on the ingest
+    workers. Poll /inbound-email/{email_id} for the outcome. An email that
+    was already received (same Message-ID) isn't queued again, unless
+    processing it failed for good.
+    """
     start_time = time.time()
+    # Read raw email from body
+    raw_email = await request.body()
+    if not raw_email:
+        raise HTTPException(status_code=400, detail="Empty email content")
     try:
-        # Read raw email from body
-        raw_email = await request.body()
-        if not raw_email:
-            raise HTTPException(status_code=400, detail="Empty email content")
-        # Parse email
-        email_data = parser.parse_email(raw_email)
-        # Check if email is within age limit
-        email_date = email_data['date']
-        # Ensure both datetimes are timezone-aware (UTC)
-        if email_date.tzinfo is None:
-            email_date = email_date.replace(tzinfo=pytz.UTC)
-        now_utc = datetime.utcnow().replace(tzinfo=email_date.tzinfo)
-        if email_date < now_utc - timedelta(days=config.MAX_AGE_DAYS):
-            return EmailProcessingResponse(
-                success=False,
-                email_id="",
-                message=f"Email too old (received {email_date.date()}, max age: {config.MAX_AGE_DAYS} days)",
-                processing_time=time.time() - start_time
-            )
-        # Generate email ID
-        email_id = str(uuid.uuid4())
-        # Save parsed email to file
-        parsed_path = parser.save_parsed_email(email_data, email_id)
-        if not parsed_path:
-            raise HTTPException(status_code=500, detail="Failed to save parsed email")
-        # Create email metadata
-        email_metadata = EmailMetadata(
-            id=email_id,
-            subject=email_data['subject'],
-            sender=email_data['sender'],
-            date=email_data['date'],
-            label=email_data['label'],
-            parsed_path=parsed_path,
-            has_attachments=email_data['has_attachments'],
-            attachment_count=email_data['attachment_count'],
-            has_media=email_data.get('has_media', False),
-            media_urls=email_data.get('media_urls', {'images': [], 'videos': [], 'iframes': []}),
-            persona=PersonaInfo(**email_data['persona']) if email_data.get('persona') else None
-        )
-        # Save to database
-        if not db.insert_email(email_metadata):
-            raise HTTPException(status_code=500, detail="Failed to save email metadata")
-        processing_time = time.time() - start_time
-        return EmailProcessingResponse(
-            success=True,
-            email_id=email_id,
-            message=f"Email processed successfully. Subject: {email_data['subject']}",
-            metadata=email_metadata,
-            processing_time=processing_time
-        )
-    except HTTPException:
-        raise
+        item, created = await run_in_threadpool(get_ingest_queue().enqueue, raw_email)
+    except QueueFullError as e:
+        print(f"⚠️  Ingest queue full, rejecting email: {e}")
+        raise HTTPException(status_code=429, detail=f"Ingest queue full: {e}",
+                            headers={"Retry-After": str(int(config.INGEST_RETRY_BASE_SECONDS) or 1)})
     except Exception as e:
-        processing_time = time.time() - start_time
-        print(f"Error processing email: {e}")
-        return EmailProcessingResponse(
-            success=False,
-            email_id="",
-            message=f"Error processing email: {str(e)}",
-            processing_time=processing_time
-        )
+        print(f"Error queueing email: {e}")
+        raise HTTPException(status_code=500, detail=f"Error queueing email: {str(e)}")
+    if created:
+        message = "Email queued for processing"
+    else:
+        message = f"Email already received ({item['status']})"
+    response = EmailProcessingResponse(
+        success=True,
+        email_id=item['id'],
+        message=message,
+        processing_time=time.time() - start_time
+    )
+    return JSONResponse(status_code=202 if created else 200, content=response.model_dump(mode='json'))
+
+@app.get("/inbound-email/{email_id}", response_model=IngestStatusResponse)
+async def get_inbound_email_status(email_id: str):
+    """Get the processing status of a queued inbound email."""
+    item = get_ingest_queue().get(email_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Queued email not found")
+    return IngestStatusResponse(**{key: item[key] for key in ('id', 'status', 'attempts', 'message', 'error')})
 
 @app.get("/status", response_model=EmailStatusResponse)
 async def get_email_status(
@@ -285,18 +356,20 @@ async def get_emails(
         print(f"Error getting emails: {e}")
         raise HTTPException(status_code=500, detail=f"Error retrieving emails: {str(e)}")
 
-@app.post("/refresh", response_model=RefreshResponse)
+@app.post("/refresh", response_model=RefreshResponse, status_code=202)
 async def refresh_emails():
-    """Reprocess emails from maildir and refresh RAG index."""
+    """Start a background rebuild of the RAG index; poll /jobs/{job_id} for progress."""
     start_time = time.time()
     
     try:
         # TODO: Implement maildir reprocessing
         # This would scan the maildir directory and reprocess any unprocessed emails
         
-        # Refresh RAG index
+        # Re-embedding the corpus takes minutes, so it runs as a job. A refresh
+        # while one is already queued or running joins that job.
         pipeline = get_rag_pipeline()
-        pipeline.initialize(force_rebuild=True)
+        job = pipeline.refresh_index()
+        print(f"🔄 Index rebuild job {job['id']} is {job['status']}")
         
         processing_time = time.time() - start_time
         
@@ -304,7 +377,10 @@ async def refresh_emails():
             success=True,
             processed_count=0,
             errors=["Maildir reprocessing not yet implemented"],
-            processing_time=processing_time
+            processing_time=processing_time,
+            message=f"Index rebuild {job['status']}, see /jobs/{job['id']}",
+            job_id=job['id'],
+            status=job['status']
         )
         
     except Exception as e:
@@ -316,13 +392,22 @@ async def refresh_emails():
             processing_time=processing_time
         )
 
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Get the status and progress of a background job."""
+    job = get_rag_pipeline().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.post("/query", response_model=QueryResponse)
 async def query_rag(request: QueryRequest):
     """Query the RAG system with a question."""
     start_time = time.time()
     try:
-        # Query the RAG pipeline
-        result = get_rag_pipeline().query(
+        # Query the RAG pipeline off the event loop
+        result = await query_pool.run(
+            get_rag_pipeline().query,
             question=request.question,
             label=request.label,
             max_age_days=getattr(request, 'max_age_days', None)
@@ -352,10 +437,64 @@ async def query_rag(request: QueryRequest):
             model=result.get('model', 'unknown')
         )
         
+    except PoolSaturatedError as e:
+        print(f"⚠️  Query rejected: {e}")
+        raise HTTPException(status_code=503, detail="Too many concurrent queries, try again shortly",
+                            headers={"Retry-After": "1"})
     except Exception as e:
         print(f"Error generating response: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/query/stream")
+async def query_rag_stream(request: QueryRequest):
+    """Stream a RAG answer as server-sent events.
+    
+    Events: ``sources`` (retrieved context and metadata), one ``token`` per
+    generated text fragment, then ``done`` (full answer, provider, timings)
+    or ``error``.
+    """
+    try:
+        stream = query_pool.iterate(
+            get_rag_pipeline().query_stream,
+            question=request.question,
+            label=request.label,
+            max_age_days=getattr(request, 'max_age_days', None)
+        )
+        # Wait for a worker here, so an overloaded server can still answer 503
+        first_event = await stream.__anext__()
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        print(f"⚠️  Query rejected: {e}")
+        raise HTTPException(status_code=503, detail="Too many concurrent queries, try again shortly",
+                            headers={"Retry-After": "1"})
+    except Exception as e:
+        print(f"Error starting streamed query: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+    
+    async def events():
+        try:
+            event = first_event
+            while True:
+                event_type = event.pop('type')
+                event.pop('stats', None)
+                yield _sse(event_type, event)
+                event = await stream.__anext__()
+        except StopAsyncIteration:
+            pass
+        except Exception as e:
+            print(f"Error streaming query: {e}")
+            yield _sse("error", {"error": str(e)})
+        finally:
+            await stream.aclose()
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/rag/stats")
 async def get_rag_stats():
     """Get RAG pipeline statistics."""
@@ -367,6 +506,36 @@ async def get_rag_stats():
         print(f"Error getting RAG stats: {e}")
         raise HTTPException(status_code=500, detail=f"Error retrieving RAG stats: {str(e)}")
 
+@app.get("/rag/snapshots")
+async def list_index_snapshots():
+    """List the versioned index snapshots kept on disk."""
+    try:
+        return {"snapshots": get_rag_pipeline().list_snapshots()}
+    except Exception as e:
+        print(f"Error listing index snapshots: {e}")
+        raise HTTPException(status_code=500, detail=f"Error listing index snapshots: {str(e)}")
+
+@app.post("/rag/rollback")
+async def rollback_index(version: Optional[str] = Query(None, description="Snapshot to restore (default: the previous one)")):
+    """Make an earlier index snapshot live again."""
+    pipeline = get_rag_pipeline()
+    try:
+        # Reloading a snapshot reads and maps the index files: keep it off the event loop
+        restored = await query_pool.run(pipeline.rollback_index, version)
+    except PoolSaturatedError as e:
+        print(f"⚠️  Rollback rejected: {e}")
+        raise HTTPException(status_code=503, detail="Index is busy, try again shortly",
+                            headers={"Retry-After": "1"})
+    except Exception as e:
+        print(f"Error rolling back index: {e}")
+        raise HTTPException(status_code=500, detail=f"Error rolling back index: {str(e)}")
+    if pipeline.role == 'reader':
+        return {"status": "queued", "message": "Rollback handed to the index writer"}
+    if restored is None:
+        raise HTTPException(status_code=404, detail="No index snapshot to roll back to")
+    print(f"⏪ Index rolled back to snapshot {restored}")
+    return {"status": "success", "snapshot": restored}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -377,14 +546,20 @@ async def health_check():
             rag_status = "initialized"
         else:
             rag_status = "not_initialized"
+        index_role = pipeline.role
+        index_generation = pipeline.retriever.loaded_generation
     except:
         rag_status = "error"
+        index_role = index_generation = None
     
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
         "database": "connected" if db else "disconnected",
-        "rag_pipeline": rag_status
+        "rag_pipeline": rag_status,
+        "worker_pid": os.getpid(),
+        "index_role": index_role,
+        "index_generation": index_generation
     }
 
 @app.get("/personas", response_model=List[Dict[str, Any]])
@@ -592,8 +767,9 @@ async def get_system_stats():
         
         # Get file system stats
         vector_store_size = 0
-        if Path("data/vector_store/faiss_index.bin").exists():
-            vector_store_size = Path("data/vector_store/faiss_index.bin").stat().st_size
+        index_path = get_rag_pipeline().retriever.saved_index_path()
+        if index_path is not None:
+            vector_store_size = index_path.stat().st_size
         
         parsed_emails_size = sum(f.stat().st_size for f in email_files)
         
@@ -665,6 +841,9 @@ async def get_performance_metrics():
             'efficiency_metrics': efficiency_metrics,
             'embedding_stats': embedder_stats,
             'rag_pipeline_stats': rag_stats,
+            'worker_pools': {query_pool.name: query_pool.get_stats()},
+            'ingest_queue': get_ingest_queue().get_stats(),
+            'attachment_extraction': attachment_extractor.get_stats(),
             'recommendations': _get_performance_recommendations(efficiency_metrics, embedder_stats)
         }
         
@@ -736,7 +915,8 @@ async def optimize_system():
 async def http_exception_handler(request, exc):
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
@@ -4,7 +4,8 @@ from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from fastapi import FastAPI, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 import pytz
 import os
@@ -15,11 +16,13 @@ import psutil
 
 from .models import (
     EmailProcessingResponse, EmailStatusResponse, EmailContent,
-    QueryRequest, QueryResponse, RefreshResponse, EmailMetadata, PersonaInfo
+    QueryRequest, QueryResponse, RefreshResponse, JobResponse, EmailMetadata, PersonaInfo
 )
 from .parser import parser
 from .database import db
 from .config import config
+from .concurrency import BlockingPool, PoolSaturatedError
+from .attachments import attachment_extractor
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -40,6 +43,12 @@ app.add_middleware(
 # Global RAG pipeline instance (initialized lazily)
 _rag_pipeline = None
 
+# Embedding, FAISS search and LLM calls block, so they run on bounded thread
+# pools instead of the event loop (which keeps serving /inbound-email and /health)
+query_pool = BlockingPool("rag-query", config.MAX_CONCURRENT_REQUESTS, config.QUERY_QUEUE_TIMEOUT)
+# Index writes are serialized by the retriever anyway
+index_pool = BlockingPool("rag-index", 1)
+
 def get_rag_pipeline():
     """Get or create RAG pipeline instance - LAZY LOADING for Cloud Run."""
     global _rag_pipeline
@@ -48,6 +57,8 @@ def get_rag_pipeline():
             sys.path.append(str(Path(__file__).parent.parent))
             from rag.email_pipeline import pipeline
             _rag_pipeline = pipeline
+            # Keep the vector index in sync with deletions (including the 100-email cap)
+            db.add_delete_listener(pipeline.remove_emails)
         except Exception as e:
             print(f"⚠️  Warning: Could not initialize RAG pipeline: {e}")
             return None
@@ -72,6 +83,16 @@ async def startup_event():
     except Exception as e:
         print(f"⚠️  Warning: Could not create directories: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the worker pools."""
+    query_pool.shutdown()
+    attachment_extractor.shutdown()
+    index_pool.shutdown()
+    # Lets another worker take over as index writer right away
+    if _rag_pipeline is not None:
+        _rag_pipeline.shutdown()
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -82,8 +103,10 @@ async def root():
             "POST /inbound-email": "Process incoming MIME email",
             "GET /status": "Get email status and metadata",
             "GET /email/{id}/content": "Get parsed email content",
-            "POST /refresh": "Reprocess emails from maildir",
+            "POST /refresh": "Rebuild the RAG index in the background (returns a job ID)",
+            "GET /jobs/{id}": "Get the status and progress of a background job",
             "POST /query": "Query emails using RAG",
+            "POST /query/stream": "Query emails using RAG, streaming the answer as server-sent events",
             "GET /rag/stats": "Get RAG pipeline statistics"
         }
     }
@@ -140,6 +163,21 @@ async def process_inbound_email(request: Request):
         # Save to database
         if not db.insert_email(email_metadata):
             raise HTTPException(status_code=500, detail="Failed to save email metadata")
+        if db.get_email_by_id(email_id) is None:
+            # Older than the 100 most recent emails: evicted as soon as it was inserted
+            return EmailProcessingResponse(
+                success=False,
+                email_id=email_id,
+                message="Email is older than the most recent emails kept",
+                processing_time=time.time() - start_time
+            )
+        # Make the new email searchable without a full index rebuild
+        try:
+            pipeline = get_rag_pipeline()
+            if pipeline is not None:
+                await index_pool.run(pipeline.index_email, email_id, parsed_path, email_metadata)
+        except Exception as e:
+            print(f"⚠️  Warning: Could not index email {email_id}: {e}")
         
         processing_time = time.time() - start_time
         return EmailProcessingResponse(
@@ -297,19 +335,50 @@ async def get_emails(
 
 @app.post("/refresh", response_model=RefreshResponse)
 async def refresh_emails():
-    """Reprocess emails from maildir - simplified for Cloud Run."""
+    """Rebuild the RAG index from the parsed emails.
+    
+    There's no maildir to reprocess on Cloud Run. Cloud Run throttles the CPU
+    of an instance outside of requests, so the rebuild runs inside this one
+    (off the event loop) instead of on a background thread; it's still
+    recorded as a job, see /jobs/{job_id}. If a rebuild is already under way,
+    that job is returned with 202.
+    """
+    start_time = time.time()
     try:
-        # For Cloud Run, we'll just return a message since we can't access maildir
-        return RefreshResponse(
+        pipeline = get_rag_pipeline()
+        if pipeline is None:
+            raise HTTPException(status_code=503, detail="RAG pipeline not available")
+        job = await run_in_threadpool(pipeline.refresh_index, wait=True)
+        print(f"🔄 Index rebuild job {job['id']} is {job['status']}")
+        if job['status'] == 'failed':
+            raise HTTPException(status_code=500, detail=f"Index rebuild failed: {job['error']}")
+        response = RefreshResponse(
             success=True,
-            message="Email refresh not available in Cloud Run (no persistent maildir access)",
-            processed_count=0,
-            processing_time=0.0
+            message=f"Index rebuild {job['status']}, see /jobs/{job['id']}",
+            processed_count=(job['result'] or {}).get('emails', 0),
+            processing_time=time.time() - start_time,
+            job_id=job['id'],
+            status=job['status']
         )
+        finished = job['status'] == 'succeeded'
+        return JSONResponse(status_code=200 if finished else 202, content=response.model_dump(mode='json'))
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error refreshing emails: {e}")
         raise HTTPException(status_code=500, detail=f"Error refreshing emails: {str(e)}")
 
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Get the status and progress of a background job."""
+    pipeline = get_rag_pipeline()
+    if pipeline is None:
+        raise HTTPException(status_code=503, detail="RAG pipeline not available")
+    job = pipeline.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.post("/query", response_model=QueryResponse)
 async def query_rag(request: QueryRequest):
     """Query emails using RAG - with lazy initialization for Cloud Run."""
@@ -320,11 +389,12 @@ async def query_rag(request: QueryRequest):
         if pipeline is None:
             raise HTTPException(status_code=500, detail="RAG pipeline not available")
         
-        # Perform query
-        result = pipeline.query(
-            question=request.query,
+        # Perform query off the event loop
+        result = await query_pool.run(
+            pipeline.query,
+            question=request.question,
             label=request.label,
-            max_age_days=request.max_age_days,
+            max_age_days=getattr(request, 'max_age_days', None),
             use_cache=True
         )
         
@@ -341,11 +411,68 @@ async def query_rag(request: QueryRequest):
         
     except HTTPException:
         raise
+    except PoolSaturatedError as e:
+        print(f"⚠️  Query rejected: {e}")
+        raise HTTPException(status_code=503, detail="Too many concurrent queries, try again shortly",
+                            headers={"Retry-After": "1"})
     except Exception as e:
         processing_time = time.time() - start_time
         print(f"Error processing query: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/query/stream")
+async def query_rag_stream(request: QueryRequest):
+    """Stream a RAG answer as server-sent events.
+    
+    Events: ``sources`` (retrieved context and metadata), one ``token`` per
+    generated text fragment, then ``done`` (full answer, provider, timings)
+    or ``error``.
+    """
+    try:
+        pipeline = get_rag_pipeline()
+        if pipeline is None:
+            raise HTTPException(status_code=500, detail="RAG pipeline not available")
+        stream = query_pool.iterate(
+            pipeline.query_stream,
+            question=request.question,
+            label=request.label,
+            max_age_days=getattr(request, 'max_age_days', None)
+        )
+        # Wait for a worker here, so an overloaded server can still answer 503
+        first_event = await stream.__anext__()
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        print(f"⚠️  Query rejected: {e}")
+        raise HTTPException(status_code=503, detail="Too many concurrent queries, try again shortly",
+                            headers={"Retry-After": "1"})
+    except Exception as e:
+        print(f"Error starting streamed query: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+    
+    async def events():
+        try:
+            event = first_event
+            while True:
+                event_type = event.pop('type')
+                event.pop('stats', None)
+                yield _sse(event_type, event)
+                event = await stream.__anext__()
+        except StopAsyncIteration:
+            pass
+        except Exception as e:
+            print(f"Error streaming query: {e}")
+            yield _sse("error", {"error": str(e)})
+        finally:
+            await stream.aclose()
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/rag/stats")
 async def get_rag_stats():
     """Get RAG pipeline statistics."""
@@ -365,6 +492,33 @@ async def get_rag_stats():
         print(f"Error getting RAG stats: {e}")
         return {"error": f"Error retrieving RAG stats: {str(e)}"}
 
+@app.get("/rag/snapshots")
+async def list_index_snapshots():
+    """List the versioned index snapshots kept on disk."""
+    pipeline = get_rag_pipeline()
+    if pipeline is None:
+        return {"error": "RAG pipeline not available"}
+    return {"snapshots": pipeline.list_snapshots()}
+
+@app.post("/rag/rollback")
+async def rollback_index(version: Optional[str] = Query(None, description="Snapshot to restore (default: the previous one)")):
+    """Make an earlier index snapshot live again."""
+    pipeline = get_rag_pipeline()
+    if pipeline is None:
+        raise HTTPException(status_code=503, detail="RAG pipeline not available")
+    try:
+        # Reloading a snapshot reads and maps the index files: keep it off the event loop
+        restored = await index_pool.run(pipeline.rollback_index, version)
+    except Exception as e:
+        print(f"Error rolling back index: {e}")
+        raise HTTPException(status_code=500, detail=f"Error rolling back index: {str(e)}")
+    if pipeline.role == 'reader':
+        return {"status": "queued", "message": "Rollback handed to the index writer"}
+    if restored is None:
+        raise HTTPException(status_code=404, detail="No index snapshot to roll back to")
+    print(f"⏪ Index rolled back to snapshot {restored}")
+    return {"status": "success", "snapshot": restored}
+
 @app.get("/health")
 async def health_check():
     """Lightweight health check for Cloud Run."""
@@ -588,8 +742,10 @@ async def get_system_stats():
         
         # Get file system stats
         vector_store_size = 0
-        if Path(config.VECTOR_STORE_DIR / "faiss_index.bin").exists():
-            vector_store_size = Path(config.VECTOR_STORE_DIR / "faiss_index.bin").stat().st_size
+        pipeline = get_rag_pipeline()
+        index_path = pipeline.retriever.saved_index_path() if pipeline is not None else None
+        if index_path is not None:
+            vector_store_size = index_path.stat().st_size
         
         parsed_emails_size = sum(f.stat().st_size for f in email_files)
         
@@ -656,6 +812,8 @@ async def get_performance_metrics():
             },
             "rag_performance": rag_stats,
             "embedder_stats": embedder_stats,
+            "worker_pools": {pool.name: pool.get_stats() for pool in (query_pool, index_pool)},
+            "attachment_extraction": attachment_extractor.get_stats(),
             "recommendations": recommendations,
             "environment": "cloud-run"
         }
@@ -709,7 +867,8 @@ async def http_exception_handler(request, exc):
     """Handle HTTP exceptions."""
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail, "timestamp": datetime.utcnow().isoformat()}
+        content={"detail": exc.detail, "timestamp": datetime.utcnow().isoformat()},
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
@@ -114,6 +114,14 @@ class EmailProcessingResponse(BaseModel):
     metadata: Optional[EmailMetadata] = None
     processing_time: float
 
+class IngestStatusResponse(BaseModel):
+    """Response model for a queued inbound email."""
+    id: str
+    status: str
+    attempts: int = 0
+    message: Optional[str] = None
+    error: Optional[str] = None
+
 class EmailStatusResponse(BaseModel):
     """Response model for email status endpoint."""
     emails: List[EmailMetadata]
@@ -143,4 +151,20 @@ class RefreshResponse(BaseModel):
     success: bool
     processed_count: int
     errors: List[str] = []
-    processing_time: float 
\ No newline at end of file
+    processing_time: float
+    message: Optional[str] = None
+    job_id: Optional[str] = None
+    status: Optional[str] = None
+
+class JobResponse(BaseModel):
+    """Response model for background job status."""
+    id: str
+    kind: str
+    status: str
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    progress: Dict[str, Any] = {}
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
\ No newline at end of file
@@ -21,30 +21,27 @@ except Exception as e:
     OPEN_NOTEBOOK_AVAILABLE = False
     print(f"Warning: open-notebook database not configured. Notebook creation will be skipped. Error: {e}")
 
-# Document processing imports
-try:
-    import fitz  # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    PYMUPDF_AVAILABLE = False
-
-try:
-    # Try to import pytesseract without pandas dependency
-    import pytesseract
-    from PIL import Image
-    import io
-    TESSERACT_AVAILABLE = True
-except (ImportError, ValueError) as e:
-    TESSERACT_AVAILABLE = False
-    print(f"Warning: pytesseract not available. OCR will be skipped. Error: {e}")
-
 try:
     from bs4 import BeautifulSoup
     BEAUTIFULSOUP_AVAILABLE = True
 except ImportError:
     BEAUTIFULSOUP_AVAILABLE = False
 
+# Faster HTML backend, used instead of BeautifulSoup when installed
+try:
+    import lxml.html
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Text of these elements isn't part of the readable content
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+MEDIA_FILE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.mov', '.avi', '.webm']
+VIDEO_PLATFORMS = ['youtube.com', 'vimeo.com', 'dailymotion.com', 'twitch.tv']
+
 from .config import config
+from .attachments import attachment_extractor
 
 
 def clean_email_address(email_str):
@@ -96,14 +93,8 @@ class EmailParser:
             domain_label = match.group(1).lower() if match else "unknown"
             label = domain_label
             
-            # Extract body content
-            body = self._extract_body(msg)
-            
-            # Process attachments
-            attachments = self._process_attachments(msg)
-            
-            # Extract media URLs from HTML content
-            media_urls = self._extract_media_from_email(msg)
+            # Body text, attachments and media URLs in one pass over the MIME tree
+            body, attachments, media_urls = self._walk_parts(msg)
             
             # Combine all text content
             full_content = self._combine_content(body, attachments)
@@ -173,80 +164,173 @@ class EmailParser:
         except Exception:
             return datetime.utcnow()
     
-    def _extract_body(self, msg) -> str:
-        """Extract text body from email, preferring plain text over HTML."""
+    def _walk_parts(self, msg) -> Tuple[str, List[Dict[str, Any]], Dict[str, List[str]]]:
+        """Extract body text, attachments and media URLs in a single traversal.
+        
+        Each part's payload is decoded once and each HTML part parsed once.
+        The body prefers plain text: an HTML part is only used for it if no
+        text part came before. Media URLs come from every HTML part.
+        """
         body_parts = []
+        attachments = []
+        to_extract = []
+        media_urls = {'images': [], 'videos': [], 'iframes': []}
+        is_multipart = msg.is_multipart()
         
-        if msg.is_multipart():
-            for part in msg.walk():
-                if part.get_content_maintype() == 'multipart':
-                    continue
-                
-                content_type = part.get_content_type()
-                if content_type == 'text/plain':
-                    body_parts.append(self._decode_part(part))
-                elif content_type == 'text/html' and not body_parts:
-                    # Only use HTML if no plain text found
-                    html_content = self._decode_part(part)
-                    if BEAUTIFULSOUP_AVAILABLE:
-                        body_parts.append(self._strip_html(html_content))
-                    else:
-                        body_parts.append(html_content)
-        else:
-            # Single part message
-            content_type = msg.get_content_type()
+        for part in msg.walk():
+            if part.get_content_maintype() == 'multipart':
+                continue
+            
+            content_type = part.get_content_type()
+            # Single part messages have no attachments
+            filename = part.get_filename() if is_multipart else None
+            is_text = content_type in ('text/plain', 'text/html')
+            if not is_text and not filename:
+                continue
+            payload = self._get_payload(part)
+            text = self._decode_payload(part, payload) if is_text else ''
+            
             if content_type == 'text/plain':
-                body_parts.append(self._decode_part(msg))
+                body_parts.append(text)
             elif content_type == 'text/html':
-                html_content = self._decode_part(msg)
-                if BEAUTIFULSOUP_AVAILABLE:
-                    body_parts.append(self._strip_html(html_content))
-                else:
-                    body_parts.append(html_content)
+                use_for_body = not body_parts
+                if text:
+                    html_text, part_media = self._parse_html(text, with_text=use_for_body)
+                    for media_type in media_urls:
+                        media_urls[media_type].extend(part_media[media_type])
+                    if use_for_body:
+                        body_parts.append(self._append_media_urls(html_text, part_media))
+                elif use_for_body:
+                    body_parts.append(text)
+            
+            if filename:
+                attachment_info = {
+                    'filename': filename,
+                    'content_type': content_type,
+                    'size': len(payload),
+                    'extracted_text': text
+                }
+                # PDF text and OCR run on the attachment extractor's process pool
+                if content_type == 'application/pdf' or content_type.startswith('image/'):
+                    to_extract.append((attachment_info, content_type, payload))
+                attachments.append(attachment_info)
+        
+        if to_extract:
+            results = attachment_extractor.extract_many([(content_type, payload)
+                                                         for _, content_type, payload in to_extract])
+            for (attachment_info, _, _), result in zip(to_extract, results):
+                attachment_info['extracted_text'] = result['text']
+                attachment_info['sha256'] = result['sha256']
+                if result['truncated']:
+                    attachment_info['truncated'] = True
         
-        return '\n\n'.join(body_parts) if body_parts else 'No text content found'
+        body = '\n\n'.join(body_parts) if body_parts else 'No text content found'
+        return body, attachments, self._dedupe_media(media_urls)
     
-    def _decode_part(self, part) -> str:
-        """Decode email part content."""
+    def _get_payload(self, part) -> bytes:
+        try:
+            return part.get_payload(decode=True) or b''
+        except Exception as e:
+            print(f"Error decoding part: {e}")
+            return b''
+    
+    def _decode_payload(self, part, payload: bytes) -> str:
+        """Decode an already transfer-decoded payload with the part's charset."""
         try:
-            payload = part.get_payload(decode=True)
-            if payload is None:
-                return ''
-            
             charset = part.get_content_charset() or 'utf-8'
             return payload.decode(charset, errors='replace')
         except Exception as e:
             print(f"Error decoding part: {e}")
             return ''
     
+    def _decode_part(self, part) -> str:
+        """Decode email part content."""
+        return self._decode_payload(part, self._get_payload(part))
+    
+    def _parse_html(self, html_content: str, with_text: bool = True) -> Tuple[Optional[str], Dict[str, List[str]]]:
+        """Parse HTML once into its text (if ``with_text``) and embedded media URLs.
+        
+        Uses lxml when installed, else BeautifulSoup; without either the HTML
+        is kept as is and no media URLs are found.
+        """
+        if LXML_AVAILABLE:
+            try:
+                root = lxml.html.document_fromstring(html_content)
+                text = self._lxml_text(root) if with_text else None
+                return text, self._lxml_media_urls(root)
+            except (etree.ParserError, ValueError):
+                # Empty document, or an encoding declaration in a str; BeautifulSoup copes
+                pass
+        if BEAUTIFULSOUP_AVAILABLE:
+            try:
+                soup = BeautifulSoup(html_content, 'html.parser')
+                text = soup.get_text(separator='\n', strip=True) if with_text else None
+                return text, self._extract_media_urls(soup)
+            except Exception as e:
+                print(f"Error stripping HTML: {e}")
+        return html_content, {'images': [], 'videos': [], 'iframes': []}
+    
     def _strip_html(self, html_content: str) -> str:
         """Strip HTML tags and extract text content, preserving embedded media URLs."""
-        if not BEAUTIFULSOUP_AVAILABLE:
-            return html_content
+        text_content, media_urls = self._parse_html(html_content)
+        return self._append_media_urls(text_content, media_urls)
+    
+    def _append_media_urls(self, text_content: str, media_urls: Dict[str, List[str]]) -> str:
+        """Append media URLs to the text content."""
+        if media_urls:
+            text_content += '\n\n--- EMBEDDED MEDIA ---\n'
+            for media_type, urls in media_urls.items():
+                if urls:
+                    text_content += f'\n{media_type.upper()} URLs:\n'
+                    for url in urls:
+                        text_content += f'- {url}\n'
+        return text_content
+    
+    @staticmethod
+    def _lxml_text(root) -> str:
+        """Same text as BeautifulSoup's ``get_text(separator='\\n', strip=True)``."""
+        strings = []
         
-        try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Extract embedded media URLs before stripping HTML
-            media_urls = self._extract_media_urls(soup)
-            
-            # Get clean text content
-            text_content = soup.get_text(separator='\n', strip=True)
-            
-            # Append media URLs to the text content
-            if media_urls:
-                text_content += '\n\n--- EMBEDDED MEDIA ---\n'
-                for media_type, urls in media_urls.items():
-                    if urls:
-                        text_content += f'\n{media_type.upper()} URLs:\n'
-                        for url in urls:
-                            text_content += f'- {url}\n'
-            
-            return text_content
-            
-        except Exception as e:
-            print(f"Error stripping HTML: {e}")
-            return html_content
+        def visit(element):
+            if element.text and element.tag not in NON_TEXT_TAGS:
+                strings.append(element.text)
+            for child in element:
+                # Comments and processing instructions have no text of their own, only tails
+                if isinstance(child.tag, str):
+                    visit(child)
+                if child.tail:
+                    strings.append(child.tail)
+        
+        visit(root)
+        return '\n'.join(stripped for stripped in (string.strip() for string in strings) if stripped)
+    
+    @staticmethod
+    def _lxml_media_urls(root) -> Dict[str, List[str]]:
+        """Image, video and iframe URLs; the lxml version of ``_extract_media_urls``."""
+        def http_urls(elements, attribute='src'):
+            urls = (element.get(attribute, '') for element in elements)
+            return [url for url in urls if url.startswith(('http://', 'https://'))]
+        
+        images = http_urls(root.iter('img'))
+        videos = []
+        for video in root.iter('video'):
+            videos.extend(http_urls([video]))
+            # Check for source tags inside video
+            videos.extend(http_urls(video.iter('source')))
+        iframes = http_urls(root.iter('iframe'))
+        # Links that might be media (common in newsletters)
+        for href in http_urls(root.iter('a'), 'href'):
+            lowered = href.lower()
+            if any(ext in lowered for ext in MEDIA_FILE_EXTENSIONS):
+                images.append(href)
+            elif any(platform in lowered for platform in VIDEO_PLATFORMS):
+                videos.append(href)
+        return EmailParser._dedupe_media({'images': images, 'videos': videos, 'iframes': iframes})
+    
+    @staticmethod
+    def _dedupe_media(media_urls: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """Remove duplicates while preserving order."""
+        return {media_type: list(dict.fromkeys(urls)) for media_type, urls in media_urls.items()}
     
     def _extract_media_urls(self, soup) -> Dict[str, List[str]]:
         """Extract image and video URLs from HTML content."""
@@ -286,106 +370,18 @@ class EmailParser:
                 href = link.get('href', '')
                 if href and href.startswith(('http://', 'https://')):
                     # Check if link points to media files
-                    if any(ext in href.lower() for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.mov', '.avi', '.webm']):
+                    if any(ext in href.lower() for ext in MEDIA_FILE_EXTENSIONS):
                         media_urls['images'].append(href)
                     # Check for common video platforms
-                    elif any(platform in href.lower() for platform in ['youtube.com', 'vimeo.com', 'dailymotion.com', 'twitch.tv']):
+                    elif any(platform in href.lower() for platform in VIDEO_PLATFORMS):
                         media_urls['videos'].append(href)
             
-            # Remove duplicates while preserving order
-            for media_type in media_urls:
-                seen = set()
-                media_urls[media_type] = [url for url in media_urls[media_type] if not (url in seen or seen.add(url))]
-            
-            return media_urls
+            return self._dedupe_media(media_urls)
             
         except Exception as e:
             print(f"Error extracting media URLs: {e}")
             return media_urls
     
-    def _process_attachments(self, msg) -> List[Dict[str, Any]]:
-        """Process email attachments and extract text content."""
-        attachments = []
-        
-        if not msg.is_multipart():
-            return attachments
-        
-        for part in msg.walk():
-            if part.get_content_maintype() == 'multipart':
-                continue
-            
-            filename = part.get_filename()
-            if not filename:
-                continue
-            
-            content_type = part.get_content_type()
-            attachment_info = {
-                'filename': filename,
-                'content_type': content_type,
-                'size': len(part.get_payload(decode=True) or b''),
-                'extracted_text': ''
-            }
-            
-            # Extract text based on content type
-            if content_type == 'application/pdf':
-                attachment_info['extracted_text'] = self._extract_pdf_text(part)
-            elif content_type.startswith('image/'):
-                attachment_info['extracted_text'] = self._extract_image_text(part)
-            elif content_type in ['text/plain', 'text/html']:
-                attachment_info['extracted_text'] = self._decode_part(part)
-            
-            attachments.append(attachment_info)
-        
-        return attachments
-    
-    def _extract_pdf_text(self, part) -> str:
-        """Extract text from PDF attachment."""
-        if not PYMUPDF_AVAILABLE:
-            return "PDF text extraction not available (PyMuPDF not installed)"
-        
-        try:
-            pdf_data = part.get_payload(decode=True)
-            if not pdf_data:
-                return ""
-            
-            # Open PDF with PyMuPDF
-            doc = fitz.open(stream=pdf_data, filetype="pdf")
-            text_parts = []
-            
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text = page.get_text()
-                if text.strip():
-                    text_parts.append(text)
-            
-            doc.close()
-            return '\n\n'.join(text_parts)
-            
-        except Exception as e:
-            print(f"Error extracting PDF text: {e}")
-            return f"Error extracting PDF text: {str(e)}"
-    
-    def _extract_image_text(self, part) -> str:
-        """Extract text from image using OCR."""
-        if not TESSERACT_AVAILABLE:
-            return "OCR not available (pytesseract not installed)"
-        
-        try:
-            image_data = part.get_payload(decode=True)
-            if not image_data:
-                return ""
-            
-            # Open image with PIL
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Perform OCR
-            text = pytesseract.image_to_string(image)
-            return text.strip()
-            
-        except Exception as e:
-            print(f"Error extracting image text: {e}")
-            return f"Error extracting image text: {str(e)}"
-    
     def _combine_content(self, body: str, attachments: List[Dict[str, Any]]) -> str:
         """Combine email body and attachment text into full content."""
         content_parts = [body]
@@ -490,45 +486,6 @@ class EmailParser:
             
         except Exception as e:
             print(f"Error creating notebook: {e}")
-    
-    def _extract_media_from_email(self, msg) -> Dict[str, List[str]]:
-        """Extract media URLs from email HTML content."""
-        media_urls = {
-            'images': [],
-            'videos': [],
-            'iframes': []
-        }
-        
-        if not BEAUTIFULSOUP_AVAILABLE:
-            return media_urls
-        
-        try:
-            # Walk through all parts of the email
-            for part in msg.walk():
-                if part.get_content_maintype() == 'multipart':
-                    continue
-                
-                content_type = part.get_content_type()
-                if content_type == 'text/html':
-                    html_content = self._decode_part(part)
-                    if html_content:
-                        soup = BeautifulSoup(html_content, 'html.parser')
-                        part_media = self._extract_media_urls(soup)
-                        
-                        # Merge media URLs
-                        for media_type in media_urls:
-                            media_urls[media_type].extend(part_media[media_type])
-            
-            # Remove duplicates while preserving order
-            for media_type in media_urls:
-                seen = set()
-                media_urls[media_type] = [url for url in media_urls[media_type] if not (url in seen or seen.add(url))]
-            
-            return media_urls
-            
-        except Exception as e:
-            print(f"Error extracting media from email: {e}")
-            return media_urls
 
 # Global parser instance
 parser = EmailParser() 
\ No newline at end of file
@@ -184,7 +184,7 @@ class GmailIMAPForwarder:
                 timeout=30
             )
             
-            if response.status_code == 200:
+            if response.status_code in (200, 202):
                 logger.info(f"✅ Email '{subject}' (UID: {uid}) forwarded successfully")
                 self.processed_ids.add(uid)
                 return True
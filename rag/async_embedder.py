@@ -0,0 +1,262 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import List, Dict, Any, Optional, Callable, Sequence
+
+import httpx
+import numpy as np
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingRequestError(Exception):
+    """A batch could not be embedded, even after retries."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) for quota accounting."""
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """Token buckets for a provider's requests-per-minute and tokens-per-minute quotas.
+
+    State is plain floats behind a thread lock, so one limiter can be shared by
+    every event loop (and thread) that talks to the same provider. A 429 blocks
+    the whole provider until its Retry-After has passed.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute,
+                                 self._requests + elapsed * self.requests_per_minute / 60.0)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute,
+                               self._tokens + elapsed * self.tokens_per_minute / 60.0)
+
+    def reserve(self, tokens: int) -> float:
+        """Take budget for one request if available; otherwise return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._blocked_until > now:
+                return self._blocked_until - now
+
+            wait = 0.0
+            if self.requests_per_minute and self._requests < 1:
+                wait = max(wait, (1 - self._requests) * 60.0 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                # A batch larger than the whole budget still has to go out eventually
+                tokens = min(tokens, self.tokens_per_minute)
+                if self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60.0 / self.tokens_per_minute)
+            if wait > 0:
+                return wait
+
+            if self.requests_per_minute:
+                self._requests -= 1
+            if self.tokens_per_minute:
+                self._tokens -= tokens
+            return 0.0
+
+    async def acquire(self, tokens: int):
+        while True:
+            wait = self.reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def block_for(self, seconds: float):
+        """Pause every request to this provider, e.g. after a 429."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class AsyncEmbeddingEngine:
+    """Concurrent, quota-aware batch embedding against one HTTP provider.
+
+    Texts are split into provider-sized batches. Up to ``max_in_flight`` batches
+    are outstanding at once, each one waits for request/token budget first, and
+    429/5xx/network failures are retried per batch with backoff (honouring
+    Retry-After), so one throttled batch never throws away the rest of the call.
+    Any other failure fails the call, and its batches still running are cancelled.
+    """
+
+    def __init__(self, provider: str, url: str, headers: Dict[str, str],
+                 build_payload: Callable[[List[str]], Dict[str, Any]],
+                 parse_response: Callable[[Dict[str, Any]], List[List[float]]],
+                 batch_size: int, max_in_flight: Optional[int] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 max_retries: Optional[int] = None, timeout: Optional[float] = None,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self.provider = provider
+        self.url = url
+        self.headers = headers
+        self.build_payload = build_payload
+        self.parse_response = parse_response
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight or config.EMBEDDING_MAX_IN_FLIGHT)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_retries = config.EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+        self.timeout = timeout or config.EMBEDDING_REQUEST_TIMEOUT
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'failed_batches': 0}
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts as one (len(texts), dimension) float32 array."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        starts = range(0, len(texts), self.batch_size)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            tasks = [asyncio.ensure_future(self._embed_batch(client, semaphore, texts[start:start + self.batch_size]))
+                     for start in starts]
+            try:
+                results = await asyncio.gather(*tasks)
+            except BaseException:
+                # Errors that reach here weren't retried: don't spend quota on the other batches
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+        embeddings = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+        for start, vectors in zip(starts, results):
+            embeddings[start:start + len(vectors)] = vectors
+        return embeddings
+
+    def embed_sync(self, texts: Sequence[str]) -> np.ndarray:
+        """Blocking wrapper for callers that are not running an event loop themselves."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.embed(texts))
+        # Called from inside a running loop: run ours on a separate thread
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.embed(texts)).result()
+
+    async def _embed_batch(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                           batch: List[str]) -> np.ndarray:
+        tokens = sum(estimate_tokens(text) for text in batch)
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats['retries'] += 1
+            await self.rate_limiter.acquire(tokens)
+            async with semaphore:
+                self.stats['requests'] += 1
+                try:
+                    response = await client.post(self.url, headers=self.headers, json=self.build_payload(batch))
+                except httpx.TransportError as e:
+                    last_error = e
+                    delay = self._backoff(attempt)
+                else:
+                    if response.status_code == 429 or response.status_code >= 500:
+                        last_error = EmbeddingRequestError(f"{self.provider} returned {response.status_code}")
+                        delay = self._retry_after(response)
+                        if delay is None:
+                            delay = self._backoff(attempt)
+                        if response.status_code == 429:
+                            self.stats['rate_limited'] += 1
+                            self.rate_limiter.block_for(delay)
+                    elif response.status_code >= 400:
+                        self.stats['failed_batches'] += 1
+                        raise EmbeddingRequestError(
+                            f"{self.provider} returned {response.status_code}: {response.text[:200]}")
+                    else:
+                        vectors = np.asarray(self.parse_response(response.json()), dtype=np.float32)
+                        if vectors.ndim != 2 or vectors.shape[0] != len(batch):
+                            self.stats['failed_batches'] += 1
+                            raise EmbeddingRequestError(
+                                f"{self.provider} returned {vectors.shape} embeddings for {len(batch)} texts")
+                        return vectors
+            logger.warning(f"⚠️ {self.provider} embedding batch failed ({last_error}), "
+                           f"retrying in {delay:.1f}s [{attempt + 1}/{self.max_retries}]")
+            await asyncio.sleep(delay)
+
+        self.stats['failed_batches'] += 1
+        raise EmbeddingRequestError(f"{self.provider} batch failed after {self.max_retries} retries: {last_error}")
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        value = response.headers.get('retry-after')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return None
+
+
+def _openai_request(api_key: str, model: str) -> Dict[str, Any]:
+    return {
+        'url': f"{config.OPENAI_BASE_URL.rstrip('/')}/embeddings",
+        'headers': {"Authorization": f"Bearer {api_key}"},
+        'build_payload': lambda batch: {"model": model, "input": batch},
+        'parse_response': lambda data: [item['embedding'] for item in
+                                        sorted(data['data'], key=lambda item: item['index'])],
+    }
+
+
+def _nomic_request(api_key: str, model: str) -> Dict[str, Any]:
+    return {
+        'url': f"{config.NOMIC_BASE_URL.rstrip('/')}/embed/text",
+        'headers': {"Authorization": f"Bearer {api_key}"},
+        'build_payload': lambda batch: {"texts": batch, "model": model, "task_type": "search_document"},
+        'parse_response': lambda data: data['embeddings'],
+    }
+
+
+PROVIDER_REQUESTS = {
+    'openai': _openai_request,
+    'nomic': _nomic_request,
+}
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """Process-wide limiter per provider, so concurrent callers share one quota."""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(provider)
+        if limiter is None:
+            limits = config.EMBEDDING_RATE_LIMITS.get(provider, {})
+            limiter = RateLimiter(limits.get('rpm', 0), limits.get('tpm', 0))
+            _rate_limiters[provider] = limiter
+        return limiter
+
+
+def create_engine(provider: str, api_key: str, model: str, **kwargs) -> AsyncEmbeddingEngine:
+    """Build an engine for a known provider using the configured endpoint, batch size and quotas."""
+    if provider not in PROVIDER_REQUESTS:
+        raise ValueError(f"No async embedding support for provider '{provider}'")
+    options = {
+        'batch_size': config.EMBEDDING_PROVIDER_BATCH_SIZES.get(provider, config.EMBEDDING_BATCH_SIZE),
+        'rate_limiter': get_rate_limiter(provider),
+        **PROVIDER_REQUESTS[provider](api_key, model),
+    }
+    options.update(kwargs)
+    return AsyncEmbeddingEngine(provider, **options)
@@ -0,0 +1,265 @@
+import io
+import os
+import re
+import math
+import struct
+import logging
+import threading
+import zipfile
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Very common English words; they carry almost no BM25 weight but have the longest postings
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i in is it its me my not of on or our she so
+that the their them they this to was we were what when which who will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords; names, numbers and product terms are kept whole."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: Optional[int] = None) -> List[Tuple[int, float]]:
+    """Fuse ranked ID lists: each ID scores ``sum(1 / (k + rank))`` over the lists it appears in."""
+    k = config.RRF_K if k is None else k
+    fused: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[int(doc_id)] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def _map_npz(path: Path) -> Dict[str, np.ndarray]:
+    """Memory-map the arrays of an uncompressed ``.npz`` file, as written by ``np.savez``."""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: {info.filename} is compressed and can't be mapped")
+            # The member's data follows its local header (30 bytes, then its name and extra field)
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"{path}: {info.filename} holds Python objects")
+            name = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if math.prod(shape) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+
+class BM25Index:
+    """Inverted index over document chunks with Okapi BM25 scoring.
+
+    Document IDs are the same row numbers the FAISS index and the document
+    store use, so both can be searched with the same filter mask. Postings are
+    kept per term as ``(doc_ids, term_frequencies)`` arrays; a query only
+    touches the postings of its own terms.
+
+    ``add`` and ``remove`` keep the index in step with the live FAISS index
+    (removal needs the removed texts to find their postings); ``save`` writes
+    everything to a single uncompressed ``.npz`` file: the terms in sorted
+    order, with offsets into flat ``ids``/``frequencies`` arrays. ``load``
+    memory-maps those arrays and finds a term by binary search, so reader
+    processes share the file's pages instead of each building the postings on
+    its heap. Postings changed after loading are kept per term on top.
+    """
+
+    def __init__(self, k1: Optional[float] = None, b: Optional[float] = None):
+        self.k1 = config.BM25_K1 if k1 is None else k1
+        self.b = config.BM25_B if b is None else b
+        # Postings as saved (and mapped by load): sorted terms with offsets into ids/frequencies
+        self._terms = np.zeros(0, dtype=str)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._frequencies = np.zeros(0, dtype=np.int32)
+        # Postings added or changed since, by term; empty arrays mark a term that is gone
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._doc_lengths = np.zeros(0, dtype=np.int32)
+        self._doc_count = 0
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._doc_count
+
+    @property
+    def row_count(self) -> int:
+        return len(self._doc_lengths)
+
+    def _saved_posting(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        i = int(np.searchsorted(self._terms, term))
+        if i < len(self._terms) and self._terms[i] == term:
+            start, end = self._offsets[i], self._offsets[i + 1]
+            return self._ids[start:end], self._frequencies[start:end]
+        return None
+
+    def _posting(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        posting = self._postings.get(term)
+        if posting is None:
+            posting = self._saved_posting(term)
+        return posting if posting is not None and len(posting[0]) else None
+
+    def _writable_doc_lengths(self) -> np.ndarray:
+        if not self._doc_lengths.flags.writeable:
+            self._doc_lengths = np.array(self._doc_lengths)
+        return self._doc_lengths
+
+    def reserve(self, row_count: int):
+        """Make room for document IDs below ``row_count``."""
+        with self._lock:
+            if row_count > len(self._doc_lengths):
+                self._doc_lengths = np.concatenate([
+                    self._doc_lengths, np.zeros(row_count - len(self._doc_lengths), dtype=np.int32)])
+
+    def add(self, doc_ids: Sequence[int], texts: Sequence[str]):
+        """Index ``texts`` under ``doc_ids``."""
+        new_postings: Dict[str, Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+        lengths = []
+        for doc_id, text in zip(doc_ids, texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                ids, frequencies = new_postings[term]
+                ids.append(int(doc_id))
+                frequencies.append(frequency)
+        if not lengths:
+            return
+
+        with self._lock:
+            self.reserve(max(int(doc_id) for doc_id in doc_ids) + 1)
+            self._writable_doc_lengths()[np.asarray(doc_ids, dtype=np.int64)] = lengths
+            self._doc_count += sum(1 for length in lengths if length)
+            self._total_length += sum(lengths)
+            for term, (ids, frequencies) in new_postings.items():
+                ids = np.asarray(ids, dtype=np.int64)
+                frequencies = np.asarray(frequencies, dtype=np.int32)
+                existing = self._posting(term)
+                if existing is not None:
+                    ids = np.concatenate([existing[0], ids])
+                    frequencies = np.concatenate([existing[1], frequencies])
+                self._postings[term] = (ids, frequencies)
+
+    def remove(self, doc_ids: Sequence[int], texts: Sequence[str]):
+        """Drop ``doc_ids`` from the index; ``texts`` are the texts they were added with."""
+        removed_by_term: Dict[str, List[int]] = defaultdict(list)
+        for doc_id, text in zip(doc_ids, texts):
+            for term in set(tokenize(text)):
+                removed_by_term[term].append(int(doc_id))
+
+        with self._lock:
+            doc_lengths = self._writable_doc_lengths()
+            for doc_id in doc_ids:
+                doc_id = int(doc_id)
+                if 0 <= doc_id < len(doc_lengths) and doc_lengths[doc_id] > 0:
+                    self._total_length -= int(doc_lengths[doc_id])
+                    doc_lengths[doc_id] = 0
+                    self._doc_count -= 1
+            for term, removed in removed_by_term.items():
+                posting = self._posting(term)
+                if posting is None:
+                    continue
+                keep = ~np.isin(posting[0], removed)
+                self._postings[term] = (posting[0][keep], posting[1][keep])
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top ``k`` ``(scores, doc_ids)`` for ``query``, restricted to IDs set in ``mask``."""
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or self._doc_count == 0 or k <= 0:
+                return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+            scores = np.zeros(len(self._doc_lengths), dtype=np.float32)
+            average_length = self._total_length / self._doc_count
+            for term in terms:
+                posting = self._posting(term)
+                if posting is None:
+                    continue
+                ids, frequencies = posting
+                idf = math.log(1 + (self._doc_count - len(ids) + 0.5) / (len(ids) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[ids] / average_length)
+                scores[ids] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+        candidates = np.flatnonzero(scores)
+        if mask is not None:
+            candidates = candidates[candidates < len(mask)]
+            candidates = candidates[mask[candidates]]
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return scores[top], top.astype(np.int64)
+
+    def save(self, path: Path):
+        """Write the index atomically to ``path`` (uncompressed ``.npz``, terms sorted)."""
+        path = Path(path)
+        with self._lock:
+            postings = [(term, self._posting(term))
+                        for term in sorted(set(self._terms.tolist()) | set(self._postings))]
+            postings = [(term, posting) for term, posting in postings if posting is not None]
+            terms = [term for term, _ in postings]
+            lengths = np.array([len(posting[0]) for _, posting in postings], dtype=np.int64)
+            offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+            ids = (np.concatenate([posting[0] for _, posting in postings]).astype(np.int64)
+                   if postings else np.zeros(0, np.int64))
+            frequencies = (np.concatenate([posting[1] for _, posting in postings]).astype(np.int32)
+                           if postings else np.zeros(0, np.int32))
+            buffer = io.BytesIO()
+            np.savez(buffer, terms=np.array(terms, dtype=str), offsets=offsets, ids=ids,
+                     frequencies=frequencies, doc_lengths=self._doc_lengths,
+                     params=np.array([self.k1, self.b], dtype=np.float64))
+        tmp_path = path.with_name(path.name + f".tmp{os.getpid()}")
+        with open(tmp_path, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'BM25Index':
+        """Open a saved index with its arrays memory-mapped (read-only) from ``path``."""
+        data = _map_npz(Path(path))
+        k1, b = np.asarray(data['params']).tolist()
+        index = cls(k1=k1, b=b)
+        terms, offsets, ids, frequencies = data['terms'], data['offsets'], data['ids'], data['frequencies']
+        if len(terms) > 1 and not np.all(terms[:-1] <= terms[1:]):
+            # Saved before terms were written in sorted order: sort a copy in memory
+            order = np.argsort(terms, kind='stable')
+            positions = np.concatenate([np.arange(offsets[i], offsets[i + 1]) for i in order])
+            offsets = np.concatenate([[0], np.cumsum(np.diff(offsets)[order])]).astype(np.int64)
+            terms, ids, frequencies = terms[order], ids[positions], frequencies[positions]
+        index._terms, index._offsets, index._ids, index._frequencies = terms, offsets, ids, frequencies
+        index._doc_lengths = data['doc_lengths']
+        if index._doc_lengths.dtype != np.int32:
+            index._doc_lengths = index._doc_lengths.astype(np.int32)
+        index._doc_count = int(np.count_nonzero(index._doc_lengths))
+        index._total_length = int(index._doc_lengths.sum())
+        return index
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            shadowed = [posting for posting in map(self._saved_posting, self._postings) if posting is not None]
+            terms = len(self._terms) - len(shadowed) + sum(1 for posting in self._postings.values() if len(posting[0]))
+            postings = (len(self._ids) - sum(len(posting[0]) for posting in shadowed)
+                        + sum(len(posting[0]) for posting in self._postings.values()))
+        return {
+            'documents': self._doc_count,
+            'terms': terms,
+            'postings': int(postings),
+            'average_length': round(self._total_length / self._doc_count, 1) if self._doc_count else 0.0
+        }
@@ -0,0 +1,172 @@
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Tag for entries that depend on the whole corpus (e.g. unfiltered searches)
+ALL = '*'
+
+
+def label_tag(label: Optional[str]) -> str:
+    """Cache tag for results that only depend on documents with this label."""
+    return f"label:{label}" if label else ALL
+
+
+def email_tag(email_id: str) -> str:
+    """Cache tag for results built from this email's content."""
+    return f"email:{email_id}"
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate deep size in bytes of a cached value."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'expires_at', 'tags')
+
+    def __init__(self, value: Any, size: int, expires_at: Optional[float], tags: Tuple[str, ...]):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class QueryCache:
+    """Thread-safe LRU cache with TTL, size accounting and generation-tagged invalidation.
+
+    Entries are tagged with what they depend on: ``ALL`` for results computed over
+    the whole corpus, or ``label_tag(label)`` for label-filtered ones. When the
+    corpus changes, ``bump(tags)`` drops exactly the entries tagged with those
+    labels plus every ``ALL`` entry; ``bump_all()`` drops everything (rebuild).
+
+    Tags carry generation numbers. Take a ``snapshot(tags)`` before computing a
+    value and pass it to ``set``; if the corpus changed in the meantime the
+    stale value is not stored.
+    """
+
+    def __init__(self, name: str, max_entries: int = 1000, ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+                      'invalidations': 0, 'stale_writes': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def snapshot(self, tags: Iterable[str] = (ALL,)) -> Tuple:
+        """Generation stamp for ``tags``; changes whenever an entry with these tags would be invalidated."""
+        with self._lock:
+            return self._snapshot_locked(tuple(tags))
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.stats['expirations'] += 1
+                entry = None
+            if entry is None:
+                if count:
+                    self.stats['misses'] += 1
+                return default
+            self._entries.move_to_end(key)
+            if count:
+                self.stats['hits'] += 1
+            return entry.value
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (ALL,),
+            snapshot: Optional[Tuple] = None) -> bool:
+        """Store a value. Returns False if it was stale, too large, or the cache is disabled."""
+        if self.max_entries <= 0:
+            return False
+        tags = tuple(tags)
+        size = estimate_size(value) + estimate_size(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+        with self._lock:
+            if snapshot is not None and snapshot != self._snapshot_locked(tags):
+                self.stats['stale_writes'] += 1
+                return False
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+            self._entries[key] = _Entry(value, size, expires_at, tags)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats['evictions'] += 1
+        return True
+
+    def bump(self, tags: Iterable[str]):
+        """Invalidate entries depending on ``tags`` (and every corpus-wide entry)."""
+        with self._lock:
+            tags = set(self._with_all(tags))
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            stale = [key for key, entry in self._entries.items() if tags.intersection(entry.tags)]
+            for key in stale:
+                self._remove(key)
+            self.stats['invalidations'] += len(stale)
+
+    def bump_all(self):
+        """Invalidate every entry, e.g. after an index rebuild."""
+        with self._lock:
+            self._epoch += 1
+            self.stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0
+        }
+
+    def _snapshot_locked(self, tags: Tuple[str, ...]) -> Tuple:
+        return (self._epoch,) + tuple(self._generations.get(tag, 0) for tag in tags)
+
+    @staticmethod
+    def _with_all(tags: Iterable[str]) -> Tuple[str, ...]:
+        tags = tuple(tags)
+        return tags if ALL in tags else tags + (ALL,)
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+_MISSING = object()
@@ -18,7 +18,11 @@ class RAGSettings:
     # RAG Settings
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "100"))
+    EMAIL_FILE_CACHE_MAX_MB: int = int(os.getenv("EMAIL_FILE_CACHE_MAX_MB", "64"))  # Parsed email files kept in memory
     TOP_K_RETRIEVAL: int = int(os.getenv("TOP_K_RETRIEVAL", "3"))
+    MAX_CHUNKS_PER_EMAIL: int = int(os.getenv("MAX_CHUNKS_PER_EMAIL", "1"))  # 0 = don't collapse hits
+    SCORE_THRESHOLD: float = float(os.getenv("SCORE_THRESHOLD", "0.2"))  # Min cosine similarity for new indexes
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "1024"))  # Chunks per embed call during builds
     
     # Embedding Settings
     EMBEDDING_PROVIDER: str = os.getenv("EMBEDDING_PROVIDER", "openai")  # openai, sentence-transformers, cohere
@@ -26,6 +30,31 @@ class RAGSettings:
     EMBEDDING_DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION", "1536"))  # OpenAI's dimension
     USE_SENTENCE_TRANSFORMERS: bool = os.getenv("USE_SENTENCE_TRANSFORMERS", "false").lower() == "true"
     
+    # Max texts per embedding request, per provider API limits
+    EMBEDDING_PROVIDER_BATCH_SIZES = {
+        'nomic': int(os.getenv("NOMIC_BATCH_SIZE", "256")),
+        'openai': int(os.getenv("OPENAI_EMBEDDING_BATCH_SIZE", "512")),
+        'sentence_transformers': int(os.getenv("SENTENCE_TRANSFORMERS_BATCH_SIZE", "64")),
+        'cohere': int(os.getenv("COHERE_EMBEDDING_BATCH_SIZE", "96")),
+        'gemini': int(os.getenv("GEMINI_EMBEDDING_BATCH_SIZE", "100")),
+    }
+    
+    # Async embedding engine: concurrent batches, scheduled against provider quotas
+    ASYNC_EMBEDDING_ENABLED: bool = os.getenv("ASYNC_EMBEDDING_ENABLED", "true").lower() == "true"
+    EMBEDDING_MAX_IN_FLIGHT: int = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4"))  # Batch requests per provider
+    EMBEDDING_MAX_RETRIES: int = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))  # Per batch, on 429/5xx/network errors
+    EMBEDDING_REQUEST_TIMEOUT: float = float(os.getenv("EMBEDDING_REQUEST_TIMEOUT", "60"))
+    EMBEDDING_RATE_LIMITS = {  # Requests and tokens per minute, 0 = unlimited
+        'nomic': {'rpm': int(os.getenv("NOMIC_EMBEDDING_RPM", "600")),
+                  'tpm': int(os.getenv("NOMIC_EMBEDDING_TPM", "0"))},
+        'openai': {'rpm': int(os.getenv("OPENAI_EMBEDDING_RPM", "3000")),
+                   'tpm': int(os.getenv("OPENAI_EMBEDDING_TPM", "1000000"))},
+    }
+    
+    # Provider endpoints (overridable for proxies and local stub servers)
+    NOMIC_BASE_URL: str = os.getenv("NOMIC_BASE_URL", "https://atlas.nomic.ai/api/v1")
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    
     # Generation Settings
     GENERATION_MODEL: str = "command"
     MAX_TOKENS: int = int(os.getenv("MAX_TOKENS", "800"))
@@ -36,11 +65,91 @@ class RAGSettings:
     GROQ_MAX_TOKENS: int = 8000
     GEMINI_MAX_TOKENS: int = 1000000
     
+    # Provider routing (timeouts, circuit breakers, hedged requests)
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))  # Per provider attempt
+    LLM_TOTAL_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TOTAL_TIMEOUT_SECONDS", "45"))  # Whole fallback chain
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_DELAY_SECONDS: float = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "4"))  # Until a p95 is known
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "3"))
+    LLM_CIRCUIT_RESET_SECONDS: float = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "60"))
+    MAX_CONCURRENT_REQUESTS: int = int(os.getenv("MAX_CONCURRENT_REQUESTS", "10"))  # Same setting as the API's query pool
+    
+    # Context windows (prompt + completion tokens) per generation model
+    MODEL_CONTEXT_WINDOWS = {
+        'gemma2-9b-it': 8192,
+        'meta-llama/llama-4-scout-17b-16e-instruct': 131072,
+        'llama-3.3-70b-versatile': 131072,
+        'llama3-8b-8192': 8192,
+        'gemini-2.0-flash': 1048576,
+    }
+    DEFAULT_CONTEXT_WINDOW: int = int(os.getenv("DEFAULT_CONTEXT_WINDOW", "8192"))
+    MAX_PROMPT_TOKENS: int = int(os.getenv("MAX_PROMPT_TOKENS", "0"))  # Optional cost cap, 0 = model limit
+    TOKENIZER_DIR: Path = Path(os.getenv("TOKENIZER_DIR", "./data/tokenizers"))  # <model>.json HF tokenizers
+    TIKTOKEN_ENCODING: str = os.getenv("TIKTOKEN_ENCODING", "o200k_base")  # Approximation for other models
+    APPROXIMATE_TOKEN_MARGIN: float = float(os.getenv("APPROXIMATE_TOKEN_MARGIN", "0.1"))  # Headroom if not exact
+    MIN_CHUNK_TOKENS: int = int(os.getenv("MIN_CHUNK_TOKENS", "64"))  # Smaller trimmed chunks are dropped
+    
     # Storage Paths
     DATA_DIR: Path = Path(os.getenv("DATA_DIR", "./data"))
     PARSED_EMAILS_DIR: Path = DATA_DIR / "parsed_emails"
     VECTOR_STORE_DIR: Path = DATA_DIR / "vector_store"
     
+    # Serving one vector store from several processes (e.g. uvicorn --workers N):
+    # one writer owns index updates and publishes generations that readers mmap
+    INDEX_MODE: str = os.getenv("INDEX_MODE", "shared" if int(os.getenv("WORKERS", "1")) > 1 else "single")
+    INDEX_RELOAD_CHECK_SECONDS: float = float(os.getenv("INDEX_RELOAD_CHECK_SECONDS", "1"))  # Readers: new generation?
+    INDEX_TASK_POLL_SECONDS: float = float(os.getenv("INDEX_TASK_POLL_SECONDS", "0.5"))  # Writer: forwarded updates
+    INDEX_SNAPSHOTS_KEEP: int = int(os.getenv("INDEX_SNAPSHOTS_KEEP", "3"))  # Full builds kept for rollback
+    INDEX_SNAPSHOT_VERIFY: bool = os.getenv("INDEX_SNAPSHOT_VERIFY", "true").lower() == "true"  # Checksum on load
+    
+    # Background jobs (index rebuilds started by /refresh, see rag/jobs.py)
+    JOB_STALE_SECONDS: float = float(os.getenv("JOB_STALE_SECONDS", "600"))  # Running job without progress (or queued job not started) = dead
+    JOBS_KEEP: int = int(os.getenv("JOBS_KEEP", "100"))  # Finished jobs kept for /jobs/{id}
+    
+    # ANN index selection (see rag/index_factory.py)
+    INDEX_TYPE: str = os.getenv("INDEX_TYPE", "auto")  # auto, flat, ivf_flat, hnsw, ivf_pq, opq_ivf_pq
+    INDEX_MEMORY_BUDGET_MB: float = float(os.getenv("INDEX_MEMORY_BUDGET_MB", "1024"))
+    FLAT_MAX_VECTORS: int = int(os.getenv("FLAT_MAX_VECTORS", "20000"))  # Exact search up to this size
+    IVF_NPROBE: int = int(os.getenv("IVF_NPROBE", "0"))  # 0 = nlist / 16 (at least 8)
+    INDEX_TRAIN_POINTS_PER_LIST: int = int(os.getenv("INDEX_TRAIN_POINTS_PER_LIST", "256"))
+    HNSW_M: int = int(os.getenv("HNSW_M", "32"))
+    HNSW_EF_CONSTRUCTION: int = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+    HNSW_EF_SEARCH: int = int(os.getenv("HNSW_EF_SEARCH", "128"))
+    PQ_M: int = int(os.getenv("PQ_M", "0"))  # PQ code bytes per vector, 0 = dimension / 8
+    FILTER_EXACT_SEARCH_MAX: int = int(os.getenv("FILTER_EXACT_SEARCH_MAX", "2048"))  # HNSW: brute-force tiny filters
+    FILTER_MAX_EF_SEARCH: int = int(os.getenv("FILTER_MAX_EF_SEARCH", "4096"))
+    
+    # Hybrid retrieval: BM25 over chunks fused with vector hits by reciprocal rank
+    HYBRID_SEARCH_ENABLED: bool = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+    BM25_K1: float = float(os.getenv("BM25_K1", "1.2"))
+    BM25_B: float = float(os.getenv("BM25_B", "0.75"))
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+    
+    # Optional cross-encoder reranking of retrieved chunks (local, CPU)
+    RERANK_ENABLED: bool = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANK_MODEL: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "20"))  # Retrieved before reranking
+    RERANK_TOP_K: int = int(os.getenv("RERANK_TOP_K", "3"))  # Chunks sent to the LLM after reranking
+    RERANK_BUDGET_MS: float = float(os.getenv("RERANK_BUDGET_MS", "150"))
+    RERANK_MAX_LENGTH: int = int(os.getenv("RERANK_MAX_LENGTH", "256"))  # Tokens per (query, chunk) pair
+    RERANK_CACHE_SIZE: int = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+    OPQ_TRAIN_ITERATIONS: int = int(os.getenv("OPQ_TRAIN_ITERATIONS", "10"))
+    OPQ_MAX_TRAIN_POINTS: int = int(os.getenv("OPQ_MAX_TRAIN_POINTS", "16384"))
+    
+    # Embedding cache (memory-mapped, content-addressed)
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_DIR: Path = Path(os.getenv("EMBEDDING_CACHE_DIR", str(VECTOR_STORE_DIR / "embedding_cache")))
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+    
+    # Search / answer caches (in memory, invalidated per label on ingest)
+    QUERY_CACHE_TTL: int = int(os.getenv("CACHE_TTL", "3600"))  # Seconds, 0 = no expiry
+    QUERY_CACHE_MAX_MB: int = int(os.getenv("QUERY_CACHE_MAX_MB", "64"))  # Per cache
+    
+    # Semantic answer cache (paraphrases of earlier questions reuse their answer)
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # Min cosine, model dependent
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+    
     # Development
     DEBUG: bool = os.getenv("DEBUG", "true").lower() == "true"
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -63,4 +172,5 @@ class RAGSettings:
         return True
 
 # Global settings instance
-settings = RAGSettings() 
\ No newline at end of file
+settings = RAGSettings()
+config = settings  # Modules import the settings as ``config``
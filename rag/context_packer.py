@@ -0,0 +1,191 @@
+import math
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Tokens a chat API adds around the user message (role markers etc.)
+CHAT_OVERHEAD_TOKENS = 16
+
+TRIM_MARKER = " [...]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokenizer-free upper bound: ~3 UTF-8 bytes per token (English averages ~4)."""
+    return math.ceil(len(text.encode('utf-8')) / 3)
+
+
+class TokenCounter:
+    """Counts tokens for one model; ``exact`` is False for approximations."""
+
+    def __init__(self, name: str, count: Callable[[str], int], exact: bool):
+        self.name = name
+        self._count = count
+        self.exact = exact
+
+    def count(self, text: str) -> int:
+        return self._count(text) if text else 0
+
+    def truncate(self, text: str, max_tokens: int, keep: str = 'head') -> str:
+        """Longest prefix (``keep='head'``) or suffix (``'tail'``) of ``text`` within ``max_tokens``."""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        part = (lambda n: text[:n]) if keep == 'head' else (lambda n: text[len(text) - n:])
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(part(middle)) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return part(low)
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model: str) -> TokenCounter:
+    """Best local tokenizer for a model.
+
+    A Hugging Face ``tokenizer.json`` saved as ``TOKENIZER_DIR/<model>.json``
+    (``/`` replaced by ``__``) is exact. Otherwise tiktoken, if installed,
+    approximates other vocabularies, and without it a byte-based estimate is used.
+    """
+    path = config.TOKENIZER_DIR / f"{model.replace('/', '__')}.json"
+    if path.exists():
+        try:
+            from tokenizers import Tokenizer
+            tokenizer = Tokenizer.from_file(str(path))
+            return TokenCounter(f"hf:{path.name}",
+                                lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids), exact=True)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load tokenizer {path}: {e}")
+
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(config.TIKTOKEN_ENCODING)
+        return TokenCounter(f"tiktoken:{encoding.name}",
+                            lambda text: len(encoding.encode(text, disallowed_special=())), exact=False)
+    except Exception:
+        pass
+
+    return TokenCounter("estimate", estimate_tokens, exact=False)
+
+
+def prompt_budget(model: str, max_output_tokens: int, counter: Optional[TokenCounter] = None) -> int:
+    """Largest prompt, in the counter's tokens, that fits the model's context window."""
+    counter = counter or get_token_counter(model)
+    window = config.MODEL_CONTEXT_WINDOWS.get(model, config.DEFAULT_CONTEXT_WINDOW)
+    budget = window - max_output_tokens - CHAT_OVERHEAD_TOKENS
+    if not counter.exact:
+        budget = int(budget * (1 - config.APPROXIMATE_TOKEN_MARGIN))
+    if config.MAX_PROMPT_TOKENS:
+        budget = min(budget, config.MAX_PROMPT_TOKENS)
+    return max(budget, 0)
+
+
+@dataclass
+class PackedPrompt:
+    prompt: str
+    docs: List[Dict[str, Any]]
+    tokens: int
+    budget: int
+    tokenizer: str
+    dropped: int = 0
+    trimmed: int = 0
+    persona_dropped: bool = False
+
+
+class ContextPacker:
+    """Fit RAG prompts to a model's context window, measured with its tokenizer.
+
+    The question and prompt template always go in. Persona context comes next,
+    then the retrieved chunks in rank order; the first chunk that doesn't fit
+    is trimmed to the remaining room (or dropped if that's under
+    ``MIN_CHUNK_TOKENS``) and every lower-ranked chunk is dropped.
+    """
+
+    def __init__(self, render: Optional[Callable[[str, List[Dict], Optional[str]], str]] = None,
+                 counter_for: Callable[[str], TokenCounter] = get_token_counter):
+        if render is None:
+            from .prompts import prompt_manager
+            render = prompt_manager.get_rag_query_prompt
+        self.render = render
+        self.counter_for = counter_for
+
+    def pack(self, question: str, context_docs: List[Dict[str, Any]], persona_context: Optional[str],
+             model: str, max_output_tokens: int) -> PackedPrompt:
+        counter = self.counter_for(model)
+        budget = prompt_budget(model, max_output_tokens, counter)
+
+        def fits(docs, persona=persona_context, q=question) -> bool:
+            return counter.count(self.render(q, docs, persona)) <= budget
+
+        persona_dropped = False
+        if persona_context and not fits([]):
+            persona_context, persona_dropped = None, True
+        if not fits([]):
+            # Only the question itself is left to give; keep its beginning
+            room = budget - counter.count(self.render("", [], None))
+            question = counter.truncate(question, room)
+
+        docs: List[Dict[str, Any]] = []
+        trimmed = 0
+        for doc in context_docs:
+            if fits(docs + [doc]):
+                docs.append(doc)
+                continue
+            partial_doc = self._trim_doc(doc, docs, question, persona_context, counter, budget)
+            if partial_doc is not None:
+                docs.append(partial_doc)
+                trimmed = 1
+            break
+
+        prompt = self.render(question, docs, persona_context)
+        packed = PackedPrompt(prompt=prompt, docs=docs, tokens=counter.count(prompt), budget=budget,
+                              tokenizer=counter.name, dropped=len(context_docs) - len(docs),
+                              trimmed=trimmed, persona_dropped=persona_dropped)
+        if packed.dropped or packed.trimmed or persona_dropped:
+            logger.info(f"✂️ Packed prompt for {model}: {packed.tokens}/{budget} tokens ({counter.name}), "
+                        f"{len(docs)} chunks, {packed.trimmed} trimmed, {packed.dropped} dropped")
+        return packed
+
+    def _trim_doc(self, doc: Dict[str, Any], docs: List[Dict[str, Any]], question: str,
+                  persona_context: Optional[str], counter: TokenCounter, budget: int) -> Optional[Dict[str, Any]]:
+        """The longest prefix of ``doc``'s content that still fits, or None if too little room is left."""
+        def with_content(content: str) -> Dict[str, Any]:
+            return {**doc, 'content': content}
+
+        used = counter.count(self.render(question, docs + [with_content(TRIM_MARKER)], persona_context))
+        room = budget - used
+        if room < config.MIN_CHUNK_TOKENS:
+            return None
+        content = counter.truncate(doc.get('content', ''), room)
+        # Tokens don't add up exactly across boundaries; shrink until the whole prompt fits
+        while content:
+            candidate = with_content(content.rstrip() + TRIM_MARKER)
+            if counter.count(self.render(question, docs + [candidate], persona_context)) <= budget:
+                return candidate
+            content = content[:int(len(content) * 0.95)]
+        return None
+
+    def fit_prompt(self, prompt: str, model: str, max_output_tokens: int, keep_tail_tokens: int = 256) -> str:
+        """Fit a free-form prompt by cutting from the middle, keeping its start and its ending instruction."""
+        counter = self.counter_for(model)
+        budget = prompt_budget(model, max_output_tokens, counter)
+        if counter.count(prompt) <= budget:
+            return prompt
+        marker = "\n[...]\n"
+        tail = counter.truncate(prompt, min(keep_tail_tokens, budget // 4), keep='tail')
+        head_budget = budget - counter.count(tail) - counter.count(marker)
+        while head_budget > 0:
+            fitted = counter.truncate(prompt, head_budget) + marker + tail
+            if counter.count(fitted) <= budget:
+                logger.info(f"✂️ Prompt for {model} cut to {counter.count(fitted)}/{budget} tokens ({counter.name})")
+                return fitted
+            head_budget -= max(1, head_budget // 20)
+        return counter.truncate(tail, budget, keep='tail')
@@ -5,13 +5,14 @@ from typing import List, Dict, Any, Optional
 import sys
 import os
 import json
+from collections import OrderedDict
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
 
 from ingestion_api.database import db
-from ingestion_api.models import EmailMetadata
 from .config import config
+from .bm25 import BM25Index
 from ingestion_api.parser import clean_email_address
 
 class Document:
@@ -24,9 +25,17 @@ class Document:
 class EmailDocumentSource:
     """Load and process email documents for RAG."""
     
+    # Keyword-search indexes kept for recent filter combinations
+    SEARCH_INDEX_CACHE_SIZE = 8
+    
     def __init__(self):
         self.chunk_size = config.CHUNK_SIZE
         self.chunk_overlap = config.CHUNK_OVERLAP
+        # Parsed email files by path, as (mtime_ns, content), least recently used first
+        self._file_cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._file_cache_size = 0
+        self._file_cache_max_size = config.EMAIL_FILE_CACHE_MAX_MB * 1024 * 1024
+        self._search_indexes: 'OrderedDict[tuple, tuple]' = OrderedDict()
     
     def load_documents(self, label: str = None, max_age_days: int = None, sender: str = None) -> List[Document]:
         """Load email documents from parsed files."""
@@ -75,11 +84,11 @@ class EmailDocumentSource:
                 # Read email content from file
                 if not os.path.exists(email.parsed_path):
                     print(f"Warning: Email file not found: {email.parsed_path}")
+                    self._evict_file(email.parsed_path)
                     continue
                 
                 try:
-                    with open(email.parsed_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
+                    content = self._read_email_file(email.parsed_path)
                     
                     # Create document with metadata
                     metadata = {
@@ -201,38 +210,92 @@ class EmailDocumentSource:
             }
     
     def search_documents(self, query: str, label: str = None, max_age_days: int = None, sender: str = None) -> List[Document]:
-        """Simple text search in documents (fallback when embeddings not available)."""
+        """Keyword (BM25) search in documents (fallback when embeddings not available)."""
         try:
-            documents = self.load_documents(label, max_age_days, sender)
-            chunked_docs = self.chunk_documents(documents)
-            
-            # Simple keyword search
-            query_terms = query.lower().split()
-            scored_docs = []
-            
-            for doc in chunked_docs:
-                content_lower = doc.content.lower()
-                score = 0
-                
-                for term in query_terms:
-                    if term in content_lower:
-                        score += content_lower.count(term)
-                
-                if score > 0:
-                    scored_docs.append((score, doc))
-            
-            # Sort by score and return top results
-            scored_docs.sort(key=lambda x: x[0], reverse=True)
-            return [doc for score, doc in scored_docs[:config.TOP_K_RETRIEVAL]]
+            chunked_docs, index = self._search_index(label, max_age_days, sender)
+            _, doc_ids = index.search(query, config.TOP_K_RETRIEVAL)
+            return [chunked_docs[doc_id] for doc_id in doc_ids]
             
         except Exception as e:
             print(f"Error searching documents: {e}")
             return []
     
+    def _search_index(self, label: str = None, max_age_days: int = None, sender: str = None) -> tuple:
+        """Chunks and BM25 index for a filter, rebuilt only when the email database changes.
+        
+        The database generation is checked before anything is loaded. With
+        ``max_age_days`` the index is also rebuilt once its oldest email ages out.
+        """
+        key = (label, max_age_days, sender)
+        generation = db.get_generation()
+        cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).isoformat() if max_age_days else None
+        cached = self._search_indexes.get(key)
+        if (cached is not None and generation is not None and cached[0] == generation
+                and (cutoff is None or cached[1] is None or cached[1] >= cutoff)):
+            self._search_indexes.move_to_end(key)
+            return cached[2], cached[3]
+        
+        documents = self.load_documents(label, max_age_days, sender)
+        oldest = min((doc.metadata['date'] for doc in documents), default=None)
+        chunked_docs = self.chunk_documents(documents)
+        index = BM25Index()
+        index.add(range(len(chunked_docs)), [doc.content for doc in chunked_docs])
+        self._search_indexes[key] = (generation, oldest, chunked_docs, index)
+        if len(self._search_indexes) > self.SEARCH_INDEX_CACHE_SIZE:
+            self._search_indexes.popitem(last=False)
+        return chunked_docs, index
+    
+    def _read_email_file(self, path: str) -> str:
+        """Read a parsed email file, reusing the last read while its modification time is unchanged.
+        
+        Up to ``EMAIL_FILE_CACHE_MAX_MB`` of file contents are kept; the least
+        recently read files are dropped first.
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self._evict_file(path)
+            raise
+        cached = self._file_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            self._file_cache.move_to_end(path)
+            return cached[1]
+        self._evict_file(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        if len(content) <= self._file_cache_max_size:
+            self._file_cache[path] = (mtime, content)
+            self._file_cache_size += len(content)
+            while self._file_cache_size > self._file_cache_max_size:
+                self._file_cache_size -= len(self._file_cache.popitem(last=False)[1][1])
+        return content
+    
+    def _evict_file(self, path: str):
+        cached = self._file_cache.pop(path, None)
+        if cached is not None:
+            self._file_cache_size -= len(cached[1])
+    
     def simple_search(self, query: str, label: str = None, max_age_days: int = None, sender: str = None) -> List[Document]:
         """Simple search method for RAG pipeline fallback."""
         return self.search_documents(query, label, max_age_days, sender)
 
+    def _parse_email_file(self, content: str) -> tuple:
+        """Split a parsed email file into its header fields and body.
+        
+        Files written by ``EmailParser.save_parsed_email`` start with Subject/From/
+        Date/Label/ID lines followed by a row of dashes.
+        """
+        header_fields = {}
+        lines = content.split('\n')
+        for i, line in enumerate(lines[:10]):
+            if line.startswith('-' * 80):
+                body = '\n'.join(lines[i + 1:]).strip()
+                return header_fields, body
+            key, sep, value = line.partition(': ')
+            if sep:
+                header_fields[key.strip().lower()] = value.strip()
+        return {}, content
+    
     def load_email_documents(self, file_paths: list) -> list:
         """Load email documents from a list of file paths."""
         documents = []
@@ -244,17 +307,19 @@ class EmailDocumentSource:
                 file_name = os.path.basename(file_path)
                 email_id = file_name.split('_')[0]
                 subject = file_name[len(email_id)+1:-4] if file_name.endswith('.txt') else file_name[len(email_id)+1:]
+                # Prefer the header written at the top of the parsed file
+                header_fields, body = self._parse_email_file(content)
                 metadata = {
-                    'email_id': email_id,
-                    'subject': subject,
-                    'sender': 'Unknown',
-                    'date': '',
-                    'label': 'Unknown',
-                    'has_attachments': False,
-                    'attachment_count': 0,
+                    'email_id': header_fields.get('id', email_id),
+                    'subject': header_fields.get('subject', subject),
+                    'sender': header_fields.get('from', 'Unknown'),
+                    'date': header_fields.get('date', ''),
+                    'label': header_fields.get('label', 'Unknown'),
+                    'has_attachments': '--- Attachment:' in body,
+                    'attachment_count': body.count('--- Attachment:'),
                     'source_file': str(file_path)
                 }
-                documents.append(Document(content, metadata))
+                documents.append(Document(body, metadata))
             except Exception as e:
                 print(f"Error loading email document {file_path}: {e}")
                 continue
@@ -0,0 +1,411 @@
+import os
+import mmap
+import json
+import pickle
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Sequence
+
+import numpy as np
+
+from .document_source import Document
+
+logger = logging.getLogger(__name__)
+
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.i64"
+METADATA_FILE = "metadata.db"
+LABELS_FILE = "labels.i32"
+TIMESTAMPS_FILE = "timestamps.i64"
+
+NO_LABEL = -1
+# Documents without a date pass every age filter; unparseable dates pass none
+NO_DATE = np.iinfo(np.int64).max
+BAD_DATE = np.iinfo(np.int64).min
+
+
+def parse_timestamp(date_str: Optional[str]) -> int:
+    """Epoch seconds for an ISO 8601 or RFC 2822 date; naive dates are taken as UTC."""
+    if not date_str:
+        return NO_DATE
+    try:
+        parsed = datetime.fromisoformat(date_str)
+    except (ValueError, TypeError):
+        try:
+            parsed = parsedate_to_datetime(date_str)
+        except (ValueError, TypeError):
+            return BAD_DATE
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+class DocumentStore:
+    """Append-only document store with memory-mapped text and a SQLite metadata sidecar.
+
+    Row numbers double as FAISS IDs. Layout of the store directory:
+
+        texts.bin       UTF-8 text of every document, concatenated
+        offsets.i64     (start, length) byte offsets per row into texts.bin
+        labels.i32      label code per row (codes are listed in metadata.db)
+        timestamps.i64  document date per row as epoch seconds
+        metadata.db     one row per document: email_id, label, date, deleted flag, metadata JSON
+
+    Opening a store only maps the files, so load time and resident memory do not
+    grow with the corpus. Content and metadata are materialized per row on demand,
+    which in practice means only for the top-k search hits. Label codes,
+    timestamps and the deleted flags are kept as arrays so search filters can be
+    evaluated for every row at once (see ``filter_mask``).
+    """
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = Path(store_dir)
+        self.texts_path = self.store_dir / TEXTS_FILE
+        self.offsets_path = self.store_dir / OFFSETS_FILE
+        self.db_path = self.store_dir / METADATA_FILE
+        self.labels_path = self.store_dir / LABELS_FILE
+        self.timestamps_path = self.store_dir / TIMESTAMPS_FILE
+        self._lock = threading.RLock()
+        self._conn = None
+        self._texts = None
+        self._offsets = np.zeros((0, 2), dtype=np.int64)
+        self._label_codes = np.zeros(0, dtype=np.int32)
+        self._timestamps = np.zeros(0, dtype=np.int64)
+        self._deleted = np.zeros(0, dtype=bool)
+        self._label_ids: Dict[str, int] = {}
+        self._live_count = 0
+
+    @classmethod
+    def exists(cls, store_dir: Path) -> bool:
+        store_dir = Path(store_dir)
+        return all((store_dir / name).exists() for name in (TEXTS_FILE, OFFSETS_FILE, METADATA_FILE))
+
+    @classmethod
+    def create(cls, store_dir: Path, documents: Sequence[Optional[Document]]) -> 'DocumentStore':
+        """Write a fresh store for ``documents`` (``None`` entries become deleted rows)."""
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        tmp_suffix = f".tmp{os.getpid()}"
+        texts_tmp = store_dir / (TEXTS_FILE + tmp_suffix)
+        offsets_tmp = store_dir / (OFFSETS_FILE + tmp_suffix)
+        labels_tmp = store_dir / (LABELS_FILE + tmp_suffix)
+        timestamps_tmp = store_dir / (TIMESTAMPS_FILE + tmp_suffix)
+        db_tmp = store_dir / (METADATA_FILE + tmp_suffix)
+        for path in (texts_tmp, offsets_tmp, labels_tmp, timestamps_tmp, db_tmp):
+            if path.exists():
+                path.unlink()
+
+        offsets = np.zeros((len(documents), 2), dtype=np.int64)
+        label_ids: Dict[str, int] = {}
+        label_codes = np.full(len(documents), NO_LABEL, dtype=np.int32)
+        timestamps = np.full(len(documents), NO_DATE, dtype=np.int64)
+        rows = []
+        position = 0
+        with open(texts_tmp, 'wb') as f:
+            for doc_id, doc in enumerate(documents):
+                if doc is None:
+                    offsets[doc_id] = (position, 0)
+                    rows.append((doc_id, None, None, None, 1, '{}'))
+                    continue
+                data = doc.content.encode('utf-8', errors='replace')
+                f.write(data)
+                offsets[doc_id] = (position, len(data))
+                position += len(data)
+                rows.append(cls._metadata_row(doc_id, doc.metadata))
+                label = doc.metadata.get('label')
+                if label:
+                    label_codes[doc_id] = label_ids.setdefault(label, len(label_ids))
+                timestamps[doc_id] = parse_timestamp(doc.metadata.get('date'))
+        offsets.tofile(offsets_tmp)
+        label_codes.tofile(labels_tmp)
+        timestamps.tofile(timestamps_tmp)
+
+        with sqlite3.connect(db_tmp) as conn:
+            cls._init_schema(conn)
+            conn.executemany("INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany("INSERT INTO labels VALUES (?, ?)", [(code, label) for label, code in label_ids.items()])
+            conn.commit()
+        conn.close()
+
+        # Swap the files in; readers that still map the old files keep a valid view
+        os.replace(db_tmp, store_dir / METADATA_FILE)
+        os.replace(labels_tmp, store_dir / LABELS_FILE)
+        os.replace(timestamps_tmp, store_dir / TIMESTAMPS_FILE)
+        os.replace(offsets_tmp, store_dir / OFFSETS_FILE)
+        os.replace(texts_tmp, store_dir / TEXTS_FILE)
+
+        store = cls(store_dir)
+        store.open()
+        return store
+
+    @classmethod
+    def from_pickle(cls, store_dir: Path, pickle_path: Path) -> 'DocumentStore':
+        """Migrate a legacy ``documents.pkl`` (List[Document]) into a store."""
+        logger.info(f"🔄 Migrating {pickle_path} to memory-mapped document store...")
+        with open(pickle_path, 'rb') as f:
+            documents = pickle.load(f)
+        return cls.create(store_dir, documents)
+
+    @staticmethod
+    def _init_schema(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id INTEGER PRIMARY KEY,
+                email_id TEXT,
+                label TEXT,
+                date TEXT,
+                deleted INTEGER DEFAULT 0,
+                metadata TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_email ON documents(email_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS labels (code INTEGER PRIMARY KEY, label TEXT UNIQUE NOT NULL)")
+
+    @staticmethod
+    def _metadata_row(doc_id: int, metadata: Dict[str, Any]):
+        return (
+            int(doc_id),
+            metadata.get('email_id'),
+            metadata.get('label'),
+            metadata.get('date'),
+            0,
+            json.dumps(metadata, default=str)
+        )
+
+    def open(self) -> 'DocumentStore':
+        """Map the store files. Cheap: nothing is read until rows are requested."""
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+                self._init_schema(self._conn)
+            self._remap()
+            self._label_ids = {label: code for code, label in self._conn.execute("SELECT code, label FROM labels")}
+            if len(self._label_codes) != self.row_count or len(self._timestamps) != self.row_count:
+                self._rebuild_filter_columns()
+            self._deleted = np.zeros(self.row_count, dtype=bool)
+            deleted_ids = [row[0] for row in self._conn.execute("SELECT doc_id FROM documents WHERE deleted = 1")]
+            self._deleted[[doc_id for doc_id in deleted_ids if doc_id < self.row_count]] = True
+            self._live_count = int(self.row_count - self._deleted.sum())
+        return self
+    
+    def _rebuild_filter_columns(self):
+        """Derive label codes and timestamps from metadata.db (stores written before they existed)."""
+        logger.info(f"🔄 Building filter columns for {self.store_dir}...")
+        label_codes = np.full(self.row_count, NO_LABEL, dtype=np.int32)
+        timestamps = np.full(self.row_count, NO_DATE, dtype=np.int64)
+        new_labels = []
+        for doc_id, label, date in self._conn.execute("SELECT doc_id, label, date FROM documents"):
+            if doc_id >= self.row_count:
+                continue
+            if label:
+                if label not in self._label_ids:
+                    self._label_ids[label] = len(self._label_ids)
+                    new_labels.append((self._label_ids[label], label))
+                label_codes[doc_id] = self._label_ids[label]
+            timestamps[doc_id] = parse_timestamp(date)
+        self._conn.executemany("INSERT INTO labels VALUES (?, ?)", new_labels)
+        self._conn.commit()
+        label_codes.tofile(self.labels_path)
+        timestamps.tofile(self.timestamps_path)
+        self._remap()
+
+    def _remap(self):
+        """(Re)map texts and offsets after the files were created or appended to."""
+        if self._texts is not None:
+            self._texts.close()
+            self._texts = None
+        if self.texts_path.exists() and self.texts_path.stat().st_size > 0:
+            with open(self.texts_path, 'rb') as f:
+                self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.offsets_path.exists() and self.offsets_path.stat().st_size > 0:
+            self._offsets = np.memmap(self.offsets_path, dtype=np.int64, mode='r').reshape(-1, 2)
+        else:
+            self._offsets = np.zeros((0, 2), dtype=np.int64)
+        self._label_codes = self._map_column(self.labels_path, np.int32)
+        self._timestamps = self._map_column(self.timestamps_path, np.int64)
+    
+    @staticmethod
+    def _map_column(path: Path, dtype) -> np.ndarray:
+        if path.exists() and path.stat().st_size > 0:
+            return np.memmap(path, dtype=dtype, mode='r')
+        return np.zeros(0, dtype=dtype)
+
+    def close(self):
+        with self._lock:
+            if self._texts is not None:
+                self._texts.close()
+                self._texts = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @property
+    def row_count(self) -> int:
+        """Number of rows ever written, i.e. the next free document ID."""
+        return len(self._offsets)
+
+    def live_count(self) -> int:
+        return self._live_count
+
+    def get_text(self, doc_id: int) -> str:
+        start, length = self._offsets[doc_id]
+        if length == 0 or self._texts is None:
+            return ''
+        return self._texts[int(start):int(start + length)].decode('utf-8', errors='replace')
+
+    def get_many(self, doc_ids: Sequence[int]) -> List[Optional[Document]]:
+        """Materialize documents for the given IDs; deleted or unknown IDs give ``None``."""
+        ids = [int(doc_id) for doc_id in doc_ids if 0 <= int(doc_id) < self.row_count]
+        if not ids:
+            return [None] * len(doc_ids)
+        placeholders = ','.join('?' * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT doc_id, metadata FROM documents WHERE deleted = 0 AND doc_id IN ({placeholders})",
+                ids
+            ).fetchall()
+            metadata_by_id = {row[0]: row[1] for row in rows}
+            documents = []
+            for doc_id in doc_ids:
+                metadata = metadata_by_id.get(int(doc_id))
+                if metadata is None:
+                    documents.append(None)
+                else:
+                    documents.append(Document(self.get_text(int(doc_id)), json.loads(metadata)))
+        return documents
+
+    def get(self, doc_id: int) -> Optional[Document]:
+        return self.get_many([doc_id])[0]
+
+    def iter_documents(self, batch_size: int = 256) -> Iterator[Document]:
+        """Stream live documents in ID order without loading them all at once."""
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT doc_id FROM documents WHERE deleted = 0 AND doc_id > ? ORDER BY doc_id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            ids = [row[0] for row in rows]
+            last_id = ids[-1]
+            for doc in self.get_many(ids):
+                if doc is not None:
+                    yield doc
+
+    def append(self, documents: Sequence[Document]) -> List[int]:
+        """Append documents and return their new IDs."""
+        if not documents:
+            return []
+        with self._lock:
+            start_id = self.row_count
+            position = self.texts_path.stat().st_size if self.texts_path.exists() else 0
+            offsets = np.zeros((len(documents), 2), dtype=np.int64)
+            label_codes = np.full(len(documents), NO_LABEL, dtype=np.int32)
+            timestamps = np.full(len(documents), NO_DATE, dtype=np.int64)
+            rows = []
+            new_labels = []
+            with open(self.texts_path, 'ab') as f:
+                for i, doc in enumerate(documents):
+                    data = doc.content.encode('utf-8', errors='replace')
+                    f.write(data)
+                    offsets[i] = (position, len(data))
+                    position += len(data)
+                    rows.append(self._metadata_row(start_id + i, doc.metadata))
+                    label = doc.metadata.get('label')
+                    if label:
+                        if label not in self._label_ids:
+                            self._label_ids[label] = len(self._label_ids)
+                            new_labels.append((self._label_ids[label], label))
+                        label_codes[i] = self._label_ids[label]
+                    timestamps[i] = parse_timestamp(doc.metadata.get('date'))
+            with open(self.labels_path, 'ab') as f:
+                f.write(label_codes.tobytes())
+            with open(self.timestamps_path, 'ab') as f:
+                f.write(timestamps.tobytes())
+            with open(self.offsets_path, 'ab') as f:
+                f.write(offsets.tobytes())
+            self._conn.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._conn.executemany("INSERT INTO labels VALUES (?, ?)", new_labels)
+            self._conn.commit()
+            self._live_count += len(documents)
+            self._deleted = np.concatenate([self._deleted, np.zeros(len(documents), dtype=bool)])
+            self._remap()
+        return list(range(start_id, start_id + len(documents)))
+
+    def delete(self, doc_ids: Iterable[int]) -> int:
+        """Mark rows as deleted. Their bytes are reclaimed by the next full rebuild."""
+        ids = [(int(doc_id),) for doc_id in doc_ids]
+        if not ids:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("UPDATE documents SET deleted = 1 WHERE doc_id = ? AND deleted = 0", ids)
+            self._conn.commit()
+            deleted = self._conn.total_changes - before
+            self._live_count -= deleted
+            self._deleted[[doc_id for (doc_id,) in ids if 0 <= doc_id < len(self._deleted)]] = True
+        return deleted
+
+    def discard_from(self, row_count: int) -> int:
+        """Mark every row from ``row_count`` on as deleted, including rows whose metadata never got written.
+
+        Used for rows appended by an update that crashed before it was
+        committed; the IDs are not reused.
+        """
+        with self._lock:
+            doc_ids = range(int(row_count), self.row_count)
+            if not doc_ids:
+                return 0
+            self._conn.executemany("INSERT OR REPLACE INTO documents VALUES (?, NULL, NULL, NULL, 1, '{}')",
+                                   [(doc_id,) for doc_id in doc_ids])
+            self._conn.commit()
+            self._deleted[doc_ids.start:] = True
+            self._live_count = int(self.row_count - self._deleted.sum())
+        return len(doc_ids)
+
+    def filter_mask(self, label: Optional[str] = None,
+                    min_timestamp: Optional[int] = None) -> np.ndarray:
+        """Boolean mask over all rows: live documents matching the label and minimum date."""
+        with self._lock:
+            mask = ~self._deleted
+            if label is not None:
+                code = self._label_ids.get(label)
+                if code is None:
+                    return np.zeros(self.row_count, dtype=bool)
+                mask &= self._label_codes == code
+            if min_timestamp is not None:
+                mask &= self._timestamps >= min_timestamp
+        return mask
+    
+    def labels_of(self, doc_ids: Iterable[int]) -> List[str]:
+        """Distinct labels of the given rows (unlabelled rows are skipped)."""
+        with self._lock:
+            codes = set(self._label_codes[np.asarray(list(doc_ids), dtype=np.int64)].tolist())
+            return [label for label, code in self._label_ids.items() if code in codes]
+    
+    @property
+    def has_deletions(self) -> bool:
+        return self._live_count < self.row_count
+    
+    def email_doc_ids(self, email_id: str) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id FROM documents WHERE email_id = ? AND deleted = 0 ORDER BY doc_id", (email_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def has_email(self, email_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM documents WHERE email_id = ? AND deleted = 0 LIMIT 1", (email_id,)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        return self._live_count
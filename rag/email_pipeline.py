@@ -3,21 +3,35 @@ import re
 import os
 import json
 import pickle
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple, Iterator, Hashable, Union
 from datetime import datetime, timedelta
 from pathlib import Path
 import logging
 from functools import lru_cache
 
+import numpy as np
+
 from .document_source import document_source, notebook_source, Document, EmailDocumentSource
 from .embedder import embedder, HybridEmbedder, SentenceTransformersEmbedder
 from .retriever import retriever, FAISSRetriever
+from .cache import QueryCache, label_tag
+from .semantic_cache import SemanticCache
+from .reranker import CrossEncoderReranker
+from .shared_index import SharedIndex
+from .jobs import JobStore, JOBS_FILE
 from .generator import generator, MultiProviderGenerator
 from .config import config
 from .prompts import prompt_manager
 
+if TYPE_CHECKING:
+    from ingestion_api.models import EmailMetadata
+
 logger = logging.getLogger(__name__)
 
+# Ingestion metadata that overrides what's parsed from the email file
+EMAIL_METADATA_FIELDS = ('subject', 'sender', 'date', 'label', 'has_attachments', 'attachment_count')
+
 class EmailRAGPipeline:
     """Email-centric RAG pipeline with optimizations for 500+ emails."""
     
@@ -32,11 +46,27 @@ class EmailRAGPipeline:
         self._embedder = None
         self._retriever = None
         self._generator = None
+        self._reranker = None
         self._personas = None
+        # Shared mode: this process's role and the thread that keeps it in sync
+        self._shared_index: Optional[SharedIndex] = None
+        self._sync_thread: Optional[threading.Thread] = None
+        self._sync_stop = threading.Event()
+        # Background rebuilds, and the index updates made while one runs
+        self._jobs: Optional[JobStore] = None
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_backlog: Optional[List[Tuple[str, tuple]]] = None
         
         # Cache settings
         self.cache_size = cache_size
-        self._document_cache = {}
+        self._document_cache = QueryCache('answers', max_entries=cache_size,
+                                          ttl_seconds=config.QUERY_CACHE_TTL,
+                                          max_bytes=config.QUERY_CACHE_MAX_MB * 1024 * 1024)
+        # Answers to earlier questions that mean the same, matched by query embedding
+        self._semantic_cache = SemanticCache('semantic-answers', max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES,
+                                             ttl_seconds=config.QUERY_CACHE_TTL,
+                                             max_bytes=config.QUERY_CACHE_MAX_MB * 1024 * 1024) \
+            if config.SEMANTIC_CACHE_ENABLED else None
         self._embedding_cache = {}
         
         # Performance tracking
@@ -44,7 +74,8 @@ class EmailRAGPipeline:
             'documents_loaded': 0,
             'embeddings_generated': 0,
             'queries_processed': 0,
-            'cache_hits': 0
+            'cache_hits': 0,
+            'semantic_cache_hits': 0
         }
     
     @property
@@ -66,13 +97,37 @@ class EmailRAGPipeline:
     def retriever(self) -> FAISSRetriever:
         """Lazy load FAISS retriever."""
         if self._retriever is None:
+            if config.INDEX_MODE == 'shared':
+                self._shared_index = SharedIndex(self.vector_store_dir)
+                self._shared_index.try_become_writer()
             self._retriever = FAISSRetriever(
                 self.vector_store_dir,
                 self.embedder,
-                cache_size=self.cache_size
+                cache_size=self.cache_size,
+                shared=self._shared_index
             )
+            # Answers are invalidated with the search results they were built from
+            self._retriever.attach_cache(self._document_cache)
+            if self._semantic_cache is not None:
+                self._retriever.attach_cache(self._semantic_cache)
+            if self._shared_index is not None:
+                self._start_index_sync()
         return self._retriever
     
+    @property
+    def jobs(self) -> JobStore:
+        if self._jobs is None:
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+            self._jobs = JobStore(self.data_dir / JOBS_FILE)
+        return self._jobs
+    
+    @property
+    def role(self) -> str:
+        """``single``, or ``writer``/``reader`` when several processes share the vector store."""
+        if config.INDEX_MODE == 'shared':
+            self.retriever  # The role is settled when the retriever is created
+        return self._shared_index.role if self._shared_index is not None else 'single'
+    
     @property
     def generator(self) -> MultiProviderGenerator:
         """Lazy load generator."""
@@ -80,6 +135,13 @@ class EmailRAGPipeline:
             self._generator = MultiProviderGenerator()
         return self._generator
     
+    @property
+    def reranker(self) -> Optional[CrossEncoderReranker]:
+        """Lazy load the cross-encoder reranker, if enabled."""
+        if self._reranker is None and config.RERANK_ENABLED:
+            self._reranker = CrossEncoderReranker()
+        return self._reranker
+    
     @property
     def personas(self) -> Dict:
         """Lazy load personas with caching."""
@@ -100,17 +162,18 @@ class EmailRAGPipeline:
                 return f.read()
         return None
     
-    def _batch_load_documents(self, batch_size: int = 50) -> List[Dict]:
-        """Load documents in batches to reduce memory usage."""
+    def _batch_load_documents(self, batch_size: int = 50) -> List[Document]:
+        """Load and chunk documents in batches to reduce memory usage."""
         documents = []
         email_files = list(self.parsed_emails_dir.glob("*.txt"))
         
         for i in range(0, len(email_files), batch_size):
             batch_files = email_files[i:i + batch_size]
             batch_docs = self.document_source.load_email_documents(batch_files)
-            documents.extend(batch_docs)
+            batch_chunks = self.document_source.chunk_documents(batch_docs)
+            documents.extend(batch_chunks)
             
-            logger.info(f"Loaded batch {i//batch_size + 1}: {len(batch_docs)} documents")
+            logger.info(f"Loaded batch {i//batch_size + 1}: {len(batch_docs)} emails, {len(batch_chunks)} chunks")
         
         return documents
     
@@ -118,17 +181,25 @@ class EmailRAGPipeline:
         """Initialize the RAG pipeline with lazy loading and batching."""
         logger.info("🧠 Initializing RAG pipeline with optimizations...")
         
+        if self.role == 'reader':
+            # Readers never build: they map what the writer publishes
+            if force_rebuild:
+                self._forward_to_writer('rebuild', {})
+            elif self.retriever._load_existing_index():
+                self.stats['documents_loaded'] = self.retriever.document_count()
+            return
+        
         # Check if FAISS index exists and is recent
-        faiss_index_path = self.vector_store_dir / "faiss_index.bin"
-        if not force_rebuild and faiss_index_path.exists():
+        faiss_index_path = self.retriever.saved_index_path()
+        if not force_rebuild and faiss_index_path is not None:
             # Check if index is recent (within 24 hours)
             index_age = datetime.now() - datetime.fromtimestamp(faiss_index_path.stat().st_mtime)
             if index_age < timedelta(hours=24):
                 logger.info("✅ Using existing FAISS index (recent)")
                 # Load the existing index instead of just returning
                 if self.retriever._load_existing_index():
-                    logger.info(f"✅ FAISS index loaded successfully with {len(self.retriever.documents)} documents")
-                    self.stats['documents_loaded'] = len(self.retriever.documents)
+                    logger.info(f"✅ FAISS index loaded successfully with {self.retriever.document_count()} documents")
+                    self.stats['documents_loaded'] = self.retriever.document_count()
                     return
                 else:
                     logger.warning("Failed to load existing index, will rebuild")
@@ -141,12 +212,233 @@ class EmailRAGPipeline:
             return
         
         # Build FAISS index with progress tracking
-        logger.info(f"🔧 Building FAISS index for {len(documents)} documents...")
-        self.retriever.build_index(documents, show_progress=True)
+        logger.info(f"🔧 Building FAISS index for {len(documents)} chunks...")
+        self.retriever.build_index(documents, force_rebuild=True, show_progress=True)
         
         # Save stats
         self.stats['documents_loaded'] = len(documents)
-        logger.info(f"✅ FAISS index built successfully with {len(documents)} documents")
+        logger.info(f"✅ FAISS index built successfully with {len(documents)} chunks")
+    
+    @staticmethod
+    def _email_fields(email_metadata: Union['EmailMetadata', Dict[str, Any], None]) -> Optional[Dict[str, Any]]:
+        """Document metadata from the ingestion API's ``EmailMetadata``, or from the dict a reader forwarded."""
+        if email_metadata is None:
+            return None
+        if isinstance(email_metadata, dict):
+            return {key: email_metadata.get(key) for key in EMAIL_METADATA_FIELDS}
+        return {
+            'subject': email_metadata.subject,
+            'sender': str(email_metadata.sender),
+            'date': email_metadata.date.isoformat(),
+            'label': email_metadata.label,
+            'has_attachments': email_metadata.has_attachments,
+            'attachment_count': email_metadata.attachment_count
+        }
+    
+    def _documents_for_email(self, email_id: str, parsed_path: str,
+                             email_metadata: Union['EmailMetadata', Dict[str, Any], None] = None) -> List[Document]:
+        """Load the indexable chunks for one parsed email file."""
+        documents = self.document_source.load_email_documents([parsed_path])
+        fields = self._email_fields(email_metadata)
+        if fields is not None:
+            for doc in documents:
+                doc.metadata.update({'email_id': email_id, **fields})
+        return self.document_source.chunk_documents(documents)
+    
+    def index_email(self, email_id: str, parsed_path: str,
+                    email_metadata: Union['EmailMetadata', Dict[str, Any], None] = None) -> int:
+        """Add a newly ingested email to the live FAISS index without a full rebuild.
+        
+        Raises ``RuntimeError`` if the email has content but none of it could
+        be embedded and indexed.
+        """
+        if self.role == 'reader':
+            self._forward_to_writer('index_email', {
+                'email_id': email_id,
+                'parsed_path': str(parsed_path),
+                'email_metadata': self._email_fields(email_metadata)
+            })
+            return 0
+        if self.retriever.index is None:
+            # Loads the saved index, or builds one that already includes this email
+            self.initialize()
+        if self.retriever.has_email(email_id):
+            return 0
+        
+        self._record_for_rebuild('index_email', (email_id, parsed_path, email_metadata))
+        documents = self._documents_for_email(email_id, parsed_path, email_metadata)
+        added = self.retriever.add_documents(documents)
+        if documents and not added:
+            # Raised so the caller can retry; nothing of the email is in the index
+            raise RuntimeError(f"Could not embed and index email {email_id}")
+        if added:
+            self.stats['documents_loaded'] = self.retriever.document_count()
+            logger.info(f"📨 Indexed email {email_id} ({added} documents)")
+        return added
+    
+    def remove_emails(self, email_ids: List[str]) -> int:
+        """Remove deleted emails from the live FAISS index."""
+        if self.role == 'reader':
+            self._forward_to_writer('remove_emails', {'email_ids': list(email_ids)})
+            return 0
+        if self.retriever.index is None:
+            if self.retriever.saved_index_path() is None or not self.retriever._load_existing_index():
+                return 0
+        self._record_for_rebuild('remove_emails', (list(email_ids),))
+        removed = self.retriever.remove_emails(email_ids)
+        if removed:
+            self.stats['documents_loaded'] = self.retriever.document_count()
+        return removed
+    
+    def refresh_index(self, wait: bool = False) -> Dict[str, Any]:
+        """Rebuild the index from the parsed emails in the background.
+        
+        Returns the rebuild job; if one is already queued or running, that job
+        is returned instead of starting another. Queries keep using the
+        current index until the new one is swapped in at the end. With
+        ``wait`` a new rebuild runs in the calling thread and the finished job
+        is returned (for hosts that only give a process CPU during requests).
+        """
+        job, created = self.jobs.submit('rebuild')
+        if created:
+            if self.role == 'reader':
+                self._forward_to_writer('rebuild', {'job_id': job['id']})
+            elif wait:
+                self.jobs.run(job['id'], self._rebuild)
+                job = self.jobs.get(job['id'])
+            else:
+                self.jobs.run_in_background(job['id'], self._rebuild)
+        return job
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+    
+    def _rebuild(self, progress) -> Dict[str, Any]:
+        """Job body: load and re-embed every parsed email, then swap the new index in."""
+        with self._rebuild_lock:
+            self._rebuild_backlog = []
+        try:
+            progress(stage='loading')
+            documents = self._batch_load_documents()
+            emails = len({doc.metadata.get('email_id') for doc in documents})
+            progress(emails_loaded=emails)
+            if not documents:
+                logger.warning("No documents found to process")
+                return {'emails': 0, 'documents': 0}
+            if not self.retriever.build_index(documents, force_rebuild=True, show_progress=False, progress=progress):
+                raise RuntimeError("Index build failed, the previous index is still live")
+        finally:
+            with self._rebuild_lock:
+                backlog, self._rebuild_backlog = self._rebuild_backlog, None
+        
+        # Updates made while the rebuild ran went into the old index
+        progress(stage='catching_up')
+        for kind, args in backlog:
+            try:
+                if kind == 'index_email':
+                    self.index_email(*args)
+                else:
+                    self.remove_emails(*args)
+            except Exception as e:
+                logger.error(f"❌ Could not replay {kind} after the rebuild: {e}")
+        self.stats['documents_loaded'] = self.retriever.document_count()
+        progress(stage='done')
+        return {
+            'emails': emails,
+            'documents': len(documents),
+            'snapshot': self.retriever.snapshot_version,
+            'replayed_updates': len(backlog)
+        }
+    
+    def _record_for_rebuild(self, kind: str, args: tuple):
+        with self._rebuild_lock:
+            if self._rebuild_backlog is not None:
+                self._rebuild_backlog.append((kind, args))
+    
+    def rollback_index(self, version: Optional[str] = None) -> Optional[str]:
+        """Make an earlier index snapshot live again (default: the one before the current one).
+        
+        Returns the version rolled back to, or None if there was none (or, on
+        a reader, the request was handed to the writer).
+        """
+        if self.role == 'reader':
+            self._forward_to_writer('rollback', {'version': version})
+            return None
+        if self.retriever.index is None and self.retriever.saved_index_path() is not None:
+            self.retriever._load_existing_index()
+        restored = self.retriever.rollback(version)
+        if restored:
+            self.stats['documents_loaded'] = self.retriever.document_count()
+        return restored
+    
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """Index snapshots on disk, oldest first."""
+        return self.retriever.snapshots.describe()
+    
+    def _forward_to_writer(self, kind: str, payload: Dict[str, Any]):
+        """Readers: queue an index update for the writer process."""
+        task_id = self._shared_index.tasks.put(kind, payload)
+        logger.info(f"📮 Queued {kind} for the index writer (task {task_id})")
+    
+    def _start_index_sync(self):
+        self._sync_stop.clear()
+        self._sync_thread = threading.Thread(target=self._run_index_sync, name="rag-index-sync", daemon=True)
+        self._sync_thread.start()
+    
+    def _run_index_sync(self):
+        """Shared mode: the writer applies queued updates; readers follow its
+        generations, and take over as writer if it goes away."""
+        while not self._sync_stop.wait(config.INDEX_TASK_POLL_SECONDS if self.role == 'writer'
+                                       else config.INDEX_RELOAD_CHECK_SECONDS):
+            try:
+                self.sync_index()
+            except Exception as e:
+                logger.error(f"❌ Index sync failed: {e}")
+    
+    def sync_index(self):
+        """One round of the shared mode sync loop."""
+        shared = self._shared_index
+        if shared is None:
+            return
+        if not shared.is_writer and shared.try_become_writer():
+            logger.info("✍️ Index writer went away, taking over")
+            # Reload into memory: mapped indexes can't be updated
+            self.retriever._load_existing_index()
+        if shared.is_writer:
+            self._apply_index_tasks()
+        else:
+            self.retriever.refresh_if_stale()
+    
+    def _apply_index_tasks(self):
+        """Writer: apply index updates queued by readers, oldest first."""
+        tasks = self._shared_index.tasks.peek()
+        for task_id, kind, payload in tasks:
+            try:
+                if kind == 'index_email':
+                    self.index_email(payload['email_id'], payload['parsed_path'], payload.get('email_metadata'))
+                elif kind == 'remove_emails':
+                    self.remove_emails(payload['email_ids'])
+                elif kind == 'rebuild' and payload.get('job_id'):
+                    self.jobs.run_in_background(payload['job_id'], self._rebuild)
+                elif kind == 'rebuild':
+                    self.initialize(force_rebuild=True)
+                elif kind == 'rollback':
+                    self.rollback_index(payload.get('version'))
+                else:
+                    logger.warning(f"⚠️ Unknown index task {kind}, dropped")
+            except Exception as e:
+                logger.error(f"❌ Index task {task_id} ({kind}) failed: {e}")
+            # Applied or failed, it isn't retried: a failing task would block the queue
+            self._shared_index.tasks.done([task_id])
+    
+    def shutdown(self):
+        """Stop the shared mode sync thread and hand the writer role to another process."""
+        self._sync_stop.set()
+        if self._sync_thread is not None:
+            self._sync_thread.join(timeout=5)
+            self._sync_thread = None
+        if self._shared_index is not None:
+            self._shared_index.release_writer()
     
     def query(self, question: str, label: Optional[str] = None, 
               max_age_days: Optional[int] = None, 
@@ -155,28 +447,30 @@ class EmailRAGPipeline:
         start_time = datetime.now()
         
         # Check cache first
-        cache_key = f"{question}:{label}:{max_age_days}"
-        if use_cache and cache_key in self._document_cache:
-            self.stats['cache_hits'] += 1
-            logger.info("🎯 Cache hit - using cached results")
-            return self._document_cache[cache_key]
+        cache_key = (question, label, max_age_days)
+        cache_tags = (label_tag(label),)
+        if use_cache:
+            cached = self._document_cache.get(cache_key)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                logger.info("🎯 Cache hit - using cached results")
+                return cached
         
         # Perform search
         try:
-            # Use Gemini for embeddings if Cohere fails
-            search_results = self.retriever.search(
-                question, 
-                k=5, 
-                label=label,
-                max_age_days=max_age_days,
-                use_gemini_fallback=True
-            )
+            snapshot = self._document_cache.snapshot(cache_tags)
+            persona_context = self._get_persona_context(question)
+            semantic = self._semantic_lookup(question, label, max_age_days, persona_context, use_cache)
+            if semantic.hit is not None:
+                self._document_cache.set(cache_key, semantic.hit, cache_tags, snapshot)
+                return semantic.hit
+            search_results = self._search(question, label, max_age_days, semantic.query_vector)
             
             # Generate response
             generator_result = self.generator.generate_response(
                 question, 
                 search_results, 
-                self._get_persona_context(question)
+                persona_context
             )
             
             # Handle new response format (dict with provider info)
@@ -203,12 +497,8 @@ class EmailRAGPipeline:
             
             # Cache result
             if use_cache:
-                self._document_cache[cache_key] = result
-                # Limit cache size
-                if len(self._document_cache) > self.cache_size:
-                    # Remove oldest entries
-                    oldest_key = next(iter(self._document_cache))
-                    del self._document_cache[oldest_key]
+                self._document_cache.set(cache_key, result, cache_tags, snapshot)
+                semantic.store(question, result)
             
             self.stats['queries_processed'] += 1
             return result
@@ -223,6 +513,117 @@ class EmailRAGPipeline:
                 'error': str(e)
             }
     
+    def query_stream(self, question: str, label: Optional[str] = None,
+                     max_age_days: Optional[int] = None,
+                     use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+        """Query the RAG pipeline, yielding events as soon as they are available.
+        
+        Yields a ``sources`` event with the retrieved context first, then
+        ``token`` events as the answer is generated, then a ``done`` event
+        carrying the same fields as ``query``.
+        """
+        start_time = time.time()
+        cache_key = (question, label, max_age_days)
+        cache_tags = (label_tag(label),)
+        if use_cache:
+            cached = self._document_cache.get(cache_key)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                logger.info("🎯 Cache hit - using cached results")
+                yield {'type': 'sources', 'context': cached['context'], 'metadata': cached['metadata']}
+                yield {'type': 'token', 'text': cached['answer']}
+                yield {'type': 'done', **cached, 'cached': True}
+                return
+        
+        try:
+            snapshot = self._document_cache.snapshot(cache_tags)
+            persona_context = self._get_persona_context(question)
+            semantic = self._semantic_lookup(question, label, max_age_days, persona_context, use_cache)
+            if semantic.hit is not None:
+                cached = semantic.hit
+                self._document_cache.set(cache_key, cached, cache_tags, snapshot)
+                yield {'type': 'sources', 'context': cached['context'], 'metadata': cached['metadata']}
+                yield {'type': 'token', 'text': cached['answer']}
+                yield {'type': 'done', **cached, 'cached': True}
+                return
+            search_results = self._search(question, label, max_age_days, semantic.query_vector)
+            metadata = self._extract_metadata(search_results)
+            yield {'type': 'sources', 'context': search_results, 'metadata': metadata}
+            
+            first_token_time = None
+            for event in self.generator.stream_response(question, search_results, persona_context):
+                if event['type'] == 'token':
+                    if first_token_time is None:
+                        first_token_time = time.time() - start_time
+                    yield event
+                    continue
+                
+                result = {
+                    'answer': event['response'],
+                    'context': search_results,
+                    'metadata': metadata,
+                    'processing_time': time.time() - start_time,
+                    'time_to_first_token': first_token_time,
+                    'stats': self.stats.copy(),
+                    'provider': event['provider'],
+                    'model': event['model']
+                }
+                if use_cache:
+                    self._document_cache.set(cache_key, result, cache_tags, snapshot)
+                    semantic.store(question, result)
+                self.stats['queries_processed'] += 1
+                yield {'type': 'done', **result}
+        
+        except Exception as e:
+            logger.error(f"Error in streaming RAG query: {e}")
+            yield {'type': 'error', 'error': str(e),
+                   'processing_time': time.time() - start_time}
+    
+    def _search(self, question: str, label: Optional[str] = None,
+                max_age_days: Optional[int] = None,
+                query_vector: Optional[np.ndarray] = None) -> List[Dict]:
+        """Retrieve the context documents for a question.
+        
+        With reranking, more candidates are retrieved and the cross-encoder
+        keeps the best ``RERANK_TOP_K``, so fewer chunks go into the prompt.
+        """
+        reranker = self.reranker
+        rerank = reranker is not None and reranker.is_available()
+        # Use Gemini for embeddings if Cohere fails
+        results = self.retriever.search(
+            question, 
+            k=config.RERANK_CANDIDATES if rerank else 5, 
+            label=label,
+            max_age_days=max_age_days,
+            use_gemini_fallback=True,
+            max_chunks_per_email=config.MAX_CHUNKS_PER_EMAIL,
+            query_vector=query_vector
+        )
+        if rerank:
+            results = reranker.rerank(question, results, config.RERANK_TOP_K)
+        return results
+    
+    def _semantic_lookup(self, question: str, label: Optional[str], max_age_days: Optional[int],
+                         persona_context: Optional[str], use_cache: bool = True) -> '_SemanticLookup':
+        """Look for a cached answer to a question with the same meaning and filters.
+        
+        The query embedding is kept so the search doesn't compute it again.
+        """
+        lookup = _SemanticLookup(self._semantic_cache if use_cache else None,
+                                 (label, max_age_days, persona_context))
+        if lookup.cache is None:
+            return lookup
+        lookup.snapshot = lookup.cache.snapshot()
+        lookup.query_vector = self.retriever.embed_query(question)
+        found = lookup.cache.get(lookup.query_vector, lookup.scope)
+        if found is not None:
+            (original_question, result), similarity = found
+            self.stats['semantic_cache_hits'] += 1
+            logger.info(f"🎯 Semantic cache hit ({similarity:.3f}) - reusing answer to: {original_question!r}")
+            lookup.hit = {**result, 'semantic_match': {'question': original_question,
+                                                       'similarity': round(similarity, 4)}}
+        return lookup
+    
     def _get_persona_context(self, question: str) -> Optional[str]:
         """Extract persona context from question."""
         # Simple persona detection
@@ -256,7 +657,14 @@ class EmailRAGPipeline:
         """Get performance statistics."""
         return {
             **self.stats,
+            'role': self.role,
+            'index_generation': self._retriever.loaded_generation if self._retriever is not None else None,
+            'index_snapshot': self._retriever.snapshot_version if self._retriever is not None else None,
             'cache_size': len(self._document_cache),
+            'answer_cache': self._document_cache.get_stats(),
+            'semantic_cache': self._semantic_cache.get_stats() if self._semantic_cache is not None else None,
+            'llm_router': self._generator.get_stats() if self._generator is not None else None,
+            'reranker': self._reranker.get_stats() if self._reranker is not None else None,
             'embedding_cache_size': len(self._embedding_cache),
             'memory_usage_mb': self._get_memory_usage()
         }
@@ -270,6 +678,8 @@ class EmailRAGPipeline:
     def clear_cache(self):
         """Clear all caches."""
         self._document_cache.clear()
+        if self._semantic_cache is not None:
+            self._semantic_cache.clear()
         self._embedding_cache.clear()
         self._get_email_content.cache_clear()
         logger.info("🧹 All caches cleared")
@@ -277,13 +687,22 @@ class EmailRAGPipeline:
     def search_only(self, question: str, label: Optional[str] = None, 
                    max_age_days: Optional[int] = None) -> List[Dict]:
         """Search only without generating response."""
-        return self.retriever.search(
-            question, 
-            k=5, 
-            label=label,
-            max_age_days=max_age_days,
-            use_gemini_fallback=True
-        )
+        return self._search(question, label, max_age_days)
+
+class _SemanticLookup:
+    """Outcome of a semantic cache lookup, and how to cache the answer on a miss."""
+    
+    def __init__(self, cache: Optional[SemanticCache], scope: Hashable):
+        self.cache = cache
+        self.scope = scope
+        self.snapshot = None
+        self.query_vector: Optional[np.ndarray] = None
+        self.hit: Optional[Dict[str, Any]] = None
+    
+    def store(self, question: str, result: Dict[str, Any]):
+        if self.cache is not None and self.query_vector is not None and result.get('context'):
+            sources = {doc.get('metadata', {}).get('email_id') for doc in result['context']} - {None}
+            self.cache.set(self.query_vector, (question, result), self.scope, sources, self.snapshot)
 
 # Global pipeline instance
 pipeline = EmailRAGPipeline()
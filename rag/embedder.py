@@ -1,7 +1,7 @@
 import os
 import logging
-from typing import List, Dict, Optional, Any
-from functools import lru_cache
+from typing import List, Dict, Optional, Any, Callable, Tuple, Sequence
+from pathlib import Path
 import time
 import numpy as np
 from sentence_transformers import SentenceTransformer
@@ -9,9 +9,38 @@ import cohere  # Uncommented since we have API key
 import google.generativeai as genai
 import google.ai.generativelanguage as glm
 from .config import config
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+from .async_embedder import AsyncEmbeddingEngine, create_engine
 
 logger = logging.getLogger(__name__)
 
+def provider_batch_size(provider: str) -> int:
+    """Maximum number of texts to send to ``provider`` in one request."""
+    return config.EMBEDDING_PROVIDER_BATCH_SIZES.get(provider, config.EMBEDDING_BATCH_SIZE)
+
+def embed_in_batches(texts: Sequence[str], embed_batch: Callable[[List[str]], Any],
+                     batch_size: int) -> np.ndarray:
+    """Embed ``texts`` with one ``embed_batch`` call per ``batch_size`` slice.
+    
+    Each call may return a list of vectors or an array. Results are written into one
+    preallocated, C-contiguous float32 matrix of shape (len(texts), dimension).
+    Raises ValueError if a batch comes back with the wrong number of vectors.
+    """
+    texts = list(texts)
+    batch_size = max(1, batch_size)
+    embeddings = None
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        vectors = np.asarray(embed_batch(batch), dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings, got shape {vectors.shape}")
+        if embeddings is None:
+            embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+        embeddings[start:start + len(batch)] = vectors
+    if embeddings is None:
+        return np.zeros((0, 0), dtype=np.float32)
+    return embeddings
+
 class SentenceTransformersEmbedder:
     """Sentence Transformers embedding integration for free, local embeddings."""
     
@@ -33,48 +62,25 @@ class SentenceTransformersEmbedder:
         """Check if Sentence Transformers model is available."""
         return self.model is not None
     
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings for a list of texts."""
         if not self.is_available():
             print("Warning: Sentence Transformers model not available. Returning empty embeddings.")
-            return [[0.0] * self.dimension] * len(texts)
+            return np.zeros((len(texts), self.dimension), dtype=np.float32)
         
         try:
-            # Generate embeddings
-            embeddings = self.model.encode(texts, convert_to_tensor=False)
-            
-            # Convert to list of lists
-            if len(embeddings.shape) == 1:
-                embeddings = [embeddings.tolist()]
-            else:
-                embeddings = embeddings.tolist()
-            
-            return embeddings
+            batch_size = provider_batch_size('sentence_transformers')
+            return embed_in_batches(texts, lambda batch: self.model.encode(
+                batch, batch_size=batch_size, convert_to_numpy=True), batch_size)
             
         except Exception as e:
             print(f"Error generating Sentence Transformers embeddings: {e}")
             # Return zero embeddings as fallback
-            return [[0.0] * self.dimension] * len(texts)
+            return np.zeros((len(texts), self.dimension), dtype=np.float32)
     
-    def embed_query(self, query: str) -> List[float]:
+    def embed_query(self, query: str) -> np.ndarray:
         """Generate embedding for a single query."""
-        if not self.is_available():
-            print("Warning: Sentence Transformers model not available. Returning zero embedding.")
-            return [0.0] * self.dimension
-        
-        try:
-            # Generate embedding
-            embedding = self.model.encode([query], convert_to_tensor=False)
-            
-            # Convert to list
-            if len(embedding.shape) == 1:
-                return embedding.tolist()
-            else:
-                return embedding[0].tolist()
-            
-        except Exception as e:
-            print(f"Error generating query embedding: {e}")
-            return [0.0] * self.dimension
+        return self.embed_texts([query])[0]
     
     def get_embedding_dimension(self) -> int:
         """Get the dimension of embeddings."""
@@ -101,7 +107,7 @@ class SentenceTransformersEmbedder:
                 'model': self.model_name,
                 'dimension': self.dimension,
                 'test_embedding_length': len(embedding),
-                'test_embedding_sample': embedding[:5] if embedding else []
+                'test_embedding_sample': embedding[:5].tolist()
             }
             
         except Exception as e:
@@ -118,6 +124,7 @@ class GeminiEmbedder:
     def __init__(self):
         self.client = None
         self.model = "models/embedding-001"  # Gemini's embedding model
+        self.dimension = 768
         
         if config.GEMINI_API_KEY:
             try:
@@ -136,46 +143,32 @@ class GeminiEmbedder:
         """Check if Gemini client is available."""
         return self.client is not None
     
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings for a list of texts using Gemini."""
         if not self.is_available():
             print("Warning: Gemini client not available.")
-            return []
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        
+        def embed(batch: List[str]) -> List[List[float]]:
+            # One batch request per slice instead of one request per text
+            request = glm.BatchEmbedTextRequest(
+                model=self.model,
+                texts=batch
+            )
+            response = self.client.batch_embed_text(request)
+            return [embedding.value for embedding in response.embeddings]
         
         try:
-            embeddings = []
-            for text in texts:
-                # Use Gemini's embedding model with correct API
-                request = glm.EmbedTextRequest(
-                    model=self.model,
-                    text=text
-                )
-                response = self.client.embed_text(request)
-                embeddings.append(response.embedding.values)
-            
-            return embeddings
+            return embed_in_batches(texts, embed, provider_batch_size('gemini'))
             
         except Exception as e:
             print(f"Error generating Gemini embeddings: {e}")
-            return []
+            return np.zeros((0, self.dimension), dtype=np.float32)
     
-    def embed_query(self, query: str) -> List[float]:
+    def embed_query(self, query: str) -> np.ndarray:
         """Generate embedding for a single query using Gemini."""
-        if not self.is_available():
-            print("Warning: Gemini client not available.")
-            return []
-        
-        try:
-            request = glm.EmbedTextRequest(
-                model=self.model,
-                text=query
-            )
-            response = self.client.embed_text(request)
-            return response.embedding.values
-            
-        except Exception as e:
-            print(f"Error generating Gemini query embedding: {e}")
-            return []
+        embeddings = self.embed_texts([query])
+        return embeddings[0] if len(embeddings) else np.zeros(0, dtype=np.float32)
 
 class CohereEmbedder:
     """Cohere embedding integration for email documents."""
@@ -199,41 +192,33 @@ class CohereEmbedder:
         """Check if Cohere client is available."""
         return self.client is not None
     
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings for a list of texts."""
         if not self.is_available():
             print("Warning: Cohere client not available. Returning empty embeddings.")
-            return [[0.0] * self.dimension] * len(texts)
+            return np.zeros((len(texts), self.dimension), dtype=np.float32)
+        
+        def embed(batch: List[str]) -> List[List[float]]:
+            # Use the correct method signature for Cohere v4.37
+            response = self.client.embed(
+                texts=batch,
+                input_type="search_document"
+            )
+            return response.embeddings
         
         try:
-            # Batch process texts
-            batch_size = 100  # Cohere's recommended batch size
-            all_embeddings = []
-            
-            for i in range(0, len(texts), batch_size):
-                batch = texts[i:i + batch_size]
-                
-                # Use the correct method signature for Cohere v4.37
-                response = self.client.embed(
-                    texts=batch,
-                    input_type="search_document"
-                )
-                
-                batch_embeddings = response.embeddings
-                all_embeddings.extend(batch_embeddings)
-            
-            return all_embeddings
+            return embed_in_batches(texts, embed, provider_batch_size('cohere'))
             
         except Exception as e:
             print(f"Error generating embeddings: {e}")
             # Return zero embeddings as fallback
-            return [[0.0] * self.dimension] * len(texts)
+            return np.zeros((len(texts), self.dimension), dtype=np.float32)
     
-    def embed_query(self, query: str) -> List[float]:
+    def embed_query(self, query: str) -> np.ndarray:
         """Generate embedding for a single query."""
         if not self.is_available():
             print("Warning: Cohere client not available. Returning zero embedding.")
-            return [0.0] * self.dimension
+            return np.zeros(self.dimension, dtype=np.float32)
         
         try:
             # Use the correct method signature for Cohere v4.37
@@ -242,11 +227,11 @@ class CohereEmbedder:
                 input_type="search_query"
             )
             
-            return response.embeddings[0]
+            return np.asarray(response.embeddings[0], dtype=np.float32)
             
         except Exception as e:
             print(f"Error generating query embedding: {e}")
-            return [0.0] * self.dimension
+            return np.zeros(self.dimension, dtype=np.float32)
     
     def get_embedding_dimension(self) -> int:
         """Get the dimension of embeddings."""
@@ -273,7 +258,7 @@ class CohereEmbedder:
                 'model': self.model,
                 'dimension': self.dimension,
                 'test_embedding_length': len(embedding),
-                'test_embedding_sample': embedding[:5] if embedding else []
+                'test_embedding_sample': embedding[:5].tolist()
             }
             
         except Exception as e:
@@ -292,7 +277,7 @@ class NomicEmbedder:
         self.model = "nomic-embed-text-v1.5"
         self.dimension = 768
         self.api_key = os.getenv('ATLAS_KEY')
-        self.base_url = "https://atlas.nomic.ai/api/v1"
+        self.base_url = config.NOMIC_BASE_URL
         
         # Auto-detect inference mode
         self.inference_mode = os.getenv('NOMIC_INFERENCE_MODE')
@@ -310,82 +295,78 @@ class NomicEmbedder:
             return self.api_key is not None
         return True  # Local mode always available if nomic is installed
     
-    def embed_texts(self, texts: list) -> list:
+    def embed_texts(self, texts: list) -> np.ndarray:
+        """Embed texts in provider-sized batches; returns an empty array on failure."""
         if self.inference_mode == 'remote':
-            return self._embed_texts_remote(texts)
+            if not self.api_key:
+                print("Error: ATLAS_KEY not set for remote mode")
+                return np.zeros((0, self.dimension), dtype=np.float32)
+            embed_batch = self._embed_texts_remote
         else:
-            return self._embed_texts_local(texts)
+            embed_batch = self._embed_texts_local
+        
+        try:
+            return embed_in_batches(texts, embed_batch, provider_batch_size('nomic'))
+        except Exception as e:
+            print(f"Error generating Nomic embeddings: {e}")
+            return np.zeros((0, self.dimension), dtype=np.float32)
     
-    def embed_query(self, query: str) -> list:
+    def embed_query(self, query: str) -> np.ndarray:
         embeddings = self.embed_texts([query])
-        return embeddings[0] if embeddings else []
+        return embeddings[0] if len(embeddings) else np.zeros(0, dtype=np.float32)
     
     def _embed_texts_remote(self, texts: list) -> list:
         """Use direct HTTP API with API key authentication."""
-        if not self.api_key:
-            print("Error: ATLAS_KEY not set for remote mode")
-            return []
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
         
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "texts": texts,
-                "model": self.model,
-                "task_type": "search_document",
-                "dimensionality": self.dimension
-            }
-            
-            response = self.requests.post(
-                f"{self.base_url}/embed/text",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('embeddings', [])
-            else:
-                print(f"Error generating Nomic embeddings: {response.status_code} - {response.text}")
-                return []
-                
-        except Exception as e:
-            print(f"Error generating Nomic embeddings: {e}")
-            return []
+        payload = {
+            "texts": texts,
+            "model": self.model,
+            "task_type": "search_document",
+            "dimensionality": self.dimension
+        }
+        
+        response = self.requests.post(
+            f"{self.base_url}/embed/text",
+            headers=headers,
+            json=payload,
+            timeout=30
+        )
+        
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+        return response.json().get('embeddings', [])
     
     def _embed_texts_local(self, texts: list) -> list:
         """Use local Nomic client."""
-        try:
-            output = self.embed.text(
-                texts=texts,
-                model=self.model,
-                task_type='search_document',
-                inference_mode='local',
-                dimensionality=self.dimension
-            )
-            return output['embeddings']
-        except Exception as e:
-            print(f"Error generating Nomic local embeddings: {e}")
-            return []
+        output = self.embed.text(
+            texts=texts,
+            model=self.model,
+            task_type='search_document',
+            inference_mode='local',
+            dimensionality=self.dimension
+        )
+        return output['embeddings']
 
 class HybridEmbedder:
     """Hybrid embedder with Nomic (local/remote) primary, OpenAI fallback, then Sentence Transformers."""
     def __init__(self, primary_provider: str = "nomic", fallback_provider: str = "openai", 
-                 cache_size: int = 1000, dimension: int = 768):
+                 cache_size: int = None, dimension: int = 768, cache_dir: Optional[Path] = None):
         self.primary_provider = primary_provider
         self.fallback_provider = fallback_provider
         self.dimension = dimension
-        self.cache_size = cache_size
+        self.cache_size = cache_size or config.EMBEDDING_CACHE_MAX_ENTRIES
+        self.cache_dir = cache_dir
         # Initialize embedders
         self.nomic_embedder = NomicEmbedder()
         self.openai_client = None
         self.sentence_transformers_client = None
         self.cohere_client = None
         self.gemini_client = None
+        self.async_engines: Dict[str, AsyncEmbeddingEngine] = {}
         self.stats = {
             'nomic_embeddings': 0,
             'openai_embeddings': 0,
@@ -394,6 +375,7 @@ class HybridEmbedder:
             'gemini_embeddings': 0,
             'fallback_used': 0,
             'cache_hits': 0,
+            'cache_misses': 0,
             'total_requests': 0
         }
         self._initialize_clients()
@@ -433,72 +415,130 @@ class HybridEmbedder:
                 logger.info("✅ Gemini client initialized (legacy)")
         except Exception as e:
             logger.error(f"❌ Failed to initialize Gemini client: {e}")
-    @lru_cache(maxsize=1000)
-    def _get_cached_embedding(self, text: str, provider: str) -> Optional[List[float]]:
-        return None
-    def _cache_embedding(self, text: str, embedding: List[float], provider: str):
-        pass
-    def embed_texts(self, texts: List[str], use_cache: bool = True) -> List[List[float]]:
+        # Async engines for the HTTP providers: concurrent batches within provider quotas
+        if config.ASYNC_EMBEDDING_ENABLED:
+            if self.nomic_embedder.inference_mode == 'remote' and self.nomic_embedder.api_key:
+                self.async_engines['nomic'] = create_engine('nomic', self.nomic_embedder.api_key,
+                                                            self.nomic_embedder.model)
+            if self.openai_client:
+                self.async_engines['openai'] = create_engine('openai', os.getenv('OPENAI_API_KEY'),
+                                                             "text-embedding-3-small")
+            if self.async_engines:
+                logger.info(f"✅ Async embedding enabled for: {', '.join(self.async_engines)}")
+    def _provider_model(self, provider: str) -> Tuple[str, int]:
+        """Model name and output dimension for a provider, used to namespace the cache."""
+        if provider == 'nomic':
+            return self.nomic_embedder.model, self.nomic_embedder.dimension
+        if provider == 'openai':
+            return "text-embedding-3-small", 1536
+        if provider == 'sentence_transformers' and self.sentence_transformers_client:
+            return 'all-MiniLM-L6-v2', self.sentence_transformers_client.get_sentence_embedding_dimension()
+        return provider, 0
+    def _get_cache(self, provider: str) -> Optional[EmbeddingCache]:
+        model, dimension = self._provider_model(provider)
+        return get_embedding_cache(provider, model, dimension,
+                                   cache_dir=self.cache_dir, max_entries=self.cache_size)
+    def _get_cached_embedding(self, text: str, provider: str) -> Optional[np.ndarray]:
+        cache = self._get_cache(provider)
+        if cache is None:
+            return None
+        return cache.get(text)
+    def _cache_embedding(self, text: str, embedding: np.ndarray, provider: str):
+        cache = self._get_cache(provider)
+        if cache is not None:
+            cache.put(text, embedding)
+    def _embed_with_cache(self, provider: str, texts: List[str], use_cache: bool,
+                          embed_fn: Callable[[List[str]], np.ndarray]) -> Optional[np.ndarray]:
+        """Serve texts from the on-disk cache and only call the provider for misses."""
+        cache = self._get_cache(provider) if use_cache else None
+        if cache is None:
+            embeddings = embed_fn(texts)
+            return embeddings if len(embeddings) == len(texts) else None
+        cached, hits = cache.get_many(texts)
+        missing = np.flatnonzero(~hits)
+        self.stats['cache_hits'] += len(texts) - len(missing)
+        self.stats['cache_misses'] += len(missing)
+        if len(missing):
+            fresh = embed_fn([texts[i] for i in missing])
+            if len(fresh) != len(missing):
+                return None
+            if fresh.shape[1] != cache.dimension:
+                # Provider returned an unexpected shape; don't mix it into cached rows
+                return fresh if len(missing) == len(texts) else None
+            cache.put_many([texts[i] for i in missing], fresh)
+            cached[missing] = fresh
+        return cached
+    def embed_texts(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
+        """Embed texts as one (len(texts), dimension) float32 array."""
         if not texts:
-            return []
+            return np.zeros((0, self.dimension), dtype=np.float32)
         self.stats['total_requests'] += 1
         # Try Nomic first
         embeddings = self._embed_with_nomic(texts, use_cache)
-        if embeddings:
+        if embeddings is not None:
             self.stats['nomic_embeddings'] += len(texts)
             return embeddings
         # Fallback to OpenAI
         embeddings = self._embed_with_openai(texts, use_cache)
-        if embeddings:
+        if embeddings is not None:
             self.stats['openai_embeddings'] += len(texts)
             self.stats['fallback_used'] += 1
             return embeddings
         # Fallback to Sentence Transformers
         embeddings = self._embed_with_sentence_transformers(texts, use_cache)
-        if embeddings:
+        if embeddings is not None:
             self.stats['sentence_transformers_embeddings'] += len(texts)
             self.stats['fallback_used'] += 1
             return embeddings
         logger.warning("⚠️ All embedding providers failed, returning zero embeddings")
-        return [[0.0] * self.dimension] * len(texts)
-    def _embed_with_nomic(self, texts: List[str], use_cache: bool) -> Optional[List[List[float]]]:
+        return np.zeros((len(texts), self.dimension), dtype=np.float32)
+    def _embed_with_nomic(self, texts: List[str], use_cache: bool) -> Optional[np.ndarray]:
+        engine = self.async_engines.get('nomic')
         try:
-            return self.nomic_embedder.embed_texts(texts)
+            return self._embed_with_cache('nomic', texts, use_cache,
+                                          engine.embed_sync if engine else self.nomic_embedder.embed_texts)
         except Exception as e:
             logger.error(f"❌ Nomic embedding error: {e}")
             return None
-    def _embed_with_openai(self, texts: List[str], use_cache: bool) -> Optional[List[List[float]]]:
+    def _embed_with_openai(self, texts: List[str], use_cache: bool) -> Optional[np.ndarray]:
         if not self.openai_client:
             return None
+        def embed(batch: List[str]) -> List[List[float]]:
+            response = self.openai_client.embeddings.create(
+                model="text-embedding-3-small",
+                input=batch
+            )
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        engine = self.async_engines.get('openai')
         try:
-            all_embeddings = []
-            for text in texts:
-                response = self.openai_client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=text
-                )
-                embedding_values = response.data[0].embedding
-                all_embeddings.append(embedding_values)
-            return all_embeddings
+            return self._embed_with_cache('openai', texts, use_cache, engine.embed_sync if engine else
+                                          lambda batch: embed_in_batches(batch, embed, provider_batch_size('openai')))
         except Exception as e:
             logger.error(f"❌ OpenAI embedding error: {e}")
             return None
-    def _embed_with_sentence_transformers(self, texts: List[str], use_cache: bool) -> Optional[List[List[float]]]:
+    def _embed_with_sentence_transformers(self, texts: List[str], use_cache: bool) -> Optional[np.ndarray]:
         if not self.sentence_transformers_client:
             return None
+        batch_size = provider_batch_size('sentence_transformers')
+        def embed(batch: List[str]) -> np.ndarray:
+            return self.sentence_transformers_client.encode(batch, batch_size=batch_size, convert_to_numpy=True)
         try:
-            all_embeddings = []
-            for text in texts:
-                embedding = self.sentence_transformers_client.encode([text], convert_to_tensor=False)
-                embedding_values = embedding[0].tolist()
-                all_embeddings.append(embedding_values)
-            return all_embeddings
+            return self._embed_with_cache('sentence_transformers', texts, use_cache,
+                                          lambda batch: embed_in_batches(batch, embed, batch_size))
         except Exception as e:
             logger.error(f"❌ Sentence Transformers embedding error: {e}")
             return None
-    def embed_single_text(self, text: str, use_cache: bool = True) -> List[float]:
-        embeddings = self.embed_texts([text], use_cache)
-        return embeddings[0] if embeddings else [0.0] * self.dimension
+    def embed_single_text(self, text: str, use_cache: bool = True) -> np.ndarray:
+        return self.embed_texts([text], use_cache)[0]
+    def get_stats(self) -> Dict[str, Any]:
+        """Embedding provider and cache statistics."""
+        cache_stats = {}
+        for provider in ('nomic', 'openai', 'sentence_transformers'):
+            cache = self._get_cache(provider)
+            if cache is not None and len(cache):
+                cache_stats[provider] = cache.get_stats()
+        async_stats = {provider: dict(engine.stats) for provider, engine in self.async_engines.items()}
+        return {**self.stats, 'cache': cache_stats, 'async': async_stats}
 
 # Legacy embedder for backward compatibility
 class CohereEmbedder:
@@ -507,7 +547,7 @@ class CohereEmbedder:
     def __init__(self):
         self.hybrid_embedder = HybridEmbedder(primary_provider="cohere", fallback_provider="gemini")
     
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
         return self.hybrid_embedder.embed_texts(texts)
     
     def test_connection(self) -> Dict[str, Any]:
@@ -540,40 +580,27 @@ class OpenAIEmbedder:
         """Check if OpenAI client is available."""
         return self.client is not None
     
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings for a list of texts using OpenAI."""
         if not self.is_available():
             print("Warning: OpenAI client not available.")
-            return []
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        
+        def embed(batch: List[str]) -> List[List[float]]:
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=batch
+            )
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
         
         try:
-            embeddings = []
-            for text in texts:
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=text
-                )
-                embeddings.append(response.data[0].embedding)
-            
-            return embeddings
+            return embed_in_batches(texts, embed, provider_batch_size('openai'))
             
         except Exception as e:
             print(f"Error generating OpenAI embeddings: {e}")
-            return []
+            return np.zeros((0, self.dimension), dtype=np.float32)
     
-    def embed_query(self, query: str) -> List[float]:
+    def embed_query(self, query: str) -> np.ndarray:
         """Generate embedding for a single query using OpenAI."""
-        if not self.is_available():
-            print("Warning: OpenAI client not available.")
-            return []
-        
-        try:
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=query
-            )
-            return response.data[0].embedding
-            
-        except Exception as e:
-            print(f"Error generating OpenAI query embedding: {e}")
-            return [] 
\ No newline at end of file
+        embeddings = self.embed_texts([query])
+        return embeddings[0] if len(embeddings) else np.zeros(0, dtype=np.float32)
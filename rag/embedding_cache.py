@@ -0,0 +1,225 @@
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 16
+
+
+def text_digest(text: str) -> bytes:
+    """Content hash used as the cache key for a piece of text."""
+    return hashlib.blake2b(text.encode('utf-8', errors='replace'), digest_size=KEY_BYTES).digest()
+
+
+class EmbeddingCache:
+    """Persistent, content-addressed embedding cache backed by memory-mapped files.
+
+    One cache namespace exists per (provider, model, dimension). Inside a namespace
+    entries are keyed by a hash of the text, so a rebuild only pays for chunks
+    whose text is new or has changed. On-disk layout:
+
+        vectors.f32  capacity x dimension float32 matrix
+        keys.bin     capacity x 16 byte text digests
+        ticks.i64    last-access clock per slot (0 = empty), used for LRU eviction
+        meta.json    provider, model, dimension and capacity
+
+    The cache is safe to share between threads of one process. Use
+    ``get_embedding_cache`` so every embedder in the process shares one instance
+    per namespace.
+    """
+
+    def __init__(self, cache_dir: Path, provider: str, model: str, dimension: int,
+                 max_entries: int = 50000):
+        self.provider = provider
+        self.model = model
+        self.dimension = int(dimension)
+        self.capacity = int(max_entries)
+        self.cache_dir = Path(cache_dir) / self.namespace(provider, model, dimension)
+        self._lock = threading.Lock()
+        self._slots: Dict[bytes, int] = {}
+        self._free: List[int] = []
+        self._clock = 0
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._open()
+
+    @staticmethod
+    def namespace(provider: str, model: str, dimension: int) -> str:
+        safe_model = ''.join(c if c.isalnum() or c in '-.' else '_' for c in model)
+        return f"{provider}-{safe_model}-{int(dimension)}"
+
+    def _open(self):
+        """Open (or create) the memory-mapped files for this namespace."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        meta_path = self.cache_dir / "meta.json"
+        meta = {}
+        if meta_path.exists():
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+            except Exception as e:
+                logger.warning(f"⚠️ Unreadable embedding cache metadata, resetting cache: {e}")
+
+        compatible = (
+            meta.get('dimension') == self.dimension
+            and meta.get('capacity') == self.capacity
+            and all((self.cache_dir / name).exists() for name in ("vectors.f32", "keys.bin", "ticks.i64"))
+        )
+        mode = 'r+' if compatible else 'w+'
+        if meta and not compatible:
+            logger.info(f"🔄 Embedding cache layout changed for {self.cache_dir.name}, starting empty")
+
+        self._vectors = np.memmap(self.cache_dir / "vectors.f32", dtype=np.float32, mode=mode,
+                                  shape=(self.capacity, self.dimension))
+        self._keys = np.memmap(self.cache_dir / "keys.bin", dtype=np.uint8, mode=mode,
+                               shape=(self.capacity, KEY_BYTES))
+        self._ticks = np.memmap(self.cache_dir / "ticks.i64", dtype=np.int64, mode=mode,
+                                shape=(self.capacity,))
+
+        if not compatible:
+            with open(meta_path, 'w') as f:
+                json.dump({
+                    'provider': self.provider,
+                    'model': self.model,
+                    'dimension': self.dimension,
+                    'capacity': self.capacity
+                }, f)
+
+        occupied = np.flatnonzero(self._ticks)
+        key_bytes = self._keys.tobytes() if len(occupied) else b''
+        self._slots = {key_bytes[i * KEY_BYTES:(i + 1) * KEY_BYTES]: int(i) for i in occupied}
+        self._free = np.flatnonzero(self._ticks == 0)[::-1].tolist()
+        self._clock = int(self._ticks.max()) if len(occupied) else 0
+        logger.info(f"✅ Embedding cache {self.cache_dir.name} opened with {len(self._slots)} entries")
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def get_many(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Look up texts. Returns (vectors, hit_mask); rows for misses are zero."""
+        result = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        hits = np.zeros(len(texts), dtype=bool)
+        with self._lock:
+            for i, text in enumerate(texts):
+                slot = self._slots.get(text_digest(text))
+                if slot is None:
+                    continue
+                self._clock += 1
+                self._ticks[slot] = self._clock
+                result[i] = self._vectors[slot]
+                hits[i] = True
+            hit_count = int(hits.sum())
+            self.stats['hits'] += hit_count
+            self.stats['misses'] += len(texts) - hit_count
+        return result, hits
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        vectors, hits = self.get_many([text])
+        return vectors[0] if hits[0] else None
+
+    def put_many(self, texts: Sequence[str], vectors) -> int:
+        """Store embeddings for texts, evicting least recently used entries when full."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(texts) or vectors.shape[1] != self.dimension:
+            logger.warning(f"⚠️ Not caching embeddings with shape {vectors.shape} "
+                           f"(expected ({len(texts)}, {self.dimension}))")
+            return 0
+
+        with self._lock:
+            pending: Dict[bytes, int] = {}
+            for i, text in enumerate(texts):
+                pending[text_digest(text)] = i
+            new_keys = [key for key in pending if key not in self._slots]
+            self._reserve(min(len(new_keys), self.capacity))
+
+            written = 0
+            for key, row in list(pending.items())[-self.capacity:]:
+                slot = self._slots.get(key)
+                if slot is None:
+                    if not self._free:
+                        break
+                    slot = self._free.pop()
+                    self._slots[key] = slot
+                    self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._vectors[slot] = vectors[row]
+                self._clock += 1
+                self._ticks[slot] = self._clock
+                written += 1
+
+            self.stats['writes'] += written
+            self._flush()
+        return written
+
+    def put(self, text: str, vector) -> None:
+        self.put_many([text], np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+    def _reserve(self, count: int):
+        """Make sure at least ``count`` free slots exist by evicting LRU entries."""
+        shortfall = count - len(self._free)
+        if shortfall <= 0:
+            return
+        occupied = np.flatnonzero(self._ticks)
+        ticks = np.asarray(self._ticks[occupied])
+        victims = occupied[np.argpartition(ticks, shortfall - 1)[:shortfall]]
+        victim_keys = set(self._keys[victims].tobytes()[i * KEY_BYTES:(i + 1) * KEY_BYTES]
+                          for i in range(len(victims)))
+        for key in victim_keys:
+            self._slots.pop(key, None)
+        self._ticks[victims] = 0
+        self._free.extend(int(slot) for slot in victims)
+        self.stats['evictions'] += len(victims)
+
+    def _flush(self):
+        self._vectors.flush()
+        self._keys.flush()
+        self._ticks.flush()
+
+    def clear(self):
+        """Drop every entry in this namespace."""
+        with self._lock:
+            self._ticks[:] = 0
+            self._slots.clear()
+            self._free = list(range(self.capacity - 1, -1, -1))
+            self._clock = 0
+            self._flush()
+        logger.info(f"🧹 Embedding cache {self.cache_dir.name} cleared")
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            'entries': len(self._slots),
+            'capacity': self.capacity,
+            'dimension': self.dimension
+        }
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(provider: str, model: str, dimension: int,
+                        cache_dir: Optional[Path] = None,
+                        max_entries: Optional[int] = None) -> Optional[EmbeddingCache]:
+    """Return the shared cache for a namespace, or None if caching is disabled/unavailable."""
+    if not config.EMBEDDING_CACHE_ENABLED or not dimension:
+        return None
+    cache_dir = Path(cache_dir or config.EMBEDDING_CACHE_DIR)
+    max_entries = int(max_entries or config.EMBEDDING_CACHE_MAX_ENTRIES)
+    key = str(cache_dir / EmbeddingCache.namespace(provider, model, dimension))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            try:
+                cache = EmbeddingCache(cache_dir, provider, model, dimension, max_entries)
+            except Exception as e:
+                logger.error(f"❌ Could not open embedding cache {key}: {e}")
+                return None
+            _caches[key] = cache
+        return cache
@@ -2,8 +2,22 @@
 import cohere  # Uncommented since we have API key
 import groq
 import google.generativeai as genai
-from typing import List, Dict, Any, Optional
+from functools import partial
+from typing import List, Dict, Any, Optional, Iterator, Callable
 from .config import config
+from .provider_router import Prompt, ProviderRouter, Route
+from .context_packer import ContextPacker
+
+GEMINI_MODEL = "gemini-2.0-flash"
+COHERE_MODEL = "command"
+
+# Groq models in order of preference
+GROQ_MODELS = [
+    "gemma2-9b-it",  # Primary: Gemma2 9B
+    "meta-llama/llama-4-scout-17b-16e-instruct",  # Llama 4 Scout
+    "llama-3.3-70b-versatile",  # Llama 3.3 70B
+    "llama3-8b-8192"  # Fallback
+]
 
 class MultiProviderGenerator:
     """Generate responses using multiple LLM providers with fallback chain."""
@@ -42,7 +56,7 @@ class MultiProviderGenerator:
         try:
             if config.GEMINI_API_KEY:
                 genai.configure(api_key=config.GEMINI_API_KEY)
-                self.gemini_client = genai.GenerativeModel('gemini-2.0-flash')
+                self.gemini_client = genai.GenerativeModel(GEMINI_MODEL)
                 print(f"✅ Gemini client initialized")
             else:
                 print("⚠️ GEMINI_API_KEY not set")
@@ -53,6 +67,9 @@ class MultiProviderGenerator:
         self.groq_models = [
             "gemma2-9b-it"  # Only using Gemma model
         ]
+        
+        self.router = ProviderRouter(self._build_routes())
+        self.packer = ContextPacker()
     
     def is_available(self) -> bool:
         """Check if any LLM provider is available."""
@@ -107,46 +124,50 @@ class MultiProviderGenerator:
         if max_tokens is None:
             max_tokens = min(config.MAX_TOKENS, config.GROQ_MAX_TOKENS)
         
-        try:
-            # Check prompt length and truncate if needed
-            estimated_tokens = len(prompt.split()) * 1.3  # Rough estimation
-            if estimated_tokens > config.GROQ_MAX_TOKENS:
-                print(f"⚠️ Groq prompt too long ({estimated_tokens:.0f} tokens), truncating...")
-                # Truncate prompt to fit within limits
-                words = prompt.split()
-                max_words = int(config.GROQ_MAX_TOKENS / 1.3)
-                prompt = " ".join(words[:max_words])
-            
-            # Try different Groq models in order of preference
-            models = [
-                "gemma2-9b-it",  # Primary: Gemma2 9B
-                "meta-llama/llama-4-scout-17b-16e-instruct",  # Llama 4 Scout
-                "llama-3.3-70b-versatile",  # Llama 3.3 70B
-                "llama3-8b-8192"  # Fallback
-            ]
-            
-            for model in models:
-                try:
-                    response = self.groq_client.chat.completions.create(
-                        messages=[{"role": "user", "content": prompt}],
-                        model=model,
-                        max_tokens=max_tokens,
-                        temperature=temperature,
-                        top_p=1,
-                        stream=False
-                    )
-                    self.current_provider = f"groq-{model}"
-                    return response.choices[0].message.content.strip()
-                except Exception as model_error:
-                    print(f"Groq model {model} failed: {model_error}")
-                    continue
-            
-            print("All Groq models failed")
-            return None
-            
-        except Exception as e:
-            print(f"Groq generation failed: {e}")
-            return None
+        # Try different Groq models in order of preference
+        for model in GROQ_MODELS:
+            try:
+                response = self._complete_groq(model, self.packer.fit_prompt(prompt, model, max_tokens),
+                                               max_tokens, temperature)
+                self.current_provider = f"groq-{model}"
+                return response
+            except Exception as model_error:
+                print(f"Groq model {model} failed: {model_error}")
+                continue
+        
+        print("All Groq models failed")
+        return None
+    
+    def _complete_groq(self, model: str, prompt: str, max_tokens: int, temperature: float,
+                       timeout: float = None) -> str:
+        """One Groq completion of a prompt already sized for ``model``; raises on failure."""
+        response = self.groq_client.chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=1,
+            stream=False,
+            timeout=timeout or config.LLM_TIMEOUT_SECONDS
+        )
+        return response.choices[0].message.content.strip()
+    
+    def _stream_groq(self, model: str, prompt: str, max_tokens: int, temperature: float,
+                     timeout: float = None) -> Iterator[str]:
+        """Stream one Groq completion of a prompt already sized for ``model``; raises on failure."""
+        stream = self.groq_client.chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=1,
+            stream=True,
+            timeout=timeout or config.LLM_TIMEOUT_SECONDS
+        )
+        for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                yield text
     
     def _try_gemini(self, prompt: str, max_tokens: int = None, temperature: float = 0.7) -> Optional[str]:
         """Try to generate response using Gemini."""
@@ -158,19 +179,76 @@ class MultiProviderGenerator:
             max_tokens = min(config.MAX_TOKENS, config.GEMINI_MAX_TOKENS)
         
         try:
-            response = self.gemini_client.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    max_output_tokens=max_tokens,
-                    temperature=temperature
-                )
-            )
+            response = self._complete_gemini(self.packer.fit_prompt(prompt, GEMINI_MODEL, max_tokens),
+                                             max_tokens, temperature)
             self.current_provider = "gemini"
-            return response.text.strip()
+            return response
         except Exception as e:
             print(f"Gemini generation failed: {e}")
             return None
     
+    def _complete_gemini(self, prompt: str, max_tokens: int, temperature: float,
+                         timeout: float = None) -> str:
+        """One Gemini completion of a prompt already sized for it; raises on failure."""
+        response = self.gemini_client.generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                max_output_tokens=max_tokens,
+                temperature=temperature
+            ),
+            request_options={"timeout": timeout or config.LLM_TIMEOUT_SECONDS}
+        )
+        return response.text.strip()
+    
+    def _stream_gemini(self, prompt: str, max_tokens: int, temperature: float,
+                       timeout: float = None) -> Iterator[str]:
+        """Stream one Gemini completion of a prompt already sized for it; raises on failure."""
+        response = self.gemini_client.generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                max_output_tokens=max_tokens,
+                temperature=temperature
+            ),
+            request_options={"timeout": timeout or config.LLM_TIMEOUT_SECONDS},
+            stream=True
+        )
+        for chunk in response:
+            # Chunks without text (e.g. safety metadata only) raise on .text
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
+    
+    def _build_routes(self) -> List[Route]:
+        """Routes for the provider router, in fallback order: Groq models, then Gemini."""
+        routes = []
+        if self.groq_client:
+            for model in GROQ_MODELS:
+                routes.append(Route(f"groq-{model}", "groq", model,
+                                    complete=partial(self._complete_groq, model),
+                                    stream=partial(self._stream_groq, model)))
+        if self.gemini_client:
+            routes.append(Route("gemini", "gemini", GEMINI_MODEL,
+                                complete=self._complete_gemini, stream=self._stream_gemini))
+        return routes
+    
+    def _generate(self, prompt: Prompt, max_tokens: int, temperature: float) -> Optional[Dict[str, Any]]:
+        """Generate with the provider router; None if every provider failed or timed out.
+        
+        A plain string prompt is fitted to each route's model before it is sent.
+        """
+        if isinstance(prompt, str):
+            text = prompt
+            prompt = lambda route: self.packer.fit_prompt(text, route.model, max_tokens)
+        routed = self.router.call(prompt, max_tokens, temperature)
+        if routed is None:
+            return None
+        route, response = routed
+        self.current_provider = route.name
+        return {"response": response, "provider": route.provider, "model": route.model}
+    
     def generate_response(self, query: str, context_docs: List[Dict[str, Any]], sender: str = None) -> Dict[str, Any]:
         """Generate response using fallback chain: Groq → Gemini → Cohere."""
         if not self.is_available():
@@ -182,74 +260,25 @@ class MultiProviderGenerator:
             }
         
         try:
-            # Import prompt manager here to avoid circular imports
-            from .prompts import prompt_manager
-            
-            # Get persona context if sender is provided
-            persona_context = ""
-            if sender:
-                try:
-                    from ingestion_api.persona_extractor import persona_extractor
-                    persona_context = persona_extractor.get_persona_context(sender)
-                except Exception as e:
-                    print(f"Error getting persona context: {e}")
-            
-            # Build context with proper source attribution
-            context_parts = []
-            for i, doc_info in enumerate(context_docs, 1):
-                metadata = doc_info.get('metadata', {})
-                content = doc_info.get('content', '')
-                
-                # Handle different metadata structures safely
-                sender_name = metadata.get('sender', 'Unknown')
-                subject = metadata.get('subject', 'No Subject')
-                
-                context_parts.append(f"Source {i}: Email from {sender_name} - {subject}")
-                context_parts.append(f"Content: {content}")
-                context_parts.append("---")
-            
-            context_text = "\n".join(context_parts)
-            
-            # Use centralized prompt management
-            prompt = prompt_manager.get_rag_query_prompt(
-                question=query,
-                context_docs=context_docs,
-                persona_context=persona_context
-            )
+            prompt = self._build_rag_prompt(query, context_docs, sender)
             
-            # Try providers in new fallback order: Groq → Gemini → Cohere
-            response = None
+            # Groq models, then Gemini, through the router (timeouts, circuit
+            # breakers, and a hedged request to Gemini if Groq is slow)
             provider_info = "unknown"
-            
-            # Try Groq first (primary)
-            response = self._try_groq(prompt, config.MAX_TOKENS, config.TEMPERATURE)
-            if response:
-                print(f"✅ Generated response using Groq")
-                return {
-                    "response": response,
-                    "provider": "groq",
-                    "model": self.current_provider.replace("groq-", "")
-                }
-            
-            # Try Gemini second
-            response = self._try_gemini(prompt, config.MAX_TOKENS, config.TEMPERATURE)
-            if response:
-                print(f"✅ Generated response using Gemini")
-                return {
-                    "response": response,
-                    "provider": "gemini",
-                    "model": "gemini-2.0-flash"
-                }
+            result = self._generate(lambda route: prompt(route.model), config.MAX_TOKENS, config.TEMPERATURE)
+            if result:
+                print(f"✅ Generated response using {result['provider'].capitalize()}")
+                return result
             
             # Try Cohere third (last resort)
-            response = self._try_cohere(prompt, config.MAX_TOKENS, config.TEMPERATURE)
+            response = self._try_cohere(prompt(COHERE_MODEL), config.MAX_TOKENS, config.TEMPERATURE)
             if response:
                 print(f"✅ Generated response using Cohere")
                 provider_info = "cohere"
                 return {
                     "response": response,
                     "provider": provider_info,
-                    "model": "command"
+                    "model": COHERE_MODEL
                 }
             
             # If all providers fail, use fallback
@@ -270,6 +299,70 @@ class MultiProviderGenerator:
                 "model": "none"
             }
     
+    def stream_response(self, query: str, context_docs: List[Dict[str, Any]],
+                        sender: str = None) -> Iterator[Dict[str, Any]]:
+        """Stream a response as it is generated, using the same fallback chain as ``generate_response``.
+        
+        Yields ``{"type": "token", "text": ...}`` events followed by one
+        ``{"type": "done", "response": ..., "provider": ..., "model": ...}``.
+        """
+        parts = []
+        provider, model = "fallback", "none"
+        try:
+            if self.is_available():
+                prompt = self._build_rag_prompt(query, context_docs, sender)
+                # Fall back to the next route only while nothing has been sent;
+                # text already streamed can't be retracted
+                for route in self.router.available_routes():
+                    for text in self.router.stream(route, prompt(route.model), config.MAX_TOKENS,
+                                                   config.TEMPERATURE):
+                        parts.append(text)
+                        yield {"type": "token", "text": text}
+                    if parts:
+                        print(f"✅ Streamed response using {route.name}")
+                        self.current_provider = route.name
+                        provider, model = route.provider, route.model
+                        break
+                else:
+                    provider = "fallback"
+                    print("❌ All LLM providers failed, using fallback response")
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+            if not parts:
+                provider = "error"
+        
+        if not parts:
+            text = self._fallback_response(query, context_docs)
+            parts.append(text)
+            yield {"type": "token", "text": text}
+        yield {"type": "done", "response": "".join(parts).strip(), "provider": provider, "model": model}
+    
+    def _build_rag_prompt(self, query: str, context_docs: List[Dict[str, Any]],
+                          sender: str = None) -> Callable[[str], str]:
+        """Build the RAG prompt, with persona context if a sender is provided.
+        
+        Returns a function giving the prompt for a model: chunks are packed into
+        its context window with its tokenizer (once per model), so the
+        lowest-ranked chunks are the ones left out.
+        """
+        persona_context = ""
+        if sender:
+            try:
+                from ingestion_api.persona_extractor import persona_extractor
+                persona_context = persona_extractor.get_persona_context(sender)
+            except Exception as e:
+                print(f"Error getting persona context: {e}")
+        
+        prompts = {}
+        
+        def prompt_for(model: str) -> str:
+            if model not in prompts:
+                prompts[model] = self.packer.pack(query, context_docs, persona_context,
+                                                  model, config.MAX_TOKENS).prompt
+            return prompts[model]
+        
+        return prompt_for
+    
     def _fallback_response(self, query: str, context_docs: List[Dict[str, Any]]) -> str:
         """Fallback response when all LLM providers are unavailable."""
         try:
@@ -299,13 +392,9 @@ class MultiProviderGenerator:
             if response:
                 return response
             
-            response = self._try_groq(prompt, 200, 0.3)
-            if response:
-                return response
-            
-            response = self._try_gemini(prompt, 200, 0.3)
-            if response:
-                return response
+            result = self._generate(prompt, 200, 0.3)
+            if result:
+                return result["response"]
             
             return f"Summary unavailable. Email from {sender}: {subject}"
             
@@ -329,14 +418,9 @@ class MultiProviderGenerator:
                 topics = [topic.strip() for topic in response.split(',') if topic.strip()]
                 return topics
             
-            response = self._try_groq(prompt, 100, 0.1)
-            if response:
-                topics = [topic.strip() for topic in response.split(',') if topic.strip()]
-                return topics
-            
-            response = self._try_gemini(prompt, 100, 0.1)
-            if response:
-                topics = [topic.strip() for topic in response.split(',') if topic.strip()]
+            result = self._generate(prompt, 100, 0.1)
+            if result:
+                topics = [topic.strip() for topic in result["response"].split(',') if topic.strip()]
                 return topics
             
             return []
@@ -360,13 +444,9 @@ class MultiProviderGenerator:
             if response:
                 return self._parse_sentiment(response)
             
-            response = self._try_groq(prompt, 150, 0.1)
-            if response:
-                return self._parse_sentiment(response)
-            
-            response = self._try_gemini(prompt, 150, 0.1)
-            if response:
-                return self._parse_sentiment(response)
+            result = self._generate(prompt, 150, 0.1)
+            if result:
+                return self._parse_sentiment(result["response"])
             
             return {'sentiment': 'unknown', 'explanation': 'Analysis failed'}
             
@@ -394,6 +474,10 @@ class MultiProviderGenerator:
             'explanation': explanation
         }
     
+    def get_stats(self) -> Dict[str, Any]:
+        """Provider health and routing statistics."""
+        return self.router.get_stats()
+    
     def get_current_provider(self) -> str:
         """Get the current provider being used."""
         return self.current_provider or "none"
@@ -0,0 +1,175 @@
+import json
+import math
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import faiss
+import numpy as np
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+INDEX_PARAMS_FILE = "index_params.json"
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'hnsw', 'ivf_pq', 'opq_ivf_pq')
+
+# Index types whose vectors can be removed by ID; the others rely on the
+# document store's tombstones until the next rebuild
+REMOVABLE_INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'opq_ivf_pq')
+
+# Training points per centroid FAISS wants for a stable k-means
+MIN_POINTS_PER_CENTROID = 39
+
+
+def _nlist_for(num_vectors: int) -> int:
+    """Rule of thumb: ~4*sqrt(n) inverted lists, with enough points to train each."""
+    nlist = int(4 * math.sqrt(max(num_vectors, 1)))
+    return max(1, min(nlist, num_vectors // MIN_POINTS_PER_CENTROID, 65536))
+
+
+def _pq_m_for(dimension: int, bytes_per_vector: Optional[int] = None) -> int:
+    """Number of PQ sub-quantizers: a divisor of the dimension, ~8 dims per code byte by default."""
+    target = max(1, bytes_per_vector if bytes_per_vector else dimension // 8)
+    divisors = [m for m in range(1, dimension + 1) if dimension % m == 0 and m <= target]
+    return divisors[-1]
+
+
+def estimate_memory_mb(params: Dict[str, Any], num_vectors: int, dimension: int) -> float:
+    """Approximate resident size of an index built with ``params``."""
+    index_type = params['index_type']
+    ids = 8 * num_vectors
+    if index_type == 'flat':
+        size = 4 * dimension * num_vectors + ids
+    elif index_type == 'ivf_flat':
+        size = 4 * dimension * (num_vectors + params['nlist']) + ids
+    elif index_type == 'hnsw':
+        # Vectors plus ~2*M neighbour links per vector on the base layer
+        size = (4 * dimension + 8 * params['hnsw_m']) * num_vectors + ids
+    else:
+        codes = params['pq_m'] * params['pq_nbits'] / 8
+        size = codes * num_vectors + 4 * dimension * params['nlist'] + ids
+        if index_type == 'opq_ivf_pq':
+            size += 4 * dimension * dimension
+    return size / (1024 * 1024)
+
+
+def select_index_params(num_vectors: int, dimension: int, index_type: Optional[str] = None,
+                        memory_budget_mb: Optional[float] = None) -> Dict[str, Any]:
+    """Pick an index type and its parameters for a corpus.
+
+    ``index_type`` (default ``config.INDEX_TYPE``) may force a type; ``"auto"``
+    uses exact search for small corpora, IVF-Flat while the raw vectors fit the
+    memory budget, and OPQ+IVF-PQ compression once they don't.
+    """
+    index_type = (index_type or config.INDEX_TYPE).lower()
+    memory_budget_mb = memory_budget_mb or config.INDEX_MEMORY_BUDGET_MB
+    if index_type not in INDEX_TYPES + ('auto',):
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES + ('auto',)}")
+
+    nlist = _nlist_for(num_vectors)
+    params: Dict[str, Any] = {
+        'nlist': nlist,
+        'nprobe': min(nlist, config.IVF_NPROBE or max(8, nlist // 16)),
+        'hnsw_m': config.HNSW_M,
+        'ef_construction': config.HNSW_EF_CONSTRUCTION,
+        'ef_search': config.HNSW_EF_SEARCH,
+        'pq_m': _pq_m_for(dimension, config.PQ_M or None),
+        # 8-bit codes need ~10k training points; smaller corpora get coarser codes
+        'pq_nbits': max(4, min(8, int(math.log2(max(num_vectors // MIN_POINTS_PER_CENTROID, 16))))),
+    }
+
+    if index_type == 'auto':
+        if num_vectors <= config.FLAT_MAX_VECTORS:
+            index_type = 'flat'
+        elif estimate_memory_mb({**params, 'index_type': 'ivf_flat'}, num_vectors, dimension) <= memory_budget_mb:
+            index_type = 'ivf_flat'
+        else:
+            index_type = 'opq_ivf_pq'
+            # Halve the code size until the compressed index fits as well
+            while (params['pq_m'] > 1 and
+                   estimate_memory_mb({**params, 'index_type': index_type}, num_vectors, dimension) > memory_budget_mb):
+                params['pq_m'] = _pq_m_for(dimension, params['pq_m'] // 2)
+
+    params['index_type'] = index_type
+    params['supports_remove'] = index_type in REMOVABLE_INDEX_TYPES
+    params['num_vectors'] = num_vectors
+    params['dimension'] = dimension
+    params['estimated_memory_mb'] = round(estimate_memory_mb(params, num_vectors, dimension), 2)
+    return params
+
+
+def create_index(params: Dict[str, Any]) -> faiss.Index:
+    """Create an empty (possibly untrained) inner-product index that accepts external IDs."""
+    index_type = params['index_type']
+    dimension = params['dimension']
+    metric = faiss.METRIC_INNER_PRODUCT
+    if index_type == 'flat':
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+    if index_type == 'hnsw':
+        hnsw = faiss.IndexHNSWFlat(dimension, params['hnsw_m'], metric)
+        hnsw.hnsw.efConstruction = params['ef_construction']
+        return faiss.IndexIDMap2(hnsw)
+    # IVF variants store external IDs in their inverted lists natively
+    if index_type == 'ivf_flat':
+        description = f"IVF{params['nlist']},Flat"
+    elif index_type == 'ivf_pq':
+        description = f"IVF{params['nlist']},PQ{params['pq_m']}x{params['pq_nbits']}"
+    else:
+        description = f"OPQ{params['pq_m']},IVF{params['nlist']},PQ{params['pq_m']}x{params['pq_nbits']}"
+    index = faiss.index_factory(dimension, description, metric)
+    if index_type == 'opq_ivf_pq':
+        # FAISS defaults (50 iterations over 64k points) take tens of minutes at 768 dims
+        opq = faiss.downcast_VectorTransform(index.chain.at(0))
+        opq.niter = config.OPQ_TRAIN_ITERATIONS
+        opq.max_train_points = config.OPQ_MAX_TRAIN_POINTS
+    return index
+
+
+def train_index(index: faiss.Index, vectors: np.ndarray, params: Dict[str, Any]):
+    """Train on (a sample of) the vectors if the index type needs training."""
+    if index.is_trained:
+        return
+    max_train = params['nlist'] * config.INDEX_TRAIN_POINTS_PER_LIST
+    if len(vectors) > max_train:
+        sample = np.random.default_rng(0).choice(len(vectors), max_train, replace=False)
+        vectors = vectors[np.sort(sample)]
+    logger.info(f"Training {params['index_type']} index on {len(vectors)} vectors...")
+    index.train(vectors)
+
+
+def apply_search_params(index: faiss.Index, params: Dict[str, Any]):
+    """Set query-time knobs (nprobe / efSearch), which are not stored in the index file."""
+    parameter_space = faiss.ParameterSpace()
+    if params['index_type'] == 'hnsw':
+        parameter_space.set_index_parameter(index, 'efSearch', int(params['ef_search']))
+    elif params['index_type'] != 'flat':
+        parameter_space.set_index_parameter(index, 'nprobe', int(params['nprobe']))
+
+
+def describe_index(index: faiss.Index) -> Dict[str, Any]:
+    """Reconstruct parameters for an index saved before parameters were recorded."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        params = select_index_params(index.ntotal, index.d, index_type='ivf_flat')
+        params.update({'nlist': ivf.nlist, 'nprobe': min(ivf.nlist, params['nprobe'])})
+        return params
+    return select_index_params(index.ntotal, index.d, index_type='flat')
+
+
+def save_index_params(vector_store_dir: Path, params: Dict[str, Any]):
+    with open(Path(vector_store_dir) / INDEX_PARAMS_FILE, 'w') as f:
+        json.dump(params, f, indent=2)
+
+
+def load_index_params(vector_store_dir: Path) -> Optional[Dict[str, Any]]:
+    params_path = Path(vector_store_dir) / INDEX_PARAMS_FILE
+    if not params_path.exists():
+        return None
+    try:
+        with open(params_path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read {params_path}: {e}")
+        return None
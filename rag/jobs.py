@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+JOBS_FILE = "jobs.db"
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+
+
+class JobStore:
+    """Background jobs (index rebuilds) and their progress, in a SQLite table.
+
+    The table lives in the data directory, so with several workers any of
+    them can report on a job another one runs. At most one job of a kind is
+    queued or running at a time: submitting another returns the active one.
+    A running job whose process died, or that hasn't reported progress for
+    ``JOB_STALE_SECONDS``, is marked failed the next time it's looked at; so
+    is a job still queued after that long, whose runner never picked it up.
+    """
+
+    def __init__(self, path: Path, keep: Optional[int] = None):
+        self.path = Path(path)
+        self.keep = config.JOBS_KEEP if keep is None else keep
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    pid INTEGER,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    updated_at REAL NOT NULL,
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind_status ON jobs (kind, status)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit; submit() takes its own write lock with BEGIN IMMEDIATE
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, kind: str) -> Tuple[Dict[str, Any], bool]:
+        """Queue a job of ``kind``, unless one is already active.
+
+        Returns the job and whether it was created (False: the active job was
+        returned instead).
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire_stale(conn, kind)
+                active = conn.execute(
+                    "SELECT * FROM jobs WHERE kind = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                    (kind, *ACTIVE_STATUSES)).fetchone()
+                if active is not None:
+                    conn.execute("COMMIT")
+                    return self._to_job(active), False
+                now = time.time()
+                job_id = uuid.uuid4().hex
+                conn.execute("INSERT INTO jobs (id, kind, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                             (job_id, kind, now, now))
+                # Forget the oldest finished jobs
+                conn.execute("""
+                    DELETE FROM jobs WHERE status NOT IN (?, ?) AND id NOT IN (
+                        SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?)
+                """, (*ACTIVE_STATUSES, self.keep))
+                job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        logger.info(f"🗂️ Queued {kind} job {job_id}")
+        return self._to_job(job), True
+
+    def _expire_stale(self, conn: sqlite3.Connection, kind: Optional[str] = None):
+        query = "SELECT id, status, pid, updated_at FROM jobs WHERE status IN (?, ?)"
+        rows = conn.execute(query + " AND kind = ?", (*ACTIVE_STATUSES, kind)).fetchall() if kind else \
+            conn.execute(query, ACTIVE_STATUSES).fetchall()
+        now = time.time()
+        for row in rows:
+            if row['status'] == 'running' and row['pid'] is not None and not _pid_alive(row['pid']):
+                reason = f"worker process {row['pid']} exited"
+            elif now - row['updated_at'] > config.JOB_STALE_SECONDS:
+                reason = (f"no progress for {config.JOB_STALE_SECONDS:.0f}s" if row['status'] == 'running'
+                          else f"not started within {config.JOB_STALE_SECONDS:.0f}s")
+            else:
+                continue
+            logger.warning(f"⚠️ Job {row['id']} abandoned: {reason}")
+            conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                         (f"Abandoned: {reason}", now, now, row['id']))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            self._expire_stale(conn)
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_job(row) if row is not None else None
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """The newest jobs, newest first."""
+        conn = self._connect()
+        try:
+            self._expire_stale(conn)
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        finally:
+            conn.close()
+        return [self._to_job(row) for row in rows]
+
+    def start(self, job_id: str) -> bool:
+        """Mark a queued job as running in this process (False if it isn't queued any more)."""
+        now = time.time()
+        return self._update("UPDATE jobs SET status = 'running', pid = ?, started_at = ?, updated_at = ? "
+                            "WHERE id = ? AND status = 'queued'", (os.getpid(), now, now, job_id))
+
+    def update_progress(self, job_id: str, **counts):
+        """Merge ``counts`` into the job's progress (also its heartbeat)."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None:
+                progress = {**json.loads(row['progress']), **counts}
+                conn.execute("UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                             (json.dumps(progress, default=str), time.time(), job_id))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def finish(self, job_id: str, result: Optional[Dict[str, Any]] = None):
+        now = time.time()
+        self._update("UPDATE jobs SET status = 'succeeded', result = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                     (json.dumps(result or {}, default=str), now, now, job_id))
+
+    def fail(self, job_id: str, error: str):
+        now = time.time()
+        self._update("UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                     (error, now, now, job_id))
+
+    def _update(self, query: str, params: tuple) -> bool:
+        conn = self._connect()
+        try:
+            return conn.execute(query, params).rowcount > 0
+        finally:
+            conn.close()
+
+    def run(self, job_id: str, func: Callable[[Callable[..., None]], Optional[Dict[str, Any]]]):
+        """Run a queued job in this thread: ``func(progress)`` returns the job's result.
+
+        ``progress(**counts)`` records progress; an exception fails the job.
+        """
+        if not self.start(job_id):
+            logger.warning(f"⚠️ Job {job_id} isn't queued any more, not running it")
+            return
+        start = time.time()
+        try:
+            result = func(lambda **counts: self.update_progress(job_id, **counts))
+        except Exception as e:
+            logger.error(f"❌ Job {job_id} failed: {e}")
+            self.fail(job_id, str(e))
+            return
+        self.finish(job_id, result)
+        logger.info(f"✅ Job {job_id} finished in {time.time() - start:.1f}s")
+
+    def run_in_background(self, job_id: str, func: Callable[[Callable[..., None]], Optional[Dict[str, Any]]]) -> threading.Thread:
+        thread = threading.Thread(target=self.run, args=(job_id, func), name=f"job-{job_id[:8]}", daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'created_at': _iso(row['created_at']),
+            'started_at': _iso(row['started_at']),
+            'finished_at': _iso(row['finished_at']),
+            'updated_at': _iso(row['updated_at']),
+            'progress': json.loads(row['progress']),
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error']
+        }
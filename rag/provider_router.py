@@ -0,0 +1,283 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Skip a provider (or model) after repeated failures, then probe it again.
+
+    ``closed``: calls go through. After ``failure_threshold`` consecutive
+    failures the breaker is ``open`` and calls are skipped for
+    ``reset_timeout`` seconds; then it is ``half_open`` and lets a single trial
+    call through, which closes it again on success or re-opens it on failure.
+    Recent successful latencies are kept to derive hedging deadlines.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0, latency_window: int = 100):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.latencies = deque(maxlen=latency_window)
+        self.failures = 0
+        self.total_failures = 0
+        self.total_successes = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the trial call when half open)."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def available(self) -> bool:
+        """Like ``allow`` but without claiming anything."""
+        state = self.state
+        return state == 'closed' or (state == 'half_open' and not self._trial_in_flight)
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.failures = 0
+            self.total_successes += 1
+            self._opened_at = None
+            self._trial_in_flight = False
+            self.latencies.append(latency)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.total_failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def latency_percentile(self, percentile: float, min_samples: int = 5) -> Optional[float]:
+        latencies = list(self.latencies)
+        if len(latencies) < min_samples:
+            return None
+        return float(np.percentile(latencies, percentile))
+
+    def get_stats(self) -> Dict[str, Any]:
+        p95 = self.latency_percentile(95)
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'successes': self.total_successes,
+            'failures': self.total_failures,
+            'p95_seconds': round(p95, 3) if p95 is not None else None,
+        }
+
+
+@dataclass
+class Route:
+    """One provider/model the router can send a prompt to.
+
+    ``complete(prompt, max_tokens, temperature, timeout)`` returns the full
+    text; ``stream(...)`` (optional) yields text fragments. Both should pass
+    ``timeout`` on to the client so abandoned calls end by themselves.
+    """
+    name: str
+    provider: str
+    model: str
+    complete: Callable[[str, int, float, float], Optional[str]]
+    stream: Optional[Callable[[str, int, float, float], Iterator[str]]] = None
+    timeout: Optional[float] = None
+
+
+# A prompt, or a function building the prompt for a route (e.g. sized to its model)
+Prompt = Union[str, Callable[[Route], str]]
+
+
+class ProviderRouter:
+    """Route prompts across LLM providers with timeouts, circuit breakers and hedging.
+
+    Routes are tried in order, skipping those whose breaker is open. Each
+    attempt is bounded by its timeout and the whole call by ``total_timeout``.
+    With hedging, if the current attempt hasn't answered by its provider's
+    p95 latency, the next route of a *different* provider is started as well
+    and the first good answer wins. The losing call is cancelled if it hasn't
+    started yet, otherwise abandoned (its client timeout ends it).
+    """
+
+    def __init__(self, routes: List[Route], timeout: Optional[float] = None,
+                 total_timeout: Optional[float] = None, hedge: Optional[bool] = None,
+                 hedge_delay: Optional[float] = None, failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None):
+        self.routes = routes
+        self.timeout = timeout or config.LLM_TIMEOUT_SECONDS
+        self.total_timeout = total_timeout or config.LLM_TOTAL_TIMEOUT_SECONDS
+        self.hedge = config.LLM_HEDGE_ENABLED if hedge is None else hedge
+        self.default_hedge_delay = config.LLM_HEDGE_DELAY_SECONDS if hedge_delay is None else hedge_delay
+        failure_threshold = failure_threshold or config.LLM_CIRCUIT_FAILURE_THRESHOLD
+        reset_timeout = reset_timeout or config.LLM_CIRCUIT_RESET_SECONDS
+        self.breakers = {route.name: CircuitBreaker(failure_threshold, reset_timeout) for route in routes}
+        # Each concurrent query runs at most a primary and a hedged attempt
+        self._executor = ThreadPoolExecutor(max_workers=2 * config.MAX_CONCURRENT_REQUESTS,
+                                            thread_name_prefix="llm-router")
+        self.stats = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'timeouts': 0, 'skipped': 0, 'exhausted': 0}
+
+    def available_routes(self) -> List[Route]:
+        """Routes whose breaker currently lets calls through, in preference order."""
+        routes = [route for route in self.routes if self.breakers[route.name].available()]
+        self.stats['skipped'] += len(self.routes) - len(routes)
+        return routes
+
+    def hedge_delay(self, route: Route) -> float:
+        """How long to wait for ``route`` before hedging: its recent p95 latency."""
+        p95 = self.breakers[route.name].latency_percentile(95)
+        delay = self.default_hedge_delay if p95 is None else p95
+        return min(delay, self._timeout_for(route))
+
+    def call(self, prompt: Prompt, max_tokens: int, temperature: float) -> Optional[Tuple[Route, str]]:
+        """Return ``(route, text)`` from the first route that answers, or None if all failed.
+        
+        ``prompt`` may be a function of the route, for prompts sized per model.
+        """
+        self.stats['calls'] += 1
+        queue = self.available_routes()
+        # Each attempt's start time, set once a worker picks it up, so time
+        # spent queued for a thread doesn't count against its timeout
+        pending: Dict[Future, Tuple[Route, List[float]]] = {}
+        deadline = time.monotonic() + self.total_timeout
+        hedged_from: Optional[Route] = None
+
+        def launch(route: Route):
+            started: List[float] = []
+            future = self._executor.submit(self._attempt, route, prompt, max_tokens, temperature, started)
+            pending[future] = (route, started)
+
+        try:
+            if queue:
+                launch(queue.pop(0))
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    self.stats['timeouts'] += len(pending)
+                    break
+
+                # Wake up for the earliest of: overall deadline, an attempt's
+                # timeout, or the moment to hedge the single running attempt
+                wake_at = min([deadline] + [(started[0] if started else now) + self._timeout_for(route)
+                                            for route, started in pending.values()])
+                hedge_route = None
+                if self.hedge and hedged_from is None and len(pending) == 1:
+                    route, started = next(iter(pending.values()))
+                    hedge_route = next((r for r in queue if r.provider != route.provider), None)
+                    if hedge_route is not None:
+                        wake_at = min(wake_at, (started[0] if started else now) + self.hedge_delay(route))
+
+                done, _ = wait(list(pending), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    route, _ = pending.pop(future)
+                    text = future.result()
+                    if text:
+                        if hedged_from is not None and route is not hedged_from:
+                            self.stats['hedge_wins'] += 1
+                        return route, text
+
+                now = time.monotonic()
+                for future, (route, started) in list(pending.items()):
+                    if started and now - started[0] >= self._timeout_for(route):
+                        logger.warning(f"⏱️ {route.name} timed out after {self._timeout_for(route):.1f}s")
+                        self.stats['timeouts'] += 1
+                        # Abandoned if already running (its client timeout ends it)
+                        future.cancel()
+                        del pending[future]
+
+                if hedge_route is not None and pending and not done:
+                    (primary, started), = pending.values()
+                    if started and now - started[0] >= self.hedge_delay(primary):
+                        logger.info(f"🔀 {primary.name} slow, hedging with {hedge_route.name}")
+                        queue.remove(hedge_route)
+                        hedged_from = primary
+                        self.stats['hedged'] += 1
+                        launch(hedge_route)
+                if not pending and queue:
+                    launch(queue.pop(0))
+        finally:
+            for future in pending:
+                future.cancel()
+
+        self.stats['exhausted'] += 1
+        return None
+
+    def stream(self, route: Route, prompt: Prompt, max_tokens: int, temperature: float) -> Iterator[str]:
+        """Stream from one route, recording time-to-first-token or failure on its breaker.
+
+        Streams are not hedged: once text has been sent it can't be taken back.
+        """
+        breaker = self.breakers[route.name]
+        if route.stream is None or not breaker.allow():
+            return
+        start = time.monotonic()
+        started = False
+        try:
+            prompt = prompt(route) if callable(prompt) else prompt
+            for text in route.stream(prompt, max_tokens, temperature, self._timeout_for(route)):
+                if not text:
+                    continue
+                if not started:
+                    started = True
+                    breaker.record_success(time.monotonic() - start)
+                yield text
+            if not started:
+                breaker.record_failure()
+        except Exception as e:
+            logger.warning(f"⚠️ {route.name} stream failed: {e}")
+            if not started:
+                breaker.record_failure()
+
+    def _attempt(self, route: Route, prompt: Prompt, max_tokens: int, temperature: float,
+                 started: Optional[List[float]] = None) -> Optional[str]:
+        start = time.monotonic()
+        if started is not None:
+            started.append(start)
+        breaker = self.breakers[route.name]
+        if not breaker.allow():
+            return None
+        timeout = self._timeout_for(route)
+        try:
+            prompt = prompt(route) if callable(prompt) else prompt
+            text = route.complete(prompt, max_tokens, temperature, timeout)
+        except Exception as e:
+            logger.warning(f"⚠️ {route.name} failed: {e}")
+            text = None
+        elapsed = time.monotonic() - start
+        if text and elapsed <= timeout:
+            breaker.record_success(elapsed)
+        else:
+            breaker.record_failure()
+        return text
+
+    def _timeout_for(self, route: Route) -> float:
+        return route.timeout or self.timeout
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'hedging': self.hedge,
+            'routes': {name: breaker.get_stats() for name, breaker in self.breakers.items()},
+        }
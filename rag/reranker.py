@@ -0,0 +1,130 @@
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from .cache import QueryCache
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8', errors='replace'), digest_size=16).hexdigest()
+
+
+class CrossEncoderReranker:
+    """Re-score retrieved chunks with a small local cross-encoder.
+
+    Uncached (query, chunk) pairs are scored in one batched forward pass. The
+    latency budget is enforced up front: the time per pair is tracked, and
+    only as many candidates as fit the budget are scored, best-retrieved
+    first. Unscored candidates keep their retrieval order behind the scored
+    ones, and nothing is reranked if fewer than two pairs fit.
+
+    Scores are cached by (query hash, chunk content hash), so they survive
+    index rebuilds that renumber chunks.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, budget_ms: Optional[float] = None,
+                 max_length: Optional[int] = None, cache_size: Optional[int] = None, model: Any = None):
+        self.model_name = model_name or config.RERANK_MODEL
+        self.budget_ms = config.RERANK_BUDGET_MS if budget_ms is None else budget_ms
+        self.max_length = max_length or config.RERANK_MAX_LENGTH
+        self._model = model
+        self._load_failed = False
+        self._load_lock = threading.Lock()
+        self._scores = QueryCache('rerank', max_entries=cache_size or config.RERANK_CACHE_SIZE)
+        # Exponential moving average of forward-pass time per pair
+        self.seconds_per_pair: Optional[float] = None
+        self.stats = {'reranks': 0, 'pairs_scored': 0, 'cached_pairs': 0, 'truncated': 0,
+                      'skipped': 0, 'over_budget': 0, 'avg_rerank_ms': 0.0}
+
+    @property
+    def model(self):
+        """The cross-encoder, loaded on first use (None if it can't be loaded)."""
+        if self._model is None and not self._load_failed:
+            with self._load_lock:
+                if self._model is None and not self._load_failed:
+                    try:
+                        from sentence_transformers import CrossEncoder
+                        logger.info(f"🔄 Loading cross-encoder {self.model_name}")
+                        self._model = CrossEncoder(self.model_name, max_length=self.max_length, device='cpu')
+                        logger.info(f"✅ Cross-encoder {self.model_name} loaded")
+                    except Exception as e:
+                        logger.error(f"❌ Could not load cross-encoder {self.model_name}, reranking disabled: {e}")
+                        self._load_failed = True
+        return self._model
+
+    def is_available(self) -> bool:
+        return self.model is not None
+
+    def rerank(self, query: str, candidates: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        """The ``k`` best candidates by cross-encoder score (retrieval order if the model is unavailable)."""
+        if len(candidates) <= 1 or not self.is_available():
+            return candidates[:k]
+        start = time.perf_counter()
+        query_key = _digest(query)
+        keys = [(query_key, _digest(candidate.get('content', ''))) for candidate in candidates]
+        scores = {i: self._scores.get(key) for i, key in enumerate(keys)}
+        scores = {i: score for i, score in scores.items() if score is not None}
+        self.stats['cached_pairs'] += len(scores)
+
+        missing = [i for i in range(len(candidates)) if i not in scores]
+        if missing:
+            affordable = self._affordable_pairs()
+            if affordable is not None and affordable < len(missing):
+                if len(scores) + affordable < 2:
+                    self.stats['skipped'] += 1
+                    logger.warning(f"⏱️ Reranking skipped: ~{self.seconds_per_pair * 1000:.1f} ms/pair "
+                                   f"doesn't fit the {self.budget_ms:.0f} ms budget")
+                    # Let the estimate recover, so one slow pass (e.g. a busy CPU) isn't final
+                    self.seconds_per_pair *= 0.9
+                    return candidates[:k]
+                self.stats['truncated'] += 1
+                missing = missing[:affordable]
+            scores.update(self._score(query, candidates, missing, keys))
+
+        scored = sorted(scores, key=lambda i: scores[i], reverse=True)
+        unscored = [i for i in range(len(candidates)) if i not in scores]
+        results = [{**candidates[i], 'rerank_score': scores[i]} for i in scored]
+        results += [candidates[i] for i in unscored]
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats['reranks'] += 1
+        self.stats['avg_rerank_ms'] += (elapsed_ms - self.stats['avg_rerank_ms']) / self.stats['reranks']
+        if elapsed_ms > self.budget_ms:
+            self.stats['over_budget'] += 1
+        return results[:k]
+
+    def _score(self, query: str, candidates: List[Dict[str, Any]], indices: List[int],
+               keys: List[tuple]) -> Dict[int, float]:
+        pairs = [(query, candidates[i].get('content', '')) for i in indices]
+        start = time.perf_counter()
+        predictions = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        per_pair = (time.perf_counter() - start) / len(pairs)
+        self.seconds_per_pair = per_pair if self.seconds_per_pair is None else \
+            0.8 * self.seconds_per_pair + 0.2 * per_pair
+        self.stats['pairs_scored'] += len(pairs)
+        scores = {}
+        for i, score in zip(indices, predictions):
+            scores[i] = float(score)
+            self._scores.set(keys[i], scores[i])
+        return scores
+
+    def _affordable_pairs(self) -> Optional[int]:
+        """How many pairs fit the budget at the recent speed (None until measured)."""
+        if self.seconds_per_pair is None or self.seconds_per_pair <= 0:
+            return None
+        return int(self.budget_ms / 1000 / self.seconds_per_pair)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'model': self.model_name,
+            'loaded': self._model is not None,
+            'budget_ms': self.budget_ms,
+            'ms_per_pair': round(self.seconds_per_pair * 1000, 2) if self.seconds_per_pair else None,
+            'cache': self._scores.get_stats()
+        }
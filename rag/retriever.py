@@ -1,112 +1,262 @@
 import numpy as np
 import faiss
-import pickle
 import os
-from typing import List, Dict, Any, Tuple, Optional
+import json
+import time
+import shutil
+import threading
+from contextlib import nullcontext
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Callable
 from pathlib import Path
 import logging
 from tqdm import tqdm
 
 from .document_source import Document
+from .document_store import DocumentStore
+from .cache import QueryCache, email_tag, label_tag
+from .bm25 import BM25Index, reciprocal_rank_fusion
+from .shared_index import SharedIndex
+from .snapshots import SnapshotStore
+from .index_factory import (select_index_params, create_index, train_index, apply_search_params,
+                            describe_index, save_index_params, load_index_params, INDEX_PARAMS_FILE)
 from .embedder import embedder, HybridEmbedder
 from .config import config
 
 logger = logging.getLogger(__name__)
 
+INDEX_FILE = "faiss_index.bin"
+INDEX_META_FILE = "index_meta.json"
+BM25_INDEX_FILE = "bm25_index.npz"
+DOCUMENTS_DIR = "documents"
+LEGACY_DOCUMENTS_FILE = "documents.pkl"
+# Rewritten whole on every save. A full build writes them into the snapshot
+# directory and records their checksums; incremental saves write them into a
+# new index-NNNNNN subdirectory that only becomes live with the manifest naming it.
+INDEX_FILES = (INDEX_FILE, INDEX_META_FILE, INDEX_PARAMS_FILE, BM25_INDEX_FILE)
+INDEX_DIR_PREFIX = "index-"
+# Readers map the index file instead of reading it. IO_FLAG_MMAP_IFC maps the
+# vector/code arrays of flat, HNSW and IVF indexes; plain IO_FLAG_MMAP only
+# covers on-disk inverted lists.
+MMAP_IO_FLAGS = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP)
+
+def has_empty_vectors(vectors: np.ndarray) -> bool:
+    """Whether any row is all zeros (what the embedders return when every provider failed)."""
+    return len(vectors) > 0 and not np.any(vectors, axis=1).all()
+
+def normalize_vectors(vectors) -> np.ndarray:
+    """Return an L2-normalized float32 copy, so inner product equals cosine similarity."""
+    vectors = np.array(vectors, dtype=np.float32, order='C', ndmin=2)
+    faiss.normalize_L2(vectors)
+    return vectors
+
 class FAISSRetriever:
     """FAISS-based retriever with Gemini fallback and optimizations for 500+ emails."""
     
-    def __init__(self, vector_store_dir: Path, embedder: HybridEmbedder, cache_size: int = 1000):
+    def __init__(self, vector_store_dir: Path, embedder: HybridEmbedder, cache_size: int = 1000,
+                 shared: Optional[SharedIndex] = None):
         self.vector_store_dir = Path(vector_store_dir)
         self.embedder = embedder
         self.cache_size = cache_size
         
-        # FAISS index and documents
+        # Several processes serving one vector store: only the writer changes
+        # it; readers map its published generations (see rag/shared_index.py)
+        self.shared = shared
+        self.loaded_generation: Optional[int] = None
+        self._last_generation_check = 0.0
+        
+        # FAISS index and memory-mapped document store. FAISS IDs are row numbers
+        # in the store; removed rows stay tombstoned until the next full rebuild.
         self.index = None
-        self.documents = []
-        self.document_metadata = []
+        self.index_params: Dict[str, Any] = {}
+        self.doc_store: Optional[DocumentStore] = None
+        # Lexical index over the same document IDs, fused with vector hits
+        self.bm25: Optional[BM25Index] = None
+        # _lock guards swapping the references above. Adds and removes work on
+        # a copy of the index and swap it in, so searches only hold _lock to
+        # read them; _write_lock keeps changes to the index one at a time.
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        
+        # Each full build is a new snapshot directory; the loaded one holds
+        # all of the files above (see rag/snapshots.py)
+        self.snapshots = SnapshotStore(self.vector_store_dir)
+        self.snapshot_version: Optional[str] = None
+        
+        # Vectors are unit length, so scores are cosine similarities; hits below
+        # the threshold (stored with the index, as it depends on the model) are dropped
+        self.score_threshold = config.SCORE_THRESHOLD
         
         # Performance tracking
         self.stats = {
             'searches_performed': 0,
             'cache_hits': 0,
             'gemini_fallback_used': 0,
-            'avg_search_time': 0.0
+            'avg_search_time': 0.0,
+            'lexical_searches': 0,
+            'avg_lexical_search_ms': 0.0
         }
         
-        # Cache for search results
-        self._search_cache = {}
+        # Cache for search results. Caches attached by callers that derive
+        # results from searches are invalidated together with it whenever the
+        # corpus changes; ``generation`` counts those changes.
+        self.generation = 0
+        self._search_cache = QueryCache('search', max_entries=cache_size,
+                                        ttl_seconds=config.QUERY_CACHE_TTL,
+                                        max_bytes=config.QUERY_CACHE_MAX_MB * 1024 * 1024)
+        self._caches: List[QueryCache] = [self._search_cache]
         
         # Ensure vector store directory exists
         self.vector_store_dir.mkdir(parents=True, exist_ok=True)
     
+    @property
+    def snapshot_dir(self) -> Path:
+        """Directory of the loaded snapshot (the vector store itself for legacy layouts)."""
+        if self.snapshot_version is None:
+            return self.vector_store_dir
+        return self.snapshots.path(self.snapshot_version)
+    
+    @property
+    def store_dir(self) -> Path:
+        return self.snapshot_dir / DOCUMENTS_DIR
+    
+    @property
+    def bm25_path(self) -> Path:
+        if self.snapshot_version is None:
+            return self.vector_store_dir / BM25_INDEX_FILE
+        return self._index_dir(self.snapshot_version) / BM25_INDEX_FILE
+    
+    def _index_dir(self, version: str, manifest: Optional[Dict[str, Any]] = None) -> Path:
+        """Where the committed index files of a snapshot are (its manifest names the latest save)."""
+        if manifest is None:
+            manifest = self.snapshots.read_manifest(version) or {}
+        return self.snapshots.path(version) / manifest.get('index_dir', '')
+    
+    def saved_index_path(self) -> Optional[Path]:
+        """The FAISS index file of the current snapshot (or a legacy layout), if there is one."""
+        version = self.snapshots.current_version()
+        if version is not None:
+            path = self._index_dir(version) / INDEX_FILE
+            return path if path.exists() else None
+        if self._has_legacy_layout():
+            return self.vector_store_dir / INDEX_FILE
+        return None
+    
+    def _has_legacy_layout(self) -> bool:
+        """Index files saved directly in the vector store, before snapshots."""
+        return (self.vector_store_dir / INDEX_FILE).exists() and (
+            DocumentStore.exists(self.vector_store_dir / DOCUMENTS_DIR) or
+            (self.vector_store_dir / LEGACY_DOCUMENTS_FILE).exists())
+    
+    @property
+    def read_only(self) -> bool:
+        """Whether this process only reads an index another process writes."""
+        return self.shared is not None and not self.shared.is_writer
+    
+    def _publishing(self):
+        """Keep readers from loading while the writer changes the index files."""
+        return self.shared.publishing() if self.shared is not None and self.shared.is_writer else nullcontext()
+    
     def build_index(self, documents: List[Document], force_rebuild: bool = False, 
-                   show_progress: bool = True) -> bool:
-        """Build FAISS index from documents with progress tracking."""
+                   show_progress: bool = True, batch_size: int = None,
+                   progress: Optional[Callable[..., None]] = None) -> bool:
+        """Build FAISS index from documents with progress tracking.
+        
+        ``progress(**counts)``, if given, is called with the stage and the
+        number of documents embedded and chunks indexed so far.
+        """
+        if self.read_only:
+            logger.warning("⚠️ Index is read-only in this process; the writer rebuilds it")
+            return False
         try:
-            index_path = self.vector_store_dir / "faiss_index.bin"
-            docs_path = self.vector_store_dir / "documents.pkl"
-            
             # Check if index exists and is recent
-            if not force_rebuild and index_path.exists() and docs_path.exists():
+            if not force_rebuild and self.saved_index_path() is not None:
                 logger.info("Loading existing FAISS index...")
                 return self._load_existing_index()
             
             logger.info(f"Building FAISS index for {len(documents)} documents...")
             
-            # Extract text content and metadata
-            texts = []
-            metadata_list = []
-            
+            # Generate embeddings in batches with fallback support
+            logger.info("Generating embeddings...")
+            batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+            batch_starts = range(0, len(documents), batch_size)
             if show_progress:
-                docs_iter = tqdm(documents, desc="Processing documents")
-            else:
-                docs_iter = documents
+                batch_starts = tqdm(batch_starts, desc="Embedding chunks", unit="batch")
             
-            for doc in docs_iter:
-                texts.append(doc.content)
-                metadata_list.append(doc.metadata)
+            if progress:
+                progress(stage='embedding', documents_total=len(documents), documents_embedded=0, chunks_indexed=0)
+            embeddings_array = None
+            for start in batch_starts:
+                texts = [doc.content for doc in documents[start:start + batch_size]]
+                batch_embeddings = self.embedder.embed_texts(texts)
+                if batch_embeddings is None or len(batch_embeddings) != len(texts):
+                    logger.error("Failed to generate embeddings")
+                    return False
+                batch_embeddings = np.asarray(batch_embeddings, dtype=np.float32)
+                if has_empty_vectors(batch_embeddings):
+                    # Zero vectors can never be found; keep the live index instead
+                    logger.error("Embedding providers returned empty vectors, not building the index")
+                    return False
+                if embeddings_array is None:
+                    # Fill one preallocated matrix instead of growing a list of rows
+                    embeddings_array = np.empty((len(documents), batch_embeddings.shape[1]), dtype=np.float32)
+                embeddings_array[start:start + len(texts)] = batch_embeddings
+                if progress:
+                    progress(documents_embedded=start + len(texts))
             
-            # Generate embeddings with fallback support
-            logger.info("Generating embeddings...")
-            embeddings = self.embedder.embed_texts(texts)
-            
-            if not embeddings or len(embeddings) == 0:
+            if embeddings_array is None:
                 logger.error("Failed to generate embeddings")
                 return False
             
-            # Convert to numpy array
-            embeddings_array = np.array(embeddings, dtype=np.float32)
+            # Unit-length vectors make inner product scores cosine similarities
+            faiss.normalize_L2(embeddings_array)
             
             # Build FAISS index
             dimension = embeddings_array.shape[1]
             logger.info(f"Building FAISS index with dimension {dimension}")
             
-            # Use IVF index for better performance with large datasets
-            if len(documents) > 1000:
-                # For large datasets, use IVF index
-                nlist = min(4096, len(documents) // 10)  # Number of clusters
-                quantizer = faiss.IndexFlatIP(dimension)
-                self.index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
-                
-                # Train the index
-                logger.info("Training IVF index...")
-                self.index.train(embeddings_array)
-            else:
-                # For smaller datasets, use simple index
-                self.index = faiss.IndexFlatIP(dimension)
+            # Pick the index type from corpus size and memory budget
+            index_params = select_index_params(len(documents), dimension)
+            logger.info(f"Using {index_params['index_type']} index "
+                        f"(~{index_params['estimated_memory_mb']} MB): {index_params}")
+            if progress:
+                progress(stage='indexing')
+            index = create_index(index_params)
+            train_index(index, embeddings_array, index_params)
             
-            # Add vectors to index
-            self.index.add(embeddings_array)
+            # Add vectors to index with stable IDs so emails can be removed later
+            for start in range(0, len(documents), batch_size):
+                end = min(start + batch_size, len(documents))
+                index.add_with_ids(embeddings_array[start:end], np.arange(start, end, dtype=np.int64))
+                if progress:
+                    progress(chunks_indexed=end)
+            apply_search_params(index, index_params)
+            bm25 = BM25Index()
+            bm25.add(range(len(documents)), [doc.content for doc in documents])
             
-            # Store documents and metadata
-            self.documents = documents
-            self.document_metadata = metadata_list
+            # Write the new snapshot next to the live one, which keeps serving queries
+            if progress:
+                progress(stage='writing_snapshot')
+            version = self.snapshots.create()
+            snapshot_dir = self.snapshots.path(version)
+            doc_store = DocumentStore.create(snapshot_dir / DOCUMENTS_DIR, documents)
+            self._write_snapshot(version, index, index_params, bm25, doc_store, config.SCORE_THRESHOLD)
             
-            # Save index and documents
-            self._save_index()
+            # Swap it in. The old store isn't closed: searches on other threads
+            # may still be using it, and it goes away with the last reference.
+            with self._write_lock, self._publishing():
+                self.snapshots.activate(version)
+                with self._lock:
+                    self.index = index
+                    self.doc_store = doc_store
+                    self.bm25 = bm25
+                    self.index_params = index_params
+                    self.score_threshold = config.SCORE_THRESHOLD
+                    self.snapshot_version = version
+                    self._invalidate()
+                self._publish()
+            self.snapshots.prune()
             
-            logger.info(f"✅ FAISS index built successfully with {len(documents)} documents")
+            logger.info(f"✅ FAISS index built successfully with {len(documents)} documents (snapshot {version})")
             return True
             
         except Exception as e:
@@ -114,43 +264,32 @@ class FAISSRetriever:
             return False
     
     def _load_existing_index(self) -> bool:
-        """Load existing FAISS index and documents."""
+        """Load the current snapshot; if it's damaged, the newest intact older one."""
         try:
-            index_path = self.vector_store_dir / "faiss_index.bin"
-            docs_path = self.vector_store_dir / "documents.pkl"
+            if self.read_only:
+                return self._load_published_index()
             
-            logger.info(f"🔍 Attempting to load existing index from {index_path}")
-            logger.info(f"🔍 Documents file path: {docs_path}")
-            
-            # Check if files exist
-            if not index_path.exists():
-                logger.error(f"❌ FAISS index file not found: {index_path}")
-                return False
-            
-            if not docs_path.exists():
-                logger.error(f"❌ Documents file not found: {docs_path}")
+            version = self.snapshots.current_version()
+            if version is None and self._has_legacy_layout():
+                version = self._migrate_legacy_layout()
+            if version is None:
+                logger.error(f"❌ No saved FAISS index in {self.vector_store_dir}")
                 return False
+            if self._load_snapshot(version):
+                return True
             
-            # Load FAISS index
-            logger.info("📖 Loading FAISS index...")
-            self.index = faiss.read_index(str(index_path))
-            logger.info(f"✅ FAISS index loaded successfully. Index type: {type(self.index).__name__}")
-            
-            # Load documents
-            logger.info("📖 Loading documents...")
-            with open(docs_path, 'rb') as f:
-                self.documents = pickle.load(f)
-            logger.info(f"✅ Documents loaded successfully. Count: {len(self.documents)}")
-            
-            # Extract metadata
-            self.document_metadata = [doc.metadata for doc in self.documents]
-            
-            # Verify index and documents match
-            if hasattr(self.index, 'ntotal') and self.index.ntotal != len(self.documents):
-                logger.warning(f"⚠️ Index count ({self.index.ntotal}) doesn't match document count ({len(self.documents)})")
-            
-            logger.info(f"✅ FAISS index loaded with {len(self.documents)} documents")
-            return True
+            # Only reached for real damage: an interrupted save leaves the last
+            # committed state of the current snapshot loadable. Roll back to the
+            # newest snapshot that loads; emails indexed since it was built aren't in it.
+            for previous in reversed([v for v in self.snapshots.versions() if v < version]):
+                logger.warning(f"⚠️ Falling back to index snapshot {previous}; "
+                               f"emails indexed after it was built need indexing again")
+                if self._load_snapshot(previous):
+                    with self._publishing():
+                        self.snapshots.activate(previous)
+                        self._publish()
+                    return True
+            return False
             
         except Exception as e:
             logger.error(f"❌ Error loading existing index: {e}")
@@ -159,76 +298,556 @@ class FAISSRetriever:
             logger.error(f"❌ Full traceback: {traceback.format_exc()}")
             return False
     
-    def _save_index(self):
-        """Save FAISS index and documents."""
+    def _migrate_legacy_layout(self) -> str:
+        """Move index files saved directly in the vector store into a first snapshot."""
+        version = self.snapshots.create()
+        logger.info(f"🔄 Moving existing index files into snapshot {version}...")
+        snapshot_dir = self.snapshots.path(version)
+        for name in INDEX_FILES + (DOCUMENTS_DIR, LEGACY_DOCUMENTS_FILE):
+            if (self.vector_store_dir / name).exists():
+                os.replace(self.vector_store_dir / name, snapshot_dir / name)
+        self.snapshots.activate(version)
+        return version
+    
+    def _load_snapshot(self, version: str) -> bool:
+        """Load one snapshot after checking it against its manifest, and make it the live index."""
+        snapshot_dir = self.snapshots.path(version)
+        manifest = self.snapshots.read_manifest(version)
+        index_dir = self._index_dir(version, manifest or {})
+        index_path = index_dir / INDEX_FILE
+        docs_path = snapshot_dir / LEGACY_DOCUMENTS_FILE
+        
+        logger.info(f"🔍 Attempting to load index snapshot {version} from {index_dir}")
+        
+        # Check if files exist
+        if not index_path.exists():
+            logger.error(f"❌ FAISS index file not found: {index_path}")
+            return False
+        
+        if not DocumentStore.exists(snapshot_dir / DOCUMENTS_DIR) and not docs_path.exists():
+            logger.error(f"❌ Documents not found: {snapshot_dir / DOCUMENTS_DIR}")
+            return False
+        
+        if manifest is not None:
+            problems = self.snapshots.verify(version, checksums=config.INDEX_SNAPSHOT_VERIFY)
+            if problems:
+                logger.error(f"❌ Index snapshot {version} is damaged: {'; '.join(problems)}")
+                return False
+        
+        # Load FAISS index
+        logger.info("📖 Loading FAISS index...")
+        index = faiss.read_index(str(index_path))
+        logger.info(f"✅ FAISS index loaded successfully. Index type: {type(index).__name__}")
+        
+        # Map documents (legacy pickles are converted once)
+        logger.info("📖 Opening document store...")
+        if DocumentStore.exists(snapshot_dir / DOCUMENTS_DIR):
+            doc_store = DocumentStore(snapshot_dir / DOCUMENTS_DIR).open()
+        else:
+            doc_store = DocumentStore.from_pickle(snapshot_dir / DOCUMENTS_DIR, docs_path)
+        # Rows past the committed count were appended by an update whose
+        # manifest never got written; the index doesn't have them, so they go
+        # and their emails are indexed again when they come back
+        discarded = 0
+        if manifest is not None and doc_store.row_count > manifest.get('rows', doc_store.row_count):
+            discarded = doc_store.discard_from(manifest['rows'])
+            logger.warning(f"⚠️ Discarded {discarded} document rows of an uncommitted update")
+        logger.info(f"✅ Document store opened. Count: {doc_store.live_count()}")
+        
+        meta = self._read_index_meta(index_dir)
+        index_params = load_index_params(index_dir)
+        
+        with self._lock:
+            # Not closed: searches on other threads may still be using the old store
+            self.snapshot_version = version
+            self.index = index
+            self.doc_store = doc_store
+            self.score_threshold = meta.get('score_threshold', config.SCORE_THRESHOLD)
+            migrated = manifest is None or discarded > 0
+            migrated |= self._ensure_id_map()
+            if not meta.get('normalized'):
+                self._normalize_index()
+                migrated = True
+            if index_params is None:
+                index_params = describe_index(self.index)
+                migrated = True
+            self.index_params = index_params
+            # Query-time parameters aren't stored in the index file
+            apply_search_params(self.index, index_params)
+            if not self._load_bm25():
+                migrated = True
+            if migrated or (self.shared is not None and self.shared.read_generation() is None):
+                # Also gives readers a first generation to load
+                self._save_index()
+            self._invalidate()
+        
+        # Verify index and documents match
+        live_documents = self.document_count()
+        if hasattr(self.index, 'ntotal') and self.index.ntotal != live_documents:
+            logger.warning(f"⚠️ Index count ({self.index.ntotal}) doesn't match document count ({live_documents})")
+        
+        logger.info(f"✅ FAISS index loaded with {live_documents} documents (snapshot {version})")
+        return True
+    
+    def rollback(self, version: Optional[str] = None) -> Optional[str]:
+        """Make an earlier snapshot the live index again (default: the one before the loaded one).
+        
+        Emails indexed incrementally since that snapshot was built are not in
+        it. Returns the version now live, or None if there was nothing to
+        roll back to.
+        """
+        if self.read_only:
+            logger.warning("⚠️ Index is read-only in this process; the writer rolls it back")
+            return None
+        target = version or self.snapshots.previous_version(self.snapshot_version)
+        if target is None or target not in self.snapshots.versions():
+            logger.error(f"❌ No index snapshot to roll back to (requested: {version})")
+            return None
+        logger.info(f"⏪ Rolling index back from snapshot {self.snapshot_version} to {target}")
+        if not self._load_snapshot(target):
+            return None
+        with self._publishing():
+            self.snapshots.activate(target)
+            self._publish()
+        return target
+    
+    def _load_published_index(self) -> bool:
+        """Readers: map the writer's current snapshot (index, store and BM25 files).
+        
+        The files are loaded under the shared publish lock, so they all belong
+        to the same generation. Nothing is migrated or written here; an index
+        that still needs migrating is left to the writer.
+        """
+        with self.shared.loading():
+            published = self.shared.read_generation()
+            version = self.snapshots.current_version()
+            if published is None or version is None or self.snapshots.read_manifest(version) is None:
+                logger.info("⏳ No index generation published yet, waiting for the writer")
+                return False
+            problems = self.snapshots.verify(version, checksums=False)
+            if problems:
+                logger.warning(f"⚠️ Published snapshot {version} looks damaged ({'; '.join(problems)}), "
+                               f"waiting for the writer")
+                return False
+            snapshot_dir = self.snapshots.path(version)
+            index_dir = self._index_dir(version)
+            meta = self._read_index_meta(index_dir)
+            index_params = load_index_params(index_dir)
+            index = faiss.read_index(str(index_dir / INDEX_FILE), MMAP_IO_FLAGS)
+            if not meta.get('normalized') or index_params is None or \
+                    not isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2, faiss.IndexIVF)):
+                logger.warning("⚠️ Published index needs migrating, waiting for the writer")
+                return False
+            doc_store = DocumentStore(snapshot_dir / DOCUMENTS_DIR).open()
+            bm25_path = index_dir / BM25_INDEX_FILE
+            bm25 = BM25Index.load(bm25_path) if bm25_path.exists() else None
+        
+        if bm25 is not None and bm25.row_count != doc_store.row_count:
+            logger.warning("⚠️ Published BM25 index doesn't match the document store, searching without it")
+            bm25 = None
+        apply_search_params(index, index_params)
+        with self._lock:
+            # Not closed here: searches on other threads may still be using the
+            # old store, which goes away with the last reference to it
+            self.snapshot_version = version
+            self.index = index
+            self.doc_store = doc_store
+            self.bm25 = bm25
+            self.index_params = index_params
+            self.score_threshold = meta.get('score_threshold', config.SCORE_THRESHOLD)
+            self.loaded_generation = published.get('generation')
+            self._invalidate()
+        logger.info(f"✅ Mapped index generation {self.loaded_generation} (snapshot {version}) "
+                    f"with {doc_store.live_count()} documents (read-only)")
+        return True
+    
+    def refresh_if_stale(self) -> bool:
+        """Readers: switch to the writer's latest generation. Returns True if one was loaded.
+        
+        The generation file is checked at most every ``INDEX_RELOAD_CHECK_SECONDS``.
+        """
+        if not self.read_only:
+            return False
+        now = time.monotonic()
+        if now - self._last_generation_check < config.INDEX_RELOAD_CHECK_SECONDS:
+            return False
+        self._last_generation_check = now
+        published = self.shared.read_generation()
+        if published is None or published.get('generation') == self.loaded_generation:
+            return False
+        logger.info(f"🔄 Index generation {published.get('generation')} published, reloading")
+        return self._load_existing_index()
+    
+    def _ensure_id_map(self) -> bool:
+        """Wrap indexes saved before ID mapping so vectors can be removed by ID."""
+        if isinstance(self.index, (faiss.IndexIDMap, faiss.IndexIDMap2, faiss.IndexIVF)):
+            return False
+        logger.info("🔄 Migrating FAISS index to an ID-mapped index...")
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.index.d))
+        index.add_with_ids(vectors, np.arange(self.index.ntotal, dtype=np.int64))
+        self.index = index
+        return True
+    
+    def _normalize_index(self):
+        """Re-add the vectors of an index saved before normalization as unit vectors."""
+        logger.info("🔄 Normalizing vectors of existing FAISS index...")
+        if self.index.ntotal == 0:
+            return
+        if isinstance(self.index, faiss.IndexIVF):
+            invlists = self.index.invlists
+            ids = np.concatenate([
+                faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+                for list_no in range(self.index.nlist)
+            ])
+            self.index.make_direct_map()
+            vectors = self.index.reconstruct_batch(ids)
+            self.index.make_direct_map(False)
+        else:
+            ids = faiss.vector_to_array(self.index.id_map)
+            vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+        self.index.reset()
+        self.index.add_with_ids(normalize_vectors(vectors), ids.astype(np.int64))
+    
+    def _load_bm25(self) -> bool:
+        """Load the lexical index, or rebuild it from the document store if missing or out of date."""
+        if self.bm25_path.exists():
+            try:
+                bm25 = BM25Index.load(self.bm25_path)
+                if bm25.row_count == self.doc_store.row_count:
+                    self.bm25 = bm25
+                    return True
+                if bm25.row_count < self.doc_store.row_count and \
+                        not self.doc_store.filter_mask()[bm25.row_count:].any():
+                    # The missing rows are all deleted (an uncommitted update)
+                    bm25.reserve(self.doc_store.row_count)
+                    self.bm25 = bm25
+                    return False
+                logger.warning("⚠️ BM25 index doesn't match the document store, rebuilding")
+            except Exception as e:
+                logger.warning(f"⚠️ Could not load {self.bm25_path}: {e}")
+        logger.info("🔄 Building BM25 index from the document store...")
+        doc_ids = np.flatnonzero(self.doc_store.filter_mask())
+        self.bm25 = BM25Index()
+        self.bm25.reserve(self.doc_store.row_count)
+        self.bm25.add(doc_ids, [self.doc_store.get_text(int(doc_id)) for doc_id in doc_ids])
+        return False
+    
+    def _read_index_meta(self, snapshot_dir: Path) -> Dict[str, Any]:
+        meta_path = snapshot_dir / INDEX_META_FILE
+        if not meta_path.exists():
+            return {}
         try:
-            # Save FAISS index
-            index_path = self.vector_store_dir / "faiss_index.bin"
-            faiss.write_index(self.index, str(index_path))
+            with open(meta_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read {meta_path}: {e}")
+            return {}
+    
+    def set_score_threshold(self, score_threshold: float, persist: bool = True):
+        """Change the minimum cosine similarity for hits and store it with the index."""
+        with self._write_lock:
+            self.score_threshold = float(score_threshold)
+            self._invalidate()
+            if persist and self.index is not None:
+                self._save_index()
+    
+    def attach_cache(self, cache: QueryCache):
+        """Invalidate ``cache`` together with the search cache when the corpus changes.
+        
+        Anything with ``bump(tags)`` and ``bump_all()`` can be attached. Tags
+        are the label tags and the email tags of the documents that changed.
+        """
+        if cache not in self._caches:
+            self._caches.append(cache)
+    
+    def _invalidate(self, labels: Optional[Iterable[str]] = None, email_ids: Iterable[str] = ()):
+        """Drop cached results affected by a corpus change.
+        
+        With ``labels``, only results filtered to other labels survive; without,
+        everything is dropped (rebuild, reload, threshold change). ``email_ids``
+        are the emails added or removed, for caches tracking their sources.
+        """
+        self.generation += 1
+        tags = None if labels is None else \
+            [label_tag(label) for label in labels] + [email_tag(email_id) for email_id in email_ids]
+        for cache in self._caches:
+            if tags is None:
+                cache.bump_all()
+            else:
+                cache.bump(tags)
+    
+    def document_count(self) -> int:
+        """Number of live (not removed) documents."""
+        return self.doc_store.live_count() if self.doc_store is not None else 0
+    
+    def has_email(self, email_id: str) -> bool:
+        """Whether vectors for an email are already in the index."""
+        return self.doc_store is not None and self.doc_store.has_email(email_id)
+    
+    def add_documents(self, documents: List[Document], persist: bool = True) -> int:
+        """Embed and append documents to the live index without a rebuild.
+        
+        The vectors are added to a copy of the index that then replaces it, so
+        searches running meanwhile carry on against the previous one.
+        """
+        if not documents:
+            return 0
+        if self.read_only:
+            logger.warning("⚠️ Index is read-only in this process; the writer adds documents")
+            return 0
+        if self.index is None and not self._load_existing_index():
+            logger.info("No existing FAISS index, building a new one")
+            return len(documents) if self.build_index(documents, force_rebuild=True, show_progress=False) else 0
+        
+        embeddings = self.embedder.embed_texts([doc.content for doc in documents])
+        if embeddings is None or len(embeddings) != len(documents):
+            logger.error("Failed to generate embeddings for new documents")
+            return 0
+        embeddings_array = normalize_vectors(embeddings)
+        if has_empty_vectors(embeddings_array):
+            # Indexed, they'd never be found, and has_email() would stop a retry
+            logger.error("Embedding providers returned empty vectors for new documents")
+            return 0
+        if embeddings_array.shape[1] != self.index.d:
+            logger.error(f"Embedding dimension {embeddings_array.shape[1]} doesn't match index dimension {self.index.d}")
+            return 0
+        
+        with self._write_lock, self._publishing():
+            index = faiss.clone_index(self.index)
+            ids = np.array(self.doc_store.append(documents), dtype=np.int64)
+            index.add_with_ids(embeddings_array, ids)
+            with self._lock:
+                self.index = index
+            if self.bm25 is not None:
+                self.bm25.add(ids, [doc.content for doc in documents])
+            self._invalidate(self.doc_store.labels_of(ids),
+                             {doc.metadata.get('email_id') for doc in documents} - {None})
+            if persist:
+                self._save_index()
+        
+        logger.info(f"➕ Added {len(documents)} documents to FAISS index")
+        return len(documents)
+    
+    def remove_emails(self, email_ids: Iterable[str], persist: bool = True) -> int:
+        """Remove every vector belonging to the given emails from the live index (copy-on-write, like adds)."""
+        if self.read_only:
+            logger.warning("⚠️ Index is read-only in this process; the writer removes documents")
+            return 0
+        with self._write_lock, self._publishing():
+            if self.index is None or self.doc_store is None:
+                return 0
+            email_ids = list(email_ids)
+            doc_ids = []
+            for email_id in email_ids:
+                doc_ids.extend(self.doc_store.email_doc_ids(email_id))
+            if not doc_ids:
+                return 0
             
-            # Save documents
-            docs_path = self.vector_store_dir / "documents.pkl"
-            with open(docs_path, 'wb') as f:
-                pickle.dump(self.documents, f)
+            # Indexes without removal support (HNSW) keep the vectors; the
+            # store's tombstones filter them out of results until a rebuild
+            if self.index_params.get('supports_remove', True):
+                index = faiss.clone_index(self.index)
+                index.remove_ids(np.array(doc_ids, dtype=np.int64))
+                with self._lock:
+                    self.index = index
+            if self.bm25 is not None:
+                self.bm25.remove(doc_ids, [self.doc_store.get_text(doc_id) for doc_id in doc_ids])
+            self.doc_store.delete(doc_ids)
+            self._invalidate(self.doc_store.labels_of(doc_ids), email_ids)
+            if persist:
+                self._save_index()
+        
+        logger.info(f"➖ Removed {len(doc_ids)} documents from FAISS index")
+        return len(doc_ids)
+    
+    def _save_index(self):
+        """Save the live index into its snapshot. Documents are persisted by the store as they are written.
+        
+        The index files go into a new directory and the manifest naming it is
+        swapped in last, so a crash at any point leaves the snapshot's previous
+        committed state intact. Processes that mapped the old files keep a
+        valid view of them. In shared mode a new generation is then published
+        for the readers.
+        """
+        if self.read_only:
+            return
+        try:
+            with self._publishing():
+                if self.snapshot_version is None:
+                    self.snapshot_version = self.snapshots.create()
+                    self.snapshots.activate(self.snapshot_version)
+                self._write_snapshot(self.snapshot_version, self.index, self.index_params, self.bm25,
+                                     self.doc_store, self.score_threshold, incremental=True)
+                self._publish()
             
-            logger.info("💾 Index and documents saved")
+            logger.info("💾 Index saved")
             
         except Exception as e:
             logger.error(f"Error saving index: {e}")
     
+    def _write_snapshot(self, version: str, index, index_params: Dict[str, Any], bm25: Optional[BM25Index],
+                        doc_store: Optional[DocumentStore], score_threshold: float, incremental: bool = False):
+        """Write the index files of a snapshot, then its manifest.
+        
+        A full build writes into the (not yet active) snapshot directory and
+        checksums the files once. An incremental save writes a new
+        ``index-NNNNNN`` directory and records only sizes, so an add doesn't
+        re-hash the whole index; the manifest swap commits it, and the files
+        it superseded are removed afterwards.
+        """
+        snapshot_dir = self.snapshots.path(version)
+        previous = self.snapshots.read_manifest(version) or {}
+        sequence = previous.get('index_sequence', 0) + 1 if incremental else 0
+        index_dir_name = f"{INDEX_DIR_PREFIX}{sequence:06d}" if incremental else ''
+        index_dir = snapshot_dir / index_dir_name
+        if incremental:
+            # Left over from a save that crashed before its manifest was written
+            shutil.rmtree(index_dir, ignore_errors=True)
+            index_dir.mkdir()
+        index_path = index_dir / INDEX_FILE
+        tmp_path = index_path.with_name(index_path.name + f".tmp{os.getpid()}")
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, index_path)
+        with open(index_dir / INDEX_META_FILE, 'w') as f:
+            json.dump({
+                'metric': 'cosine',
+                'normalized': True,
+                'dimension': index.d,
+                'score_threshold': score_threshold
+            }, f, indent=2)
+        if index_params:
+            save_index_params(index_dir, {**index_params, 'num_vectors': index.ntotal})
+        if bm25 is not None:
+            bm25.save(index_dir / BM25_INDEX_FILE)
+        
+        index_files = [f"{index_dir_name}/{name}" if index_dir_name else name for name in INDEX_FILES]
+        store_files = [f"{DOCUMENTS_DIR}/{path.name}" for path in sorted((snapshot_dir / DOCUMENTS_DIR).iterdir())
+                       if path.is_file() and '.tmp' not in path.name] if doc_store is not None else []
+        self.snapshots.write_manifest(version, {
+            'created_at': previous.get('created_at') or time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'embedding': self._embedding_info(index.d),
+            'index_type': index_params.get('index_type') if index_params else type(index).__name__,
+            'vectors': int(index.ntotal),
+            'rows': doc_store.row_count if doc_store is not None else 0,
+            'documents': doc_store.live_count() if doc_store is not None else 0,
+            'score_threshold': score_threshold,
+            'index_dir': index_dir_name,
+            'index_sequence': sequence
+        }, checksummed=[] if incremental else index_files,
+           sized=store_files + index_files if incremental else store_files)
+        
+        if incremental:
+            for name in INDEX_FILES:
+                (snapshot_dir / name).unlink(missing_ok=True)
+            for entry in snapshot_dir.iterdir():
+                if entry.is_dir() and entry.name.startswith(INDEX_DIR_PREFIX) and entry.name != index_dir_name:
+                    shutil.rmtree(entry, ignore_errors=True)
+    
+    def _embedding_info(self, dimension: int) -> Dict[str, Any]:
+        """Which embedder produced the vectors, for the snapshot manifest."""
+        info = {'embedder': type(self.embedder).__name__, 'dimension': int(dimension)}
+        provider = getattr(self.embedder, 'primary_provider', None)
+        if provider and hasattr(self.embedder, '_provider_model'):
+            info['provider'] = provider
+            info['model'] = self.embedder._provider_model(provider)[0]
+        return info
+    
+    def _publish(self):
+        """Shared mode: tell readers a new generation of the index is on disk."""
+        if self.shared is not None and self.shared.is_writer:
+            self.loaded_generation = self.shared.publish(
+                snapshot=self.snapshot_version,
+                vectors=int(self.index.ntotal),
+                rows=self.doc_store.row_count if self.doc_store is not None else 0)
+    
+    def embed_query(self, query: str) -> Optional[np.ndarray]:
+        """Normalized embedding of a query, as used for searching, or None if embedding failed."""
+        if self.read_only:
+            # The on-disk embedding cache has a single writer too: the index writer
+            query_embedding = self.embedder.embed_single_text(query, use_cache=False)
+        else:
+            query_embedding = self.embedder.embed_single_text(query)
+        if query_embedding is None or len(query_embedding) == 0:
+            return None
+        return normalize_vectors(query_embedding)
+    
     def search(self, query: str, k: int = 5, label: Optional[str] = None, 
-               max_age_days: Optional[int] = None, use_gemini_fallback: bool = True) -> List[Dict]:
-        """Search for similar documents with filtering and fallback support."""
-        import time
+               max_age_days: Optional[int] = None, use_gemini_fallback: bool = True,
+               max_chunks_per_email: Optional[int] = None,
+               score_threshold: Optional[float] = None,
+               query_vector: Optional[np.ndarray] = None) -> List[Dict]:
+        """Search for similar documents with filtering and fallback support.
+        
+        ``max_chunks_per_email`` collapses hits so that no email contributes more
+        than that many chunks; the best-scoring chunks of each email are kept.
+        Hits with a cosine similarity below ``score_threshold`` (default: the
+        threshold stored with the index) are dropped. ``query_vector`` is the
+        query's ``embed_query`` result, if the caller already has it.
+        """
+        self.refresh_if_stale()
+        if score_threshold is None:
+            score_threshold = self.score_threshold
         start_time = time.time()
         
-        # Check cache first
-        cache_key = f"{query}:{k}:{label}:{max_age_days}"
-        if cache_key in self._search_cache:
+        # Check cache first. The snapshot keeps results computed while the
+        # corpus changed underneath from being cached.
+        cache_key = (query, k, label, max_age_days, max_chunks_per_email, score_threshold)
+        cache_tags = (label_tag(label),)
+        snapshot = self._search_cache.snapshot(cache_tags)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
             self.stats['cache_hits'] += 1
-            return self._search_cache[cache_key]
+            return cached
         
         try:
-            if self.index is None or len(self.documents) == 0:
+            if self.index is None or self.index.ntotal == 0:
                 logger.warning("No FAISS index available, using fallback search")
                 return self._fallback_search(query, k, label, max_age_days)
             
-            # Generate query embedding
-            query_embedding = self.embedder.embed_single_text(query)
+            # Generate query embedding, normalized like the indexed vectors
+            if query_vector is None:
+                query_vector = self.embed_query(query)
             
-            if not query_embedding or len(query_embedding) == 0:
+            if query_vector is None:
                 logger.warning("Failed to generate query embedding, using fallback")
                 return self._fallback_search(query, k, label, max_age_days)
             
-            # Convert to numpy array
-            query_vector = np.array([query_embedding], dtype=np.float32)
+            # Filters are applied inside the FAISS search, so every hit already
+            # matches; only over-fetch when collapsing chunks of the same email
+            fetch_k = k if not max_chunks_per_email else k * 10
+            mask = None
+            if label or max_age_days:
+                min_timestamp = int(time.time()) - max_age_days * 86400 if max_age_days else None
+                mask = self.doc_store.filter_mask(label=label, min_timestamp=min_timestamp)
+            elif not self.index_params.get('supports_remove', True) and self.doc_store.has_deletions:
+                # Tombstoned vectors are still in the index; search live rows only
+                mask = self.doc_store.filter_mask()
+            scores, indices = self._index_search(query_vector, fetch_k, mask)
             
-            # Search FAISS index
-            scores, indices = self.index.search(query_vector, min(k * 3, len(self.documents)))
+            # Materialize only the candidate documents (hits are sorted by score)
+            hits = [(score, idx) for score, idx in zip(scores, indices)
+                    if idx != -1 and score >= score_threshold]
+            if self.bm25 is not None and config.HYBRID_SEARCH_ENABLED:
+                hits = self._fuse_lexical(query, query_vector, hits, fetch_k, mask, score_threshold)
+            candidates = self.doc_store.get_many([idx for _, idx in hits])
             
-            # Process results with filtering
+            # Process results
             results = []
-            for score, idx in zip(scores[0], indices[0]):
-                if idx == -1:  # Invalid index
+            chunks_per_email = {}
+            for (score, idx), doc in zip(hits, candidates):
+                if doc is None:  # Removed document
                     continue
+                metadata = doc.metadata
                 
-                doc = self.documents[idx]
-                metadata = self.document_metadata[idx]
+                # Collapse several hits from the same email
+                if max_chunks_per_email:
+                    email_id = metadata.get('email_id')
+                    if chunks_per_email.get(email_id, 0) >= max_chunks_per_email:
+                        continue
                 
-                # Apply filters
-                if label and metadata.get('label') != label:
-                    continue
-                
-                if max_age_days:
-                    doc_date_str = metadata.get('date', '')
-                    if doc_date_str:
-                        try:
-                            from datetime import datetime, timedelta
-                            doc_date = datetime.fromisoformat(doc_date_str)
-                            if doc_date < datetime.utcnow() - timedelta(days=max_age_days):
-                                continue
-                        except (ValueError, TypeError):
-                            continue
+                if max_chunks_per_email:
+                    chunks_per_email[email_id] = chunks_per_email.get(email_id, 0) + 1
                 
                 results.append({
                     'content': doc.content,
@@ -240,8 +859,7 @@ class FAISSRetriever:
                     break
             
             # Cache results
-            if len(self._search_cache) < self.cache_size:
-                self._search_cache[cache_key] = results
+            self._search_cache.set(cache_key, results, cache_tags, snapshot)
             
             # Update stats
             search_time = time.time() - start_time
@@ -260,15 +878,133 @@ class FAISSRetriever:
                 return self._fallback_search(query, k, label, max_age_days)
             return []
     
+    def _fuse_lexical(self, query: str, query_vector: np.ndarray, hits: List[Tuple[float, int]],
+                      fetch_k: int, mask: Optional[np.ndarray],
+                      score_threshold: float) -> List[Tuple[float, int]]:
+        """Merge BM25 hits into the vector hits by reciprocal rank fusion.
+        
+        Returns ``(cosine score, doc ID)`` pairs in fused order. Exact names
+        and product terms ranked low by the vector search are pulled up; hits
+        found only lexically still have to pass the score threshold, unless
+        the index can't reconstruct their vectors (IVF), in which case they
+        are kept with a score of 0.
+        """
+        _, lexical_ids = self._lexical_search(query, fetch_k, mask)
+        if len(lexical_ids) == 0:
+            return hits
+        dense_scores = {int(idx): float(score) for score, idx in hits}
+        lexical_scores = self._stored_scores(query_vector, [int(doc_id) for doc_id in lexical_ids
+                                                            if int(doc_id) not in dense_scores])
+        lexical_ranking = [int(doc_id) for doc_id in lexical_ids
+                           if lexical_scores.get(int(doc_id)) is None or
+                           lexical_scores[int(doc_id)] >= score_threshold]
+        fused = reciprocal_rank_fusion([list(dense_scores), lexical_ranking])
+        scores = {**lexical_scores, **dense_scores}
+        return [(scores.get(doc_id) or 0.0, doc_id) for doc_id, _ in fused]
+    
+    def _lexical_search(self, query: str, k: int,
+                        mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        start = time.perf_counter()
+        scores, doc_ids = self.bm25.search(query, k, mask)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats['lexical_searches'] += 1
+        self.stats['avg_lexical_search_ms'] += (elapsed_ms - self.stats['avg_lexical_search_ms']) / self.stats['lexical_searches']
+        return scores, doc_ids
+    
+    def _stored_scores(self, query_vector: np.ndarray, doc_ids: List[int]) -> Dict[int, Optional[float]]:
+        """Cosine similarity of the query to stored vectors (None where the index can't reconstruct them)."""
+        scores = {}
+        with self._lock:
+            index = self.index
+        for doc_id in doc_ids:
+            try:
+                scores[doc_id] = float(index.reconstruct(int(doc_id)) @ query_vector[0])
+            except RuntimeError:
+                scores[doc_id] = None
+        return scores
+    
+    def _index_search(self, query_vector: np.ndarray, fetch_k: int,
+                      mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Search the index, restricted to document IDs set in ``mask``.
+        
+        The mask is passed to FAISS as an ID selector. nprobe/efSearch grow with
+        the filter's selectivity so selective filters still see enough matching
+        vectors, and a short result falls back to an exhaustive search. The lock
+        is only held to read the current index; changes never modify it in place.
+        """
+        with self._lock:
+            index = self.index
+            index_params = self.index_params
+        ntotal = index.ntotal
+        if mask is None:
+            scores, ids = index.search(query_vector, min(fetch_k, ntotal))
+            return scores[0], ids[0]
+        
+        matching = int(mask.sum())
+        fetch_k = min(fetch_k, matching)
+        if fetch_k == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        index_type = index_params.get('index_type', 'flat')
+        if index_type == 'hnsw' and matching <= config.FILTER_EXACT_SEARCH_MAX:
+            return self._exact_search(index, query_vector, np.flatnonzero(mask), fetch_k)
+        
+        bitmap = np.packbits(mask, bitorder='little')
+        selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+        selectivity = matching / max(ntotal, 1)
+        scores, ids = index.search(query_vector, fetch_k,
+                                   params=self._search_params(index_params, selector, selectivity))
+        if (ids[0] >= 0).sum() < fetch_k and index_type != 'flat':
+            if index_type == 'hnsw':
+                return self._exact_search(index, query_vector, np.flatnonzero(mask), fetch_k)
+            # Probe every inverted list; the selector keeps this cheap
+            scores, ids = index.search(query_vector, fetch_k,
+                                       params=self._search_params(index_params, selector, 0.0))
+        return scores[0], ids[0]
+    
+    @staticmethod
+    def _search_params(index_params: Dict[str, Any], selector, selectivity: float) -> faiss.SearchParameters:
+        """Search parameters for a filtered search (selectivity 0 means exhaustive)."""
+        index_type = index_params.get('index_type', 'flat')
+        if index_type == 'flat':
+            return faiss.SearchParameters(sel=selector)
+        if index_type == 'hnsw':
+            ef_search = index_params['ef_search']
+            if selectivity > 0:
+                ef_search = int(min(config.FILTER_MAX_EF_SEARCH, np.ceil(ef_search / selectivity)))
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=max(ef_search, index_params['ef_search']))
+        nlist = index_params['nlist']
+        nprobe = nlist if selectivity <= 0 else int(min(nlist, np.ceil(index_params['nprobe'] / selectivity)))
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    
+    @staticmethod
+    def _exact_search(index, query_vector: np.ndarray, doc_ids: np.ndarray,
+                      k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force search over a small set of documents, using their stored vectors."""
+        vectors = np.vstack([index.reconstruct(int(doc_id)) for doc_id in doc_ids])
+        scores = vectors @ query_vector[0]
+        top = np.argsort(-scores)[:k]
+        return scores[top], doc_ids[top].astype(np.int64)
+    
     def _fallback_search(self, query: str, k: int, label: Optional[str] = None, 
                         max_age_days: Optional[int] = None) -> List[Dict]:
-        """Fallback search using simple text matching."""
+        """Fallback search using keyword matching (BM25 when the lexical index is available)."""
         logger.info("🔄 Using fallback text search")
         
+        if self.bm25 is not None and self.doc_store is not None:
+            min_timestamp = int(time.time()) - max_age_days * 86400 if max_age_days else None
+            scores, doc_ids = self._lexical_search(query, k, self.doc_store.filter_mask(label, min_timestamp))
+            return [{
+                'content': doc.content,
+                'metadata': doc.metadata,
+                'score': 0.5,  # Default score for fallback
+                'bm25_score': float(score)
+            } for score, doc in zip(scores, self.doc_store.get_many(doc_ids)) if doc is not None]
+        
         results = []
         query_lower = query.lower()
         
-        for doc in self.documents:
+        documents = self.doc_store.iter_documents() if self.doc_store is not None else []
+        for doc in documents:
             # Simple text matching
             if query_lower in doc.content.lower():
                 metadata = doc.metadata
@@ -305,11 +1041,14 @@ class FAISSRetriever:
             return {'status': 'not_initialized'}
         
         return {
-            'total_documents': len(self.documents),
+            'total_documents': self.document_count(),
             'index_type': type(self.index).__name__,
             'dimension': self.index.d if hasattr(self.index, 'd') else 'unknown',
             'is_trained': self.index.is_trained if hasattr(self.index, 'is_trained') else True,
-            'ntotal': self.index.ntotal if hasattr(self.index, 'ntotal') else len(self.documents),
+            'metric': 'cosine',
+            'score_threshold': self.score_threshold,
+            'index_params': self.index_params,
+            'ntotal': self.index.ntotal if hasattr(self.index, 'ntotal') else self.document_count(),
             'search_stats': self.stats
         }
     
@@ -323,7 +1062,13 @@ class FAISSRetriever:
         return {
             **self.stats,
             'cache_size': len(self._search_cache),
-            'total_documents': len(self.documents)
+            'cache': self._search_cache.get_stats(),
+            'generation': self.generation,
+            'index_generation': self.loaded_generation,
+            'snapshot': self.snapshot_version,
+            'shared_index': self.shared.get_stats() if self.shared is not None else None,
+            'bm25': self.bm25.get_stats() if self.bm25 is not None else None,
+            'total_documents': self.document_count()
         }
 
 # Legacy retriever for backward compatibility
@@ -0,0 +1,162 @@
+import logging
+import threading
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from .cache import QueryCache, email_tag
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Answer cache keyed by what a query means rather than its exact text.
+
+    Query embeddings live in a small exact FAISS index; the answers, with their
+    tags, TTL and LRU/size limits, in a ``QueryCache`` keyed by vector ID. A
+    lookup returns the answer of the most similar earlier query above
+    ``threshold`` that was asked with the same ``scope`` (filters, persona).
+
+    Each answer is stored with the IDs of the emails it was built from. Attach
+    the cache to the retriever: adding or removing an email drops only the
+    answers it was a source of (other tags in ``bump`` are ignored), and a
+    rebuild drops everything. Vectors of invalidated or evicted answers are
+    dropped lazily.
+    """
+
+    # Neighbours checked per lookup, as the closest ones may be out of scope
+    SEARCH_K = 8
+
+    def __init__(self, name: str, threshold: Optional[float] = None, max_entries: int = 1000,
+                 ttl_seconds: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.name = name
+        self.threshold = config.SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.max_entries = max_entries
+        self._answers = QueryCache(name, max_entries=max_entries, ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+        self._index: Optional[faiss.IndexIDMap2] = None
+        self._next_id = 0
+        # For refusing answers computed across a change to one of their sources:
+        # the change number at which each tag was last bumped, and rebuilds
+        self._changes = 0
+        self._changed_at: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'out_of_scope': 0}
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def snapshot(self) -> Tuple[int, int]:
+        """Stamp to take before computing an answer and pass to ``set``."""
+        with self._lock:
+            return self._epoch, self._changes
+
+    def get(self, vector: np.ndarray, scope: Hashable = None) -> Optional[Tuple[Any, float]]:
+        """``(answer, similarity)`` for the closest cached query in ``scope``, or None."""
+        vector = self._prepare(vector)
+        with self._lock:
+            if vector is None or self._index is None or self._index.ntotal == 0 \
+                    or vector.shape[1] != self._index.d:
+                self.stats['misses'] += 1
+                return None
+            scores, ids = self._index.search(vector, min(self.SEARCH_K, self._index.ntotal))
+            stale = []
+            found = None
+            for score, vector_id in zip(scores[0], ids[0]):
+                if vector_id == -1 or score < self.threshold:
+                    break
+                entry = self._answers.get(int(vector_id), count=False)
+                if entry is None:
+                    stale.append(vector_id)
+                    continue
+                entry_scope, answer = entry
+                if entry_scope == scope:
+                    found = (answer, float(score))
+                    break
+                self.stats['out_of_scope'] += 1
+            if stale:
+                self._index.remove_ids(np.array(stale, dtype=np.int64))
+            self.stats['hits' if found else 'misses'] += 1
+            return found
+
+    def set(self, vector: np.ndarray, answer: Any, scope: Hashable = None,
+            sources: Iterable[str] = (), snapshot: Optional[Tuple[int, int]] = None) -> bool:
+        """Cache ``answer`` for a query embedding, built from the emails in ``sources``.
+        
+        Returns False if it was stale (a source changed after ``snapshot``) or not stored.
+        """
+        vector = self._prepare(vector)
+        if vector is None:
+            return False
+        tags = tuple(email_tag(email_id) for email_id in sources)
+        with self._lock:
+            if snapshot is not None:
+                epoch, changes = snapshot
+                if epoch != self._epoch or any(self._changed_at.get(tag, 0) > changes for tag in tags):
+                    self._answers.stats['stale_writes'] += 1
+                    return False
+            if self._index is None or self._index.d != vector.shape[1]:
+                # First entry, or the embedding model changed: earlier vectors can't be compared
+                self._answers.clear()
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            vector_id = self._next_id
+            self._next_id += 1
+            if not self._answers.set(vector_id, (scope, answer), tags):
+                return False
+            self._index.add_with_ids(vector, np.array([vector_id], dtype=np.int64))
+            if self._index.ntotal > 2 * max(self.max_entries, 1):
+                self._compact()
+            return True
+
+    def bump(self, tags: Iterable[str]):
+        """Drop answers built from any email among ``tags``."""
+        tags = [tag for tag in tags if tag.startswith(email_tag(''))]
+        if not tags:
+            return
+        with self._lock:
+            self._changes += 1
+            for tag in tags:
+                self._changed_at[tag] = self._changes
+            self._answers.bump(tags)
+
+    def bump_all(self):
+        with self._lock:
+            self._epoch += 1
+            self._changed_at.clear()
+            self._answers.bump_all()
+            self._index = None
+
+    def clear(self):
+        with self._lock:
+            self._answers.clear()
+            self._index = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self._answers.get_stats(),
+            **self.stats,
+            'threshold': self.threshold,
+            'vectors': self._index.ntotal if self._index is not None else 0,
+            'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0
+        }
+
+    def _compact(self):
+        """Drop vectors whose answers were evicted or invalidated."""
+        ids = faiss.vector_to_array(self._index.id_map)
+        dead = np.array([vector_id for vector_id in ids if int(vector_id) not in self._answers], dtype=np.int64)
+        if len(dead):
+            self._index.remove_ids(dead)
+
+    @staticmethod
+    def _prepare(vector: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if vector is None:
+            return None
+        vector = np.array(vector, dtype=np.float32, order='C', ndmin=2)
+        if vector.size == 0 or not np.any(vector):
+            # Failed embeddings come back as zeros; they'd match anything
+            return None
+        faiss.normalize_L2(vector)
+        return vector
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import fcntl
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WRITER_LOCK_FILE = "writer.lock"
+PUBLISH_LOCK_FILE = "publish.lock"
+GENERATION_FILE = "GENERATION"
+TASKS_FILE = "index_tasks.db"
+
+
+class FileLock:
+    """Inter-process lock on a file (``fcntl.flock``).
+
+    Within a process the lock is counted rather than exclusive: once held, it
+    is held for every thread until the last ``release``. It belongs to the open
+    file, so it is freed when the holding process exits, however it exits.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+        self._depth = 0
+        self._lock = threading.Lock()
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, exclusive: bool = True, blocking: bool = True) -> bool:
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                return True
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            flags = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+            try:
+                fcntl.flock(fd, flags)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._fd = fd
+            self._depth = 1
+            return True
+
+    def release(self):
+        with self._lock:
+            if not self._depth:
+                return
+            self._depth -= 1
+            if self._depth == 0:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+                self._fd = None
+
+    @contextmanager
+    def hold(self, exclusive: bool = True) -> Iterator[None]:
+        self.acquire(exclusive)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class IndexTaskQueue:
+    """Index updates handed from reader processes to the writer, in a SQLite table.
+
+    Tasks are ``(kind, payload)`` pairs with a JSON payload; the writer takes
+    them in order and deletes them once applied.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=30)
+
+    def put(self, kind: str, payload: Dict[str, Any]) -> int:
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute("INSERT INTO tasks (kind, payload, created_at) VALUES (?, ?, ?)",
+                                      (kind, json.dumps(payload, default=str), time.time()))
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def peek(self, limit: int = 100) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """The oldest ``(id, kind, payload)`` tasks, left in the queue until ``done``."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT id, kind, payload FROM tasks ORDER BY id LIMIT ?", (limit,)).fetchall()
+        finally:
+            conn.close()
+        return [(task_id, kind, json.loads(payload)) for task_id, kind, payload in rows]
+
+    def done(self, task_ids: List[int]):
+        if not task_ids:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("DELETE FROM tasks WHERE id = ?", [(task_id,) for task_id in task_ids])
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        finally:
+            conn.close()
+
+
+class SharedIndex:
+    """Coordination between processes serving one vector store directory.
+
+    Exactly one process is the *writer*: it holds ``writer.lock`` for as long
+    as it lives, owns every index update and, after each one, publishes a new
+    generation number in ``GENERATION``. The other processes are *readers*:
+    they memory-map the published files and reload when the generation
+    changes, and they hand their index updates to the writer through the task
+    queue. When the writer exits its lock is freed and a reader takes over.
+
+    Publishing and loading are serialized by ``publish.lock`` (exclusive for
+    the writer, shared for readers), so a reader never combines files from
+    different generations.
+    """
+
+    def __init__(self, vector_store_dir: Path):
+        self.vector_store_dir = Path(vector_store_dir)
+        self.vector_store_dir.mkdir(parents=True, exist_ok=True)
+        self._writer_lock = FileLock(self.vector_store_dir / WRITER_LOCK_FILE)
+        self._publish_lock = FileLock(self.vector_store_dir / PUBLISH_LOCK_FILE)
+        self.generation_path = self.vector_store_dir / GENERATION_FILE
+        self.tasks = IndexTaskQueue(self.vector_store_dir / TASKS_FILE)
+
+    @property
+    def is_writer(self) -> bool:
+        return self._writer_lock.held
+
+    @property
+    def role(self) -> str:
+        return 'writer' if self.is_writer else 'reader'
+
+    def try_become_writer(self) -> bool:
+        """Take the writer role if no other process holds it."""
+        if self.is_writer:
+            return True
+        if self._writer_lock.acquire(exclusive=True, blocking=False):
+            logger.info(f"✍️ Process {os.getpid()} is the index writer for {self.vector_store_dir}")
+            return True
+        return False
+
+    def release_writer(self):
+        if self.is_writer:
+            self._writer_lock.release()
+
+    def publishing(self):
+        """Held by the writer while it changes files readers load."""
+        return self._publish_lock.hold(exclusive=True)
+
+    def loading(self):
+        """Held by readers while they load a generation."""
+        return self._publish_lock.hold(exclusive=False)
+
+    def read_generation(self) -> Optional[Dict[str, Any]]:
+        """The last published generation, or None if nothing was published yet."""
+        try:
+            with open(self.generation_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read {self.generation_path}: {e}")
+            return None
+
+    def publish(self, **info) -> int:
+        """Announce a new generation to readers; call with the publish lock held."""
+        previous = self.read_generation() or {}
+        generation = int(previous.get('generation', 0)) + 1
+        tmp_path = self.generation_path.with_name(self.generation_path.name + f".tmp{os.getpid()}")
+        with open(tmp_path, 'w') as f:
+            json.dump({'generation': generation, 'published_at': time.time(),
+                       'writer_pid': os.getpid(), **info}, f)
+        os.replace(tmp_path, self.generation_path)
+        return generation
+
+    def get_stats(self) -> Dict[str, Any]:
+        published = self.read_generation() or {}
+        return {
+            'role': self.role,
+            'pid': os.getpid(),
+            'published_generation': published.get('generation'),
+            'writer_pid': published.get('writer_pid'),
+            'pending_tasks': len(self.tasks)
+        }
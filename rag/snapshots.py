@@ -0,0 +1,186 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOTS_DIR = "snapshots"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_json_atomic(path: Path, data: Dict[str, Any]):
+    tmp_path = path.with_name(path.name + f".tmp{os.getpid()}")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SnapshotStore:
+    """Versioned index snapshots of a vector store directory.
+
+    Every full build goes into a new directory ``snapshots/vNNNNNN`` holding
+    the FAISS index, BM25 index, document store and a ``manifest.json`` with
+    the embedding model, dimension, counts and file checksums. ``CURRENT``
+    names the live snapshot and is switched with a rename, so a crash leaves
+    either the old or the new snapshot current, never a mix. Incremental
+    updates write new index files into the current snapshot and then swap in
+    its manifest, which is what commits them.
+
+    Whole-file checksums cover the index files of a full build; files written
+    by incremental saves and the append-only document store files are checked
+    by size, and the latter may be longer than recorded when an update didn't
+    get to write its manifest.
+    """
+
+    def __init__(self, vector_store_dir: Path, keep: Optional[int] = None):
+        self.vector_store_dir = Path(vector_store_dir)
+        self.root = self.vector_store_dir / SNAPSHOTS_DIR
+        self.current_path = self.vector_store_dir / CURRENT_FILE
+        self.keep = config.INDEX_SNAPSHOTS_KEEP if keep is None else keep
+
+    def path(self, version: str) -> Path:
+        return self.root / version
+
+    def current_version(self) -> Optional[str]:
+        try:
+            version = self.current_path.read_text().strip()
+        except FileNotFoundError:
+            return None
+        return version if version and self.path(version).is_dir() else None
+
+    def versions(self) -> List[str]:
+        """Complete snapshots (with a manifest), oldest first."""
+        if not self.root.exists():
+            return []
+        return sorted(entry.name for entry in self.root.iterdir()
+                      if entry.is_dir() and (entry / MANIFEST_FILE).exists())
+
+    def create(self) -> str:
+        """Reserve the directory for a new snapshot; it's not used until it has a manifest and is activated."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        numbers = [int(entry.name[1:]) for entry in self.root.iterdir()
+                   if entry.name.startswith('v') and entry.name[1:].isdigit()]
+        version = f"v{max(numbers, default=0) + 1:06d}"
+        self.path(version).mkdir()
+        return version
+
+    def write_manifest(self, version: str, manifest: Dict[str, Any], checksummed: Iterable[str],
+                       sized: Iterable[str] = ()):
+        """Record ``manifest`` plus checksums of ``checksummed`` and sizes of ``sized`` (relative paths)."""
+        snapshot_dir = self.path(version)
+        files = {}
+        for name in checksummed:
+            path = snapshot_dir / name
+            if path.exists():
+                files[name] = {'size': path.stat().st_size, 'sha256': file_digest(path)}
+        for name in sized:
+            path = snapshot_dir / name
+            if path.exists():
+                files[name] = {'size': path.stat().st_size}
+        write_json_atomic(snapshot_dir / MANIFEST_FILE, {
+            'version': version,
+            'written_at': datetime.now(timezone.utc).isoformat(),
+            **manifest,
+            'files': files
+        })
+
+    def read_manifest(self, version: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path(version) / MANIFEST_FILE, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read manifest of snapshot {version}: {e}")
+            return None
+
+    def verify(self, version: str, checksums: bool = True) -> List[str]:
+        """Problems found with a snapshot (empty if it's intact)."""
+        manifest = self.read_manifest(version)
+        if manifest is None:
+            return ['missing or unreadable manifest']
+        problems = []
+        for name, expected in manifest.get('files', {}).items():
+            path = self.path(version) / name
+            if not path.exists():
+                problems.append(f"{name} is missing")
+                continue
+            size = path.stat().st_size
+            if 'sha256' in expected:
+                if size != expected['size']:
+                    problems.append(f"{name} is {size} bytes, expected {expected['size']}")
+                elif checksums and file_digest(path) != expected['sha256']:
+                    problems.append(f"{name} checksum mismatch")
+            elif size < expected['size']:
+                problems.append(f"{name} is truncated ({size} < {expected['size']} bytes)")
+        return problems
+
+    def activate(self, version: str):
+        """Make ``version`` the current snapshot (atomic)."""
+        tmp_path = self.current_path.with_name(CURRENT_FILE + f".tmp{os.getpid()}")
+        with open(tmp_path, 'w') as f:
+            f.write(version + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.current_path)
+
+    def previous_version(self, version: Optional[str] = None) -> Optional[str]:
+        """The newest complete snapshot older than ``version`` (default: the current one)."""
+        version = version or self.current_version()
+        older = [v for v in self.versions() if version is None or v < version]
+        return older[-1] if older else None
+
+    def prune(self):
+        """Delete all but the newest ``keep`` complete snapshots, and abandoned partial ones.
+
+        Processes that still map files of a deleted snapshot keep a valid view
+        of them until they let go.
+        """
+        current = self.current_version()
+        if current is None or not self.root.exists():
+            return
+        complete = self.versions()
+        keep = set(complete[-max(self.keep, 1):]) | {current}
+        for entry in self.root.iterdir():
+            if not entry.is_dir() or entry.name in keep:
+                continue
+            # Partial snapshots newer than the current one may be builds in progress
+            if entry.name not in complete and entry.name > current:
+                continue
+            logger.info(f"🧹 Removing old index snapshot {entry.name}")
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def describe(self) -> List[Dict[str, Any]]:
+        current = self.current_version()
+        snapshots = []
+        for version in self.versions():
+            manifest = self.read_manifest(version) or {}
+            snapshots.append({
+                'version': version,
+                'current': version == current,
+                'created_at': manifest.get('created_at'),
+                'written_at': manifest.get('written_at'),
+                'vectors': manifest.get('vectors'),
+                'documents': manifest.get('documents'),
+                'embedding': manifest.get('embedding'),
+                'index_type': manifest.get('index_type')
+            })
+        return snapshots
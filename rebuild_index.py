@@ -22,9 +22,9 @@ def rebuild_index():
     # Force rebuild the index
     print("📚 Loading documents...")
     document_source = EmailDocumentSource()
-    documents = document_source.load_documents()
+    documents = document_source.chunk_documents(document_source.load_documents())
     
-    print(f"📄 Found {len(documents)} documents")
+    print(f"📄 Found {len(documents)} chunks")
     
     if not documents:
         print("❌ No documents found. Please ensure emails are processed first.")
@@ -0,0 +1,135 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.async_embedder import RateLimiter, EmbeddingRequestError, create_engine
+
+class StubEmbeddingServer:
+    """Local OpenAI-compatible /embeddings endpoint with scripted failures."""
+
+    def __init__(self, fail_first_for=(), status=429, delay=0.0):
+        self.fail_first_for = set(fail_first_for)
+        self.status = status
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                texts = body['input']
+                with stub._lock:
+                    stub.requests.append(texts)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    fail = texts[0] in stub.fail_first_for
+                    stub.fail_first_for.discard(texts[0])
+                time.sleep(stub.delay)
+                with stub._lock:
+                    stub.in_flight -= 1
+                if fail:
+                    self.send_response(stub.status)
+                    self.send_header('Retry-After', '0')
+                    self.end_headers()
+                    return
+                data = [{'index': i, 'embedding': [float(text.split('-')[1]), 1.0]}
+                        for i, text in reversed(list(enumerate(texts)))]
+                payload = json.dumps({'data': data}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+class TestAsyncEmbeddingEngine:
+    """Test concurrent batching, retries and quota scheduling against a stub server."""
+
+    def _engine(self, stub, **kwargs):
+        options = {'batch_size': 2, 'max_in_flight': 2, 'rate_limiter': RateLimiter(),
+                   'backoff_base': 0.01, 'url': f"{stub.base_url}/embeddings"}
+        options.update(kwargs)
+        return create_engine('openai', 'test-key', 'text-embedding-3-small', **options)
+
+    def test_embeds_in_order_with_bounded_concurrency(self):
+        """Batches run concurrently up to the limit and rows keep input order."""
+        texts = [f"text-{i}" for i in range(7)]
+        with StubEmbeddingServer(delay=0.05) as stub:
+            embeddings = self._engine(stub).embed_sync(texts)
+
+        assert embeddings.dtype == np.float32
+        assert embeddings[:, 0].tolist() == [float(i) for i in range(7)]
+        assert len(stub.requests) == 4
+        assert stub.max_in_flight == 2
+
+    def test_retries_only_the_throttled_batch(self):
+        """A 429 is retried for that batch alone; the other batches are sent once."""
+        texts = [f"text-{i}" for i in range(6)]
+        with StubEmbeddingServer(fail_first_for={'text-2'}) as stub:
+            engine = self._engine(stub)
+            embeddings = engine.embed_sync(texts)
+
+        assert embeddings[:, 0].tolist() == [float(i) for i in range(6)]
+        assert [batch[0] for batch in stub.requests].count('text-2') == 2
+        assert len(stub.requests) == 4
+        assert engine.stats['rate_limited'] == 1
+
+    def test_gives_up_after_max_retries(self):
+        """Persistent server errors surface as EmbeddingRequestError."""
+        with StubEmbeddingServer(fail_first_for={'text-0'}, status=503) as stub:
+            engine = self._engine(stub, max_retries=0)
+            with pytest.raises(EmbeddingRequestError):
+                engine.embed_sync(['text-0', 'text-1'])
+
+    def test_client_error_cancels_other_batches(self):
+        """A 4xx isn't retried and the batches still waiting are never sent."""
+        texts = [f"text-{i}" for i in range(6)]
+        with StubEmbeddingServer(fail_first_for={'text-0'}, status=400, delay=0.05) as stub:
+            engine = self._engine(stub, max_in_flight=1)
+            with pytest.raises(EmbeddingRequestError):
+                engine.embed_sync(texts)
+
+        # The second batch may have been on its way when the first failed; the last never goes out
+        assert stub.requests[0] == ['text-0', 'text-1']
+        assert ['text-4', 'text-5'] not in stub.requests
+
+    def test_rate_limiter_waits_for_budget(self):
+        """Requests beyond the per-minute budget have to wait for a refill."""
+        limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+
+        assert limiter.reserve(100) == 0
+        assert limiter.reserve(600) > 0
+        limiter.block_for(5)
+        assert limiter.reserve(1) > 4
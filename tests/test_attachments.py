@@ -0,0 +1,119 @@
+import time
+import tempfile
+import shutil
+import hashlib
+import subprocess
+from concurrent.futures import Future
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from ingestion_api import attachments
+from ingestion_api.attachments import AttachmentExtractor
+
+class TestAttachmentExtractor:
+    """Test attachment extraction budgets and the SHA-256 result cache."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.extractor = AttachmentExtractor(workers=0, timeout=0.2, max_pages=3, pages_per_task=2,
+                                             cache_path=Path(self.temp_dir) / 'attachment_cache.db')
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        self.extractor.shutdown()
+        shutil.rmtree(self.temp_dir)
+
+    def test_duplicate_attachment_comes_from_cache(self):
+        """An attachment seen before isn't extracted again."""
+        data = b'%PDF-1.4 forwarded deck'
+        self.extractor._cache_set(hashlib.sha256(data).hexdigest(), 'application/pdf',
+                                  {'text': 'Q3 roadmap', 'pages': 2, 'pages_total': 2})
+
+        with patch.object(self.extractor, '_start', side_effect=AssertionError("extracted twice")):
+            result = self.extractor.extract('application/pdf', data)
+
+        assert result['cached'] and result['text'] == 'Q3 roadmap'
+        assert not result['truncated']
+
+    def test_time_budget_keeps_finished_work_only(self):
+        """Tasks still running at the deadline are dropped, and the partial result isn't cached."""
+        def start(content_type, data, result):
+            finished = Future()
+            finished.set_result(['page one'])
+            result['pages_total'] = 4
+            return [finished, Future()]
+
+        with patch.object(self.extractor, '_start', side_effect=start):
+            result = self.extractor.extract('application/pdf', b'slow deck')
+
+        assert result['truncated'] and result['text'] == 'page one' and result['pages'] == 1
+        assert self.extractor._cache_get(result['sha256']) is None
+
+    def test_missing_library_is_reported(self):
+        """Without an OCR engine the attachment gets a note instead of text."""
+        with patch.object(attachments, 'TESSERACT_AVAILABLE', False):
+            result = self.extractor.extract('image/png', b'\x89PNG')
+        assert result['text'] == "OCR not available (pytesseract not installed)"
+
+    def test_pdf_page_budget(self):
+        """Only the first max_pages pages of a PDF are read, in page-range tasks."""
+        fitz = pytest.importorskip('fitz')
+        doc = fitz.open()
+        for page_num in range(5):
+            doc.new_page().insert_text((72, 72), f"Slide {page_num + 1}")
+        data = doc.tobytes()
+        doc.close()
+
+        result = self.extractor.extract('application/pdf', data)
+
+        assert result['pages'] == 3 and result['pages_total'] == 5 and result['truncated']
+        assert 'Slide 3' in result['text'] and 'Slide 4' not in result['text']
+
+class TestAttachmentWorkers:
+    """Test the process pool behind attachment extraction."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.extractor = AttachmentExtractor(workers=1, timeout=2.0,
+                                             cache_path=Path(self.temp_dir) / 'attachment_cache.db')
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        self.extractor.shutdown()
+        shutil.rmtree(self.temp_dir)
+
+    def test_timed_out_worker_is_killed(self):
+        """A task still running at the deadline doesn't keep its worker busy; later work gets a fresh pool."""
+        stuck = []
+        def start(content_type, data, result):
+            future = self.extractor._submit(time.sleep, 60)
+            stuck.extend(self.extractor._pool._processes.values())
+            return [future]
+
+        with patch.object(self.extractor, '_start', side_effect=start):
+            result = self.extractor.extract('image/png', b'huge scan')
+        assert result['truncated'] and stuck
+
+        with patch.object(self.extractor, '_start', lambda content_type, data, result: [
+                self.extractor._submit(str.upper, 'ocr text')]):
+            assert self.extractor.extract('image/png', b'small scan')['text'] == 'OCR TEXT'
+
+        deadline = time.time() + 5
+        while any(process.is_alive() for process in stuck) and time.time() < deadline:
+            time.sleep(0.05)
+        assert not any(process.is_alive() for process in stuck)
+
+    def test_worker_import_does_not_load_the_api(self):
+        """Spawned workers import this module without starting the FastAPI app."""
+        code = "import sys, ingestion_api.attachments; print('ingestion_api.main' in sys.modules)"
+        output = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent.parent,
+                                capture_output=True, text=True, check=True).stdout
+        assert output.strip().splitlines()[-1] == 'False'
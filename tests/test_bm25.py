@@ -0,0 +1,229 @@
+import os
+import tempfile
+import shutil
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from rag.config import config
+from rag.document_source import EmailDocumentSource
+from rag.retriever import FAISSRetriever
+from ingestion_api.database import EmailDatabase
+from ingestion_api.models import EmailMetadata
+from tests.test_retriever import make_doc
+
+TEXTS = [
+    'agents are reshaping software teams',
+    'the zorblax pricing memo leaked',
+    'agents agents agents and more agents',
+    'sourdough starter hydration',
+]
+
+class TestBM25Index:
+    """Test BM25 scoring, updates and persistence of the inverted index."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.index = BM25Index()
+        self.index.add(range(len(TEXTS)), TEXTS)
+
+    def test_rare_terms_rank_first(self):
+        """An exact rare name outweighs common words."""
+        scores, doc_ids = self.index.search('what did zorblax say about agents', k=4)
+
+        assert doc_ids[0] == 1
+        assert set(doc_ids.tolist()) == {0, 1, 2}
+        assert list(scores) == sorted(scores, reverse=True)
+        assert 'the' not in tokenize('The memo')
+
+    def test_mask_and_remove(self):
+        """Masked-out and removed documents are never returned."""
+        mask = np.array([True, False, True, True])
+        assert 1 not in self.index.search('zorblax agents', k=4, mask=mask)[1]
+
+        self.index.remove([1], [TEXTS[1]])
+
+        assert len(self.index.search('zorblax', k=4)[1]) == 0
+        assert len(self.index) == 3
+
+    def test_save_and_load(self):
+        """A reloaded index scores exactly like the original."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = Path(temp_dir) / 'bm25.npz'
+            self.index.save(path)
+            loaded = BM25Index.load(path)
+
+            for query in ('zorblax', 'agents teams', 'hydration'):
+                expected, actual = self.index.search(query, k=4), loaded.search(query, k=4)
+                assert np.allclose(expected[0], actual[0])
+                assert expected[1].tolist() == actual[1].tolist()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_loaded_index_is_mapped_and_updatable(self):
+        """Loading maps the saved arrays; later adds and removes work on top of them."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = Path(temp_dir) / 'bm25.npz'
+            self.index.save(path)
+            loaded = BM25Index.load(path)
+
+            assert isinstance(loaded._ids, np.memmap) and not loaded._postings
+            assert loaded.get_stats() == self.index.get_stats()
+
+            for index in (self.index, loaded):
+                index.remove([1], [TEXTS[1]])
+                index.add([4], ['zorblax returns with agents'])
+            expected = self.index.search('zorblax agents', k=4)[1].tolist()
+            assert loaded.search('zorblax agents', k=4)[1].tolist() == expected
+            assert loaded.get_stats() == self.index.get_stats()
+
+            loaded.save(path)
+            reloaded = BM25Index.load(path)
+            assert reloaded.search('zorblax', k=4)[1].tolist() == [4]
+            assert reloaded.get_stats() == self.index.get_stats()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_reciprocal_rank_fusion(self):
+        """IDs ranked well in both lists beat IDs ranked first in only one."""
+        fused = reciprocal_rank_fusion([[1, 2, 3], [2, 4]], k=60)
+
+        assert [doc_id for doc_id, _ in fused] == [2, 1, 4, 3]
+
+class TopicEmbedder:
+    """Embeds by topic, so 'agentic' posts are close to questions about agents but share no words."""
+
+    def embed_texts(self, texts):
+        return np.array([self.embed_single_text(text) for text in texts], dtype=np.float32)
+
+    def embed_single_text(self, text):
+        return np.array([float('agent' in text), 0.3 * ('zorblax' in text), 1.0, 0.0], dtype=np.float32)
+
+class TestHybridRetrieval:
+    """Test that the retriever fuses lexical hits into vector search."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.retriever = FAISSRetriever(Path(self.temp_dir), TopicEmbedder())
+        documents = [make_doc(f'email-{i}', f'agentic workflows update {i}') for i in range(5)]
+        documents.append(make_doc('email-zorblax', 'zorblax pricing memo'))
+        self.retriever.build_index(documents, force_rebuild=True, show_progress=False)
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def search_ids(self, retriever):
+        results = retriever.search('what did zorblax say about agents', k=3, score_threshold=0.1)
+        return [r['metadata']['email_id'] for r in results]
+
+    def test_exact_name_is_recalled(self):
+        """A name the vector search ranks too low is found through BM25."""
+        with patch.object(config, 'HYBRID_SEARCH_ENABLED', False):
+            assert 'email-zorblax' not in self.search_ids(self.retriever)
+        self.retriever.clear_cache()
+
+        assert 'email-zorblax' in self.search_ids(self.retriever)
+
+    def test_lexical_index_follows_the_vector_index(self):
+        """The BM25 index is persisted with the index and updated on removal."""
+        reloaded = FAISSRetriever(Path(self.temp_dir), TopicEmbedder())
+        reloaded._load_existing_index()
+        assert 'email-zorblax' in self.search_ids(reloaded)
+
+        reloaded.remove_emails(['email-zorblax'])
+
+        assert len(reloaded.bm25.search('zorblax', k=3)[1]) == 0
+        assert 'email-zorblax' not in self.search_ids(reloaded)
+
+class TestEmailFileCache:
+    """Test the parsed email files kept in memory for keyword search."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = EmailDocumentSource()
+        self.source._file_cache_max_size = 26
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, content):
+        path = Path(self.temp_dir) / name
+        path.write_text(content)
+        return str(path)
+
+    def test_cache_is_bounded_and_follows_file_changes(self):
+        """The least recently read files are dropped past the size cap, and rewritten files are re-read."""
+        first = self.write('a.txt', 'agents ' * 2)
+        second = self.write('b.txt', 'retention')
+        self.source._read_email_file(first)
+        self.source._read_email_file(second)
+        self.source._read_email_file(first)
+        third = self.write('c.txt', 'zorblax memo')
+
+        assert self.source._read_email_file(third) == 'zorblax memo'
+        assert list(self.source._file_cache) == [first, third]
+        assert self.source._file_cache_size == len('agents ' * 2) + len('zorblax memo')
+
+        Path(first).write_text('pricing')
+        os.utime(first, ns=(0, 0))
+        assert self.source._read_email_file(first) == 'pricing'
+        assert self.source._file_cache_size == len('pricing') + len('zorblax memo')
+
+        os.remove(third)
+        with pytest.raises(OSError):
+            self.source._read_email_file(third)
+        assert list(self.source._file_cache) == [first]
+
+class TestKeywordSearchCache:
+    """Test that keyword-search indexes are reused until the email database changes."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = EmailDatabase(str(Path(self.temp_dir) / 'emails.db'))
+        self.patcher = patch('rag.document_source.db', self.db)
+        self.patcher.start()
+        self.source = EmailDocumentSource()
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        self.patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def insert(self, name, content):
+        path = Path(self.temp_dir) / f"{name}.txt"
+        path.write_text(content)
+        email = EmailMetadata(subject=name, sender='test@example.com', date=datetime.utcnow(),
+                              label='substack.com', parsed_path=str(path))
+        self.db.insert_email(email)
+        return email
+
+    def test_index_is_reused_until_emails_change(self):
+        """Repeat searches don't reload emails; an insert or delete makes the next search rebuild."""
+        self.insert('agents', 'agents are reshaping software teams')
+        with patch.object(self.source, 'load_documents', wraps=self.source.load_documents) as load:
+            assert self.source.search_documents('agents')[0].metadata['subject'] == 'agents'
+            assert self.source.search_documents('agents')[0].metadata['subject'] == 'agents'
+            assert load.call_count == 1
+
+            memo = self.insert('memo', 'the zorblax pricing memo leaked')
+            assert self.source.search_documents('zorblax')[0].metadata['subject'] == 'memo'
+            assert load.call_count == 2
+
+            self.db.delete_email(memo.id)
+            assert all(doc.metadata['subject'] != 'memo' for doc in self.source.search_documents('zorblax'))
+            assert load.call_count == 3
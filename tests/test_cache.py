@@ -0,0 +1,119 @@
+import tempfile
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.cache import QueryCache, label_tag, ALL
+from rag.retriever import FAISSRetriever
+from tests.test_retriever import HashEmbedder, make_doc
+
+class TestQueryCache:
+    """Test LRU, TTL and tag-based invalidation of the query cache."""
+
+    def test_lru_eviction(self):
+        """The least recently used entry goes first."""
+        cache = QueryCache('test', max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert 'a' in cache and 'c' in cache
+        assert 'b' not in cache
+        assert cache.get_stats()['evictions'] == 1
+
+    def test_ttl_expiry(self):
+        """Entries older than the TTL are misses."""
+        cache = QueryCache('test', ttl_seconds=10)
+        with patch('rag.cache.time.monotonic', return_value=100.0):
+            cache.set('a', 1)
+        with patch('rag.cache.time.monotonic', return_value=105.0):
+            assert cache.get('a') == 1
+        with patch('rag.cache.time.monotonic', return_value=111.0):
+            assert cache.get('a') is None
+
+        assert cache.get_stats()['expirations'] == 1
+
+    def test_byte_budget(self):
+        """Entries are evicted to stay under the byte budget."""
+        cache = QueryCache('test', max_bytes=20000)
+        for i in range(10):
+            cache.set(i, 'x' * 5000)
+
+        assert len(cache) < 10
+        assert cache.get_stats()['bytes'] <= 20000
+
+    def test_bump_only_drops_affected_labels(self):
+        """A change to one label keeps results filtered to other labels."""
+        cache = QueryCache('test')
+        cache.set('all', 1, (ALL,))
+        cache.set('news', 2, (label_tag('news'),))
+        cache.set('other', 3, (label_tag('other'),))
+
+        cache.bump([label_tag('news')])
+
+        assert 'all' not in cache and 'news' not in cache
+        assert cache.get('other') == 3
+
+    def test_stale_snapshot_is_not_stored(self):
+        """A result computed across an invalidation is not cached."""
+        cache = QueryCache('test')
+        snapshot = cache.snapshot((label_tag('news'),))
+        cache.bump([label_tag('news')])
+
+        assert not cache.set('news', 2, (label_tag('news'),), snapshot)
+        assert cache.set('news', 2, (label_tag('news'),), cache.snapshot((label_tag('news'),)))
+
+class TestRetrieverCacheInvalidation:
+    """Test that ingest invalidates cached search results."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.retriever = FAISSRetriever(Path(self.temp_dir), HashEmbedder())
+        self.retriever.build_index([
+            make_doc('email-1', 'agents are reshaping software teams', label='news'),
+            make_doc('email-2', 'retention is the situationship of saas', label='other'),
+        ], force_rebuild=True, show_progress=False)
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_new_email_is_found_after_cached_search(self):
+        """Adding an email invalidates searches that could now return it."""
+        assert self.retriever.search('microplastics kitchen', k=1, label='news') == []
+
+        self.retriever.add_documents([make_doc('email-3', 'microplastics in your kitchen', label='news')])
+
+        results = self.retriever.search('microplastics kitchen', k=1, label='news')
+        assert results[0]['metadata']['email_id'] == 'email-3'
+
+    def test_other_labels_stay_cached(self):
+        """Ingest into one label keeps cached searches of other labels."""
+        attached = QueryCache('answers')
+        self.retriever.attach_cache(attached)
+        attached.set('other-answer', 'cached', (label_tag('other'),))
+        self.retriever.search('retention saas', k=1, label='other')
+        generation = self.retriever.generation
+
+        self.retriever.add_documents([make_doc('email-3', 'microplastics in your kitchen', label='news')])
+        self.retriever.search('retention saas', k=1, label='other')
+
+        assert self.retriever.generation == generation + 1
+        assert self.retriever.stats['cache_hits'] == 1
+        assert attached.get('other-answer') == 'cached'
+
+    def test_remove_invalidates_attached_caches(self):
+        """Removing an email drops cached answers that may cite it."""
+        attached = QueryCache('answers')
+        self.retriever.attach_cache(attached)
+        attached.set('news-answer', 'cached', (label_tag('news'),))
+
+        self.retriever.remove_emails(['email-1'])
+
+        assert 'news-answer' not in attached
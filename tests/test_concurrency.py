@@ -0,0 +1,76 @@
+import time
+import asyncio
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from ingestion_api.concurrency import BlockingPool, PoolSaturatedError
+
+class TestBlockingPool:
+    """Test that blocking work is offloaded and bounded."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.pool = BlockingPool("test", max_workers=2, queue_timeout=0.05)
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        self.pool.shutdown()
+
+    def test_event_loop_stays_responsive(self):
+        """Other coroutines keep running while a blocking call is in flight."""
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            task = asyncio.create_task(ticker())
+            result = await self.pool.run(lambda: time.sleep(0.2) or 'done')
+            task.cancel()
+            return result, ticks
+
+        result, ticks = asyncio.run(scenario())
+
+        assert result == 'done'
+        assert ticks >= 10
+
+    def test_rejects_when_saturated(self):
+        """Callers beyond the limit wait for the queue timeout, then get rejected."""
+        async def scenario():
+            calls = [self.pool.run(time.sleep, 0.3) for _ in range(3)]
+            return await asyncio.gather(*calls, return_exceptions=True)
+
+        results = asyncio.run(scenario())
+
+        assert sum(isinstance(result, PoolSaturatedError) for result in results) == 1
+        assert self.pool.get_stats()['rejected'] == 1
+
+    def test_waiting_caller_gets_freed_slot(self):
+        """A queued call runs once a worker frees up within the timeout."""
+        pool = BlockingPool("test-wait", max_workers=1, queue_timeout=1.0)
+
+        async def scenario():
+            return await asyncio.gather(pool.run(time.sleep, 0.1), pool.run(lambda: 'second'))
+
+        try:
+            assert asyncio.run(scenario())[1] == 'second'
+            assert pool.get_stats()['completed'] == 2
+        finally:
+            pool.shutdown()
+
+    def test_exceptions_propagate(self):
+        """Errors raised on the worker surface in the caller."""
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            asyncio.run(self.pool.run(fail))
+        assert self.pool.get_stats()['failed'] == 1
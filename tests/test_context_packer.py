@@ -0,0 +1,91 @@
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.config import config
+from rag.context_packer import ContextPacker, TokenCounter, TRIM_MARKER, estimate_tokens
+from rag.generator import MultiProviderGenerator
+from rag.provider_router import ProviderRouter, Route
+
+MODEL = 'tiny-model'
+
+def make_doc(i, words=60):
+    return {'content': ' '.join(f"chunk{i}-word{j}" for j in range(words)),
+            'metadata': {'sender': f"sender{i}@example.com", 'subject': f"Subject {i}"}}
+
+class TestContextPacker:
+    """Test that prompts are packed to the model's context window."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        counter = TokenCounter('estimate', estimate_tokens, exact=False)
+        self.packer = ContextPacker(counter_for=lambda model: counter)
+        self.counter = counter
+        self.windows = patch.dict(config.MODEL_CONTEXT_WINDOWS, {MODEL: 2000})
+        self.windows.start()
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        self.windows.stop()
+
+    def test_everything_fits(self):
+        """Small contexts are passed through untouched."""
+        docs = [make_doc(i, words=5) for i in range(3)]
+
+        packed = self.packer.pack("What was decided?", docs, "Prefers short replies", MODEL, 256)
+
+        assert packed.docs == docs
+        assert packed.dropped == packed.trimmed == 0
+        assert "Prefers short replies" in packed.prompt
+
+    def test_lowest_ranked_chunks_dropped(self):
+        """Overflow drops the tail of the ranking; the question and budget hold."""
+        docs = [make_doc(i) for i in range(20)]
+
+        packed = self.packer.pack("What was decided about the launch?", docs, None, MODEL, 256)
+
+        assert 0 < len(packed.docs) < len(docs)
+        assert packed.docs[0] == docs[0]
+        assert packed.dropped == len(docs) - len(packed.docs)
+        assert "What was decided about the launch?" in packed.prompt
+        assert "chunk19-word0" not in packed.prompt
+        assert self.counter.count(packed.prompt) <= packed.budget
+
+    def test_partial_chunk_is_marked(self):
+        """The first chunk that doesn't fit is cut down rather than dropped outright."""
+        docs = [make_doc(0, words=2000)]
+
+        packed = self.packer.pack("Summarise", docs, None, MODEL, 256)
+
+        assert packed.trimmed == 1
+        assert packed.docs[0]['content'].endswith(TRIM_MARKER)
+        assert packed.docs[0]['content'].startswith("chunk0-word0 ")
+        assert self.counter.count(packed.prompt) <= packed.budget
+
+    def test_fit_prompt_keeps_head_and_tail(self):
+        """Free-form prompts lose their middle, not their closing instruction."""
+        prompt = "Emails:\n" + make_doc(0, words=3000)['content'] + "\n\nSummary:"
+
+        fitted = self.packer.fit_prompt(prompt, MODEL, 256)
+
+        assert fitted.startswith("Emails:\nchunk0-word0")
+        assert fitted.endswith("Summary:")
+        assert self.counter.count(fitted) <= int((2000 - 256 - 16) * (1 - config.APPROXIMATE_TOKEN_MARGIN))
+
+    def test_generator_fits_free_form_prompts(self):
+        """Summary, topic and sentiment prompts are fitted to the route's model before sending."""
+        sent = []
+        generator = MultiProviderGenerator()
+        generator.packer = self.packer
+        generator.router = ProviderRouter([Route('tiny', 'groq', MODEL,
+                                                 lambda prompt, *args: sent.append(prompt) or 'ok')], hedge=False)
+        prompt = "Emails:\n" + make_doc(0, words=3000)['content'] + "\n\nSummary:"
+
+        result = generator._generate(prompt, 256, 0.3)
+
+        assert result['response'] == 'ok'
+        assert sent == [self.packer.fit_prompt(prompt, MODEL, 256)]
+        assert len(sent[0]) < len(prompt)
@@ -0,0 +1,75 @@
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.embedder import HybridEmbedder, embed_in_batches
+
+class TestEmbedInBatches:
+    """Test the shared batching layer used by every provider."""
+
+    def test_one_call_per_batch(self):
+        """Texts are sent in provider-sized batches and stacked into one array."""
+        calls = []
+
+        def embed(batch):
+            calls.append(len(batch))
+            return [[float(len(text)), 1.0] for text in batch]
+
+        embeddings = embed_in_batches(['a', 'bb', 'ccc', 'dddd', 'eeeee'], embed, batch_size=2)
+
+        assert calls == [2, 2, 1]
+        assert embeddings.dtype == np.float32
+        assert embeddings.flags['C_CONTIGUOUS']
+        assert embeddings[:, 0].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+    def test_non_positive_batch_size_sends_one_text_per_call(self):
+        """A batch size below 1 is treated as 1 instead of sending empty batches."""
+        calls = []
+
+        def embed(batch):
+            calls.append(list(batch))
+            return [[1.0, 0.0] for _ in batch]
+
+        embeddings = embed_in_batches(['a', 'b'], embed, batch_size=0)
+
+        assert calls == [['a'], ['b']]
+        assert embeddings.shape == (2, 2)
+
+    def test_short_batch_raises(self):
+        """A provider returning too few vectors is an error, not silent misalignment."""
+        with pytest.raises(ValueError):
+            embed_in_batches(['a', 'b'], lambda batch: [[0.0, 1.0]], batch_size=2)
+
+class TestHybridEmbedderCache:
+    """Test that cached rows and fresh batches are merged into one array."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.embedder = HybridEmbedder(cache_dir=Path(self.temp_dir))
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_only_misses_reach_provider(self):
+        """The provider is called once, with only the uncached texts."""
+        requested = []
+
+        def embed(batch):
+            requested.append(list(batch))
+            return np.full((len(batch), 768), len(requested), dtype=np.float32)
+
+        self.embedder._embed_with_cache('nomic', ['alpha', 'beta'], True, embed)
+        embeddings = self.embedder._embed_with_cache('nomic', ['beta', 'gamma', 'alpha'], True, embed)
+
+        assert requested == [['alpha', 'beta'], ['gamma']]
+        assert embeddings.shape == (3, 768)
+        assert embeddings[:, 0].tolist() == [1.0, 2.0, 1.0]
@@ -0,0 +1,69 @@
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.embedding_cache import EmbeddingCache
+
+class TestEmbeddingCache:
+    """Test the memory-mapped embedding cache."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def _cache(self, max_entries: int = 4) -> EmbeddingCache:
+        return EmbeddingCache(Path(self.temp_dir), "test", "model/v1", 3, max_entries=max_entries)
+
+    def test_put_and_get(self):
+        """Cached vectors come back for the same text only."""
+        cache = self._cache()
+        cache.put_many(["alpha", "beta"], np.array([[1, 0, 0], [0, 1, 0]], dtype=np.float32))
+
+        vectors, hits = cache.get_many(["beta", "gamma", "alpha"])
+
+        assert hits.tolist() == [True, False, True]
+        assert vectors[0].tolist() == [0.0, 1.0, 0.0]
+        assert vectors[2].tolist() == [1.0, 0.0, 0.0]
+        assert cache.get("gamma") is None
+
+    def test_persists_across_reopen(self):
+        """Entries survive closing and reopening the cache directory."""
+        self._cache().put("alpha", [0.5, 0.5, 0.0])
+
+        reopened = self._cache()
+
+        assert len(reopened) == 1
+        assert reopened.get("alpha").tolist() == [0.5, 0.5, 0.0]
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted when the cache is full."""
+        cache = self._cache(max_entries=2)
+        cache.put("a", [1, 0, 0])
+        cache.put("b", [0, 1, 0])
+        cache.get("a")  # "b" is now the least recently used
+        cache.put("c", [0, 0, 1])
+
+        assert len(cache) == 2
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+        assert cache.stats['evictions'] == 1
+
+    def test_rejects_wrong_dimension(self):
+        """Vectors with the wrong dimension are not cached."""
+        cache = self._cache()
+
+        written = cache.put_many(["a"], np.zeros((1, 5), dtype=np.float32))
+
+        assert written == 0
+        assert len(cache) == 0
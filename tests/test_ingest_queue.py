@@ -0,0 +1,103 @@
+import tempfile
+import shutil
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from ingestion_api.ingest_queue import IngestQueue, QueueFullError
+
+def make_email(message_id, body='Hello'):
+    headers = f"Message-ID: {message_id}\r\n" if message_id else ""
+    return (headers + "From: writer@substack.com\r\nSubject: Test\r\n\r\n" + body).encode()
+
+class TestIngestQueue:
+    """Test the durable queue between /inbound-email and the ingest workers."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.handled = []
+        self.failures = 0
+        self.queue = IngestQueue(Path(self.temp_dir) / 'ingest_queue.db', self.handle,
+                                 max_pending=2, max_attempts=2, retry_base_seconds=0)
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        self.queue.shutdown()
+        shutil.rmtree(self.temp_dir)
+
+    def handle(self, item_id, raw_email):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("OCR crashed")
+        self.handled.append((item_id, raw_email))
+        return {'status': 'done', 'message': 'ok'}
+
+    def test_message_id_is_idempotency_key(self):
+        """Re-sending an email with the same Message-ID returns the existing item."""
+        item, created = self.queue.enqueue(make_email('<a@example.com>'))
+        again, created_again = self.queue.enqueue(make_email('<a@example.com>', body='Resent'))
+        assert created and not created_again
+        assert again['id'] == item['id']
+
+        # Without a Message-ID, identical bytes are the same email
+        assert self.queue.enqueue(make_email(None))[1]
+        assert not self.queue.enqueue(make_email(None))[1]
+
+    def test_backpressure_when_full(self):
+        """Once max_pending emails wait, new ones are rejected until the workers catch up."""
+        self.queue.enqueue(make_email('<a@example.com>'))
+        self.queue.enqueue(make_email('<b@example.com>'))
+        with pytest.raises(QueueFullError):
+            self.queue.enqueue(make_email('<c@example.com>'))
+
+        assert self.queue.process_next()
+        assert self.queue.enqueue(make_email('<c@example.com>'))[1]
+
+    def test_failed_item_is_retried_then_given_up(self):
+        """A failing email is retried, and marked failed after max_attempts."""
+        item, _ = self.queue.enqueue(make_email('<a@example.com>'))
+        self.failures = 1
+        self.queue.process_next()
+        assert self.queue.get(item['id'])['status'] == 'pending'
+        self.queue.process_next()
+        done = self.queue.get(item['id'])
+        assert done['status'] == 'done' and done['attempts'] == 2
+        assert [item_id for item_id, _ in self.handled] == [item['id']]
+
+        failing, _ = self.queue.enqueue(make_email('<b@example.com>'))
+        self.failures = 2
+        self.queue.process_next()
+        self.queue.process_next()
+        failed = self.queue.get(failing['id'])
+        assert failed['status'] == 'failed' and failed['error'] == 'OCR crashed'
+
+    def test_unfinished_items_are_recovered(self):
+        """Items claimed by a worker that stopped are processed on the next start."""
+        item, _ = self.queue.enqueue(make_email('<a@example.com>'))
+        assert self.queue.claim()[0] == item['id']
+
+        restarted = IngestQueue(self.queue.db_path, self.handle)
+        assert restarted.recover() == 1
+        assert restarted.process_next()
+        assert restarted.get(item['id'])['status'] == 'done'
+
+    def test_failed_email_can_be_resent(self):
+        """Re-sending an email that exhausted its attempts queues it again with fresh attempts."""
+        item, _ = self.queue.enqueue(make_email('<a@example.com>'))
+        self.failures = 2
+        self.queue.process_next()
+        self.queue.process_next()
+        assert self.queue.get(item['id'])['status'] == 'failed'
+
+        again, created = self.queue.enqueue(make_email('<a@example.com>'))
+        assert created and again['id'] == item['id']
+        assert again['status'] == 'pending' and again['attempts'] == 0 and again['error'] is None
+
+        assert self.queue.process_next()
+        assert self.queue.get(item['id'])['status'] == 'done'
+        assert [raw for _, raw in self.handled] == [make_email('<a@example.com>')]
@@ -195,6 +195,29 @@ class TestEmailDatabase:
         assert "AI" in labels
         assert "Fintech" in labels
         assert len(labels) == 2
+    
+    def test_removed_emails_lose_their_parsed_file(self):
+        """Deleted and evicted emails have their parsed file removed, so a rebuild can't index them again."""
+        def insert(name, date):
+            path = Path(self.temp_dir) / f"{name}.txt"
+            path.write_text(name)
+            email = EmailMetadata(subject=name, sender="test@example.com", date=date,
+                                  label="AI", parsed_path=str(path))
+            assert self.db.insert_email(email)
+            return email, path
+        
+        evicted = []
+        self.db.add_delete_listener(evicted.extend)
+        emails = [insert(f"recent-{i}", datetime(2025, 10, 1 + i % 28, i % 24)) for i in range(100)]
+        old, old_path = insert("old", datetime(2025, 1, 1))
+        
+        # Older than the 100 kept: evicted right away
+        assert self.db.get_email_by_id(old.id) is None
+        assert evicted == [old.id] and not old_path.exists()
+        
+        email, path = emails[0]
+        assert self.db.delete_email(email.id)
+        assert not path.exists()
 
 if __name__ == "__main__":
     # Run basic tests
@@ -53,7 +53,8 @@ class TestCompleteSystem:
                 headers={"Content-Type": "message/rfc822"},
                 timeout=10
             )
-            assert response.status_code == 200
+            # 202: queued for processing, 200: already received
+            assert response.status_code in (200, 202)
             print("✅ Email ingestion successful")
             
             # Wait a moment for processing
@@ -0,0 +1,128 @@
+import time
+import tempfile
+import shutil
+import sqlite3
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.config import config
+from rag.email_pipeline import EmailRAGPipeline
+from rag.jobs import JobStore
+from tests.test_retriever import HashEmbedder, make_doc
+
+def wait_for(store, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get(job_id)
+        if job['status'] not in ('queued', 'running'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+class TestJobStore:
+    """Test job deduplication, progress and abandoned jobs."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = JobStore(Path(self.temp_dir) / 'jobs.db')
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_active_job_is_deduplicated(self):
+        """A second submit while a job is active returns that job; after it finishes a new one starts."""
+        job, created = self.store.submit('rebuild')
+        again, created_again = self.store.submit('rebuild')
+        assert created and not created_again
+        assert again['id'] == job['id']
+
+        self.store.run(job['id'], lambda progress: progress(documents_embedded=3) or {'documents': 3})
+        finished = self.store.get(job['id'])
+        assert finished['status'] == 'succeeded'
+        assert finished['progress'] == {'documents_embedded': 3}
+        assert finished['result'] == {'documents': 3}
+
+        assert self.store.submit('rebuild')[1]
+
+    def test_abandoned_job_is_failed(self):
+        """A running job whose worker process is gone no longer blocks new ones."""
+        job, _ = self.store.submit('rebuild')
+        self.store.start(job['id'])
+        conn = sqlite3.connect(str(self.store.path))
+        with conn:
+            conn.execute("UPDATE jobs SET pid = ? WHERE id = ?", (2 ** 22 + 1, job['id']))
+        conn.close()
+
+        new_job, created = self.store.submit('rebuild')
+        assert created and new_job['id'] != job['id']
+        assert self.store.get(job['id'])['status'] == 'failed'
+
+    def test_job_never_started_is_failed(self):
+        """A job left queued (its runner never picked it up) stops blocking new ones once stale."""
+        job, _ = self.store.submit('rebuild')
+        with patch.object(config, 'JOB_STALE_SECONDS', 0.0):
+            time.sleep(0.01)
+            new_job, created = self.store.submit('rebuild')
+        assert created and new_job['id'] != job['id']
+        expired = self.store.get(job['id'])
+        assert expired['status'] == 'failed' and 'not started' in expired['error']
+        assert not self.store.start(job['id'])
+
+class TestBackgroundRebuild:
+    """Test /refresh rebuilds running as background jobs on the pipeline."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.patch = patch.object(config, 'INDEX_MODE', 'single')
+        self.patch.start()
+        self.pipeline = EmailRAGPipeline(data_dir=self.temp_dir)
+        self.pipeline._embedder = HashEmbedder()
+        self.pipeline.retriever.build_index([make_doc('email-1', 'agents are reshaping software teams')],
+                                            force_rebuild=True, show_progress=False)
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        self.patch.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_rebuild_reports_progress_and_keeps_concurrent_updates(self):
+        """The rebuild swaps in a new index, and an email indexed meanwhile survives the swap."""
+        corpus = [make_doc('email-1', 'agents are reshaping software teams'),
+                  make_doc('email-2', 'retention is the situationship of saas')]
+
+        def load_documents(batch_size=50):
+            # An email arrives while the rebuild is under way
+            self.pipeline.index_email('email-3', 'unused')
+            return corpus
+
+        with patch.object(self.pipeline, '_batch_load_documents', load_documents), \
+                patch.object(self.pipeline, '_documents_for_email',
+                             lambda email_id, path, metadata=None: [make_doc(email_id, 'agents shipping code')]):
+            job = self.pipeline.refresh_index()
+            job = wait_for(self.pipeline.jobs, job['id'])
+
+        assert job['status'] == 'succeeded', job['error']
+        assert job['progress']['documents_embedded'] == 2
+        assert job['progress']['chunks_indexed'] == 2
+        assert job['result']['replayed_updates'] == 1
+        assert job['result']['snapshot'] == self.pipeline.retriever.snapshot_version
+        for email_id in ('email-1', 'email-2', 'email-3'):
+            assert self.pipeline.retriever.has_email(email_id)
+
+    def test_rebuild_can_run_in_the_request(self):
+        """With wait=True the rebuild runs in the caller and the finished job is returned."""
+        corpus = [make_doc('email-1', 'agents are reshaping software teams'),
+                  make_doc('email-2', 'retention is the situationship of saas')]
+        with patch.object(self.pipeline, '_batch_load_documents', lambda batch_size=50: corpus):
+            job = self.pipeline.refresh_index(wait=True)
+
+        assert job['status'] == 'succeeded', job['error']
+        assert job['result']['emails'] == 2
+        assert self.pipeline.retriever.has_email('email-2')
@@ -0,0 +1,90 @@
+import importlib
+from email.message import EmailMessage
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from ingestion_api.parser import EmailParser
+from ingestion_api.persona_extractor import persona_extractor
+
+# The package exports the parser instance under the module's name
+parser_module = importlib.import_module('ingestion_api.parser')
+
+NEWSLETTER_HTML = """
+<html><head><style>p { color: red }</style><script>track();</script></head>
+<body>
+  <h1>Weekly &amp; more</h1>
+  <!-- tracking pixel below -->
+  <p>Agents are <b>reshaping</b> software&nbsp;teams.</p>
+  <img src="https://cdn.substack.com/chart.png"><img src="data:image/png;base64,AAAA">
+  <video src="https://video.example.com/demo.mp4"><source src="https://video.example.com/demo.webm"></video>
+  <iframe src="https://www.youtube.com/embed/abc"></iframe>
+  <a href="https://youtube.com/watch?v=abc">Watch</a>
+  <noscript>Enable JavaScript</noscript>
+</body></html>
+"""
+
+def make_email(plain=None, html=None, attachments=()):
+    msg = EmailMessage()
+    msg['From'] = 'Writer <writer@substack.com>'
+    msg['Subject'] = 'Weekly'
+    msg['Date'] = 'Mon, 13 Oct 2025 10:00:00 +0000'
+    if plain is not None:
+        msg.set_content(plain)
+        if html is not None:
+            msg.add_alternative(html, subtype='html')
+    else:
+        msg.set_content(html, subtype='html')
+    for content, filename in attachments:
+        msg.add_attachment(content, filename=filename)
+    return msg.as_bytes()
+
+class TestSinglePassParsing:
+    """Test that one MIME walk yields the body, media URLs and attachments."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.parser = EmailParser()
+        self.patch = patch.object(persona_extractor, 'create_persona', return_value=None)
+        self.patch.start()
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        self.patch.stop()
+
+    def test_each_part_is_decoded_once(self):
+        """Plain body, HTML media and a text attachment come from one decode per part."""
+        raw = make_email(plain='Plain body', html=NEWSLETTER_HTML, attachments=[('meeting notes', 'notes.txt')])
+
+        with patch.object(self.parser, '_get_payload', wraps=self.parser._get_payload) as get_payload:
+            parsed = self.parser.parse_email(raw)
+
+        assert get_payload.call_count == 3
+        assert parsed['body'].startswith('Plain body')
+        assert 'reshaping' not in parsed['body']
+        assert parsed['media_urls']['images'] == ['https://cdn.substack.com/chart.png']
+        assert parsed['media_urls']['videos'] == ['https://video.example.com/demo.mp4',
+                                                  'https://video.example.com/demo.webm',
+                                                  'https://youtube.com/watch?v=abc']
+        assert parsed['media_urls']['iframes'] == ['https://www.youtube.com/embed/abc']
+        assert [a['filename'] for a in parsed['attachments']] == ['notes.txt']
+        assert parsed['attachments'][0]['extracted_text'].strip() == 'meeting notes'
+
+    @pytest.mark.skipif(not parser_module.LXML_AVAILABLE, reason="lxml not installed")
+    def test_lxml_matches_beautifulsoup(self):
+        """The lxml backend produces the same body text as the BeautifulSoup fallback."""
+        raw = make_email(html=NEWSLETTER_HTML)
+
+        with_lxml = self.parser.parse_email(raw)
+        with patch.object(parser_module, 'LXML_AVAILABLE', False):
+            with_bs4 = self.parser.parse_email(raw)
+
+        assert with_lxml['body'] == with_bs4['body']
+        assert with_lxml['media_urls'] == with_bs4['media_urls']
+        assert 'track()' not in with_lxml['body'] and 'color: red' not in with_lxml['body']
+        assert 'Enable JavaScript' in with_lxml['body']
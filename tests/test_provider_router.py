@@ -0,0 +1,99 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.provider_router import CircuitBreaker, ProviderRouter, Route
+
+def make_route(name, provider, delay=0.0, fail=False, calls=None):
+    def complete(prompt, max_tokens, temperature, timeout):
+        if calls is not None:
+            calls.append(name)
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError(f"{name} is down")
+        return f"answer from {name}"
+    return Route(name, provider, name, complete=complete)
+
+class TestCircuitBreaker:
+    """Test breaker state transitions."""
+
+    def test_opens_after_failures_and_probes_after_reset(self):
+        """Consecutive failures open the breaker; after the reset period one trial goes through."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == 'open' and not breaker.allow()
+
+        time.sleep(0.06)
+        assert breaker.allow()
+        assert not breaker.allow()  # Only one trial call at a time
+        breaker.record_success(0.1)
+        assert breaker.state == 'closed'
+
+class TestProviderRouter:
+    """Test fallback, timeouts, breakers and hedging."""
+
+    def test_falls_back_and_skips_open_breaker(self):
+        """A failing route is skipped once its breaker opens."""
+        calls = []
+        router = ProviderRouter([make_route('groq-a', 'groq', fail=True, calls=calls),
+                                 make_route('gemini', 'gemini', calls=calls)],
+                                hedge=False, failure_threshold=1, reset_timeout=60)
+
+        first = router.call('q', 10, 0.1)
+        second = router.call('q', 10, 0.1)
+
+        assert first[0].name == 'gemini' and second[0].name == 'gemini'
+        assert calls == ['groq-a', 'gemini', 'gemini']
+
+    def test_slow_route_times_out(self):
+        """An attempt slower than its timeout is abandoned for the next route."""
+        router = ProviderRouter([make_route('groq-a', 'groq', delay=1.0), make_route('gemini', 'gemini')],
+                                timeout=0.1, hedge=False)
+
+        start = time.monotonic()
+        route, text = router.call('q', 10, 0.1)
+
+        assert route.name == 'gemini'
+        assert time.monotonic() - start < 0.5
+        assert router.stats['timeouts'] == 1
+
+    def test_hedges_to_other_provider(self):
+        """If the primary is slower than the hedge delay, the other provider answers."""
+        router = ProviderRouter([make_route('groq-a', 'groq', delay=0.5), make_route('groq-b', 'groq'),
+                                 make_route('gemini', 'gemini')],
+                                timeout=2.0, hedge=True, hedge_delay=0.05)
+
+        start = time.monotonic()
+        route, text = router.call('q', 10, 0.1)
+
+        assert route.name == 'gemini'
+        assert time.monotonic() - start < 0.3
+        assert router.stats['hedged'] == 1 and router.stats['hedge_wins'] == 1
+
+    def test_total_timeout_bounds_the_call(self):
+        """The whole chain gives up at the total timeout."""
+        router = ProviderRouter([make_route('groq-a', 'groq', delay=1.0), make_route('gemini', 'gemini', delay=1.0)],
+                                timeout=5.0, total_timeout=0.2, hedge=True, hedge_delay=0.05)
+
+        start = time.monotonic()
+        assert router.call('q', 10, 0.1) is None
+        assert time.monotonic() - start < 0.5
+
+    def test_queued_attempt_timeout_starts_when_it_runs(self):
+        """Time spent waiting for a worker thread doesn't count against an attempt's timeout."""
+        router = ProviderRouter([make_route('groq-a', 'groq', delay=0.05), make_route('gemini', 'gemini')],
+                                timeout=0.2, hedge=False)
+        router._executor = ThreadPoolExecutor(max_workers=1)
+        router._executor.submit(time.sleep, 0.3)
+
+        route, text = router.call('q', 10, 0.1)
+
+        assert route.name == 'groq-a'
+        assert router.stats['timeouts'] == 0
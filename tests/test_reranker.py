@@ -0,0 +1,65 @@
+from pathlib import Path
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.reranker import CrossEncoderReranker
+
+class FakeCrossEncoder:
+    """Scores a pair by how many query words the chunk contains."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.batches.append(len(pairs))
+        return [sum(word in chunk.split() for word in query.split()) for query, chunk in pairs]
+
+def candidates():
+    texts = ['weather report', 'agents memo', 'nate on agents and evals', 'sourdough', 'agents']
+    return [{'content': text, 'metadata': {'email_id': f'email-{i}'}} for i, text in enumerate(texts)]
+
+class TestCrossEncoderReranker:
+    """Test reranking, score caching and the latency budget."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.model = FakeCrossEncoder()
+        self.reranker = CrossEncoderReranker(model=self.model, budget_ms=100)
+
+    def test_reranks_in_one_batch(self):
+        """All candidates are scored in a single forward pass and the best k kept."""
+        results = self.reranker.rerank('nate agents evals', candidates(), k=2)
+
+        assert [r['content'] for r in results] == ['nate on agents and evals', 'agents memo']
+        assert results[0]['rerank_score'] == 3
+        assert self.model.batches == [5]
+
+    def test_scores_are_cached_per_query_and_chunk(self):
+        """Only pairs not seen before go through the model."""
+        self.reranker.rerank('nate agents evals', candidates()[:3], k=2)
+        self.reranker.rerank('nate agents evals', candidates(), k=2)
+
+        assert self.model.batches == [3, 2]
+        assert self.reranker.get_stats()['cached_pairs'] == 3
+
+    def test_budget_limits_scored_pairs(self):
+        """When the model is slow only the best-retrieved candidates that fit are scored."""
+        self.reranker.seconds_per_pair = 0.03
+
+        results = self.reranker.rerank('nate agents evals', candidates(), k=4)
+
+        assert self.model.batches == [3]
+        assert [r['content'] for r in results] == ['nate on agents and evals', 'agents memo',
+                                                   'weather report', 'sourdough']
+        assert self.reranker.get_stats()['truncated'] == 1
+
+    def test_skips_when_budget_too_small(self):
+        """If no pairs can be compared within the budget, retrieval order is kept."""
+        self.reranker.seconds_per_pair = 0.06
+
+        results = self.reranker.rerank('nate agents evals', candidates(), k=2)
+
+        assert [r['metadata']['email_id'] for r in results] == ['email-0', 'email-1']
+        assert self.model.batches == []
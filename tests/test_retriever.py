@@ -0,0 +1,329 @@
+import tempfile
+import shutil
+import hashlib
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import faiss
+import numpy as np
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.document_source import Document
+from rag.retriever import FAISSRetriever
+from rag.document_store import DocumentStore
+from rag.index_factory import select_index_params
+from rag.config import config
+
+class HashEmbedder:
+    """Deterministic bag-of-words embedder so tests don't need a model or API key."""
+
+    def __init__(self, dimension: int = 64):
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in text.lower().split():
+            bucket = int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimension
+            vector[bucket] += 1.0
+        return vector
+
+    def embed_texts(self, texts):
+        return np.array([self._embed(text) for text in texts], dtype=np.float32).reshape(-1, self.dimension)
+
+    def embed_single_text(self, text):
+        return self._embed(text)
+
+def make_doc(email_id: str, content: str, label: str = 'substack.com') -> Document:
+    return Document(content, {
+        'email_id': email_id,
+        'subject': f'Subject {email_id}',
+        'sender': 'writer@example.com',
+        'date': '2025-01-15T10:00:00',
+        'label': label
+    })
+
+class TestIncrementalIndex:
+    """Test incremental add/remove on the FAISS retriever."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.retriever = FAISSRetriever(Path(self.temp_dir), HashEmbedder())
+        self.retriever.build_index([
+            make_doc('email-1', 'agents are reshaping software teams'),
+            make_doc('email-2', 'retention is the situationship of saas'),
+        ], force_rebuild=True, show_progress=False)
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_add_documents_is_searchable(self):
+        """New documents are searchable without a rebuild."""
+        added = self.retriever.add_documents([make_doc('email-3', 'microplastics in your kitchen')])
+
+        results = self.retriever.search('microplastics kitchen', k=1)
+
+        assert added == 1
+        assert self.retriever.has_email('email-3')
+        assert results[0]['metadata']['email_id'] == 'email-3'
+
+    def test_remove_emails(self):
+        """Removed emails never come back from search."""
+        removed = self.retriever.remove_emails(['email-1'])
+
+        results = self.retriever.search('agents software teams', k=5)
+
+        assert removed == 1
+        assert not self.retriever.has_email('email-1')
+        assert all(r['metadata']['email_id'] != 'email-1' for r in results)
+        assert self.retriever.index.ntotal == 1
+
+    def test_changes_swap_in_a_copy_of_the_index(self):
+        """Adds and removes never modify an index a running search may hold."""
+        before = self.retriever.index
+
+        self.retriever.add_documents([make_doc('email-3', 'microplastics in your kitchen')])
+        added = self.retriever.index
+        self.retriever.remove_emails(['email-1'])
+
+        assert before.ntotal == 2 and added.ntotal == 3
+        assert self.retriever.index.ntotal == 2
+        assert self.retriever.search('microplastics kitchen', k=1)[0]['metadata']['email_id'] == 'email-3'
+
+    def test_empty_embeddings_are_not_indexed(self):
+        """Zero vectors from failed providers are refused, so the email can be retried."""
+        self.retriever.embedder.embed_texts = lambda texts: np.zeros((len(texts), 64), dtype=np.float32)
+
+        added = self.retriever.add_documents([make_doc('email-3', 'microplastics in your kitchen')])
+
+        assert added == 0
+        assert not self.retriever.has_email('email-3')
+        assert self.retriever.index.ntotal == 2
+
+    def test_changes_survive_reload(self):
+        """Incremental changes are persisted with the index."""
+        self.retriever.add_documents([make_doc('email-3', 'microplastics in your kitchen')])
+        self.retriever.remove_emails(['email-2'])
+
+        reloaded = FAISSRetriever(Path(self.temp_dir), HashEmbedder())
+
+        assert reloaded._load_existing_index()
+        assert reloaded.has_email('email-3')
+        assert not reloaded.has_email('email-2')
+        assert reloaded.document_count() == 2
+
+class TestChunkSearch:
+    """Test chunk-level search with per-email collapsing."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.retriever = FAISSRetriever(Path(self.temp_dir), HashEmbedder())
+        self.retriever.build_index([
+            make_doc('email-1', 'agents agents planning'),
+            make_doc('email-1', 'agents agents tooling'),
+            make_doc('email-1', 'agents memory'),
+            make_doc('email-2', 'agents evaluation metrics'),
+        ], force_rebuild=True, show_progress=False, batch_size=2)
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_without_collapse_returns_all_chunks(self):
+        """Several chunks of one email can fill the results."""
+        results = self.retriever.search('agents', k=3)
+
+        assert [r['metadata']['email_id'] for r in results].count('email-1') >= 2
+
+    def test_collapse_limits_chunks_per_email(self):
+        """Collapsing keeps the best chunk of each email."""
+        results = self.retriever.search('agents', k=3, max_chunks_per_email=1)
+
+        email_ids = [r['metadata']['email_id'] for r in results]
+        assert sorted(email_ids) == ['email-1', 'email-2']
+
+class TestDocumentStore:
+    """Test the memory-mapped document store."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store_dir = Path(self.temp_dir) / "documents"
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_create_and_reopen(self):
+        """Content and metadata round-trip through the store files."""
+        DocumentStore.create(self.store_dir, [make_doc('email-1', 'héllo wörld'), None]).close()
+
+        store = DocumentStore(self.store_dir).open()
+
+        assert store.row_count == 2
+        assert store.live_count() == 1
+        assert store.get(0).content == 'héllo wörld'
+        assert store.get(0).metadata['email_id'] == 'email-1'
+        assert store.get(1) is None
+
+    def test_append_and_delete(self):
+        """Appended rows get the next IDs and deleted rows disappear."""
+        store = DocumentStore.create(self.store_dir, [make_doc('email-1', 'first')])
+
+        ids = store.append([make_doc('email-2', 'second'), make_doc('email-2', 'third')])
+        store.delete(store.email_doc_ids('email-1'))
+
+        assert ids == [1, 2]
+        assert [doc.content for doc in store.iter_documents()] == ['second', 'third']
+        assert not store.has_email('email-1')
+        assert len(store) == 2
+
+class TestCosineScores:
+    """Test normalized vectors and the stored score threshold."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.retriever = FAISSRetriever(Path(self.temp_dir), HashEmbedder())
+        self.retriever.build_index([
+            make_doc('email-1', 'agents ' * 50),
+            make_doc('email-2', 'agents tooling evaluation'),
+            make_doc('email-3', 'sourdough starter hydration'),
+        ], force_rebuild=True, show_progress=False)
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_scores_are_cosine_similarities(self):
+        """Chunk length doesn't inflate scores; identical direction scores 1."""
+        results = self.retriever.search('agents', k=3, score_threshold=0.0)
+
+        assert results[0]['metadata']['email_id'] == 'email-1'
+        assert abs(results[0]['score'] - 1.0) < 1e-5
+        assert all(r['score'] <= 1.0 + 1e-5 for r in results)
+
+    def test_threshold_drops_weak_hits(self):
+        """Hits below the threshold stored with the index are not returned."""
+        self.retriever.set_score_threshold(0.8)
+
+        reloaded = FAISSRetriever(Path(self.temp_dir), HashEmbedder())
+        reloaded._load_existing_index()
+        results = reloaded.search('agents tooling', k=3)
+
+        assert reloaded.score_threshold == 0.8
+        assert [r['metadata']['email_id'] for r in results] == ['email-2']
+
+    def test_legacy_index_is_normalized_on_load(self):
+        """Indexes saved before normalization (and before snapshots) are migrated to unit vectors."""
+        legacy_dir = Path(self.temp_dir) / 'legacy'
+        DocumentStore.create(legacy_dir / 'documents', [make_doc(f'email-{i}', 'agents') for i in range(3)])
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.retriever.index.d))
+        index.add_with_ids(np.full((3, index.d), 3.0, dtype=np.float32), np.arange(3, dtype=np.int64))
+        faiss.write_index(index, str(legacy_dir / "faiss_index.bin"))
+
+        reloaded = FAISSRetriever(legacy_dir, HashEmbedder())
+        assert reloaded._load_existing_index()
+        assert reloaded.snapshots.current_version() == reloaded.snapshot_version
+        assert not (legacy_dir / "faiss_index.bin").exists()
+
+        norms = np.linalg.norm(reloaded.index.index.reconstruct_n(0, 3), axis=1)
+        assert np.allclose(norms, 1.0)
+
+class TestIndexFactory:
+    """Test index selection and the HNSW tombstone path."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_auto_selection_by_size_and_budget(self):
+        """Small corpora are exact, large ones IVF, and over-budget ones compressed."""
+        assert select_index_params(5000, 768, index_type='auto')['index_type'] == 'flat'
+        assert select_index_params(100000, 768, index_type='auto',
+                                   memory_budget_mb=1024)['index_type'] == 'ivf_flat'
+        compressed = select_index_params(100000, 768, index_type='auto', memory_budget_mb=64)
+        assert compressed['index_type'] == 'opq_ivf_pq'
+        assert compressed['estimated_memory_mb'] <= 64
+        assert 768 % compressed['pq_m'] == 0
+
+    def test_hnsw_index_with_tombstones(self):
+        """HNSW can't remove vectors; removed emails are filtered by the store instead."""
+        retriever = FAISSRetriever(Path(self.temp_dir), HashEmbedder())
+        with patch.object(config, 'INDEX_TYPE', 'hnsw'):
+            retriever.build_index([
+                make_doc('email-1', 'agents are reshaping software teams'),
+                make_doc('email-2', 'agents evaluation metrics'),
+            ], force_rebuild=True, show_progress=False)
+
+        retriever.remove_emails(['email-1'])
+        results = retriever.search('agents software teams', k=2, score_threshold=0.0)
+        reloaded = FAISSRetriever(Path(self.temp_dir), HashEmbedder())
+        reloaded._load_existing_index()
+
+        assert [r['metadata']['email_id'] for r in results] == ['email-2']
+        assert retriever.index.ntotal == 2
+        assert reloaded.index_params['index_type'] == 'hnsw'
+
+class TestFilteredSearch:
+    """Test that label and date filters are applied inside the FAISS search."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def _corpus(self, count: int):
+        # Most documents match the query well; a few rare-label ones barely do
+        documents = [make_doc(f'email-{i}', f'agents agents planning topic{i}') for i in range(count)]
+        documents += [make_doc(f'rare-{i}', f'sourdough agents hydration note{i}', label='rare.com')
+                      for i in range(3)]
+        return documents
+
+    def test_selective_label_returns_k_results(self):
+        """A rare label still fills k results instead of losing them to post-filtering."""
+        retriever = FAISSRetriever(Path(self.temp_dir), HashEmbedder())
+        retriever.build_index(self._corpus(60), force_rebuild=True, show_progress=False)
+
+        results = retriever.search('agents planning', k=3, label='rare.com', score_threshold=0.0)
+
+        assert sorted(r['metadata']['email_id'] for r in results) == ['rare-0', 'rare-1', 'rare-2']
+
+    def test_selective_label_on_ivf_index(self):
+        """IVF widens nprobe for selective filters, so matches in other lists are found."""
+        retriever = FAISSRetriever(Path(self.temp_dir), HashEmbedder())
+        with patch.object(config, 'INDEX_TYPE', 'ivf_flat'), patch.object(config, 'IVF_NPROBE', 1):
+            retriever.build_index(self._corpus(400), force_rebuild=True, show_progress=False)
+
+        results = retriever.search('agents planning', k=3, label='rare.com', score_threshold=0.0)
+
+        assert retriever.index_params['nprobe'] == 1
+        assert len(results) == 3
+
+    def test_max_age_uses_timestamps(self):
+        """Age filters compare precomputed timestamps, including timezone-aware dates."""
+        old = make_doc('old', 'agents planning')
+        recent = make_doc('recent', 'agents planning review')
+        undated = make_doc('undated', 'agents planning notes')
+        old.metadata['date'] = '2020-01-01T00:00:00+00:00'
+        recent.metadata['date'] = datetime.now(timezone.utc).isoformat()
+        undated.metadata['date'] = ''
+        retriever = FAISSRetriever(Path(self.temp_dir), HashEmbedder())
+        retriever.build_index([old, recent, undated], force_rebuild=True, show_progress=False)
+
+        results = retriever.search('agents planning', k=3, max_age_days=30, score_threshold=0.0)
+
+        assert sorted(r['metadata']['email_id'] for r in results) == ['recent', 'undated']
@@ -0,0 +1,100 @@
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.cache import email_tag, label_tag
+from rag.email_pipeline import EmailRAGPipeline
+from rag.semantic_cache import SemanticCache
+from tests.test_retriever import HashEmbedder, make_doc
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+class CountingGenerator:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_response(self, query, context_docs, sender=None):
+        self.calls += 1
+        return {'response': f"answer {self.calls}", 'provider': 'stub', 'model': 'stub'}
+
+class TestSemanticCache:
+    """Test similarity lookups, scoping and invalidation of the semantic cache."""
+
+    def test_similar_query_hits(self):
+        """A nearby embedding reuses the answer; a distant one doesn't."""
+        cache = SemanticCache('test', threshold=0.9)
+        cache.set(unit(1, 0, 0), 'agents answer')
+
+        answer, similarity = cache.get(unit(1, 0.2, 0))
+        assert answer == 'agents answer'
+        assert similarity > 0.9
+        assert cache.get(unit(0, 1, 0)) is None
+
+    def test_scope_must_match(self):
+        """Answers for another label or persona are never reused."""
+        cache = SemanticCache('test', threshold=0.9)
+        cache.set(unit(1, 0, 0), 'news answer', scope=('news', None, None))
+
+        assert cache.get(unit(1, 0, 0), scope=('other', None, None)) is None
+        assert cache.get(unit(1, 0, 0), scope=('news', None, None))[0] == 'news answer'
+
+    def test_bump_and_stale_snapshot(self):
+        """Only answers built from a changed email are dropped, and answers computed across its change aren't stored."""
+        cache = SemanticCache('test', threshold=0.9)
+        cache.set(unit(1, 0, 0), 'old', sources=['email-1'])
+        cache.set(unit(0, 1, 0), 'other', sources=['email-2'])
+        snapshot = cache.snapshot()
+
+        cache.bump([label_tag('news'), email_tag('email-1')])
+
+        assert cache.get(unit(1, 0, 0)) is None
+        assert cache.get(unit(0, 1, 0))[0] == 'other'
+        assert not cache.set(unit(1, 0, 0), 'stale', sources=['email-1'], snapshot=snapshot)
+        assert cache.set(unit(0, 0, 1), 'fresh', sources=['email-2'], snapshot=snapshot)
+        assert cache.get_stats()['vectors'] == 2
+
+class TestPipelineSemanticCache:
+    """Test that the pipeline answers paraphrases from the semantic cache."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.pipeline = EmailRAGPipeline(data_dir=self.temp_dir)
+        self.pipeline._embedder = HashEmbedder()
+        self.pipeline._generator = CountingGenerator()
+        self.pipeline.retriever.build_index([
+            make_doc('email-1', 'nate thinks agents will reshape software teams'),
+            make_doc('email-2', 'retention is the situationship of saas'),
+        ], force_rebuild=True, show_progress=False)
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_paraphrase_reuses_answer_until_its_sources_change(self):
+        """A reworded question skips retrieval and generation until an email it was answered from is removed."""
+        first = self.pipeline.query('what did nate say about agents')
+        second = self.pipeline.query('about agents what did nate say')
+
+        assert second['answer'] == first['answer']
+        assert second['semantic_match']['question'] == 'what did nate say about agents'
+        assert self.pipeline._generator.calls == 1
+        sources = {doc['metadata']['email_id'] for doc in first['context']}
+        assert 'email-1' in sources and 'email-3' not in sources
+
+        self.pipeline.retriever.add_documents([make_doc('email-3', 'sourdough starter hydration')])
+        assert 'semantic_match' in self.pipeline.query('say about agents what did nate')
+        assert self.pipeline._generator.calls == 1
+
+        self.pipeline.retriever.remove_emails(['email-1'])
+        self.pipeline.query('what did nate say about agents?')
+
+        assert self.pipeline._generator.calls == 2
@@ -0,0 +1,136 @@
+import tempfile
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from ingestion_api.models import EmailMetadata
+from rag.config import config
+from rag.email_pipeline import EmailRAGPipeline
+from rag.retriever import FAISSRetriever
+from rag.shared_index import SharedIndex
+from tests.test_retriever import HashEmbedder, make_doc
+
+class CachingHashEmbedder(HashEmbedder):
+    """HashEmbedder with the ``use_cache`` switch of the hybrid embedder."""
+
+    def embed_single_text(self, text, use_cache=True):
+        return self._embed(text)
+
+def search_ids(retriever, query):
+    return [hit['metadata']['email_id'] for hit in retriever.search(query, k=5, max_chunks_per_email=0)]
+
+class TestSharedIndex:
+    """Test one writer and mapped readers sharing a vector store directory."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store_dir = Path(self.temp_dir) / 'vector_store'
+        self.writer_shared = SharedIndex(self.store_dir)
+        self.reader_shared = SharedIndex(self.store_dir)
+        assert self.writer_shared.try_become_writer()
+        self.writer = FAISSRetriever(self.store_dir, CachingHashEmbedder(), shared=self.writer_shared)
+        self.writer.build_index([
+            make_doc('email-1', 'agents are reshaping software teams'),
+            make_doc('email-2', 'retention is the situationship of saas'),
+        ], force_rebuild=True, show_progress=False)
+        self.reader = FAISSRetriever(self.store_dir, CachingHashEmbedder(), shared=self.reader_shared)
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        self.writer_shared.release_writer()
+        self.reader_shared.release_writer()
+        shutil.rmtree(self.temp_dir)
+
+    def test_single_writer_election(self):
+        """Only one process holds the writer role; it passes on when released."""
+        assert not self.reader_shared.try_become_writer()
+        assert self.reader.read_only and not self.writer.read_only
+
+        self.writer_shared.release_writer()
+
+        assert self.reader_shared.try_become_writer()
+        assert not self.reader.read_only
+
+    def test_reader_follows_published_generations(self):
+        """Readers map the published index and switch to each new generation."""
+        assert self.reader._load_existing_index()
+        assert self.reader.loaded_generation == self.writer.loaded_generation
+        assert search_ids(self.reader, 'agents software') == ['email-1']
+        assert self.reader.add_documents([make_doc('email-3', 'ignored')]) == 0
+
+        self.writer.add_documents([make_doc('email-3', 'agents running whole software companies')])
+        self.writer.remove_emails(['email-1'])
+
+        with patch.object(config, 'INDEX_RELOAD_CHECK_SECONDS', 0):
+            assert self.reader.refresh_if_stale()
+            assert not self.reader.refresh_if_stale()
+        assert self.reader.loaded_generation == self.writer_shared.read_generation()['generation']
+        hits = search_ids(self.reader, 'agents software companies')
+        assert hits[0] == 'email-3' and 'email-1' not in hits
+
+class TestSharedPipeline:
+    """Test index updates forwarded from a reader pipeline to the writer."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.patches = [patch.object(config, 'INDEX_MODE', 'shared'),
+                        patch.object(config, 'INDEX_RELOAD_CHECK_SECONDS', 0),
+                        patch.object(EmailRAGPipeline, '_start_index_sync', lambda self: None)]
+        for p in self.patches:
+            p.start()
+        self.writer = EmailRAGPipeline(data_dir=self.temp_dir)
+        self.writer._embedder = CachingHashEmbedder()
+        assert self.writer.role == 'writer'
+        self.writer.retriever.build_index([
+            make_doc('email-1', 'agents are reshaping software teams'),
+            make_doc('email-2', 'retention is the situationship of saas'),
+        ], force_rebuild=True, show_progress=False)
+        self.reader = EmailRAGPipeline(data_dir=self.temp_dir)
+        self.reader._embedder = CachingHashEmbedder()
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        self.reader.shutdown()
+        self.writer.shutdown()
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_reader_forwards_updates_to_writer(self):
+        """A removal on a reader is applied by the writer and then seen by the reader."""
+        assert self.reader.role == 'reader'
+        self.reader.initialize()
+        assert 'email-1' in search_ids(self.reader.retriever, 'agents software')
+
+        assert self.reader.remove_emails(['email-1']) == 0
+        assert len(self.reader._shared_index.tasks) == 1
+
+        self.writer.sync_index()
+        assert len(self.writer._shared_index.tasks) == 0
+        assert not self.writer.retriever.has_email('email-1')
+
+        self.reader.sync_index()
+        assert 'email-1' not in search_ids(self.reader.retriever, 'agents software')
+
+    def test_forwarded_email_keeps_its_metadata(self):
+        """An email indexed through a reader is indexed by the writer with the ingestion metadata."""
+        parsed_path = Path(self.temp_dir) / 'email-3_Agents.txt'
+        parsed_path.write_text('Subject: Agents\nFrom: Unknown\n' + '-' * 80 + '\nagents shipping code')
+        metadata = EmailMetadata(subject='Agents at work', sender='Writer <writer@substack.com>',
+                                 date=datetime(2025, 10, 13, 10, tzinfo=timezone.utc), label='ai',
+                                 parsed_path=str(parsed_path))
+        self.reader.initialize()
+        assert self.reader.index_email('email-3', str(parsed_path), metadata) == 0
+
+        self.writer.sync_index()
+        hits = self.writer.retriever.search('agents shipping code', k=5, max_chunks_per_email=0)
+        hit = next(hit['metadata'] for hit in hits if hit['metadata']['email_id'] == 'email-3')
+        assert hit['subject'] == 'Agents at work' and hit['label'] == 'ai'
+        assert hit['date'] == '2025-10-13T10:00:00+00:00'
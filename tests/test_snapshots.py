@@ -0,0 +1,90 @@
+import json
+import tempfile
+import shutil
+from unittest.mock import patch
+from pathlib import Path
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.retriever import FAISSRetriever
+from rag.snapshots import MANIFEST_FILE
+from tests.test_retriever import HashEmbedder, make_doc
+
+def search_ids(retriever, query):
+    return [hit['metadata']['email_id'] for hit in retriever.search(query, k=5, max_chunks_per_email=0)]
+
+class TestIndexSnapshots:
+    """Test versioned index snapshots, rollback and recovery from a damaged build."""
+
+    def setup_method(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store_dir = Path(self.temp_dir)
+        self.retriever = FAISSRetriever(self.store_dir, HashEmbedder())
+        self.retriever.build_index([
+            make_doc('email-1', 'agents are reshaping software teams'),
+            make_doc('email-2', 'retention is the situationship of saas'),
+        ], force_rebuild=True, show_progress=False)
+        self.first = self.retriever.snapshot_version
+        self.retriever.build_index([
+            make_doc('email-3', 'agents running whole software companies'),
+        ], force_rebuild=True, show_progress=False)
+        self.second = self.retriever.snapshot_version
+
+    def teardown_method(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_rebuild_writes_a_new_snapshot(self):
+        """A rebuild goes into a new version with a manifest; the previous one is kept."""
+        assert self.first != self.second
+        assert self.retriever.snapshots.versions() == [self.first, self.second]
+        assert self.retriever.snapshots.current_version() == self.second
+
+        manifest = self.retriever.snapshots.read_manifest(self.second)
+        assert manifest['embedding'] == {'embedder': 'HashEmbedder', 'dimension': 64}
+        assert manifest['vectors'] == 1 and manifest['documents'] == 1
+        assert 'sha256' in manifest['files']['faiss_index.bin']
+        assert self.retriever.snapshots.verify(self.second) == []
+
+    def test_rollback_restores_previous_snapshot(self):
+        """Rolling back serves the previous build again, and survives a reload."""
+        assert self.retriever.rollback() == self.first
+        assert search_ids(self.retriever, 'agents software') == ['email-1']
+
+        reloaded = FAISSRetriever(self.store_dir, HashEmbedder())
+        assert reloaded._load_existing_index()
+        assert reloaded.snapshot_version == self.first
+
+    def test_damaged_snapshot_falls_back_to_previous(self):
+        """A current snapshot that fails its checksums is skipped on load."""
+        manifest_path = self.retriever.snapshots.path(self.second) / MANIFEST_FILE
+        manifest = json.loads(manifest_path.read_text())
+        manifest['files']['faiss_index.bin']['sha256'] = '0' * 64
+        manifest_path.write_text(json.dumps(manifest))
+
+        reloaded = FAISSRetriever(self.store_dir, HashEmbedder())
+        assert reloaded._load_existing_index()
+        assert reloaded.snapshot_version == self.first
+        assert reloaded.snapshots.current_version() == self.first
+
+    def test_interrupted_save_keeps_last_committed_state(self):
+        """A save that dies before its manifest leaves the current snapshot loadable, without the update."""
+        self.retriever.add_documents([make_doc('email-4', 'agents negotiating software contracts')])
+        manifest = self.retriever.snapshots.read_manifest(self.second)
+        assert 'sha256' not in manifest['files'][f"{manifest['index_dir']}/faiss_index.bin"]
+
+        with patch.object(self.retriever.snapshots, 'write_manifest', side_effect=OSError('disk gone')):
+            self.retriever.add_documents([make_doc('email-5', 'agents writing software postmortems')])
+
+        reloaded = FAISSRetriever(self.store_dir, HashEmbedder())
+        assert reloaded._load_existing_index()
+        assert reloaded.snapshot_version == self.second
+        assert reloaded.snapshots.current_version() == self.second
+        assert reloaded.has_email('email-4')
+        assert not reloaded.has_email('email-5')
+
+        reloaded.add_documents([make_doc('email-5', 'agents writing software postmortems')])
+        assert 'email-5' in search_ids(reloaded, 'postmortems')
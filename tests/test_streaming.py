@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+# Add parent directory to path for imports
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rag.generator import MultiProviderGenerator, GROQ_MODELS
+from rag.provider_router import ProviderRouter
+from ingestion_api import main
+
+class FakeGroqClient:
+    """Groq client whose first model fails and whose others stream the given chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.models = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, stream, **kwargs):
+        self.models.append(model)
+        assert stream is True
+        if model == GROQ_MODELS[0]:
+            raise RuntimeError("model decommissioned")
+        return iter(SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk))])
+                    for chunk in self.chunks)
+
+class StubPipeline:
+    def query_stream(self, question, label=None, max_age_days=None):
+        yield {'type': 'sources', 'context': [{'content': 'c', 'metadata': {}}], 'metadata': [{'id': 'email-1'}]}
+        for text in ('Hello', ' world'):
+            yield {'type': 'token', 'text': text}
+        yield {'type': 'done', 'answer': 'Hello world', 'provider': 'groq', 'model': 'm', 'stats': {}}
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+class TestStreamingGeneration:
+    """Test token streaming from the generator and over SSE."""
+
+    def test_groq_stream_falls_back_between_models(self):
+        """Tokens come from the first model that starts answering."""
+        generator = MultiProviderGenerator()
+        generator.groq_client = FakeGroqClient(['Hel', None, 'lo'])
+        generator.gemini_client = None
+        generator.router = ProviderRouter(generator._build_routes())
+
+        events = list(generator.stream_response('hi?', [{'content': 'x', 'metadata': {}}]))
+
+        assert [e['text'] for e in events if e['type'] == 'token'] == ['Hel', 'lo']
+        assert events[-1] == {'type': 'done', 'response': 'Hello', 'provider': 'groq', 'model': GROQ_MODELS[1]}
+        assert generator.groq_client.models == GROQ_MODELS[:2]
+
+    def test_fallback_text_when_no_provider(self):
+        """Without providers the fallback answer is sent as a single token."""
+        generator = MultiProviderGenerator()
+        generator.groq_client = generator.gemini_client = generator.cohere_client = None
+
+        events = list(generator.stream_response('hi?', []))
+
+        assert [e['type'] for e in events] == ['token', 'done']
+        assert events[-1]['provider'] == 'fallback'
+
+    def test_sse_endpoint_sends_sources_before_tokens(self):
+        """/query/stream emits sources, then tokens, then done."""
+        with patch.object(main, 'get_rag_pipeline', return_value=StubPipeline()):
+            response = TestClient(main.app).post('/query/stream', json={'question': 'hi?'})
+
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/event-stream')
+        events = parse_sse(response.text)
+        assert [name for name, _ in events] == ['sources', 'token', 'token', 'done']
+        assert events[-1][1]['answer'] == 'Hello world'
+        assert 'stats' not in events[-1][1]